@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+企业实体目录
+功能:
+1. 从 companies / company_aliases 一次性载入全部企业名称和别名,进程内共享
+2. 别名、全名、去后缀简称编译为一个多模式自动机,一次扫描完成企业识别
+3. 精确匹配失败时,用本地模糊索引(bigram + 有界编辑距离 + 可选拼音首字母)给出带分数的候选
+4. 数据库变更(data_version/文件变化)后自动重新载入
+5. 将问题中的企业名称替换为占位符,得到与企业无关的问题模板
+
+FinancialQuery 企业匹配、IntentClassifier 企业判断、聊天接口按ID取企业名共用同一目录
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from modules.data_version import DataVersionWatcher
+from modules.fuzzy_index import FuzzyNameIndex
+from modules.keyword_matcher import KeywordAutomaton
+
+# 默认企业数据库(与工作目录无关)
+DEFAULT_DB_PATH = str(Path(__file__).resolve().parent.parent / 'database' / 'financial.db')
+
+# 去后缀简称时去掉的后缀(按顺序替换)
+COMPANY_SUFFIXES = ('有限公司', '有限责任公司', '公司', '厂')
+
+
+def short_company_name(name: str) -> str:
+    """去掉常见后缀得到企业简称"""
+    for suffix in COMPANY_SUFFIXES:
+        name = name.replace(suffix, '')
+    return name
+
+
+class CompanyCatalogSnapshot:
+    """某一数据版本的企业目录(只读)"""
+
+    def __init__(self, companies: Dict[int, str], aliases: Dict[str, int]):
+        """
+        构建目录并编译匹配自动机
+
+        Args:
+            companies: {企业ID: 企业全名}
+            aliases: {别名: 企业ID}
+        """
+        self.companies = companies
+        self.aliases = aliases
+
+        # 各类别按长度降序排列(稳定排序),列表位置即优先级,与逐个`in`判断的顺序一致
+        self._alias_list = sorted(aliases, key=len, reverse=True)
+        self._company_list = sorted(companies.items(), key=lambda x: len(x[1]), reverse=True)
+        self._short_list = [(cid, short_company_name(name)) for cid, name in self._company_list]
+        self._automaton = KeywordAutomaton({
+            'alias': self._alias_list,
+            'name': [name for _, name in self._company_list],
+            'short': [short if len(short) >= 2 else '' for _, short in self._short_list]
+        })
+        self._fuzzy: Optional[FuzzyNameIndex] = None
+        self._fuzzy_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.companies)
+
+    def get(self, company_id: int) -> Optional[Dict]:
+        """按ID获取企业 {'id': ..., 'name': ...}"""
+        name = self.companies.get(company_id)
+        return None if name is None else {'id': company_id, 'name': name}
+
+    def match(self, question: str) -> Optional[Dict]:
+        """
+        从问题中识别企业(别名 > 全名 > 去后缀简称,同类别内优先更长的名称)
+
+        Returns:
+            {'id': ..., 'name': ...} 或 None
+        """
+        hits = self._automaton.scan(question)
+
+        hit = hits.first('alias')
+        if hit is not None:
+            company_id = self.aliases[hit.word]
+            return {'id': company_id, 'name': self.companies.get(company_id)}
+
+        for category, entries in (('name', self._company_list), ('short', self._short_list)):
+            hit = hits.first(category)
+            if hit is not None:
+                return self.get(entries[hit.index][0])
+        return None
+
+    def fuzzy_candidates(self, question: str, top_k: int = 5, min_score: float = 0.4) -> List[Dict]:
+        """
+        模糊匹配候选企业(精确匹配失败时使用,首次调用时构建索引)
+
+        Returns:
+            [{'id': ..., 'name': ..., 'score': ..., 'matched': 命中的名称/别名}, ...],按得分降序
+        """
+        if self._fuzzy is None:
+            with self._fuzzy_lock:
+                if self._fuzzy is None:
+                    # 简称去掉了"有限公司"等所有企业共有的后缀,避免其bigram召回全部企业
+                    entries = [(short if len(short) >= 2 else self.companies[cid], cid)
+                               for cid, short in self._short_list]
+                    entries += [(alias, cid) for alias, cid in self.aliases.items()]
+                    self._fuzzy = FuzzyNameIndex(entries)
+        return [{'id': c.key, 'name': self.companies.get(c.key), 'score': c.score, 'matched': c.text}
+                for c in self._fuzzy.query(question, top_k=top_k, min_score=min_score)]
+
+    def mentions_company(self, question: str) -> bool:
+        """问题中是否出现企业全名或别名"""
+        hits = self._automaton.scan(question)
+        return hits.any('alias') or hits.any('name')
+
+    def mask(self, question: str, placeholder: str = '<企业>') -> str:
+        """
+        将问题中的企业别名/全名/简称替换为占位符(最左最长、互不重叠)
+
+        用于生成与具体企业无关的问题模板(如Text-to-SQL模板缓存的键)
+        """
+        hits = self._automaton.scan(question)
+        spans = sorted((m for category in ('alias', 'name', 'short') for m in hits.matches(category)),
+                       key=lambda m: (m.start, m.start - m.end))
+        parts, end = [], 0
+        for m in spans:
+            if m.start >= end:
+                parts.append(question[end:m.start])
+                parts.append(placeholder)
+                end = m.end
+        parts.append(question[end:])
+        return ''.join(parts)
+
+    def names(self) -> List[str]:
+        """全部企业全名(按ID顺序)"""
+        return [self.companies[cid] for cid in sorted(self.companies)]
+
+
+class CompanyCatalog:
+    """企业目录(数据版本变化时自动重新载入)"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        """
+        初始化
+
+        Args:
+            db_path: financial.db 路径
+        """
+        self.db_path = str(db_path)
+        self._watcher = DataVersionWatcher(self.db_path)
+        self._stamp = None
+        self._snapshot: Optional[CompanyCatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> CompanyCatalogSnapshot:
+        """
+        获取当前数据版本的目录,数据库变化时重新载入
+
+        数据库不存在或读取失败时返回空目录(不会创建数据库文件)
+        """
+        stamp = self._watcher.stamp()
+        if stamp is None:
+            return CompanyCatalogSnapshot({}, {})
+        with self._lock:
+            if stamp != self._stamp or self._snapshot is None:
+                self._snapshot = self.load()
+                self._stamp = stamp
+            return self._snapshot
+
+    def load(self) -> CompanyCatalogSnapshot:
+        """从数据库全量载入"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, name FROM companies')
+            companies = {row[0]: row[1] for row in cursor.fetchall() if row[1]}
+            cursor.execute('SELECT company_id, alias FROM company_aliases')
+            aliases = {row[1]: row[0] for row in cursor.fetchall() if row[1]}
+        except sqlite3.Error as e:
+            print(f"⚠️  企业目录载入失败: {e}")
+            companies, aliases = {}, {}
+        finally:
+            conn.close()
+        print(f"🏢 企业目录已载入: {len(companies)} 家企业, {len(aliases)} 个别名")
+        return CompanyCatalogSnapshot(companies, aliases)
+
+
+# 全局实例(按数据库路径共享)
+_catalog_instances: Dict[str, CompanyCatalog] = {}
+_catalog_lock = threading.Lock()
+
+
+def get_company_catalog(db_path: str = DEFAULT_DB_PATH) -> CompanyCatalog:
+    """获取指定数据库的全局企业目录实例"""
+    key = str(Path(db_path).resolve())
+    with _catalog_lock:
+        if key not in _catalog_instances:
+            _catalog_instances[key] = CompanyCatalog(key)
+        return _catalog_instances[key]
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JSON配置注册中心
+功能:
+1. 统一管理 config/*.json: 每个文件只解析一次,以带版本号的只读快照发布
+2. 后台线程按间隔轮询文件状态(去抖动: 连续两次轮询状态一致才发布,避免读到写了一半的文件)
+3. 订阅者在配置变化时收到回调,只在变化时重建派生结构
+4. 查询路径只读取内存中的快照引用,不再逐次 stat() 配置文件
+
+解析失败时保留上一个有效快照;文件从未成功解析时快照 data 为 None
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class ConfigSnapshot:
+    """某一版本的配置快照(只读,调用方不得修改 data)"""
+
+    __slots__ = ('path', 'version', 'data', 'fingerprint')
+
+    def __init__(self, path: str, version: int, data: Optional[Any], fingerprint: str):
+        object.__setattr__(self, 'path', path)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'data', data)
+        object.__setattr__(self, 'fingerprint', fingerprint)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot是只读的")
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot(path={self.path!r}, version={self.version}, fingerprint={self.fingerprint!r})"
+
+
+class _WatchedFile:
+    """单个被监视文件的状态"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stat: Optional[Tuple[int, int]] = None   # 已发布快照对应的 (mtime_ns, size)
+        self.pending: Optional[Tuple[int, int]] = None  # 上次轮询看到但尚未发布的状态
+        self.snapshot: Optional[ConfigSnapshot] = None
+        self.subscribers: List[Callable[[ConfigSnapshot], None]] = []
+
+
+class ConfigRegistry:
+    """JSON配置注册中心(线程安全)"""
+
+    def __init__(self, poll_interval: float = 1.0):
+        """
+        初始化
+
+        Args:
+            poll_interval: 后台轮询间隔(秒)
+        """
+        self.poll_interval = poll_interval
+        self._files: Dict[str, _WatchedFile] = {}
+        self._keys: Dict[Any, str] = {}
+        self._lock = threading.RLock()
+        self._version = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _key(self, path) -> str:
+        """规范化路径(结果缓存,避免每次读取都访问文件系统)"""
+        key = self._keys.get(path)
+        if key is None:
+            key = self._keys[path] = str(Path(path).resolve())
+        return key
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _publish(self, watched: _WatchedFile, stat: Optional[Tuple[int, int]]) -> Optional[ConfigSnapshot]:
+        """解析文件并发布新快照;内容未变或解析失败时不发布(返回None)"""
+        data, fingerprint = None, "missing"
+        if stat is not None:
+            try:
+                with open(watched.path, 'rb') as f:
+                    raw = f.read()
+                fingerprint = hashlib.sha1(raw).hexdigest()[:16]
+                if watched.snapshot is not None and watched.snapshot.fingerprint == fingerprint:
+                    watched.stat = stat  # 仅mtime变化(如touch),内容相同,不发布新版本
+                    return None
+                data = json.loads(raw.decode('utf-8'))
+            except FileNotFoundError:
+                stat, fingerprint = None, "missing"
+            except (OSError, json.JSONDecodeError, UnicodeDecodeError) as e:
+                print(f"⚠️ 配置文件格式错误,保留上一版本: {watched.path}: {e}")
+                watched.stat = stat
+                if watched.snapshot is not None:
+                    return None
+                fingerprint = "invalid"
+        elif watched.snapshot is not None and watched.snapshot.data is None:
+            watched.stat = stat
+            return None
+
+        self._version += 1
+        watched.stat = stat
+        watched.snapshot = ConfigSnapshot(watched.path, self._version, data, fingerprint)
+        return watched.snapshot
+
+    def _notify(self, watched: _WatchedFile, snapshot: Optional[ConfigSnapshot]):
+        """通知订阅者(在锁外调用)"""
+        if snapshot is None:
+            return
+        for callback in list(watched.subscribers):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"⚠️ 配置订阅者处理失败: {e}")
+
+    def _watch(self, path) -> _WatchedFile:
+        """注册文件(首次注册时同步解析)"""
+        key = self._key(path)
+        with self._lock:
+            watched = self._files.get(key)
+            if watched is None:
+                watched = self._files[key] = _WatchedFile(key)
+                self._publish(watched, self._stat(key))
+        self._ensure_thread()
+        return watched
+
+    def get(self, path) -> ConfigSnapshot:
+        """
+        获取配置的当前快照(不访问文件系统,首次获取时同步解析)
+
+        Args:
+            path: 配置文件路径
+
+        Returns:
+            ConfigSnapshot;文件不存在或从未成功解析时 data 为 None
+        """
+        return self._watch(path).snapshot
+
+    def subscribe(self, path, callback: Callable[[ConfigSnapshot], None]) -> ConfigSnapshot:
+        """
+        订阅配置变化
+
+        Args:
+            path: 配置文件路径
+            callback: 新快照发布时调用 callback(snapshot)(在轮询线程中执行)
+
+        Returns:
+            当前快照
+        """
+        watched = self._watch(path)
+        with self._lock:
+            watched.subscribers.append(callback)
+        return watched.snapshot
+
+    def unsubscribe(self, path, callback: Callable[[ConfigSnapshot], None]):
+        """取消订阅"""
+        with self._lock:
+            watched = self._files.get(self._key(path))
+            if watched is not None and callback in watched.subscribers:
+                watched.subscribers.remove(callback)
+
+    def poll(self):
+        """轮询一次所有文件(去抖动: 状态与上次轮询一致才发布)"""
+        changed = []
+        with self._lock:
+            for watched in self._files.values():
+                stat = self._stat(watched.path)
+                if stat == watched.stat:
+                    watched.pending = None
+                    continue
+                if stat != watched.pending:
+                    watched.pending = stat  # 文件仍在变化,下次轮询再确认
+                    continue
+                watched.pending = None
+                changed.append((watched, self._publish(watched, stat)))
+        for watched, snapshot in changed:
+            if snapshot is not None:
+                print(f"📂 配置已更新: {watched.path} (v{snapshot.version})")
+            self._notify(watched, snapshot)
+
+    def refresh(self, path=None):
+        """
+        立即重新检查文件(不去抖动),用于工具脚本写入配置后或测试中
+
+        Args:
+            path: 配置文件路径;None表示全部
+        """
+        changed = []
+        with self._lock:
+            if path is None:
+                targets = list(self._files.values())
+            else:
+                targets = [self._watch(path)]
+            for watched in targets:
+                stat = self._stat(watched.path)
+                watched.pending = None
+                if stat != watched.stat:
+                    changed.append((watched, self._publish(watched, stat)))
+        for watched, snapshot in changed:
+            self._notify(watched, snapshot)
+
+    def _ensure_thread(self):
+        """按需启动后台轮询线程"""
+        with self._lock:
+            if self._thread is not None or self.poll_interval <= 0:
+                return
+            self._thread = threading.Thread(target=self._run, name="config-registry", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️ 配置轮询失败: {e}")
+
+    def stop(self):
+        """停止后台轮询线程"""
+        self._stop.set()
+
+
+# 全局实例
+_registry: Optional[ConfigRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_config_registry() -> ConfigRegistry:
+    """获取全局配置注册中心"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ConfigRegistry()
+        return _registry
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SQLite数据版本监视器
+功能:
+1. 通过 PRAGMA data_version 检测其他连接提交的数据变更
+2. 通过文件 inode/mtime/size 检测数据库文件被整体替换
+3. 为内存索引、缓存等派生结构提供统一的失效判断
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+
+class DataVersionWatcher:
+    """SQLite数据版本监视器(线程安全)"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化
+
+        Args:
+            db_path: 数据库路径
+        """
+        self.db_path = str(db_path)
+        self._conn = None
+        self._conn_ino = None
+        self._lock = threading.Lock()
+
+    def _file_stat(self) -> Optional[Tuple[int, int, int]]:
+        """获取数据库文件状态 (inode, mtime_ns, size)"""
+        try:
+            st = os.stat(self.db_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _data_version(self, ino: int) -> int:
+        """
+        读取 PRAGMA data_version
+
+        data_version 只对同一连接有意义,因此这里持有一个长连接;
+        文件被替换(inode变化)时重新打开连接
+        """
+        if self._conn is None or self._conn_ino != ino:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn_ino = ino
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def stamp(self) -> Optional[tuple]:
+        """
+        获取当前数据版本戳
+
+        Returns:
+            (inode, mtime_ns, size, data_version),文件不存在时返回None
+        """
+        with self._lock:
+            file_stat = self._file_stat()
+            if file_stat is None:
+                return None
+            try:
+                version = self._data_version(file_stat[0])
+            except sqlite3.Error:
+                version = -1
+            return file_stat + (version,)
+
+    def close(self):
+        """关闭监视连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._conn_ino = None
@@ -7,19 +7,110 @@
 2. 支持全文搜索
 3. 结果排序和过滤
 4. 支持配置热更新
+5. n-gram倒排索引加速LIKE语义检索(search_backend="ngram")
+6. FTS5(trigram)检索 + bm25相关度排序(search_backend="fts")
+7. LLM辅助推理结果持久化缓存(llm_cache)
+8. LLM推理税种/提取项目并发执行,统一截止时间,超时降级为关键词检索(llm_inference)
+9. 问题分析关键词由配置编译为一个Aho-Corasick自动机,单次扫描完成匹配
+10. 常驻内存模式(resident_store): 全表列式载入内存,取记录和统计不再建立连接
+11. 关键词未命中时使用本地向量索引(TF-IDF+SVD)与词法检索融合召回(hybrid_search)
+12. 问题级结果缓存(search_cache): 按归一化问题+limit+配置/数据版本缓存search结果
 """
 
 import sqlite3
-import json
-import os
+import copy
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
+
+from modules.config_registry import get_config_registry
+from modules.data_version import DataVersionWatcher
+from modules.keyword_matcher import KeywordAutomaton
+from modules.memory_cache import LRUCache
+from modules.persistent_cache import PersistentCache, get_persistent_cache
+from modules.policy_index import get_policy_index, is_like_safe
+from modules.policy_store import PolicySnapshot, get_policy_store
+
+
+# LLM辅助推理共享线程池(超时的调用在后台继续完成并写入缓存,不阻塞检索)
+_llm_executor = None
+_llm_executor_lock = threading.Lock()
+
+
+# _extract_keywords 使用的固定关键词(关键词查询策略)
+_SEARCH_KEYWORD_AUTOMATON = KeywordAutomaton({
+    "tax_types": ["增值税", "企业所得税", "个人所得税", "印花税", "房产税",
+                  "城镇土地使用税", "消费税", "土地增值税", "资源税", "车船税", "契税"],
+    "incentive_keywords": ["优惠", "减免", "免征", "减征", "抵扣", "退税",
+                           "补贴", "扶持", "即征即退", "先征后退", "免税", "减税"],
+    "entity_keywords": ["高新技术", "小微企业", "农业", "科技", "研发",
+                        "软件", "集成电路", "节能", "环保", "残疾人"]
+})
+
+
+def _get_llm_executor() -> ThreadPoolExecutor:
+    """获取LLM辅助推理共享线程池(懒加载)"""
+    global _llm_executor
+    with _llm_executor_lock:
+        if _llm_executor is None:
+            _llm_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tax-llm")
+        return _llm_executor
 
 
 class TaxIncentiveQuery:
     """税收优惠政策查询类"""
     
-    def __init__(self, db_path: Optional[str] = None, config_path: Optional[str] = None):
+    # 优惠方式关键词(数据库中所有可能的值)
+    INCENTIVE_METHODS = [
+        "减征", "免征", "不征", "暂免", "减半", "退税",
+        "即征即退", "先征后退", "先征后返", "免税", "减税",
+        "减免", "抵扣", "补贴", "扶持", "优惠"
+    ]
+    
+    # 各检索策略匹配的字段
+    ENTITY_SEARCH_COLUMNS = ('incentive_items', 'detailed_rules', 'qualification',
+                             'incentive_method', 'keywords', 'explanation')
+    STRUCTURED_SEARCH_COLUMNS = ('incentive_items', 'detailed_rules', 'qualification',
+                                 'incentive_method')
+    KEYWORD_SEARCH_COLUMNS = ('tax_type', 'incentive_items', 'qualification', 'detailed_rules',
+                              'keywords', 'explanation', 'incentive_method', 'legal_basis')
+    
+    # 支持的检索后端: like=SQL LIKE全表扫描, ngram=内存n-gram倒排索引, fts=FTS5+bm25排序
+    SEARCH_BACKENDS = ("like", "ngram", "fts")
+    
+    # bm25字段权重(配置项 fts_column_weights 可覆盖,未列出的字段权重为1.0)
+    DEFAULT_FTS_WEIGHTS = {
+        "incentive_items": 10.0,
+        "keywords": 8.0,
+        "incentive_method": 5.0,
+        "qualification": 3.0,
+        "tax_type": 2.0,
+        "detailed_rules": 1.0,
+        "explanation": 1.0,
+        "legal_basis": 0.5
+    }
+    
+    # trigram分词器能索引的最短关键词长度
+    FTS_MIN_TERM_LENGTH = 3
+    
+    # 结构化查询候选ID列表缓存条数(用于翻页复用)
+    CANDIDATE_CACHE_SIZE = 64
+    
+    # LLM提示词版本(修改提示词时递增,使旧缓存失效)
+    TAX_TYPE_PROMPT_VERSION = "v1"
+    PROJECT_KEYWORDS_PROMPT_VERSION = "v1"
+    
+    # LLM辅助推理的默认总截止时间(秒,配置项 llm_inference.deadline_seconds 可覆盖)
+    DEFAULT_LLM_DEADLINE_SECONDS = 8.0
+    
+    def __init__(self, db_path: Optional[str] = None, config_path: Optional[str] = None,
+                 search_backend: Optional[str] = None, llm_cache_path: Optional[str] = None,
+                 resident: Optional[bool] = None):
         if db_path is None:
             # 默认数据库路径
             db_path = Path(__file__).parent.parent / "database" / "tax_incentives.db"
@@ -30,8 +121,19 @@ class TaxIncentiveQuery:
         
         self.db_path = str(db_path)
         self.config_path = str(config_path)
-        self._config_mtime = 0  # 配置文件修改时间(用于热更新检测)
+        self._config_version = None  # 当前配置快照版本(用于热更新检测)
         self._config = {}  # 配置缓存
+        self._search_backend = search_backend  # 为None时从配置读取
+        self._resident = resident  # 是否使用常驻内存存储,为None时从配置读取
+        self._fts_warned = False  # FTS不可用提示只打印一次
+        self._data_watcher = DataVersionWatcher(self.db_path)  # 数据变更检测(候选缓存失效)
+        self._candidate_cache = OrderedDict()  # 结构化查询候选ID列表(LRU)
+        self._candidate_lock = threading.Lock()
+        self._config_fingerprint = "default"  # 配置内容指纹(LLM缓存失效依据)
+        self._llm_cache_path = llm_cache_path  # 为None时使用 database/tax_llm_cache.db
+        self._llm_cache_tag = None  # LLM缓存已按哪个配置指纹清理过
+        self._keyword_automaton = None  # (配置指纹, 问题分析关键词自动机, 模糊映射),配置变化时整体替换
+        self._search_cache = LRUCache()  # 问题级结果缓存(容量/TTL随配置更新)
         
         self._verify_database()
         self._load_config()  # 初始化时加载配置
@@ -43,29 +145,24 @@ class TaxIncentiveQuery:
     
     def _load_config(self):
         """
-        加载配置文件(支持热更新)
-        每次调用时检查文件修改时间,只有文件变化时才重新加载
+        获取当前配置(支持热更新)
+        
+        配置由全局注册中心后台监视并解析,这里只比较快照版本号,版本变化时才替换本实例的配置副本
         """
-        try:
-            current_mtime = os.path.getmtime(self.config_path)
-            
-            # 如果文件未修改,直接返回缓存的配置
-            if current_mtime == self._config_mtime and self._config:
-                return self._config
-            
-            # 文件已修改,重新加载
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                self._config = json.load(f)
-            
-            self._config_mtime = current_mtime
-            print(f"📂 配置已加载/更新: {self.config_path}")
-            
-        except FileNotFoundError:
-            print(f"⚠️ 配置文件不存在,使用默认配置: {self.config_path}")
-            self._config = self._get_default_config()
-        except json.JSONDecodeError as e:
-            print(f"⚠️ 配置文件格式错误,使用默认配置: {e}")
+        snapshot = get_config_registry().get(self.config_path)
+        if snapshot.version == self._config_version and self._config:
+            return self._config
+        
+        if snapshot.data is None:
+            print(f"⚠️ 配置文件不存在或格式错误,使用默认配置: {self.config_path}")
             self._config = self._get_default_config()
+            self._config_fingerprint = "default"
+        else:
+            # 深拷贝: 本实例对配置的修改不影响共享快照
+            self._config = copy.deepcopy(snapshot.data)
+            self._config_fingerprint = snapshot.fingerprint
+            print(f"📂 配置已加载/更新: {self.config_path}")
+        self._config_version = snapshot.version
         
         return self._config
     
@@ -98,6 +195,31 @@ class TaxIncentiveQuery:
                 "小微企业": ["小微企业", "小型微利", "小微"],
                 "小型微利": ["小型微利", "小微企业", "小微"],
                 "高新技术": ["高新技术", "高新企业"]
+            },
+            "search_backend": "fts",
+            "resident_store": True,
+            "fts_column_weights": dict(self.DEFAULT_FTS_WEIGHTS),
+            "llm_cache": {
+                "enabled": True,
+                "max_entries": 5000,
+                "ttl_hours": 168
+            },
+            "llm_inference": {
+                "deadline_seconds": self.DEFAULT_LLM_DEADLINE_SECONDS
+            },
+            "search_cache": {
+                "enabled": True,
+                "max_entries": 500,
+                "ttl_seconds": 600
+            },
+            "hybrid_search": {
+                "enabled": True,
+                "replace_llm": False,
+                "candidates": 100,
+                "min_similarity": 0.1,
+                "lexical_weight": 1.0,
+                "dense_weight": 1.0,
+                "rrf_k": 60
             }
         }
     
@@ -107,6 +229,190 @@ class TaxIncentiveQuery:
         conn.row_factory = sqlite3.Row  # 返回字典格式
         return conn
     
+    def _get_resident_snapshot(self) -> Optional[PolicySnapshot]:
+        """
+        获取常驻内存存储的当前快照(数据库变化时自动重新载入)
+        
+        Returns:
+            快照;常驻模式关闭或载入失败时返回None(调用方走SQL)
+        """
+        resident = self._resident
+        if resident is None:
+            resident = self._load_config().get("resident_store", True)
+        if not resident:
+            return None
+        try:
+            return get_policy_store(self.db_path).snapshot()
+        except Exception as e:
+            print(f"⚠️ 常驻存储不可用,回退到SQL: {e}")
+            return None
+    
+    def _get_search_backend(self) -> str:
+        """获取当前检索后端(构造参数优先,其次配置文件)"""
+        backend = self._search_backend or self._load_config().get("search_backend", "fts")
+        if backend not in self.SEARCH_BACKENDS:
+            print(f"⚠️ 未知的检索后端'{backend}',使用like")
+            return "like"
+        return backend
+    
+    def _index_match(self, terms: List[str], columns: tuple,
+                     tax_type: Optional[str] = None) -> Optional[Set[int]]:
+        """
+        使用n-gram索引求匹配ID集合(fts模式下也用于FTS不可用时的降级和短关键词补充)
+        
+        Returns:
+            匹配ID集合;索引不可用或无法精确回答时返回None(调用方回退到SQL)
+        """
+        if self._get_search_backend() == "like":
+            return None
+        try:
+            index = get_policy_index(self.db_path)
+            if not index.ensure_fresh():
+                return None
+            return index.match_ids(terms, columns, tax_type=tax_type)
+        except Exception as e:
+            print(f"⚠️ n-gram索引查询失败,回退到SQL: {e}")
+            return None
+    
+    @staticmethod
+    def _fts_quote(term: str) -> str:
+        """将关键词转为FTS5短语字符串(按字面匹配)"""
+        return '"' + term.replace('"', '""') + '"'
+    
+    def _fts_table_columns(self, cursor) -> Optional[List[str]]:
+        """
+        获取FTS表字段列表
+        
+        Returns:
+            字段列表;FTS表不存在或不是trigram分词(无法检索中文子串)时返回None
+        """
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'tax_incentives_fts'")
+        row = cursor.fetchone()
+        if not row or 'trigram' not in (row[0] or '').lower():
+            return None
+        cursor.execute("PRAGMA table_info(tax_incentives_fts)")
+        return [r[1] for r in cursor.fetchall()]
+    
+    def _fts_match(self, terms: List[str], columns: tuple, tax_type: Optional[str] = None,
+                   limit: Optional[int] = None) -> Optional[List[int]]:
+        """
+        使用FTS5检索并按bm25相关度排序
+        
+        匹配集合与 `[tax_type = ? AND] (任一字段 LIKE '%任一关键词%')` 一致:
+        - 长度>=3的关键词和税种下推到MATCH表达式,结果按bm25加权排序
+        - 更短的关键词trigram无法索引,由n-gram索引补充,排在MATCH结果之后(按id)
+        
+        Args:
+            terms: 关键词列表(OR)
+            columns: 参与匹配的字段
+            tax_type: 税种精确过滤(可选)
+            limit: 返回数量限制(None表示全部,用于计数)
+        
+        Returns:
+            按相关度排序的政策ID列表;FTS不可用或无可MATCH的关键词时返回None
+        """
+        if self._get_search_backend() != "fts":
+            return None
+        # 含LIKE通配符的关键词在MATCH中会按字面匹配,语义不同
+        if any(not is_like_safe(term) for term in terms):
+            return None
+        long_terms = [t for t in terms if len(t) >= self.FTS_MIN_TERM_LENGTH]
+        short_terms = [t for t in terms if len(t) < self.FTS_MIN_TERM_LENGTH]
+        if not long_terms:
+            return None
+        
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            fts_columns = self._fts_table_columns(cursor)
+            if fts_columns is None or not set(columns) <= set(fts_columns):
+                if not self._fts_warned:
+                    print("⚠️ FTS索引不可用(需trigram分词且包含检索字段),请运行 tools/rebuild_fts_index.py")
+                    self._fts_warned = True
+                return None
+            
+            weights = self._load_config().get("fts_column_weights", self.DEFAULT_FTS_WEIGHTS)
+            bm25_args = ', '.join(str(float(weights.get(col, 1.0))) for col in fts_columns)
+            
+            match_expr = "{%s} : (%s)" % (' '.join(columns),
+                                          ' OR '.join(self._fts_quote(t) for t in long_terms))
+            params = []
+            tax_clause = ""
+            if tax_type:
+                # 税种下推到MATCH缩小候选集;MATCH是子串语义,仍需等值过滤
+                if len(tax_type) >= self.FTS_MIN_TERM_LENGTH:
+                    match_expr = f"tax_type : {self._fts_quote(tax_type)} AND ({match_expr})"
+                tax_clause = "AND t.tax_type = ?"
+                params.append(tax_type)
+            
+            query = f"""
+                SELECT tax_incentives_fts.rowid
+                FROM tax_incentives_fts
+                JOIN tax_incentives t ON t.id = tax_incentives_fts.rowid
+                WHERE tax_incentives_fts MATCH ? {tax_clause}
+                ORDER BY bm25(tax_incentives_fts, {bm25_args}), tax_incentives_fts.rowid
+            """
+            params.insert(0, match_expr)
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit)
+            cursor.execute(query, params)
+            ids = [row[0] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"⚠️ FTS检索失败,回退到n-gram/LIKE: {e}")
+            return None
+        finally:
+            conn.close()
+        
+        if short_terms:
+            extra = self._index_match(short_terms, columns, tax_type=tax_type)
+            if extra is None:
+                return None
+            seen = set(ids)
+            ids.extend(sorted(extra - seen))
+        return ids
+    
+    def _fetch_by_ids(self, ids: List[int]) -> List[Dict]:
+        """按ID列表取回政策记录(保持ID列表顺序)"""
+        if not ids:
+            return []
+        snapshot = self._get_resident_snapshot()
+        if snapshot is not None:
+            return snapshot.rows(ids)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' for _ in ids)
+        cursor.execute(f"SELECT * FROM tax_incentives WHERE id IN ({placeholders})", ids)
+        rows = {row['id']: dict(row) for row in cursor.fetchall()}
+        conn.close()
+        return [rows[policy_id] for policy_id in ids if policy_id in rows]
+    
+    @staticmethod
+    def _entity_order_key(tax_type: Optional[str], policy_id: int) -> tuple:
+        """与entity_search的ORDER BY一致: 企业所得税 > 增值税 > 其他, 再按id"""
+        if tax_type == '企业所得税':
+            rank = 1
+        elif tax_type == '增值税':
+            rank = 2
+        else:
+            rank = 3
+        return (rank, policy_id)
+    
+    def _expand_entities(self, entity_keywords: List[str]) -> List[str]:
+        """使用配置中的实体同义词扩展实体关键词(去重)"""
+        # 从配置文件加载实体同义词(支持热更新)
+        config = self._load_config()
+        entity_synonyms = config.get("entity_synonyms", {})
+        
+        expanded_keywords = []
+        for entity in entity_keywords:
+            if entity in entity_synonyms:
+                expanded_keywords.extend(entity_synonyms[entity])
+            else:
+                expanded_keywords.append(entity)
+        # 去重
+        return list(set(expanded_keywords))
+    
     def search(self, question: str, limit: int = 50) -> tuple:
         """
         智能搜索:根据问题自动选择最佳查询策略
@@ -118,23 +424,61 @@ class TaxIncentiveQuery:
         Returns:
             (查询结果列表, 总数, 查询意图)
         """
+        results, total_count, query_intent, _ = self.search_with_meta(question, limit=limit)
+        return results, total_count, query_intent
+    
+    def search_with_meta(self, question: str, limit: int = 50) -> tuple:
+        """
+        智能搜索(同search),额外返回检索元数据
+        
+        Args:
+            question: 用户问题
+            limit: 返回结果数量限制
+        
+        Returns:
+            (查询结果列表, 总数, 查询意图, 元数据)
+            元数据: strategy=最终采用的检索策略, elapsed_ms=总耗时, llm=LLM辅助推理耗时与超时情况,
+                    cache="hit"/"miss"(结果缓存关闭时无此项)
+        """
+        start = time.perf_counter()
+        
+        # 问题级结果缓存: 键含归一化问题、limit、配置指纹和数据版本,配置或数据变化后自然失效
+        cache = self._get_search_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = (self._normalize_question(question), limit,
+                         self._config_fingerprint, self._data_watcher.stamp())
+            hit, value = cache.get(cache_key)
+            if hit:
+                results, total_count, query_intent, meta = value
+                meta = dict(meta, cache="hit", elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+                print(f"💾 检索结果缓存命中: 结果={len(results)}条")
+                return [dict(row) for row in results], total_count, query_intent, meta
+        
+        # 向量索引可用且配置 replace_llm 时,关键词完全未命中的问题直接走混合检索,不再调用LLM
+        # (默认关闭: 向量检索质量经离线评估后再开启)
+        vector_index = self._get_vector_index()
+        replace_llm = vector_index is not None and \
+            self._load_config().get("hybrid_search", {}).get("replace_llm", False)
+        
         # 提取税种、优惠关键词、实体关键词和查询意图
-        tax_type, incentive_keywords, entity_keywords, query_intent, tax_type_source = self._extract_tax_and_incentive(question)
+        tax_type, incentive_keywords, entity_keywords, query_intent, tax_type_source, llm_meta = \
+            self._extract_tax_and_incentive(question, skip_llm_if_unmatched=replace_llm)
         
         results = []
+        strategy = None
         total_count = 0
         
         # 策略选择逻辑:
         # - 如果用户明确指定了税种(explicit),使用结构化查询(限定该税种)
         # - 如果税种是LLM推理的(inferred),且有实体关键词,使用跨税种实体搜索
-        # - 如果没有税种也没有实体关键词,使用关键词搜索
+        # - 如果没有税种也没有实体关键词,使用词法+向量混合检索(不可用时退回关键词搜索)
         
         # 策略1: 用户明确指定了税种,使用结构化查询
         if tax_type and tax_type_source == "explicit":
-            # 先查询总数
-            total_count = self.count_structured_results(tax_type, entity_keywords)
-            # 再查询限定数量的结果
-            results = self.structured_search(tax_type, entity_keywords, limit=limit)
+            # 一次执行同时得到结果页和总数
+            results, total_count, _ = self.structured_search_page(tax_type, entity_keywords, limit=limit)
+            strategy = "structured"
             
             if entity_keywords:
                 print(f"📊 结构化查询: 税种='{tax_type}'(用户指定), 实体={entity_keywords}, 总数={total_count}条, 返回={len(results)}条")
@@ -145,123 +489,393 @@ class TaxIncentiveQuery:
         elif entity_keywords:
             results = self.entity_search(entity_keywords, limit=limit)
             total_count = len(results)
+            strategy = "entity"
             if tax_type and tax_type_source == "inferred":
                 print(f"📊 跨税种实体搜索: 实体={entity_keywords}, 结果={len(results)}条 (忽略LLM推理税种'{tax_type}')")
             else:
                 print(f"📊 跨税种实体搜索: 实体={entity_keywords}, 结果={len(results)}条")
         
-        # 策略3: 如果没有提取到税种和实体,使用关键词搜索
+        # 策略3: 如果没有提取到税种和实体,词法+向量混合检索(向量索引可用时)
+        if not results and vector_index is not None:
+            results = self.hybrid_search(question, limit=limit, vector_index=vector_index)
+            total_count = len(results)
+            strategy = "hybrid"
+            print(f"📊 混合检索: 结果={len(results)}条")
+        
+        # 策略4: 向量索引不可用(或混合检索无结果)时使用关键词搜索
         if not results:
             keywords = self._extract_keywords(question)
             if keywords:
                 results = self.keyword_search(keywords, limit=limit)
                 total_count = len(results)  # 关键词搜索已限制数量,总数=结果数
+                strategy = "keyword"
                 print(f"📊 关键词查询: 关键词='{keywords}', 结果={len(results)}条")
         
-        # 策略4: 如果仍然没有结果,使用原问题搜索
+        # 策略5: 如果仍然没有结果,使用原问题搜索
         if not results:
             results = self.keyword_search(question, limit=limit)
             total_count = len(results)
+            strategy = "question"
             print(f"📊 原问题查询: 结果={len(results)}条")
         
-        return results[:limit], total_count, query_intent
+        meta = {
+            "strategy": strategy,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            "llm": llm_meta
+        }
+        results = results[:limit]
+        
+        # LLM超时或调用失败降级的结果不缓存,下次同一问题仍可得到完整结果
+        if cache is not None:
+            meta["cache"] = "miss"
+            if not llm_meta.get("degraded"):
+                cache.set(cache_key, ([dict(row) for row in results], total_count, query_intent, dict(meta)))
+        return results, total_count, query_intent, meta
+    
+    def _get_search_cache(self) -> Optional[LRUCache]:
+        """
+        获取问题级结果缓存(按配置更新容量和TTL)
+        
+        Returns:
+            缓存实例;配置关闭时返回None
+        """
+        settings = self._load_config().get("search_cache", {})
+        if not settings.get("enabled", True):
+            return None
+        cache = self._search_cache
+        cache.max_entries = int(settings.get("max_entries", 500))
+        ttl = settings.get("ttl_seconds", 600)
+        cache.ttl_seconds = float(ttl) if ttl else None
+        return cache
+    
+    def get_search_cache_stats(self) -> Dict:
+        """获取问题级结果缓存统计(命中/未命中/淘汰/条目数)"""
+        cache = self._get_search_cache()
+        if cache is None:
+            return {"enabled": False}
+        return dict(cache.stats(), enabled=True)
+    
+    def clear_search_cache(self) -> int:
+        """
+        清空问题级结果缓存
+        
+        Returns:
+            清除的条目数
+        """
+        return self._search_cache.clear()
     
-    def _extract_tax_and_incentive(self, question: str) -> tuple:
+    def _extract_tax_and_incentive(self, question: str, skip_llm_if_unmatched: bool = False) -> tuple:
         """
         从问题中提取税种、优惠关键词、实体关键词和查询意图
         
         Args:
             question: 用户问题
+            skip_llm_if_unmatched: 税种和核心实体都未命中时不调用LLM(由混合检索兜底)
         
         Returns:
-            (税种, 优惠关键词列表, 实体关键词列表, 查询意图, 税种来源)
+            (税种, 优惠关键词列表, 实体关键词列表, 查询意图, 税种来源, LLM推理元数据)
             税种来源: "explicit"=用户明确指定, "inferred"=LLM推理, None=未识别
         """
-        # 从配置文件加载(支持热更新)
-        config = self._load_config()
-        
-        # 税种关键词(按长度排序,优先匹配长的)
-        tax_types = config.get("tax_types", [])
-        
-        # 税种模糊匹配映射(支持缺少"税"字的情况)
-        tax_fuzzy_map = config.get("tax_fuzzy_map", {})
+        # 一次扫描匹配所有类别的关键词(自动机随配置热更新重建)
+        automaton, tax_fuzzy_map = self._get_keyword_automaton()
+        hits = automaton.scan(question)
         
-        # 优惠关键词
-        incentive_keywords = config.get("incentive_keywords", [])
-        
-        # 核心实体关键词(高频、重要的,用于快速匹配)
-        core_entity_keywords = config.get("core_entity_keywords", [])
-        
-        # 条件意图关键词(判断用户是否关注优惠条件)
-        condition_intent_keywords = config.get("condition_intent_keywords", [])
-        
-        # 提取税种(精确匹配)
+        # 提取税种(精确匹配): 最长匹配,同时命中多个时按配置列表顺序(按长度排序,优先匹配长的)
         matched_tax_type = None
         tax_type_source = None  # 税种来源: "explicit" 或 "inferred"
         
-        for tax_type in tax_types:
-            if tax_type in question:
-                matched_tax_type = tax_type
-                tax_type_source = "explicit"
-                break
+        match = hits.first("tax_types", longest=True)
+        if match:
+            matched_tax_type = match.word
+            tax_type_source = "explicit"
         
-        # 如果精确匹配失败,尝试模糊匹配
-        if not matched_tax_type:
-            for fuzzy_key, full_tax_type in tax_fuzzy_map.items():
-                if fuzzy_key in question:
-                    matched_tax_type = full_tax_type
-                    tax_type_source = "explicit"
-                    print(f"🔍 模糊匹配: '{fuzzy_key}' → '{full_tax_type}'")
-                    break
-        
-        # 如果仍然没有匹配,使用DeepSeek推理
+        # 如果精确匹配失败,尝试模糊匹配(支持缺少"税"字的情况)
         if not matched_tax_type:
-            matched_tax_type = self._infer_tax_type_with_llm(question)
-            if matched_tax_type:
-                tax_type_source = "inferred"
-                print(f"🤖 DeepSeek推理: 税种='{matched_tax_type}'")
+            match = hits.first("tax_fuzzy_map", longest=True)
+            if match:
+                matched_tax_type = tax_fuzzy_map[match.word]
+                tax_type_source = "explicit"
+                print(f"🔍 模糊匹配: '{match.word}' → '{matched_tax_type}'")
         
         # 提取优惠关键词
-        matched_incentives = []
-        for keyword in incentive_keywords:
-            if keyword in question:
-                matched_incentives.append(keyword)
+        matched_incentives = hits.found("incentive_keywords")
         
         # 提取实体关键词(先尝试快速匹配核心关键词)
-        matched_entities = []
-        for keyword in core_entity_keywords:
-            if keyword in question:
-                matched_entities.append(keyword)
+        matched_entities = hits.found("core_entity_keywords")
         
-        # 如果没有匹配到核心关键词,使用DeepSeek智能提取优惠项目
+        # 税种仍未匹配时用DeepSeek推理;未匹配到核心关键词时用DeepSeek提取优惠项目
+        # 两者并发执行,共用一个截止时间;LLM缓存和配置指纹在本线程取得后传入,工作线程不读取配置
+        llm_tasks = {}
+        if not matched_tax_type:
+            llm_tasks["tax_type"] = self._infer_tax_type_with_llm
         if not matched_entities:
-            project_keywords = self._extract_project_keywords_with_llm(question)
-            if project_keywords:
-                matched_entities = project_keywords
-                print(f"🤖 DeepSeek提取优惠项目: {project_keywords}")
-        
-        # 判断查询意图
-        is_condition_focused = any(kw in question for kw in condition_intent_keywords)
+            llm_tasks["project_keywords"] = self._extract_project_keywords_with_llm
+        if skip_llm_if_unmatched and not matched_tax_type and not matched_entities:
+            llm_tasks = {}
+        if llm_tasks:
+            llm_cache = self._resolve_llm_cache()
+            llm_tasks = {name: partial(func, llm_cache=llm_cache) for name, func in llm_tasks.items()}
+        llm_results, llm_meta = self._run_llm_tasks(question, llm_tasks)
+        
+        if llm_results.get("tax_type"):
+            matched_tax_type = llm_results["tax_type"]
+            tax_type_source = "inferred"
+            print(f"🤖 DeepSeek推理: 税种='{matched_tax_type}'")
+        
+        if llm_results.get("project_keywords"):
+            matched_entities = llm_results["project_keywords"]
+            print(f"🤖 DeepSeek提取优惠项目: {matched_entities}")
+        
+        # 判断查询意图(条件意图关键词表示用户关注优惠条件)
+        is_condition_focused = hits.any("condition_intent_keywords")
         query_intent = "condition" if is_condition_focused else "general"
         
-        return matched_tax_type, matched_incentives, matched_entities, query_intent, tax_type_source
+        return matched_tax_type, matched_incentives, matched_entities, query_intent, tax_type_source, llm_meta
     
-    def _infer_tax_type_with_llm(self, question: str) -> Optional[str]:
+    def _get_keyword_automaton(self) -> tuple:
         """
-        使用DeepSeek推理税种
+        获取问题分析关键词自动机
+        
+        按配置指纹缓存;配置热更新后重新编译,并以单次赋值整体替换(并发查询不会看到半成品)
+        
+        Returns:
+            (自动机, 编译时的税种模糊匹配映射)
+        """
+        config = self._load_config()
+        current = self._keyword_automaton
+        if current is not None and current[0] == self._config_fingerprint:
+            return current[1], current[2]
+        
+        tax_fuzzy_map = dict(config.get("tax_fuzzy_map", {}))
+        automaton = KeywordAutomaton({
+            "tax_types": config.get("tax_types", []),
+            "tax_fuzzy_map": list(tax_fuzzy_map),
+            "incentive_keywords": config.get("incentive_keywords", []),
+            "core_entity_keywords": config.get("core_entity_keywords", []),
+            "condition_intent_keywords": config.get("condition_intent_keywords", [])
+        })
+        self._keyword_automaton = (self._config_fingerprint, automaton, tax_fuzzy_map)
+        return automaton, tax_fuzzy_map
+    
+    def _get_vector_index(self):
+        """
+        获取政策向量索引
+        
+        Returns:
+            PolicyVectorIndex;混合检索关闭、numpy不可用或索引文件未构建时返回None
+        """
+        settings = self._load_config().get("hybrid_search", {})
+        if not settings.get("enabled", True):
+            return None
+        try:
+            from modules.vector_index import default_index_path, get_vector_index
+        except ImportError:
+            return None
+        index = get_vector_index(settings.get("index_path") or default_index_path(self.db_path))
+        return index if index.available() else None
+    
+    def hybrid_search(self, question: str, limit: int = 50, vector_index=None) -> List[Dict]:
+        """
+        词法+向量混合检索: 关键词检索排序与向量余弦相似度排序做加权RRF融合
         
         Args:
             question: 用户问题
+            limit: 返回结果数量限制
+            vector_index: 向量索引(None时自动获取)
         
         Returns:
-            推理出的税种,如果无法推理返回None
+            查询结果列表;向量索引不可用时只有词法结果
         """
+        from modules.vector_index import reciprocal_rank_fusion
+        
+        settings = self._load_config().get("hybrid_search", {})
+        pool = max(limit, int(settings.get("candidates", 100)))
+        
+        lexical_rows = self.keyword_search(self._extract_keywords(question), limit=pool)
+        rows = {row['id']: row for row in lexical_rows}
+        
+        dense_ids = []
+        if vector_index is None:
+            vector_index = self._get_vector_index()
+        if vector_index is not None:
+            dense = vector_index.query(question, top_k=pool,
+                                       min_score=float(settings.get("min_similarity", 0.1)))
+            dense_ids = [policy_id for policy_id, _ in dense]
+        
+        fused = reciprocal_rank_fusion(
+            [(list(rows), float(settings.get("lexical_weight", 1.0))),
+             (dense_ids, float(settings.get("dense_weight", 1.0)))],
+            k=float(settings.get("rrf_k", 60))
+        )[:limit]
+        
+        missing = [policy_id for policy_id in fused if policy_id not in rows]
+        rows.update((row['id'], row) for row in self._fetch_by_ids(missing))
+        return [rows[policy_id] for policy_id in fused if policy_id in rows]
+    
+    def _get_llm_deadline(self) -> float:
+        """获取LLM辅助推理总截止时间(秒)"""
+        settings = self._load_config().get("llm_inference", {})
         try:
-            from modules.deepseek_client import DeepSeekClient
-            
-            deepseek = DeepSeekClient()
-            
-            prompt = f"""请根据以下问题判断涉及的税种。
+            return max(0.0, float(settings.get("deadline_seconds", self.DEFAULT_LLM_DEADLINE_SECONDS)))
+        except (TypeError, ValueError):
+            return self.DEFAULT_LLM_DEADLINE_SECONDS
+    
+    def _run_llm_tasks(self, question: str, tasks: Dict) -> tuple:
+        """
+        并发执行LLM辅助推理任务,超过截止时间或抛出异常的任务视为无结果
+        
+        超时的任务不会被中断,在后台完成后照常写入LLM缓存,相同问题再次查询时直接命中
+        
+        Args:
+            question: 用户问题
+            tasks: {任务名: 函数 func(question)}
+        
+        Returns:
+            (按时完成的结果 {任务名: 结果}, 元数据)
+            元数据: deadline_seconds, elapsed_ms, timed_out=超时任务名列表, failed=调用失败任务名列表,
+                    degraded=是否有任务超时或失败
+        """
+        deadline = self._get_llm_deadline()
+        meta = {"deadline_seconds": deadline, "elapsed_ms": 0.0, "tasks": sorted(tasks),
+                "timed_out": [], "failed": [], "degraded": False}
+        if not tasks:
+            return {}, meta
+        
+        start = time.perf_counter()
+        executor = _get_llm_executor()
+        futures = {name: executor.submit(func, question) for name, func in tasks.items()}
+        wait(futures.values(), timeout=deadline)
+        
+        results = {}
+        for name, future in sorted(futures.items()):
+            if not future.done():
+                meta["timed_out"].append(name)
+            elif future.exception() is not None:
+                meta["failed"].append(name)
+                print(f"⚠️  DeepSeek辅助推理失败({name}): {future.exception()}")
+            else:
+                results[name] = future.result()
+        meta["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        
+        if meta["timed_out"]:
+            print(f"⏱️ LLM辅助推理超时({deadline}s): {meta['timed_out']},降级为关键词检索")
+        meta["degraded"] = bool(meta["timed_out"] or meta["failed"])
+        return results, meta
+    
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """归一化问题文本(全半角统一、小写、去空白和标点),用作LLM缓存键"""
+        text = unicodedata.normalize('NFKC', question).lower()
+        return ''.join(ch for ch in text
+                       if not ch.isspace() and not unicodedata.category(ch).startswith('P'))
+    
+    def _get_llm_cache(self) -> Optional[PersistentCache]:
+        """
+        获取LLM结果缓存(配置变更时清除旧配置下的缓存)
+        
+        Returns:
+            缓存实例;配置关闭或缓存不可用时返回None
+        """
+        settings = self._load_config().get("llm_cache", {})
+        if not settings.get("enabled", True):
+            return None
+        try:
+            cache = get_persistent_cache("tax_query_llm", self._llm_cache_path)
+            cache.max_entries = int(settings.get("max_entries", 5000))
+            ttl_hours = settings.get("ttl_hours", 168)
+            cache.ttl_seconds = float(ttl_hours) * 3600 if ttl_hours else None
+            if self._llm_cache_tag != self._config_fingerprint:
+                removed = cache.retain_tag(self._config_fingerprint)
+                if removed:
+                    print(f"🧹 配置已变更,清除LLM缓存 {removed} 条")
+                self._llm_cache_tag = self._config_fingerprint
+            return cache
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ LLM缓存不可用: {e}")
+            return None
+    
+    def _resolve_llm_cache(self) -> tuple:
+        """
+        取得LLM缓存及其对应的配置指纹
+        
+        在调用线程上执行(可能重新加载配置),结果传给并发的LLM任务,工作线程不再读取或修改实例配置
+        
+        Returns:
+            (缓存实例或None, 配置指纹)
+        """
+        cache = self._get_llm_cache()
+        return cache, self._config_fingerprint
+    
+    def _cached_llm_call(self, task: str, prompt_version: str, question: str, compute,
+                         llm_cache: Optional[tuple] = None):
+        """
+        带持久化缓存的LLM调用
+        
+        键为 任务+提示词版本+配置指纹+归一化问题;compute抛出异常时不写缓存,异常继续向上抛出
+        
+        Args:
+            task: 任务名(区分不同的LLM辅助函数)
+            prompt_version: 提示词版本
+            question: 用户问题
+            compute: 实际调用LLM的函数 compute(question) -> 可JSON序列化的结果
+            llm_cache: _resolve_llm_cache() 的结果;None时在当前线程获取
+        
+        Returns:
+            LLM结果(可能来自缓存)
+        """
+        cache, fingerprint = llm_cache if llm_cache is not None else self._resolve_llm_cache()
+        key = None
+        if cache is not None:
+            key = PersistentCache.make_key(task, prompt_version, fingerprint,
+                                           self._normalize_question(question))
+            try:
+                hit, value = cache.get(key)
+                if hit:
+                    print(f"💾 LLM缓存命中: {task}")
+                    return value
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM缓存读取失败: {e}")
+        
+        value = compute(question)
+        
+        if cache is not None:
+            try:
+                cache.set(key, value, tag=fingerprint)
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM缓存写入失败: {e}")
+        return value
+    
+    def get_llm_cache_stats(self) -> Dict:
+        """获取LLM缓存统计(命中/未命中/条目数)"""
+        cache = self._get_llm_cache()
+        if cache is None:
+            return {"enabled": False}
+        return dict(cache.stats(), enabled=True)
+    
+    def _infer_tax_type_with_llm(self, question: str, llm_cache: Optional[tuple] = None) -> Optional[str]:
+        """
+        使用DeepSeek推理税种(结果持久化缓存)
+        
+        Args:
+            question: 用户问题
+            llm_cache: _resolve_llm_cache() 的结果;None时在当前线程获取
+        
+        Returns:
+            推理出的税种,如果无法推理返回None
+        
+        Raises:
+            调用DeepSeek失败时抛出异常(由 _run_llm_tasks 记录为失败,检索结果不缓存)
+        """
+        return self._cached_llm_call("tax_type", self.TAX_TYPE_PROMPT_VERSION,
+                                     question, self._call_tax_type_llm, llm_cache)
+    
+    def _call_tax_type_llm(self, question: str) -> Optional[str]:
+        """调用DeepSeek推理税种(异常向上抛出,由调用方决定是否缓存)"""
+        from modules.deepseek_client import DeepSeekClient
+        
+        deepseek = DeepSeekClient()
+        
+        prompt = f"""请根据以下问题判断涉及的税种。
 
 问题: {question}
 
@@ -287,42 +901,47 @@ class TaxIncentiveQuery:
 5. 如果无法判断,返回"无法判断"
 
 请只返回税种名称或"无法判断",不要有其他内容。"""
-            
-            messages = [{"role": "user", "content": prompt}]
-            response = deepseek.chat_completion(messages, stream=False, temperature=0.3)
-            response = response.strip()
-            
-            # 验证返回的是有效税种
-            valid_tax_types = [
-                "增值税", "企业所得税", "个人所得税", "印花税", "房产税",
-                "城镇土地使用税", "消费税", "土地增值税", "资源税", "车船税", "契税", "关税"
-            ]
-            
-            if response in valid_tax_types:
-                return response
-            else:
-                return None
         
-        except Exception as e:
-            print(f"⚠️  DeepSeek推理失败: {str(e)}")
+        messages = [{"role": "user", "content": prompt}]
+        response = deepseek.chat_completion(messages, stream=False, temperature=0.3)
+        response = response.strip()
+        
+        # 验证返回的是有效税种
+        valid_tax_types = [
+            "增值税", "企业所得税", "个人所得税", "印花税", "房产税",
+            "城镇土地使用税", "消费税", "土地增值税", "资源税", "车船税", "契税", "关税"
+        ]
+        
+        if response in valid_tax_types:
+            return response
+        else:
             return None
     
-    def _extract_project_keywords_with_llm(self, question: str) -> Optional[List[str]]:
+    def _extract_project_keywords_with_llm(self, question: str,
+                                           llm_cache: Optional[tuple] = None) -> Optional[List[str]]:
         """
-        使用DeepSeek智能提取优惠项目关键词
+        使用DeepSeek智能提取优惠项目关键词(结果持久化缓存)
         
         Args:
             question: 用户问题
+            llm_cache: _resolve_llm_cache() 的结果;None时在当前线程获取
         
         Returns:
             优惠项目关键词列表,如果无法提取返回None
+        
+        Raises:
+            调用DeepSeek失败时抛出异常(由 _run_llm_tasks 记录为失败,检索结果不缓存)
         """
-        try:
-            from modules.deepseek_client import DeepSeekClient
-            
-            deepseek = DeepSeekClient()
-            
-            prompt = f"""请从以下问题中提取税收优惠相关的项目关键词。
+        return self._cached_llm_call("project_keywords", self.PROJECT_KEYWORDS_PROMPT_VERSION,
+                                     question, self._call_project_keywords_llm, llm_cache)
+    
+    def _call_project_keywords_llm(self, question: str) -> Optional[List[str]]:
+        """调用DeepSeek提取优惠项目关键词(异常向上抛出,由调用方决定是否缓存)"""
+        from modules.deepseek_client import DeepSeekClient
+        
+        deepseek = DeepSeekClient()
+        
+        prompt = f"""请从以下问题中提取税收优惠相关的项目关键词。
 
 问题: {question}
 
@@ -352,23 +971,19 @@ class TaxIncentiveQuery:
 返回: 海南
 
 请直接返回关键词或"无"。"""
-            
-            messages = [{"role": "user", "content": prompt}]
-            response = deepseek.chat_completion(messages, stream=False, temperature=0.3)
-            response = response.strip()
-            
-            # 解析返回结果
-            if response and response != "无" and response != "无法提取":
-                # 分割关键词
-                keywords = [kw.strip() for kw in response.split(',') if kw.strip()]
-                # 过滤掉过长的关键词(可能是错误)
-                keywords = [kw for kw in keywords if 2 <= len(kw) <= 10]
-                return keywords if keywords else None
-            else:
-                return None
         
-        except Exception as e:
-            print(f"⚠️  DeepSeek提取优惠项目失败: {str(e)}")
+        messages = [{"role": "user", "content": prompt}]
+        response = deepseek.chat_completion(messages, stream=False, temperature=0.3)
+        response = response.strip()
+        
+        # 解析返回结果
+        if response and response != "无" and response != "无法提取":
+            # 分割关键词
+            keywords = [kw.strip() for kw in response.split(',') if kw.strip()]
+            # 过滤掉过长的关键词(可能是错误)
+            keywords = [kw for kw in keywords if 2 <= len(kw) <= 10]
+            return keywords if keywords else None
+        else:
             return None
     
     def entity_search(self, entity_keywords: List[str], limit: int = 50) -> List[Dict]:
@@ -384,25 +999,25 @@ class TaxIncentiveQuery:
         Returns:
             查询结果列表
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # 从配置文件加载实体同义词(支持热更新)
-        config = self._load_config()
-        entity_synonyms = config.get("entity_synonyms", {})
-        
         # 扩展实体关键词
-        expanded_keywords = []
-        for entity in entity_keywords:
-            if entity in entity_synonyms:
-                expanded_keywords.extend(entity_synonyms[entity])
-            else:
-                expanded_keywords.append(entity)
-        # 去重
-        expanded_keywords = list(set(expanded_keywords))
+        expanded_keywords = self._expand_entities(entity_keywords)
         
         print(f"🔍 实体关键词扩展: {entity_keywords} → {expanded_keywords}")
         
+        # 优先使用FTS(bm25排序),其次n-gram索引
+        ids = self._fts_match(expanded_keywords, self.ENTITY_SEARCH_COLUMNS, limit=limit)
+        if ids is not None:
+            return self._fetch_by_ids(ids[:limit])
+        
+        ids = self._index_match(expanded_keywords, self.ENTITY_SEARCH_COLUMNS)
+        if ids is not None:
+            index = get_policy_index(self.db_path)
+            ordered = sorted(ids, key=lambda i: self._entity_order_key(index.tax_type_of(i), i))
+            return self._fetch_by_ids(ordered[:limit])
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
         # 构建实体关键词条件(在多个字段中搜索)
         entity_conditions = []
         params = []
@@ -440,55 +1055,21 @@ class TaxIncentiveQuery:
         
         return results
     
-    def structured_search(self, tax_type: str, entity_keywords: List[str] = None, limit: int = 50) -> List[Dict]:
+    def _structured_where(self, tax_type: str, entity_keywords: List[str] = None) -> tuple:
         """
-        结构化查询:税种精确匹配 + 优惠方式包含特定关键词 + 实体关键词过滤
-        
-        Args:
-            tax_type: 税种(如"增值税"、"个人所得税")
-            entity_keywords: 实体关键词列表(如["集成电路", "软件"])
-            limit: 返回结果数量限制
+        构建结构化查询的WHERE子句(structured_search与count_structured_results共用)
         
         Returns:
-            查询结果列表
+            (WHERE子句, 参数列表, 匹配关键词列表, 匹配字段)
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # 优惠方式关键词(数据库中所有可能的值)
-        incentive_methods = [
-            "减征", "免征", "不征", "暂免", "减半", "退税",
-            "即征即退", "先征后退", "先征后返", "免税", "减税",
-            "减免", "抵扣", "补贴", "扶持", "优惠"
-        ]
-        
-        # 构建优惠方式OR条件
-        method_conditions = " OR ".join(["incentive_method LIKE ?" for _ in incentive_methods])
-        method_params = [f"%{method}%" for method in incentive_methods]
-        
-        # 基础查询条件
-        params = [tax_type] + method_params
-        
         # 如果有实体关键词,增加实体过滤条件
         if entity_keywords:
-            # 从配置文件加载实体同义词(支持热更新)
-            config = self._load_config()
-            entity_synonyms = config.get("entity_synonyms", {})
-            
             # 扩展实体关键词
-            expanded_keywords = []
-            for entity in entity_keywords:
-                if entity in entity_synonyms:
-                    expanded_keywords.extend(entity_synonyms[entity])
-                else:
-                    expanded_keywords.append(entity)
-            # 去重
-            expanded_keywords = list(set(expanded_keywords))
-            
-            print(f"🔍 结构化查询实体扩展: {entity_keywords} → {expanded_keywords}")
+            expanded_keywords = self._expand_entities(entity_keywords)
             
             # 在多个字段中搜索实体关键词(增加incentive_method字段)
             entity_conditions = []
+            params = [tax_type]
             for entity in expanded_keywords:
                 entity_conditions.append("""(
                     incentive_items LIKE ? 
@@ -496,112 +1077,162 @@ class TaxIncentiveQuery:
                     OR qualification LIKE ?
                     OR incentive_method LIKE ?
                 )""")
+                params.extend([f"%{entity}%"] * 4)
             
             entity_clause = " OR ".join(entity_conditions)
             
             # 移除优惠方式条件限制(因为实体关键词可能就是优惠方式)
-            query = f"""
-                SELECT * FROM tax_incentives
-                WHERE tax_type = ?
-                AND ({entity_clause})
-                LIMIT ?
-            """
-            # 重新构建params
-            params = [tax_type]
-            for entity in expanded_keywords:
-                params.extend([f"%{entity}%", f"%{entity}%", f"%{entity}%", f"%{entity}%"])
-            params.append(limit)
-        else:
-            query = f"""
-                SELECT * FROM tax_incentives
-                WHERE tax_type = ?
-                AND ({method_conditions})
-                LIMIT ?
-            """
-            params.append(limit)
+            where_clause = f"tax_type = ? AND ({entity_clause})"
+            return where_clause, params, expanded_keywords, self.STRUCTURED_SEARCH_COLUMNS
         
-        cursor.execute(query, params)
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        # 构建优惠方式OR条件
+        method_conditions = " OR ".join(["incentive_method LIKE ?" for _ in self.INCENTIVE_METHODS])
+        params = [tax_type] + [f"%{method}%" for method in self.INCENTIVE_METHODS]
+        where_clause = f"tax_type = ? AND ({method_conditions})"
+        return where_clause, params, list(self.INCENTIVE_METHODS), ('incentive_method',)
+    
+    @staticmethod
+    def _parse_cursor(cursor: Optional[str]) -> tuple:
+        """
+        解析分页游标
         
-        return results
+        游标格式: "o<偏移量>"(候选ID列表分页) 或 "k<最后ID>"(SQL按id键集分页)
+        
+        Returns:
+            (类型, 数值);无游标时返回 ("o", 0)
+        """
+        if not cursor:
+            return "o", 0
+        kind, value = cursor[0], cursor[1:]
+        if kind not in ("o", "k") or not value.isdigit():
+            raise ValueError(f"无效的分页游标: {cursor}")
+        return kind, int(value)
     
-    def count_structured_results(self, tax_type: str, entity_keywords: List[str] = None) -> int:
+    def _structured_candidate_ids(self, tax_type: str, terms: List[str],
+                                  columns: tuple) -> Optional[List[int]]:
         """
-        统计结构化查询的总数(不限制limit)
+        获取结构化查询的有序候选ID列表(FTS按bm25,n-gram按id),带缓存
+        
+        缓存键包含数据版本和配置版本,翻页时直接复用,不再重新检索
+        
+        Returns:
+            有序ID列表;FTS和n-gram均不可用时返回None
+        """
+        backend = self._get_search_backend()
+        if backend == "like":
+            return None
+        key = (backend, tax_type, tuple(sorted(terms)), columns,
+               self._config_version, self._data_watcher.stamp())
+        with self._candidate_lock:
+            if key in self._candidate_cache:
+                self._candidate_cache.move_to_end(key)
+                return self._candidate_cache[key]
+        
+        ids = self._fts_match(terms, columns, tax_type=tax_type)
+        if ids is None:
+            matched = self._index_match(terms, columns, tax_type=tax_type)
+            if matched is None:
+                return None
+            ids = sorted(matched)
+        
+        with self._candidate_lock:
+            self._candidate_cache[key] = ids
+            while len(self._candidate_cache) > self.CANDIDATE_CACHE_SIZE:
+                self._candidate_cache.popitem(last=False)
+        return ids
+    
+    def structured_search_page(self, tax_type: str, entity_keywords: List[str] = None,
+                               limit: int = 50, cursor: Optional[str] = None) -> tuple:
+        """
+        结构化查询(单次执行同时返回当前页和总数,支持游标分页)
         
         Args:
             tax_type: 税种(如"增值税"、"个人所得税")
             entity_keywords: 实体关键词列表(如["集成电路", "软件"])
+            limit: 每页数量
+            cursor: 上一页返回的 next_cursor(None表示第一页)
         
         Returns:
-            总记录数
+            (当前页结果列表, 总数, 下一页游标);没有下一页时游标为None
+        """
+        kind, value = self._parse_cursor(cursor)
+        where_clause, params, terms, columns = self._structured_where(tax_type, entity_keywords)
+        if entity_keywords:
+            print(f"🔍 结构化查询实体扩展: {entity_keywords} → {terms}")
+        
+        # 优先使用FTS/n-gram索引得到的候选ID列表
+        ids = self._structured_candidate_ids(tax_type, terms, columns)
+        if ids is not None:
+            if kind == "k":
+                # 键集游标(如后端切换前签发)换算为列表位置
+                offset = next((i + 1 for i, policy_id in enumerate(ids) if policy_id == value), 0)
+            else:
+                offset = value
+            page_ids = ids[offset:offset + limit]
+            next_offset = offset + len(page_ids)
+            next_cursor = f"o{next_offset}" if limit > 0 and next_offset < len(ids) else None
+            return self._fetch_by_ids(page_ids), len(ids), next_cursor
+        
+        # SQL路径: 窗口函数在游标过滤前计算总数,一次查询返回当前页和总数
+        page_clause, page_params, offset = "", [], value
+        if kind == "k":
+            page_clause, page_params, offset = "WHERE id > ?", [value], 0
+        query = f"""
+            SELECT * FROM (
+                SELECT *, COUNT(*) OVER() AS _total, ROW_NUMBER() OVER(ORDER BY id) AS _pos
+                FROM tax_incentives
+                WHERE {where_clause}
+            ) {page_clause}
+            ORDER BY id
+            LIMIT ? OFFSET ?
         """
         conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # 优惠方式关键词(与structured_search保持一致)
-        incentive_methods = [
-            "减征", "免征", "不征", "暂免", "减半", "退税",
-            "即征即退", "先征后退", "先征后返", "免税", "减税",
-            "减免", "抵扣", "补贴", "扶持", "优惠"
-        ]
+        db_cursor = conn.cursor()
+        db_cursor.execute(query, params + page_params + [limit, offset])
+        results = [dict(row) for row in db_cursor.fetchall()]
+        last_pos = 0
+        if results:
+            total = results[0]['_total']
+            last_pos = results[-1]['_pos']
+            for row in results:
+                del row['_total'], row['_pos']
+        else:
+            # 空页(仅计数或已翻到末尾)时窗口函数拿不到总数,单独计数
+            db_cursor.execute(f"SELECT COUNT(*) FROM tax_incentives WHERE {where_clause}", params)
+            total = db_cursor.fetchone()[0]
+        conn.close()
         
-        # 构建优惠方式OR条件
-        method_conditions = " OR ".join(["incentive_method LIKE ?" for _ in incentive_methods])
-        method_params = [f"%{method}%" for method in incentive_methods]
+        next_cursor = f"k{results[-1]['id']}" if results and last_pos < total else None
+        return results, total, next_cursor
+    
+    def structured_search(self, tax_type: str, entity_keywords: List[str] = None, limit: int = 50) -> List[Dict]:
+        """
+        结构化查询:税种精确匹配 + 优惠方式包含特定关键词 + 实体关键词过滤
         
-        # 基础查询参数
-        params = [tax_type] + method_params
+        Args:
+            tax_type: 税种(如"增值税"、"个人所得税")
+            entity_keywords: 实体关键词列表(如["集成电路", "软件"])
+            limit: 返回结果数量限制
         
-        # 如果有实体关键词,增加实体过滤条件(与structured_search保持一致)
-        if entity_keywords:
-            # 从配置文件加载实体同义词(支持热更新)
-            config = self._load_config()
-            entity_synonyms = config.get("entity_synonyms", {})
-            
-            # 扩展实体关键词
-            expanded_keywords = []
-            for entity in entity_keywords:
-                if entity in entity_synonyms:
-                    expanded_keywords.extend(entity_synonyms[entity])
-                else:
-                    expanded_keywords.append(entity)
-            expanded_keywords = list(set(expanded_keywords))
-            
-            entity_conditions = []
-            for entity in expanded_keywords:
-                entity_conditions.append("""(
-                    incentive_items LIKE ? 
-                    OR detailed_rules LIKE ? 
-                    OR qualification LIKE ?
-                    OR incentive_method LIKE ?
-                )""")
-            
-            entity_clause = " OR ".join(entity_conditions)
-            
-            # 移除优惠方式条件限制(因为实体关键词可能就是优惠方式)
-            query = f"""
-                SELECT COUNT(*) FROM tax_incentives
-                WHERE tax_type = ?
-                AND ({entity_clause})
-            """
-            # 重新构建params
-            params = [tax_type]
-            for entity in expanded_keywords:
-                params.extend([f"%{entity}%", f"%{entity}%", f"%{entity}%", f"%{entity}%"])
-        else:
-            query = f"""
-                SELECT COUNT(*) FROM tax_incentives
-                WHERE tax_type = ?
-                AND ({method_conditions})
-            """
+        Returns:
+            查询结果列表
+        """
+        results, _, _ = self.structured_search_page(tax_type, entity_keywords, limit=limit)
+        return results
+    
+    def count_structured_results(self, tax_type: str, entity_keywords: List[str] = None) -> int:
+        """
+        统计结构化查询的总数(不限制limit)
         
-        cursor.execute(query, params)
-        count = cursor.fetchone()[0]
-        conn.close()
+        Args:
+            tax_type: 税种(如"增值税"、"个人所得税")
+            entity_keywords: 实体关键词列表(如["集成电路", "软件"])
         
-        return count
+        Returns:
+            总记录数
+        """
+        _, total, _ = self.structured_search_page(tax_type, entity_keywords, limit=0)
+        return total
     
     def _extract_keywords(self, question: str) -> str:
         """
@@ -613,39 +1244,16 @@ class TaxIncentiveQuery:
         Returns:
             关键词字符串
         """
-        # 税种关键词
-        tax_types = ["增值税", "企业所得税", "个人所得税", "印花税", "房产税", 
-                     "城镇土地使用税", "消费税", "土地增值税", "资源税", "车船税", "契税"]
+        hits = _SEARCH_KEYWORD_AUTOMATON.scan(question)
         
-        # 优惠关键词
-        incentive_keywords = ["优惠", "减免", "免征", "减征", "抵扣", "退税", 
-                             "补贴", "扶持", "即征即退", "先征后退", "免税", "减税"]
-        
-        # 行业/企业类型关键词
-        entity_keywords = ["高新技术", "小微企业", "农业", "科技", "研发", 
-                          "软件", "集成电路", "节能", "环保", "残疾人"]
-        
-        keywords = []
-        
-        # 提取税种
-        for tax_type in tax_types:
-            if tax_type in question:
-                keywords.append(tax_type)
-        
-        # 提取优惠关键词
-        for keyword in incentive_keywords:
-            if keyword in question:
-                keywords.append(keyword)
-        
-        # 提取行业/企业类型
-        for keyword in entity_keywords:
-            if keyword in question:
-                keywords.append(keyword)
+        # 依次提取税种、优惠关键词、行业/企业类型
+        keywords = (hits.found("tax_types") + hits.found("incentive_keywords")
+                    + hits.found("entity_keywords"))
         
         # 如果提取到关键词,返回组合;否则返回原问题
         if keywords:
-            # 去重并返回
-            return ' '.join(list(set(keywords)))
+            # 去重并返回(保持提取顺序)
+            return ' '.join(dict.fromkeys(keywords))
         else:
             # 返回原问题用于搜索
             return question
@@ -697,16 +1305,24 @@ class TaxIncentiveQuery:
         Returns:
             查询结果列表
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         # 将关键词分割成列表
         keyword_list = keywords.split()
-        
+
         if not keyword_list:
-            conn.close()
             return []
-        
+
+        # 优先使用FTS(bm25排序),其次n-gram索引
+        ids = self._fts_match(keyword_list, self.KEYWORD_SEARCH_COLUMNS, limit=limit)
+        if ids is not None:
+            return self._fetch_by_ids(ids[:limit])
+
+        ids = self._index_match(keyword_list, self.KEYWORD_SEARCH_COLUMNS)
+        if ids is not None:
+            return self._fetch_by_ids(sorted(ids)[:limit])
+
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
         # 构建OR查询条件
         conditions = []
         params = []
@@ -754,6 +1370,10 @@ class TaxIncentiveQuery:
         Returns:
             查询结果列表
         """
+        snapshot = self._get_resident_snapshot()
+        if snapshot is not None:
+            return snapshot.rows(snapshot.ids_by_tax_type(tax_type)[:limit])
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -779,6 +1399,10 @@ class TaxIncentiveQuery:
         Returns:
             查询结果列表
         """
+        snapshot = self._get_resident_snapshot() if is_like_safe(method) else None
+        if snapshot is not None:
+            return snapshot.rows(snapshot.ids_by_method_like(method)[:limit])
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -803,6 +1427,10 @@ class TaxIncentiveQuery:
         Returns:
             政策详情字典,如果不存在返回None
         """
+        snapshot = self._get_resident_snapshot()
+        if snapshot is not None:
+            return snapshot.get(policy_id)
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -819,6 +1447,10 @@ class TaxIncentiveQuery:
         Returns:
             统计信息字典
         """
+        snapshot = self._get_resident_snapshot()
+        if snapshot is not None:
+            return snapshot.statistics()
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
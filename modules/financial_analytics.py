@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+财务指标向量化分析
+功能:
+1. 期间 × 指标矩阵转为 NumPy 数组(缺失值为NaN),所有计算按整列/整矩阵完成
+2. 环比(相邻期间)变化额与增长率、同比(上年同期)增长率、年复合增长率(CAGR)、滚动平均
+3. 背离识别: 同一期间两个指标一升一降(变动超过±1%),以及首末期整体方向相反
+4. 生成供LLM总结使用的预计算结论文本,LLM不再自行从原始表格推算
+
+文本对比、图表和LLM总结共用本模块,增长率口径与原逐期循环一致:
+(本期 - 上期) / |上期| * 100,任一期缺失或上期为0时为空
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from modules.financial_results import FinancialResultSet, period_label
+
+# 变动超过该百分比视为上升/下降(与对比分析的趋势判断一致)
+TREND_THRESHOLD = 1.0
+
+
+def to_array(values: Sequence[Optional[float]]) -> np.ndarray:
+    """数值序列/矩阵转为float数组,None为NaN"""
+    if len(values) and isinstance(values[0], (list, tuple)):
+        return np.array([[np.nan if v is None else v for v in row] for row in values], dtype=float)
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def to_list(array: np.ndarray, digits: Optional[int] = None) -> list:
+    """数组转为列表,NaN为None,可选按位数四舍五入(与内置round一致)"""
+    if array.ndim > 1:
+        return [to_list(row, digits) for row in array]
+    return [None if np.isnan(x) else (round(float(x), digits) if digits is not None else float(x))
+            for x in array]
+
+
+def _rounded(x, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(x) else round(float(x), digits)
+
+
+def sequential_change(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    相邻期间变化(沿第0维,支持单列或期间 × 指标矩阵)
+
+    Returns:
+        (变化额, 增长率%),第一期及无法计算处为NaN
+    """
+    change = np.full(values.shape, np.nan)
+    pct = np.full(values.shape, np.nan)
+    if len(values) > 1:
+        prev, cur = values[:-1], values[1:]
+        change[1:] = cur - prev
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct[1:] = np.where(prev != 0, (cur - prev) / np.abs(prev) * 100, np.nan)
+    return change, pct
+
+
+def trend_signs(pct: np.ndarray) -> np.ndarray:
+    """增长率转为方向: 1 上升 / -1 下降 / 0 持平或无法判断"""
+    with np.errstate(invalid='ignore'):
+        return np.where(pct > TREND_THRESHOLD, 1, np.where(pct < -TREND_THRESHOLD, -1, 0))
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """滚动平均(沿第0维,窗口内须全部有值,否则为NaN)"""
+    valid = ~np.isnan(values)
+    zeros = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    result = np.full(values.shape, np.nan)
+    if window <= len(values):
+        window_sums = sums[window:] - sums[:-window]
+        window_counts = counts[window:] - counts[:-window]
+        result[window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return result
+
+
+class FinancialAnalytics:
+    """基于期间 × 指标矩阵的分析结果(按需计算并缓存)"""
+
+    def __init__(self, results):
+        """
+        初始化
+
+        Args:
+            results: FinancialResultSet 或结果字典列表
+        """
+        self.result_set = FinancialResultSet.of(results)
+        self.periods = self.result_set.periods
+        self.metrics = self.result_set.metrics
+        self.units = self.result_set.metric_units
+        self.values = to_array(self.result_set.matrix) if self.periods else np.empty((0, len(self.metrics)))
+        self._sequential = None
+
+    @property
+    def labels(self) -> List[str]:
+        return [period_label(p) for p in self.periods]
+
+    def _sequential_change(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._sequential is None:
+            self._sequential = sequential_change(self.values)
+        return self._sequential
+
+    @property
+    def change(self) -> np.ndarray:
+        """环比变化额(期间 × 指标)"""
+        return self._sequential_change()[0]
+
+    @property
+    def growth_pct(self) -> np.ndarray:
+        """环比增长率%(期间 × 指标)"""
+        return self._sequential_change()[1]
+
+    def chart_growth(self, metric_id: int) -> Tuple[list, list]:
+        """
+        某指标的环比增长额(绝对值≥1万时以万为单位)和增长率%,保留2位小数,供图表使用
+
+        Returns:
+            (增长额列表, 增长率列表),无法计算处为None
+        """
+        change, pct = self.change[:, metric_id], self.growth_pct[:, metric_id]
+        amounts = np.where(np.isnan(pct), np.nan, np.where(np.abs(change) >= 10000, change / 10000, change))
+        return to_list(amounts, 2), to_list(pct, 2)
+
+    def yoy_pct(self) -> np.ndarray:
+        """同比增长率%(与上年同季度/同为年度数据的期间对比)"""
+        position = {period: i for i, period in enumerate(self.periods)}
+        index = np.array([position.get((year - 1, quarter), -1) for year, quarter in self.periods], dtype=int)
+        prev = np.where(index[:, None] >= 0, self.values[index], np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(prev != 0, (self.values - prev) / np.abs(prev) * 100, np.nan)
+
+    def _endpoints(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """各指标首末个有效期间的序号及是否有至少两个有效值"""
+        valid = ~np.isnan(self.values)
+        first = np.argmax(valid, axis=0)
+        last = len(self.periods) - 1 - np.argmax(valid[::-1], axis=0)
+        return first, last, valid.sum(axis=0) >= 2
+
+    def overall_change_pct(self) -> np.ndarray:
+        """各指标首末有效期间的变化率%"""
+        if not len(self.periods):
+            return np.full(len(self.metrics), np.nan)
+        first, last, enough = self._endpoints()
+        columns = np.arange(len(self.metrics))
+        start, end = self.values[first, columns], self.values[last, columns]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(enough & (start != 0), (end - start) / np.abs(start) * 100, np.nan)
+
+    def cagr(self) -> np.ndarray:
+        """
+        各指标年复合增长率%(首末有效期间,按年份和季度折算年数;首末值须为正)
+        """
+        if not len(self.periods):
+            return np.full(len(self.metrics), np.nan)
+        first, last, enough = self._endpoints()
+        columns = np.arange(len(self.metrics))
+        start, end = self.values[first, columns], self.values[last, columns]
+        offsets = np.array([year + ((quarter - 1) / 4 if isinstance(quarter, int) and quarter else 0)
+                            for year, quarter in self.periods])
+        years = offsets[last] - offsets[first]
+        ok = enough & (years > 0) & (start > 0) & (end > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(ok, end / np.where(ok, start, 1), 1.0)
+            return np.where(ok, (np.power(ratio, 1 / np.where(ok, years, 1)) - 1) * 100, np.nan)
+
+    def divergences(self) -> List[Dict]:
+        """
+        指标两两背离
+
+        Returns:
+            [{'metrics': (A, B), 'periods': [一升一降的期间], 'overall': 首末期方向相反}, ...]
+        """
+        if len(self.metrics) < 2 or len(self.periods) < 2:
+            return []
+        signs = trend_signs(self.growth_pct)
+        opposite = (signs[:, :, None] * signs[:, None, :]) == -1
+        overall = trend_signs(self.overall_change_pct())
+        overall_opposite = (overall[:, None] * overall[None, :]) == -1
+
+        labels = self.labels
+        found = []
+        rows, cols = np.nonzero(np.triu(opposite.any(axis=0) | overall_opposite, k=1))
+        for a, b in zip(rows.tolist(), cols.tolist()):
+            found.append({
+                'metrics': (self.metrics[a], self.metrics[b]),
+                'periods': [labels[t] for t in np.nonzero(opposite[:, a, b])[0].tolist()],
+                'overall': bool(overall_opposite[a, b])
+            })
+        return found
+
+    def summary(self) -> Dict:
+        """各指标的预计算结论(可直接序列化为JSON)"""
+        if not len(self.periods):
+            return {'metrics': [], 'divergences': []}
+        first, last, _ = self._endpoints()
+        labels = self.labels
+        growth, yoy = self.growth_pct, self.yoy_pct()
+        overall, cagr = self.overall_change_pct(), self.cagr()
+        valid = ~np.isnan(self.values)
+        means = np.where(valid, self.values, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+        # 季度数据取近4期滚动平均,年度数据取近3期
+        window = 4 if any(isinstance(q, int) and q for _, q in self.periods) else 3
+        rolling = rolling_mean(self.values, window)
+        metrics = []
+        for m, name in enumerate(self.metrics):
+            if not valid[:, m].any():
+                continue
+            metrics.append({
+                'metric': name,
+                'unit': self.units[m],
+                'first_period': labels[first[m]],
+                'last_period': labels[last[m]],
+                'last_value': float(self.values[last[m], m]),
+                'mean': float(means[m]),
+                'rolling_window': window,
+                'rolling_mean': _rounded(rolling[last[m], m]),
+                'change_pct': _rounded(overall[m]),
+                'cagr_pct': _rounded(cagr[m]),
+                'last_growth_pct': _rounded(growth[last[m], m]),
+                'last_yoy_pct': _rounded(yoy[last[m], m]),
+            })
+        return {'metrics': metrics, 'divergences': self.divergences()}
+
+    def summary_text(self) -> str:
+        """预计算结论的文本形式(供LLM总结提示词使用)"""
+        summary = self.summary()
+        lines = []
+        for item in summary['metrics']:
+            parts = [f"{item['first_period']}至{item['last_period']}"]
+            for key, label in (('change_pct', '累计变化'), ('cagr_pct', '年复合增长率'),
+                               ('last_growth_pct', '最近一期环比'), ('last_yoy_pct', '最近一期同比')):
+                if item[key] is not None:
+                    parts.append(f"{label} {item[key]:+.2f}%")
+            if item['rolling_mean'] is not None:
+                parts.append(f"近{item['rolling_window']}期平均 {item['rolling_mean']:.2f}{item['unit']}")
+            lines.append(f"- {item['metric']}: " + ", ".join(parts))
+        for item in summary['divergences']:
+            a, b = item['metrics']
+            detail = f"背离期间: {'、'.join(item['periods'])}" if item['periods'] else ""
+            overall = "首末期整体方向相反" if item['overall'] else ""
+            lines.append(f"- 背离: {a} 与 {b} " + "; ".join(x for x in (overall, detail) if x))
+        return "\n".join(lines)
@@ -12,26 +12,54 @@ V2.0 重构版:
 
 import sqlite3
 import re
+import time
 from typing import Dict, List, Optional, Tuple
-from datetime import datetime
+
+import numpy as np
+
+from modules.company_catalog import get_company_catalog
+from modules.financial_analytics import sequential_change, to_array
+from modules.financial_results import FinancialResultSet, period_label
+from modules.keyword_matcher import KeywordAutomaton, KeywordMatch
+from modules.period_rollup import get_period_rollup
+from modules.query_planner import BatchQuery, QueryPlanner, has_value, is_month_range, period_filter
+from modules.sqlite_pool import get_connection_pool, in_list
+from modules.time_parser import TimeRangeParser
 
 # 数据库路径
 DB_PATH = 'database/financial.db'
 
+# 需要Text-to-SQL处理的复杂条件关键词(未配置 query_settings.complex_query_keywords 时使用)
+DEFAULT_COMPLEX_QUERY_KEYWORDS = [
+    "排名", "排行", "最高", "最低", "最大", "最小", "前三", "前五", "前十", "哪个", "哪些", "哪家",
+    "明细", "客户", "供应商", "销售方", "购买方", "开票方", "超过", "大于", "小于", "高于", "低于"
+]
+
 
 class FinancialQuery:
     """企业财务数据查询"""
     
+    # 企业模糊匹配: 候选数、最低得分、直接采用所需的得分及领先第二名的差距
+    FUZZY_TOP_K = 5
+    FUZZY_MIN_SCORE = 0.4
+    FUZZY_ACCEPT_SCORE = 0.6
+    FUZZY_MARGIN = 0.1
+    
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
-        # 缓存企业和别名信息
-        self._companies_cache = None
-        self._aliases_cache = None
+        # 企业和别名信息由进程内共享的企业目录提供
+        self._company_catalog = get_company_catalog(db_path)
         
         # === V2.0: 使用 MetricsLoader 动态加载配置 ===
         self._metrics_loader = None
-        self._metrics_map = None
-        self._formulas = None
+        
+        # 时间范围解析器(随配置对象重建)
+        self._time_parser = None
+        self._time_parser_config = None
+        
+        # 复杂条件关键词自动机(随关键词列表重建)
+        self._complex_keywords = None
+        self._complex_automaton = None
     
     @property
     def metrics_loader(self):
@@ -47,58 +75,35 @@ class FinancialQuery:
     
     @property
     def metrics_map(self) -> Dict[str, Tuple[str, str]]:
-        """获取指标映射(从外部配置加载)"""
-        if self._metrics_map is None:
-            if self.metrics_loader:
-                self._metrics_map = self.metrics_loader.get_metrics_map()
-            else:
-                self._metrics_map = {}
-        return self._metrics_map
+        """获取指标映射(从外部配置加载,由 MetricsLoader 缓存并随配置热更新)"""
+        if self.metrics_loader:
+            return self.metrics_loader.get_metrics_map()
+        return {}
     
     @property
     def formulas(self) -> Dict:
-        """获取公式定义(从外部配置加载)"""
-        if self._formulas is None:
-            if self.metrics_loader:
-                self._formulas = self.metrics_loader.get_formulas()
-            else:
-                self._formulas = {}
-        return self._formulas
+        """获取公式定义(从外部配置加载,由 MetricsLoader 缓存并随配置热更新)"""
+        if self.metrics_loader:
+            return self.metrics_loader.get_formulas()
+        return {}
     
     def reload_config(self):
         """重新加载配置(当配置文件更新后调用)"""
         if self.metrics_loader:
             self.metrics_loader.reload()
-        self._metrics_map = None
-        self._formulas = None
         print("✅ 配置已重新加载")
 
     def _get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """当前线程的长连接(连接池持有,调用方不关闭)"""
+        return get_connection_pool(self.db_path).get()
     
     def _load_companies(self):
-        """加载企业缓存"""
-        if self._companies_cache is None:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT id, name FROM companies')
-            self._companies_cache = {row['id']: row['name'] for row in cursor.fetchall()}
-            conn.close()
-        return self._companies_cache
+        """获取企业 {ID: 全名}(来自共享企业目录)"""
+        return self._company_catalog.snapshot().companies
     
     def _load_aliases(self):
-        """加载别名缓存"""
-        if self._aliases_cache is None:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT company_id, alias FROM company_aliases')
-            self._aliases_cache = {}
-            for row in cursor.fetchall():
-                self._aliases_cache[row['alias']] = row['company_id']
-            conn.close()
-        return self._aliases_cache
+        """获取别名 {别名: 企业ID}(来自共享企业目录)"""
+        return self._company_catalog.snapshot().aliases
     
     def search(self, question: str) -> Tuple[Optional[List[Dict]], Optional[Dict], str]:
         """
@@ -111,10 +116,21 @@ class FinancialQuery:
             (查询结果, 企业信息, 状态)
             状态: "success", "company_not_found", "no_data", "error"
         """
+        results, company, status, _ = self.search_with_meta(question)
+        return results, company, status
+    
+    def search_with_meta(self, question: str) -> Tuple[Optional[List[Dict]], Optional[Dict], str, Dict]:
+        """
+        主查询入口(附带执行元数据)
+        
+        Returns:
+            (查询结果, 企业信息, 状态, 元数据);元数据见 execute_query_with_meta,
+            未识别企业时为 {'tier': 'none'}
+        """
         # 1. 识别企业
         company = self.match_company(question)
         if not company:
-            return None, None, "company_not_found"
+            return None, None, "company_not_found", {'tier': 'none'}
         
         print(f"🏢 匹配企业: {company['name']} (ID: {company['id']})")
         
@@ -127,12 +143,12 @@ class FinancialQuery:
         print(f"📊 识别指标: {metrics}")
         
         # 4. 执行查询
-        results = self.execute_query(company['id'], time_range, metrics, question)
+        results, meta = self.execute_query_with_meta(company['id'], time_range, metrics, question)
         
         if not results:
-            return None, company, "no_data"
+            return None, company, "no_data", meta
         
-        return results, company, "success"
+        return results, company, "success", meta
     
     def match_company(self, question: str) -> Optional[Dict]:
         """
@@ -144,38 +160,42 @@ class FinancialQuery:
         Returns:
             企业信息字典 {'id': ..., 'name': ...} 或 None
         """
-        companies = self._load_companies()
-        aliases = self._load_aliases()
-        
-        # 策略1: 从别名表精确匹配(按长度降序,优先匹配长的)
-        sorted_aliases = sorted(aliases.keys(), key=len, reverse=True)
-        for alias in sorted_aliases:
-            if alias in question:
-                company_id = aliases[alias]
-                return {'id': company_id, 'name': companies.get(company_id)}
-        
-        # 策略2: 从企业全名匹配
-        sorted_companies = sorted(companies.items(), key=lambda x: len(x[1]), reverse=True)
-        for company_id, name in sorted_companies:
-            if name in question:
-                return {'id': company_id, 'name': name}
-        
-        # 策略3: 模糊匹配(去掉常见后缀)
-        for company_id, name in sorted_companies:
-            # 去掉后缀后匹配
-            short = name.replace('有限公司', '').replace('有限责任公司', '').replace('公司', '').replace('厂', '')
-            if short and len(short) >= 2 and short in question:
-                return {'id': company_id, 'name': name}
-        
-        # 策略4: 使用DeepSeek智能识别(如果上述都失败)
-        return self._extract_company_with_llm(question)
+        catalog = self._company_catalog.snapshot()
+        
+        # 策略1-3: 别名 > 企业全名 > 去掉常见后缀的简称(同类别优先匹配长的),一次自动机扫描完成
+        company = catalog.match(question)
+        if company:
+            return company
+        
+        # 策略4: 本地模糊匹配(错别字/漏字/拼音首字母),唯一高分候选直接采用
+        candidates = catalog.fuzzy_candidates(question, top_k=self.FUZZY_TOP_K,
+                                              min_score=self.FUZZY_MIN_SCORE)
+        if not candidates:
+            return None
+        top = candidates[0]
+        runner_up = candidates[1]['score'] if len(candidates) > 1 else 0.0
+        if top['score'] >= self.FUZZY_ACCEPT_SCORE and top['score'] - runner_up >= self.FUZZY_MARGIN:
+            print(f"🔎 企业模糊匹配: {top['matched']} (得分 {top['score']})")
+            return {'id': top['id'], 'name': top['name']}
+        
+        # 策略5: 候选不明确时,仅把候选企业交给DeepSeek判断
+        return self._extract_company_with_llm(question, candidates)
     
-    def _extract_company_with_llm(self, question: str) -> Optional[Dict]:
-        """使用DeepSeek提取企业名称"""
+    def _extract_company_with_llm(self, question: str, candidates: Optional[List[Dict]] = None) -> Optional[Dict]:
+        """
+        使用DeepSeek提取企业名称
+        
+        Args:
+            question: 用户问题
+            candidates: 模糊匹配候选企业;None表示使用全部企业
+        """
         try:
             from modules.deepseek_client import DeepSeekClient
             
-            companies = self._load_companies()
+            if candidates is None:
+                companies = self._load_companies()
+            else:
+                companies = {c['id']: c['name'] for c in candidates}
             company_list = ', '.join(companies.values())
             
             deepseek = DeepSeekClient()
@@ -231,210 +251,17 @@ class FinancialQuery:
                 'is_comparison': True      # 是否对比分析(新)
             }
         """
-        result = {}
-        current_year = datetime.now().year
-        
-        # === 从配置加载关键词（支持热更新）===
-        query_settings = {}
-        if self.metrics_loader:
-            config = self.metrics_loader.load_config()
-            query_settings = config.get('query_settings', {})
-        
-        # 全期查询关键词
-        all_periods_keywords = query_settings.get('all_periods_keywords', [
-            "多少", "是多少", "数据", "金额", "查询", 
-            "增长", "增减", "增加", "减少", 
-            "变动", "改变", "变化", "趋势", "情况"
-        ])
-        has_all_periods_keyword = any(kw in question for kw in all_periods_keywords)
-        
-        # === 检测对比分析意图 ===
-        comparison_keywords = query_settings.get('comparison_keywords', [
-            '增长', '对比', '比较', 'vs', '变化', '趋势', '同比', '环比', '差异', '变动'
-        ])
-        result['is_comparison'] = any(kw in question for kw in comparison_keywords)
-        
-        # === 提取年份(支持多个) ===
-        years = []
-        has_explicit_time = False  # 标记是否有明确指定时间
-        
-        # 辅助函数: 将2位数年份转换为4位数
-        def to_full_year(short_year: int) -> int:
-            return 2000 + short_year if short_year <= 60 else 1900 + short_year
-        
-        # 模式1: 4位数-4位数年份范围 (如 2022-2024, 2022至2024)
-        range_match = re.search(r'(\d{4})[—\-~至到](\d{4})年?', question)
-        if range_match:
-            start_year = int(range_match.group(1))
-            end_year = int(range_match.group(2))
-            if 1990 <= start_year <= 2060 and 1990 <= end_year <= 2060:
-                years = list(range(start_year, end_year + 1))
-                result['is_comparison'] = True
-                has_explicit_time = True
-        
-        # 模式2: 2位数-2位数年份范围 (如 21-23 → 2021-2023)
-        if not years:
-            range_match_2_2 = re.search(r'(?<!\d)(\d{2})[—\-~至到](\d{2})(?!\d)', question)
-            if range_match_2_2:
-                start_short = int(range_match_2_2.group(1))
-                end_short = int(range_match_2_2.group(2))
-                start_year = to_full_year(start_short)
-                end_year = to_full_year(end_short)
-                if 1990 <= start_year <= 2060 and 1990 <= end_year <= 2060:
-                    years = list(range(start_year, end_year + 1))
-                    result['is_comparison'] = True
-                    has_explicit_time = True
-        
-        # 模式3: 4位数-2位数年份范围 (如 2021-24 → 2021-2024)
-        if not years:
-            range_match_4_2 = re.search(r'(\d{4})[—\-~至到](\d{2})(?!\d)', question)
-            if range_match_4_2:
-                start_year = int(range_match_4_2.group(1))
-                end_short = int(range_match_4_2.group(2))
-                end_year = to_full_year(end_short)
-                if 1990 <= start_year <= 2060 and 1990 <= end_year <= 2060:
-                    years = list(range(start_year, end_year + 1))
-                    result['is_comparison'] = True
-                    has_explicit_time = True
-        
-        # 模式4: 多个四位数年份 (如 2023、2024, 2023和2024)
-        if not years:
-            multi_match = re.findall(r'(\d{4})年?', question)
-            if multi_match:
-                years = [int(y) for y in multi_match if 1990 <= int(y) <= 2060]
-                years = sorted(set(years))  # 去重并排序
-                has_explicit_time = bool(years)
-        
-        # 模式X: 两位数列表 (如 "22、23年", "21,22年")
-        if not years:
-            # 匹配类似 "22、23" 或 "21,22" 后面跟着 "年" 的情况
-            # 先找包含分隔符的两位数串
-            list_match = re.search(r'((?:\d{2}[、，,])+\d{2})年', question)
-            if list_match:
-                year_str = list_match.group(1)
-                # 分割并提取
-                parts = re.split(r'[、，,]', year_str)
-                for p in parts:
-                    if p.isdigit():
-                        y = to_full_year(int(p))
-                        if 1990 <= y <= 2060:
-                            years.append(y)
-                years = sorted(set(years))
-                has_explicit_time = bool(years)
-
-        # 模式5: 两位数年份+年字 (如 23年、24年 → 2023、2024)
-        if not years:
-            short_match = re.findall(r'(?<!\d)(\d{2})年', question)
-            if short_match:
-                for y in short_match:
-                    yi = int(y)
-                    full_year = to_full_year(yi)
-                    if 1990 <= full_year <= 2060:
-                        years.append(full_year)
-                years = sorted(set(years))
-                has_explicit_time = bool(years)
-        
-        # 模式6: 独立四位数字 (如 2023利润率)
-        if not years:
-            standalone = re.findall(r'(?<!\d)(\d{4})(?!\d)', question)
-            if standalone:
-                years = [int(y) for y in standalone if 1990 <= int(y) <= 2060]
-                has_explicit_time = bool(years)
-
-        # 模式7: 两位数范围 (如 "22-25" -> 2022-2025, "22-25年")
-        # 必须确保不与上面的 "2022-25" 冲突
-        if not years:
-            # 优先匹配带'年'的: "22-25年"
-            range_short_year = re.search(r'(?<!\d)(\d{2})[—\-](\d{2})年', question)
-            # 或者是无单位的: "22-25"
-            if not range_short_year:
-                range_short_year = re.search(r'(?<!\d)(\d{2})[—\-](\d{2})(?!\d)', question)
-            
-            if range_short_year:
-                s = int(range_short_year.group(1))
-                e = int(range_short_year.group(2))
-                # 简单的合法性检查: start < end, 且都在合理年份区间
-                sy = to_full_year(s)
-                ey = to_full_year(e)
-                if 1990 <= sy <= 2060 and 1990 <= ey <= 2060 and sy <= ey:
-                    years = list(range(sy, ey + 1))
-                    result['is_comparison'] = True
-                    has_explicit_time = True
-        
-        # 设置结果
-        if len(years) > 1:
-            result['years'] = years
-            result['year'] = years[0]  # 兼容旧逻辑
-            result['is_comparison'] = True
-        elif len(years) == 1:
-            result['year'] = years[0]
-            result['years'] = years
-        else:
-            # 没有指定年份时的处理
-            if has_all_periods_keyword:
-                # 包含优先关键词时,查询所有期间的数据
-                result['query_all_periods'] = True
-                result['year'] = None
-                result['years'] = []
-                result['is_comparison'] = True  # 全期查询默认视为对比分析
-                print(f"📅 检测到全期查询关键词,将查询所有期间数据")
-            else:
-                # 默认当前年份
-                result['year'] = current_year
-                result['years'] = [current_year]
-        
-        # === 提取季度(支持多个) ===
-        cn_num = {'一': 1, '二': 2, '三': 3, '四': 4, '1': 1, '2': 2, '3': 3, '4': 4}
-        quarters = []
-        
-        # 模式1: Q1、Q2 或 Q1和Q2
-        q_matches = re.findall(r'[Qq]([1234])', question)
-        if q_matches:
-            quarters = [int(q) for q in q_matches]
-        
-        # 模式2: 一季度、二季度 等
-        if not quarters:
-            cn_matches = re.findall(r'第?([一二三四1234])季度?', question)
-            if cn_matches:
-                quarters = [cn_num.get(q, int(q) if q.isdigit() else None) for q in cn_matches]
-                quarters = [q for q in quarters if q is not None]
-        
-        # 设置结果
-        if len(quarters) > 1:
-            result['quarters'] = sorted(set(quarters))
-            result['quarter'] = quarters[0]  # 兼容旧逻辑
-            result['is_comparison'] = True
-        elif len(quarters) == 1:
-            result['quarter'] = quarters[0]
-            result['quarters'] = quarters
-        
-        # === 提取月份 ===
-        cn_month = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6,
-                    '七': 7, '八': 8, '九': 9, '十': 10, '十一': 11, '十二': 12}
-        
-        # 月份范围
-        range_match = re.search(r'(\d{1,2})[—\-~至到](\d{1,2})月', question)
-        if range_match:
-            start = int(range_match.group(1))
-            end = int(range_match.group(2))
-            if 1 <= start <= 12 and 1 <= end <= 12:
-                result['start_month'] = start
-                result['end_month'] = end
-        elif 'quarters' not in result and 'quarter' not in result:
-            # 单月份
-            month_match = re.search(r'(\d{1,2})月份?', question)
-            if month_match:
-                month = int(month_match.group(1))
-                if 1 <= month <= 12:
-                    result['month'] = month
-        
-        # === 判断是否全年 ===
-        if '全年' in question or '年度' in question:
-            result['is_full_year'] = True
-        elif 'quarter' not in result and 'quarters' not in result and 'month' not in result and 'start_month' not in result:
-            result['is_full_year'] = True
-        
-        return result
+        return self._get_time_parser().parse(question)
+    
+    def _get_time_parser(self) -> TimeRangeParser:
+        """时间范围解析器: 关键词来自配置(支持热更新),配置重新载入后重建,解析结果按问题缓存"""
+        config = self.metrics_loader.load_config() if self.metrics_loader else None
+        if self._time_parser is None or config is not self._time_parser_config:
+            query_settings = (config or {}).get('query_settings', {})
+            self._time_parser = TimeRangeParser(query_settings.get('all_periods_keywords'),
+                                                query_settings.get('comparison_keywords'))
+            self._time_parser_config = config
+        return self._time_parser
     
     def _extract_metric_name_from_question(self, question: str) -> str:
         """从问题中智能提取指标名称"""
@@ -464,27 +291,27 @@ class FinancialQuery:
         
         return '查询结果'
     
+    def match_metrics(self, question: str) -> List[KeywordMatch]:
+        """
+        匹配问题中的指标名称(指标别名和公式名)
+        
+        使用 MetricsLoader 预编译的自动机一次扫描,按最左最长规则选取互不重叠的命中
+        
+        Returns:
+            [KeywordMatch(index, word, start, end), ...],按在问题中的位置排序
+        """
+        if not self.metrics_loader:
+            return []
+        return self.metrics_loader.get_metric_matcher().scan(question).non_overlapping('metric')
+    
     def extract_metrics(self, question: str) -> List[str]:
         """提取用户询问的指标"""
         found_metrics = []
         
-        # 合并metrics_map和formulas的所有关键词
-        all_metrics = list(self.metrics_map.keys()) + list(self.formulas.keys())
-        
-        # 按关键词长度降序匹配(优先匹配长的)
-        sorted_metrics = sorted(set(all_metrics), key=len, reverse=True)
-        
-        for metric_name in sorted_metrics:
-            if metric_name in question:
-                # 检查是否为已找到指标的子串(避免重复,如找到了'企业所得税'就不应再找'所得税')
-                is_substring = False
-                for existing in found_metrics:
-                    if metric_name in existing:
-                        is_substring = True
-                        break
-                
-                if not is_substring:
-                    found_metrics.append(metric_name)
+        # 优先保留长的指标名;已找到指标的子串不再重复加入(如找到了'企业所得税'就不应再找'所得税')
+        for match in sorted(self.match_metrics(question), key=lambda m: len(m.word), reverse=True):
+            if not any(match.word in existing for existing in found_metrics):
+                found_metrics.append(match.word)
         
         # 不再使用默认值 - 如果没找到指标，返回空列表
         # 由execute_query决定是否使用Text-to-SQL或返回无数据
@@ -493,15 +320,199 @@ class FinancialQuery:
     def execute_query(self, company_id: int, time_range: Dict, metrics: List[str], 
                        question: str = None) -> List[Dict]:
         """
-        执行查询(三层策略)
-        1. 预计算指标:直接从financial_metrics或原表查询
-        2. 公式计算:使用公式库动态计算
-        3. Text-to-SQL回退:使用DeepSeek生成SQL
+        执行查询(分层策略,见 execute_query_with_meta)
+        
+        Returns:
+            结果列表
+        """
+        results, _ = self.execute_query_with_meta(company_id, time_range, metrics, question)
+        return results
+    
+    def execute_query_with_meta(self, company_id: int, time_range: Dict, metrics: List[str],
+                                question: str = None) -> Tuple[List[Dict], Dict]:
+        """
+        执行查询(分层策略)
+        1. 配置指标直查: 问题中的指标全部可由 metrics_map(含item_queries)/formulas 解析,
+           且问题不含复杂条件时,直接查询SQLite(预计算字段/原表/公式),不调用LLM
+        2. Text-to-SQL回退: 存在未配置指标、包含复杂条件(如seller_name过滤、排名),
+           或直查没有数据时,使用DeepSeek生成SQL
         
-        注意: 当问题包含复杂条件(如seller_name过滤)时,优先使用Text-to-SQL
+        Returns:
+            (结果列表, 元数据)
+            元数据: {tier: "configured"/"text_to_sql"/"none", elapsed_ms, metrics, unresolved, complex,
+                    fallback_reason(仅回退时)}
+        """
+        start = time.perf_counter()
+        unresolved = [m for m in metrics if m not in self.metrics_map and m not in self.formulas]
+        complex_markers = self._complex_query_markers(question) if question else []
+        meta = {'tier': 'none', 'metrics': list(metrics), 'unresolved': unresolved,
+                'complex': complex_markers}
+        
+        results = []
+        if not metrics:
+            meta['fallback_reason'] = 'no_metric'
+        elif unresolved:
+            meta['fallback_reason'] = 'unresolved_metric'
+        elif complex_markers:
+            meta['fallback_reason'] = 'complex_condition'
+        else:
+            results = self._query_configured(company_id, time_range, metrics)
+            if results:
+                meta['tier'] = 'configured'
+                print(f"⚡ 配置指标直查: {len(results)} 个数据点")
+            else:
+                meta['fallback_reason'] = 'configured_no_data'
+        
+        if meta['tier'] == 'none' and (question or metrics):
+            results = self._query_text_to_sql(company_id, time_range, metrics, question or '、'.join(metrics))
+            if results:
+                meta['tier'] = 'text_to_sql'
+        
+        meta['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return results, meta
+    
+    def _complex_query_markers(self, question: str) -> List[str]:
+        """
+        问题中出现的复杂条件关键词(排名、筛选、明细等,需要Text-to-SQL处理)
+        
+        落在时间表达式(如"前三季度")或指标名称(如"所得税申报明细")中的关键词不算
+        """
+        keywords = DEFAULT_COMPLEX_QUERY_KEYWORDS
+        if self.metrics_loader:
+            config = self.metrics_loader.load_config()
+            keywords = config.get('query_settings', {}).get('complex_query_keywords', keywords)
+        keywords = tuple(keywords)
+        if self._complex_automaton is None or keywords != self._complex_keywords:
+            self._complex_automaton = KeywordAutomaton({'complex': keywords})
+            self._complex_keywords = keywords
+        
+        hits = self._complex_automaton.scan(question).non_overlapping('complex')
+        if not hits:
+            return []
+        consumed = self._get_time_parser().time_spans(question)
+        consumed.extend((m.start, m.end) for m in self.match_metrics(question))
+        markers = []
+        for m in hits:
+            if m.word not in markers and not any(start < m.end and m.start < end for start, end in consumed):
+                markers.append(m.word)
+        return markers
+    
+    def _aggregation_tables(self) -> List[str]:
+        """需要按期间求和的流量型数据表(从配置加载,支持热更新)"""
+        aggregation_tables = ['income_statements', 'tax_reports', 'tax_returns_income', 
+                              'vat_returns', 'cash_flow_statements', 'tax_return_stamp_items']
+        if self.metrics_loader:
+            config = self.metrics_loader.load_config()
+            query_settings = config.get('query_settings', {})
+            aggregation_tables = query_settings.get('aggregation_tables', aggregation_tables)
+        return aggregation_tables
+    
+    def _query_configured(self, company_id: int, time_range: Dict, metrics: List[str]) -> List[Dict]:
+        """
+        按配置直接查询指标(预计算字段/原表/item_query/公式)
+        
+        多个指标按数据表批量查询(见 QueryPlanner): 同一张表的字段/预计算字段一条SQL取出,
+        预计算为空的公式指标再按公式所在表批量计算,结果按问题中的指标顺序返回
+        """
+        planner = QueryPlanner(self.metrics_map, self.formulas, self._aggregation_tables(), self._get_unit)
+        plan = planner.plan(metrics, time_range)
+        
+        cursor = self._get_connection().cursor()
+        
+        by_metric: Dict[str, List[Dict]] = {}
+        
+        try:
+            # === 策略1: 原表字段及公式预计算字段(按表批量) ===
+            conditions, params = period_filter(company_id, time_range)
+            direct_where = ' AND '.join(conditions)
+            for batch in plan.batches:
+                rows = self._quarter_rollup(company_id, time_range, batch) if batch.aggregate else None
+                if rows is not None:
+                    print(f"📈 使用累计汇总: {batch.table} {len(rows)} 个季度")
+                    by_metric.update(batch.fan_out(rows))
+                else:
+                    by_metric.update(self._run_batch(cursor, batch, direct_where, params))
+            
+            for metric_name in plan.singles:
+                table, field = self.metrics_map[metric_name]
+                if table.startswith('__item_query__'):
+                    query_name = table.replace('__item_query__', '')
+                    by_metric[metric_name] = self._query_item(cursor, company_id, time_range, query_name, metric_name)
+                else:
+                    by_metric[metric_name] = self._query_direct(cursor, company_id, time_range,
+                                                                table, field, metric_name)
+            
+            # === 策略2: 预计算为空的公式指标(按公式所在表批量计算) ===
+            pending = {}
+            for metric_name, formula_info in plan.formulas.items():
+                if has_value(by_metric.get(metric_name)):
+                    print(f"📊 使用预计算字段: {metric_name}")
+                else:
+                    pending[metric_name] = formula_info
+                    by_metric.pop(metric_name, None)
+            if pending:
+                conditions, params = period_filter(company_id, time_range, with_month=False)
+                formula_where = ' AND '.join(conditions)
+                for batch in planner.formula_plan(pending).batches:
+                    by_metric.update(self._run_batch(cursor, batch, formula_where, params))
+                for metric_name in pending:
+                    if by_metric.get(metric_name):
+                        print(f"🧮 使用公式计算: {metric_name}")
+        finally:
+            cursor.close()
+        
+        results = []
+        for metric_name in metrics:
+            results.extend(by_metric.get(metric_name, []))
+        return results
+    
+    def _run_batch(self, cursor, batch: BatchQuery, where_clause: str, params=()) -> Dict[str, List[Dict]]:
+        """执行一个批次并拆回各指标结果;批量查询出错时(如某字段不存在)逐个指标单独查询"""
+        try:
+            cursor.execute(batch.sql(where_clause), params)
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            if len(batch.targets) == 1:
+                print(f"⚠️  查询错误 ({batch.targets[0][0]}): {e}")
+                return {batch.targets[0][0]: []}
+            print(f"⚠️  批量查询失败 ({batch.table}),改为逐个指标查询: {e}")
+            results = {}
+            for single in batch.split():
+                results.update(self._run_batch(cursor, single, where_clause, params))
+            return results
+        
+        if len(batch.targets) > 1:
+            print(f"📦 批量查询 {batch.table}: {len(batch.targets)} 个指标")
+        return batch.fan_out(rows)
+    
+    def _quarter_rollup(self, company_id: int, time_range: Dict, batch: BatchQuery) -> Optional[List[Dict]]:
+        """
+        指定季度时由按月累计汇总表得出每个季度的合计(累计(q*3) - 累计((q-1)*3),见 PeriodRollup)
+
+        Returns:
+            与批量查询相同形式的行;有任一(年份, 季度)无法由汇总表得出时返回None(改为求和查询)
         """
-        # === 全面启用 Text-to-SQL ===
-        # 所有非公式指标查询，优先使用Text-to-SQL
+        quarters = time_range.get('quarters', [time_range.get('quarter')] if time_range.get('quarter') else None)
+        years = [y for y in time_range.get('years', [time_range.get('year')]) if y is not None]
+        if time_range.get('query_all_periods', False) or not quarters or not quarters[0] or not years:
+            return None
+        rollup = get_period_rollup(self.db_path)
+        fields = list(batch.columns)
+        rows = []
+        for year in years:
+            for quarter in quarters:
+                totals = rollup.range_totals(batch.table, fields, company_id, year,
+                                             (int(quarter) - 1) * 3 + 1, int(quarter) * 3)
+                if totals is None:
+                    return None
+                row = {'period_year': year, 'period_quarter': int(quarter)}
+                row.update((alias, totals[expression]) for expression, alias in batch.columns.items())
+                rows.append(row)
+        return rows
+    
+    def _query_text_to_sql(self, company_id: int, time_range: Dict, metrics: List[str],
+                           question: str) -> List[Dict]:
+        """使用DeepSeek生成SQL查询(未配置指标或复杂条件)"""
         try:
             from modules.text_to_sql import get_text_to_sql_engine
             engine = get_text_to_sql_engine()
@@ -555,168 +566,31 @@ class FinancialQuery:
         except Exception as e:
             print(f"❌ Text-to-SQL执行异常: {e}")
         
-        # === 以下为旧逻辑保留 (仅作为公式计算的数据源支持) ===
-        # 注意: 纯指标查询不应走到这里，除非Text-to-SQL彻底失败。
-        # 但按照"All-in"策略，我们主要依赖上面的块。
-        # 如果Text-to-SQL失败，我们直接返回空列表不再fallback，
-        # 或者仅保留公式计算部分。
-        
-        # 暂时返回空，或根据需要抛出错误
         return []
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        results = []
-        
-        for metric_name in metrics:
-            # === 策略1: 检查metrics_map(预计算/原始数据) ===
-            if metric_name in self.metrics_map:
-                table, field = self.metrics_map[metric_name]
-                
-                # 检查是否为特殊item_query
-                if table.startswith('__item_query__'):
-                    query_name = table.replace('__item_query__', '')
-                    result = self._query_item(cursor, company_id, time_range, query_name, metric_name)
-                    results.extend(result)
-                    continue
-                
-                result = self._query_direct(cursor, company_id, time_range, table, field, metric_name)
-                results.extend(result)
-                continue
-            
-            # === 策略2: 检查公式库 ===
-            if metric_name in self.formulas:
-                formula_info = self.formulas[metric_name]
-                
-                # 如果有预计算字段,优先使用预计算
-                if 'precomputed' in formula_info:
-                    precomputed_field = formula_info['precomputed']
-                    result = self._query_direct(cursor, company_id, time_range, 
-                                               'financial_metrics', precomputed_field, metric_name)
-                    # 检查是否有有效数据(非NULL)
-                    has_valid_data = any(r['value'] is not None for r in result) if result else False
-                    if has_valid_data:
-                        results.extend(result)
-                        print(f"📊 使用预计算字段: {precomputed_field}")
-                        continue
-                    else:
-                        print(f"📊 预计算字段为空,尝试公式计算")
-                
-                # 使用公式计算
-                result = self._calculate_with_formula(cursor, company_id, time_range, 
-                                                     metric_name, formula_info)
-                if result:
-                    results.extend(result)
-                    print(f"🧮 使用公式计算: {metric_name}")
-                continue
-            
-            # === 策略3: Text-to-SQL回退 ===
-            # 当指标未配置时,使用LLM动态生成SQL
-            print(f"🤖 尝试Text-to-SQL: {metric_name}")
-            try:
-                from modules.text_to_sql import get_text_to_sql_engine
-                engine = get_text_to_sql_engine()
-                
-                # 构建原始问题
-                years = time_range.get('years', [time_range.get('year')])
-                years = [y for y in years if y is not None]
-                quarter = time_range.get('quarter')
-                
-                # 使用指标名作为问题
-                sql_results, status = engine.query(metric_name, company_id, years, quarter)
-                
-                if status == "success" and sql_results:
-                    # 转换结果格式
-                    for row in sql_results:
-                        # 尝试提取标准字段
-                        year = row.get('period_year') or row.get('year') or row.get('年份') or row.get('年度')
-                        qtr = row.get('period_quarter') or row.get('quarter') or row.get('季度') or row.get('period_month') or 1
-                        value = None
-                        # 查找第一个数值字段作为value
-                        excluded_fields = ('period_year', 'period_quarter', 'period_month', 
-                                         'year', 'quarter', 'company_id', 'month',
-                                         '年份', '年度', '季度', '月份')
-                        for k, v in row.items():
-                            if k not in excluded_fields:
-                                if isinstance(v, (int, float)) and v is not None:
-                                    value = v
-                                    break
-                        
-                        if year and value is not None:
-                            results.append({
-                                'metric_name': metric_name,
-                                'year': year,
-                                'quarter': qtr,
-                                'value': value,
-                                'unit': '元'
-                            })
-                    print(f"✅ Text-to-SQL成功: {len(sql_results)} 条记录")
-                else:
-                    print(f"⚠️  Text-to-SQL无结果: {status}")
-            except Exception as e:
-                print(f"⚠️  Text-to-SQL失败: {e}")
-        
-        conn.close()
-        return results
     
     def _query_direct(self, cursor, company_id: int, time_range: Dict, 
                      table: str, field: str, metric_name: str) -> List[Dict]:
         """直接查询预计算或原始数据(支持多时间段)"""
         results = []
         
-        conditions = [f"company_id = {company_id}"]
-        
-        # === 检查是否为全期查询 ===
-        query_all = time_range.get('query_all_periods', False)
+        # 月份范围需要特殊处理
+        if is_month_range(time_range) and table == 'income_statements':
+            result = self._query_month_range(
+                cursor, company_id, time_range['year'],
+                time_range['start_month'], time_range['end_month'],
+                field, metric_name
+            )
+            if result:
+                return [result]
+            return []
         
-        if not query_all:
-            # === 处理年份(支持多年) ===
-            years = time_range.get('years', [time_range.get('year')])
-            # 过滤掉None值
-            years = [y for y in years if y is not None]
-            if len(years) > 1:
-                # 多年份查询
-                years_str = ','.join(str(y) for y in years)
-                conditions.append(f"period_year IN ({years_str})")
-            elif years:
-                conditions.append(f"period_year = {years[0]}")
-            
-            # === 处理季度(支持多季度) ===
-            quarters = time_range.get('quarters', [time_range.get('quarter')] if time_range.get('quarter') else None)
-            if quarters and len(quarters) > 1:
-                # 多季度查询
-                quarters_str = ','.join(str(q) for q in quarters)
-                conditions.append(f"period_quarter IN ({quarters_str})")
-            elif quarters and quarters[0]:
-                conditions.append(f"period_quarter = {quarters[0]}")
-            elif 'month' in time_range:
-                conditions.append(f"period_month = {time_range['month']}")
-            elif 'start_month' in time_range and 'end_month' in time_range:
-                # 月份范围需要特殊处理
-                if table == 'income_statements':
-                    result = self._query_month_range(
-                        cursor, company_id, time_range['year'],
-                        time_range['start_month'], time_range['end_month'],
-                        field, metric_name
-                    )
-                    if result:
-                        return [result]
-                    return []
         # 全期查询时不添加年份/季度条件,查询该企业所有存在的数据
-        
+        conditions, params = period_filter(company_id, time_range)
         where_clause = ' AND '.join(conditions)
         
         # 判断是否需要聚合(对流量型数据进行求和,如税额、收入等)
         # 资产负债表等存量数据不需要求和(通常取期末值)
-        # 从配置加载（支持热更新）
-        aggregation_tables = ['income_statements', 'tax_reports', 'tax_returns_income', 
-                              'vat_returns', 'cash_flow_statements', 'tax_return_stamp_items']
-        if self.metrics_loader:
-            config = self.metrics_loader.load_config()
-            query_settings = config.get('query_settings', {})
-            aggregation_tables = query_settings.get('aggregation_tables', aggregation_tables)
-        should_aggregate = table in aggregation_tables
+        should_aggregate = table in self._aggregation_tables()
         
         # 构建查询语句
         if should_aggregate:
@@ -736,7 +610,7 @@ class FinancialQuery:
             """
         
         try:
-            cursor.execute(query)
+            cursor.execute(query, params)
             rows = cursor.fetchall()
             
             for row in rows:
@@ -786,36 +660,20 @@ class FinancialQuery:
         # 确定时间粒度字段(优先季度,其次月份)
         period_field = quarter_field or month_field
         
-        # 构建条件
-        conditions = [f"{company_field} = {company_id}"]
-        
-        # 处理年份
-        years = time_range.get('years', [time_range.get('year')])
-        years = [y for y in years if y is not None]
-        if years:
-            if len(years) > 1:
-                years_str = ','.join(str(y) for y in years)
-                conditions.append(f"{year_field} IN ({years_str})")
-            else:
-                conditions.append(f"{year_field} = {years[0]}")
-        
-        # 处理季度(如果有季度字段且查询中指定了季度)
-        if quarter_field:
-            quarters = time_range.get('quarters', [time_range.get('quarter')] if time_range.get('quarter') else None)
-            if quarters and quarters[0]:
-                if len(quarters) > 1:
-                    quarters_str = ','.join(str(q) for q in quarters)
-                    conditions.append(f"{quarter_field} IN ({quarters_str})")
-                else:
-                    conditions.append(f"{quarter_field} = {quarters[0]}")
+        # 构建条件(季度仅在有季度字段且查询中指定了季度时过滤)
+        conditions, params = period_filter(company_id, time_range, with_month=False,
+                                           company_field=company_field, year_field=year_field,
+                                           quarter_field=quarter_field)
         
         # 处理item_name过滤(如果适用)
         if item_name_field and item_name_value:
-            conditions.append(f"{table}.{item_name_field} = '{item_name_value}'")
+            conditions.append(f"{table}.{item_name_field} = ?")
+            params.append(item_name_value)
         
         # 处理filter条件过滤(如发票类型)
         if filter_field and filter_value:
-            conditions.append(f"{filter_field} = '{filter_value}'")
+            conditions.append(f"{filter_field} = ?")
+            params.append(filter_value)
         
         where_clause = ' AND '.join(conditions)
         
@@ -872,7 +730,7 @@ class FinancialQuery:
                 """
         
         try:
-            cursor.execute(query)
+            cursor.execute(query, params)
             rows = cursor.fetchall()
             
             for row in rows:
@@ -890,110 +748,58 @@ class FinancialQuery:
         
         return results
     
-    def _calculate_with_formula(self, cursor, company_id: int, time_range: Dict,
-                                metric_name: str, formula_info: Dict) -> List[Dict]:
-        """使用公式库计算指标(支持多时间段)"""
-        results = []
-        
-        formula = formula_info['formula']
-        table = formula_info['table']
-        unit = formula_info['unit']
-        
-        conditions = [f"company_id = {company_id}"]
-        
-        # === 检查是否为全期查询 ===
-        query_all = time_range.get('query_all_periods', False)
-        
-        if not query_all:
-            # === 处理年份(支持多年) ===
-            years = time_range.get('years', [time_range.get('year')])
-            # 过滤掉None值
-            years = [y for y in years if y is not None]
-            if len(years) > 1:
-                years_str = ','.join(str(y) for y in years)
-                conditions.append(f"period_year IN ({years_str})")
-            elif years:
-                conditions.append(f"period_year = {years[0]}")
-            
-            # === 处理季度(支持多季度) ===
-            quarters = time_range.get('quarters', [time_range.get('quarter')] if time_range.get('quarter') else None)
-            if quarters and len(quarters) > 1:
-                quarters_str = ','.join(str(q) for q in quarters)
-                conditions.append(f"period_quarter IN ({quarters_str})")
-            elif quarters and quarters[0]:
-                conditions.append(f"period_quarter = {quarters[0]}")
-        
-        where_clause = ' AND '.join(conditions)
-        
-        query = f"""
-            SELECT period_year, period_quarter, {formula} as value
-            FROM {table}
-            WHERE {where_clause}
-            ORDER BY period_year, period_quarter
-        """
-        
-        try:
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
-            for row in rows:
-                results.append({
-                    'metric_name': metric_name,
-                    'year': row['period_year'],
-                    'quarter': row['period_quarter'],
-                    'value': row['value'],
-                    'unit': unit
-                })
-        except Exception as e:
-            print(f"⚠️  公式计算错误 ({metric_name}): {e}")
-        
-        return results
-    
     def _query_month_range(self, cursor, company_id: int, year: int, 
                            start_month: int, end_month: int,
                            field: str, metric_name: str) -> Optional[Dict]:
-        """查询月份范围的汇总数据"""
-        # 对于需要汇总的字段(如收入),计算总和
-        # 注意:实际数据可能按季度存储,需要按比例计算
-        
-        query = f"""
-            SELECT SUM({field}) as total
-            FROM income_statements
-            WHERE company_id = ?
-            AND period_year = ?
-            AND period_quarter IN (
-                SELECT DISTINCT period_quarter FROM income_statements
-                WHERE company_id = ? AND period_year = ?
-            )
         """
+        查询月份范围的汇总数据
         
-        try:
-            # 简化处理:根据月份范围确定涉及的季度
-            quarters = set()
-            for month in range(start_month, end_month + 1):
-                quarters.add((month - 1) // 3 + 1)
-            
-            cursor.execute(f"""
-                SELECT SUM({field}) as total
-                FROM income_statements
-                WHERE company_id = ?
-                AND period_year = ?
-                AND period_quarter IN ({','.join(map(str, quarters))})
-            """, (company_id, year))
-            
-            row = cursor.fetchone()
-            if row and row['total']:
-                return {
-                    'metric_name': f"{start_month}-{end_month}月{metric_name}",
-                    'year': year,
-                    'quarter': f"{start_month}-{end_month}月",
-                    'value': row['total'],
-                    'unit': self._get_unit(metric_name)
-                }
-        except Exception as e:
-            print(f"⚠️  月份范围查询错误: {e}")
+        优先使用按月累计汇总表(累计(end) - 累计(start-1),见 PeriodRollup);
+        汇总表未建立或待刷新时按月求和,该年没有月度数据时按涉及的整季度近似汇总
+        """
+        total = get_period_rollup(self.db_path).range_total(
+            'income_statements', field, company_id, year, start_month, end_month)
         
-        return None
+        if total is None:
+            try:
+                cursor.execute(f"""
+                    SELECT SUM({field}) as total
+                    FROM income_statements
+                    WHERE company_id = ?
+                    AND period_year = ?
+                    AND period_month BETWEEN ? AND ?
+                """, [company_id, year, start_month, end_month])
+                row = cursor.fetchone()
+                total = row['total'] if row else None
+            except Exception as e:
+                print(f"⚠️  月份范围查询错误: {e}")
+        
+        if total is None:
+            # 数据按季度存储: 根据月份范围确定涉及的季度
+            quarters = sorted({(month - 1) // 3 + 1 for month in range(start_month, end_month + 1)})
+            quarter_condition, quarter_params = in_list('period_quarter', quarters)
+            try:
+                cursor.execute(f"""
+                    SELECT SUM({field}) as total
+                    FROM income_statements
+                    WHERE company_id = ?
+                    AND period_year = ?
+                    AND {quarter_condition}
+                """, [company_id, year] + quarter_params)
+                row = cursor.fetchone()
+                total = row['total'] if row and row['total'] else None
+            except Exception as e:
+                print(f"⚠️  月份范围查询错误: {e}")
+        
+        if total is None:
+            return None
+        return {
+            'metric_name': f"{start_month}-{end_month}月{metric_name}",
+            'year': year,
+            'quarter': f"{start_month}-{end_month}月",
+            'value': total,
+            'unit': self._get_unit(metric_name)
+        }
     
     def _get_unit(self, metric_name: str) -> str:
         """获取指标单位"""
@@ -1013,7 +819,7 @@ class FinancialQuery:
         计算对比分析结果
         
         Args:
-            results: 查询结果列表
+            results: 查询结果列表或 FinancialResultSet
             time_range: 时间范围(包含is_comparison标志)
         
         Returns:
@@ -1030,36 +836,25 @@ class FinancialQuery:
                 ]
             }
         """
-        if not time_range.get('is_comparison') or len(results) < 2:
+        result_set = FinancialResultSet.of(results)
+        if not time_range.get('is_comparison') or len(result_set) < 2:
             return {'has_comparison': False, 'comparisons': []}
         
-        # 按指标名称分组
-        metrics_data = {}
-        for r in results:
-            metric = r['metric_name']
-            if metric not in metrics_data:
-                metrics_data[metric] = []
-            metrics_data[metric].append(r)
-        
+        values, units = result_set.values, result_set.units
         comparisons = []
-        for metric, data in metrics_data.items():
-            if len(data) < 2:
+        for metric_id, metric in enumerate(result_set.metrics):
+            # 该指标按年份和季度排序的行,过滤掉None值
+            rows = result_set.series(metric_id)
+            if len(rows) < 2:
                 continue
-            
-            # 按年份和季度排序
-            data.sort(key=lambda x: (x['year'], x.get('quarter', 0)))
-            
-            # 过滤掉None值
-            valid_data = [d for d in data if d['value'] is not None]
-            if len(valid_data) < 2:
+            valid_rows = [i for i in rows if values[i] is not None]
+            if len(valid_rows) < 2:
                 continue
             
             # 计算第一个和最后一个时间点的差异
-            first = valid_data[0]
-            last = valid_data[-1]
-            
-            first_val = first['value']
-            last_val = last['value']
+            first, last = valid_rows[0], valid_rows[-1]
+            first_val = values[first]
+            last_val = values[last]
             
             # 计算变化额和百分比
             change = last_val - first_val
@@ -1078,15 +873,15 @@ class FinancialQuery:
             
             comparisons.append({
                 'metric': metric,
-                'periods': [(d['year'], d.get('quarter'), d['value'], d['unit']) for d in valid_data],
-                'first_period': (first['year'], first.get('quarter')),
-                'last_period': (last['year'], last.get('quarter')),
+                'periods': [result_set.period(i) + (values[i], units[i]) for i in valid_rows],
+                'first_period': result_set.period(first),
+                'last_period': result_set.period(last),
                 'first_value': first_val,
                 'last_value': last_val,
                 'change': change,
                 'change_pct': change_pct,
                 'trend': trend,
-                'unit': first['unit']
+                'unit': units[first]
             })
         
         return {
@@ -1154,24 +949,21 @@ class FinancialQuery:
                     if len(comp['periods']) > 2:
                         output += f"*{comp['metric']}*：\n"
                         output += "| 期间 | 数值 | 增长额 | 增长率 |\n|------|------|--------|--------|\n"
-                        prev_val = None
-                        for period in comp['periods']:
+                        # 环比增长（与上一期对比,向量化计算）
+                        changes, growth_pcts = sequential_change(to_array([p[2] for p in comp['periods']]))
+                        for period, growth, growth_pct in zip(comp['periods'], changes, growth_pcts):
                             year, q, val, u = period
                             q_str = f"Q{q}" if q else ""
                             val_str = self._format_value(val, u)
                             
-                            # 计算环比增长（与上一期对比）
-                            if prev_val is not None and prev_val != 0 and val is not None:
-                                growth = val - prev_val
-                                growth_pct = (growth / abs(prev_val)) * 100
-                                growth_str = self._format_change(growth, u)
+                            if not np.isnan(growth_pct):
+                                growth_str = self._format_change(float(growth), u)
                                 pct_str = f"{growth_pct:+.2f}%"
                             else:
                                 growth_str = "n/a"
                                 pct_str = "n/a"
                             
                             output += f"| {year}年{q_str} | {val_str} | {growth_str} | {pct_str} |\n"
-                            prev_val = val
                         output += "\n"
         else:
             # 列表格式（原有逻辑，用于简单对比）
@@ -1196,29 +988,27 @@ class FinancialQuery:
         
         return output
     
-    def format_results(self, results: List[Dict], company: Dict) -> str:
+    def format_results(self, results, company: Dict) -> str:
         """
-        格式化查询结果
+        格式化查询结果(结果列表或 FinancialResultSet)
         当指标 > 1 或期间 >= 4 时使用表格格式
         """
         if not results:
             return f"📊 {company['name']} 暂无相关数据"
         
-        # 统计不同指标和期间
-        metrics = set(r['metric_name'] for r in results)
-        periods = set((r['year'], r.get('quarter')) for r in results)
+        result_set = FinancialResultSet.of(results)
         
         # 判断是否使用表格格式
-        use_table = len(metrics) > 1 or len(periods) >= 4
+        use_table = len(result_set.metrics) > 1 or len(result_set.periods) >= 4
         
         output = f"📊 **{company['name']}** 财务数据：\n\n"
         
         if use_table:
             # 表格格式
-            output += self._format_as_table(results, metrics, periods)
+            output += self._format_as_table(result_set)
         else:
             # 列表格式（原有逻辑）
-            output += self._format_as_list(results)
+            output += self._format_as_list(result_set)
         
         return output
     
@@ -1252,46 +1042,33 @@ class FinancialQuery:
         else:
             return f"{change:+.2f}{unit}"
     
-    def _format_as_table(self, results: List[Dict], metrics: set, periods: set) -> str:
-        """生成表格格式输出"""
-        # 按期间排序
-        sorted_periods = sorted(periods, key=lambda x: (x[0], x[1] or 0))
-        sorted_metrics = sorted(metrics)
-        
-        # 构建数据矩阵
-        data_matrix = {}
-        units = {}
-        for r in results:
-            period_key = (r['year'], r.get('quarter'))
-            metric = r['metric_name']
-            data_matrix[(period_key, metric)] = r['value']
-            units[metric] = r['unit']
+    def _format_as_table(self, result_set: FinancialResultSet) -> str:
+        """生成表格格式输出(期间 × 指标矩阵,指标按名称排序)"""
+        matrix = result_set.matrix
+        units = result_set.metric_units
+        sorted_metrics = sorted(range(len(result_set.metrics)), key=lambda m: result_set.metrics[m])
         
         # 生成表头
         header = "| 期间 |"
         separator = "|------|"
-        for metric in sorted_metrics:
-            header += f" {metric} |"
+        for metric_id in sorted_metrics:
+            header += f" {result_set.metrics[metric_id]} |"
             separator += "--------|"
         output = header + "\n" + separator + "\n"
         
         # 生成数据行
-        for period in sorted_periods:
-            year, quarter = period
-            period_str = f"{year}年" + (f"Q{quarter}" if quarter else "")
-            row = f"| {period_str} |"
+        for period, row_values in zip(result_set.periods, matrix):
+            row = f"| {period_label(period)} |"
             
-            for metric in sorted_metrics:
-                value = data_matrix.get((period, metric))
-                unit = units.get(metric, '元')
-                formatted = self._format_value(value, unit)
+            for metric_id in sorted_metrics:
+                formatted = self._format_value(row_values[metric_id], units[metric_id])
                 row += f" {formatted} |"
             
             output += row + "\n"
         
         return output
     
-    def _format_as_list(self, results: List[Dict]) -> str:
+    def _format_as_list(self, results) -> str:
         """生成列表格式输出（原有逻辑）"""
         output = ""
         for result in results:
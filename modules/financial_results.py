@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+财务查询结果的列式容器
+功能:
+1. 以并列数组保存结果(指标序号/年份/季度/数值/单位),指标名驻留(intern)后只存一份
+2. 按需构建一次并缓存: 排序后的期间列表、期间 × 指标矩阵、每个指标按期间排序的行序号
+3. 对比分析、文本格式化、图表生成和LLM总结共用同一个容器,不再各自重新分组
+
+迭代/下标访问仍返回原来的结果字典,兼容按 List[Dict] 使用的调用方
+"""
+
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+Period = Tuple[int, object]
+
+
+def period_sort_key(period: Period):
+    """期间排序键(年份, 季度;年度数据的季度为None排在最前)"""
+    return (period[0], period[1] or 0)
+
+
+def period_label(period: Period) -> str:
+    """期间显示文本(表格/图表),如 2023年Q1 / 2023年"""
+    year, quarter = period
+    return f"{year}年" + (f"Q{quarter}" if quarter else "")
+
+
+class FinancialResultSet:
+    """财务查询结果(列式存储,构建后只读)"""
+
+    __slots__ = ('metrics', 'metric_ids', 'years', 'quarters', 'values', 'units',
+                 '_metric_index', '_periods', '_matrix', '_series')
+
+    def __init__(self, records: Iterable[Dict] = ()):
+        """
+        由结果字典列表构建
+
+        Args:
+            records: [{'metric_name', 'year', 'quarter', 'value', 'unit'}, ...]
+        """
+        self.metrics: List[str] = []      # 指标名(按首次出现顺序)
+        self.metric_ids: List[int] = []   # 每行的指标序号
+        self.years: List[int] = []
+        self.quarters: List[object] = []
+        self.values: List[Optional[float]] = []
+        self.units: List[str] = []
+        self._metric_index: Dict[str, int] = {}
+        self._periods: Optional[List[Period]] = None
+        self._matrix: Optional[List[List[Optional[float]]]] = None
+        self._series: Dict[int, List[int]] = {}
+        for record in records:
+            self.append(record)
+
+    @classmethod
+    def of(cls, results) -> 'FinancialResultSet':
+        """已是结果容器时直接返回,否则由结果字典列表构建"""
+        return results if isinstance(results, cls) else cls(results or ())
+
+    def append(self, record: Dict):
+        """追加一行(会使缓存的期间/矩阵失效)"""
+        metric = record.get('metric_name')
+        metric_id = self._metric_index.get(metric)
+        if metric_id is None:
+            metric_id = len(self.metrics)
+            self._metric_index[metric] = metric_id
+            self.metrics.append(sys.intern(metric) if isinstance(metric, str) else metric)
+        self.metric_ids.append(metric_id)
+        self.years.append(record.get('year'))
+        self.quarters.append(record.get('quarter'))
+        self.values.append(record.get('value'))
+        self.units.append(record.get('unit', '元'))
+        self._periods = None
+        self._matrix = None
+        self._series = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __bool__(self) -> bool:
+        return bool(self.values)
+
+    def __getitem__(self, i: int) -> Dict:
+        return self.record(i)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self.record(i) for i in range(len(self.values)))
+
+    def record(self, i: int) -> Dict:
+        """第 i 行的结果字典"""
+        return {
+            'metric_name': self.metrics[self.metric_ids[i]],
+            'year': self.years[i],
+            'quarter': self.quarters[i],
+            'value': self.values[i],
+            'unit': self.units[i]
+        }
+
+    def to_list(self) -> List[Dict]:
+        return list(self)
+
+    def period(self, i: int) -> Period:
+        return (self.years[i], self.quarters[i])
+
+    @property
+    def periods(self) -> List[Period]:
+        """去重并排序后的期间列表"""
+        if self._periods is None:
+            unique = dict.fromkeys(zip(self.years, self.quarters))
+            self._periods = sorted(unique, key=period_sort_key)
+        return self._periods
+
+    @property
+    def metric_units(self) -> List[str]:
+        """每个指标的单位(同一指标取最后一行的单位)"""
+        units = ['元'] * len(self.metrics)
+        for metric_id, unit in zip(self.metric_ids, self.units):
+            units[metric_id] = unit
+        return units
+
+    @property
+    def matrix(self) -> List[List[Optional[float]]]:
+        """
+        期间 × 指标矩阵 matrix[期间序号][指标序号],缺失为None
+        (同一期间同一指标有多行时取最后一行)
+        """
+        if self._matrix is None:
+            index = {period: i for i, period in enumerate(self.periods)}
+            matrix = [[None] * len(self.metrics) for _ in self.periods]
+            for i, metric_id in enumerate(self.metric_ids):
+                matrix[index[(self.years[i], self.quarters[i])]][metric_id] = self.values[i]
+            self._matrix = matrix
+        return self._matrix
+
+    def column(self, metric_id: int) -> List[Optional[float]]:
+        """某指标在各期间(self.periods 顺序)的值"""
+        return [row[metric_id] for row in self.matrix]
+
+    def series(self, metric_id: int) -> List[int]:
+        """某指标的全部行序号,按期间排序(同一期间保持原顺序)"""
+        if metric_id not in self._series:
+            rows = [i for i, m in enumerate(self.metric_ids) if m == metric_id]
+            rows.sort(key=lambda i: period_sort_key((self.years[i], self.quarters[i])))
+            self._series[metric_id] = rows
+        return self._series[metric_id]
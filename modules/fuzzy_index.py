@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+名称模糊匹配索引
+功能:
+1. 字符二元组(bigram)倒排索引快速召回候选名称(高频bigram不参与召回)
+2. 有界编辑距离(近似子串匹配)精排,容忍错别字、漏字、多字
+3. 可选拼音首字母匹配(如 "hxkj" -> 华兴科技),需安装 pypinyin,未安装时自动跳过
+
+只在本地内存中计算,用于精确匹配失败后、调用LLM之前的企业名称识别
+"""
+
+import heapq
+from collections import namedtuple
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+
+# 一个候选: 目标键、得分(0-1)、命中的名称
+FuzzyCandidate = namedtuple('FuzzyCandidate', ['key', 'score', 'text'])
+
+# 拼音首字母精确命中时的得分(首字母相同的名称较多,不视为完全确定)
+PINYIN_INITIALS_SCORE = 0.85
+
+
+def bigrams(text: str) -> Set[str]:
+    """字符二元组集合"""
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def substring_edit_distance(pattern: str, text: str, max_distance: int) -> Optional[int]:
+    """
+    pattern 与 text 中任意子串的最小编辑距离(半全局对齐)
+
+    Args:
+        pattern: 名称
+        text: 问题
+        max_distance: 距离上限
+
+    Returns:
+        最小编辑距离;超过上限时返回None
+    """
+    m = len(pattern)
+    # prev[i]: pattern[:i] 与以当前位置结尾的 text 子串的最小距离
+    prev = list(range(m + 1))
+    best = prev[m]
+    for ch in text:
+        cur = [0] * (m + 1)
+        for i in range(1, m + 1):
+            cost = 0 if pattern[i - 1] == ch else 1
+            cur[i] = min(prev[i - 1] + cost, prev[i] + 1, cur[i - 1] + 1)
+        if cur[m] < best:
+            best = cur[m]
+        prev = cur
+    return best if best <= max_distance else None
+
+
+def pinyin_initials(text: str) -> str:
+    """拼音首字母(小写);未安装 pypinyin 时返回空串"""
+    if lazy_pinyin is None:
+        return ''
+    return ''.join(p[0] for p in lazy_pinyin(text, style=Style.FIRST_LETTER) if p and p[0].isalpha()).lower()
+
+
+def _ascii_words(text: str) -> Set[str]:
+    """问题中的连续英文字母串(小写)"""
+    words, word = set(), []
+    for ch in text.lower() + ' ':
+        if 'a' <= ch <= 'z':
+            word.append(ch)
+        elif word:
+            words.add(''.join(word))
+            word = []
+    return words
+
+
+class FuzzyNameIndex:
+    """名称模糊匹配索引(构建后只读)"""
+
+    # 参与精排的最大候选名称数(按bigram覆盖率召回)
+    MAX_RERANK = 30
+    # 出现在超过该比例(且不少于MIN_COMMON_POSTINGS个)名称中的bigram视为高频
+    COMMON_RATIO = 0.02
+    MIN_COMMON_POSTINGS = 64
+
+    def __init__(self, entries: Iterable[Tuple[str, Hashable]], use_pinyin: bool = True):
+        """
+        构建索引
+
+        Args:
+            entries: (名称, 目标键) 列表,同一目标可有多个名称(全名、简称、别名)
+            use_pinyin: 是否索引拼音首字母
+        """
+        self._texts: List[str] = []
+        self._keys: List[Hashable] = []
+        self._grams: List[frozenset] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._initials: Dict[str, List[int]] = {}
+
+        for text, key in entries:
+            if not text or len(text) < 2:
+                continue
+            entry_id = len(self._texts)
+            self._texts.append(text)
+            self._keys.append(key)
+            grams = frozenset(bigrams(text))
+            self._grams.append(grams)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(entry_id)
+            if use_pinyin:
+                initials = pinyin_initials(text)
+                if len(initials) >= 2:
+                    self._initials.setdefault(initials, []).append(entry_id)
+
+        # 高频bigram(如"科技")不用于召回,只在计算重叠数时计入
+        limit = max(self.MIN_COMMON_POSTINGS, int(len(self._texts) * self.COMMON_RATIO))
+        self._common = {gram for gram, ids in self._postings.items() if len(ids) > limit}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def query(self, question: str, top_k: int = 5, min_score: float = 0.4) -> List[FuzzyCandidate]:
+        """
+        检索与问题最相近的名称
+
+        得分 = 0.7 * (1 - 编辑距离/名称长度) + 0.3 * bigram覆盖率,
+        编辑距离上限为名称长度的1/3(2个字的名称不容错)
+
+        Args:
+            question: 用户问题
+            top_k: 返回的候选数(按目标键去重)
+            min_score: 最低得分
+
+        Returns:
+            按得分降序的候选列表
+        """
+        question_grams = bigrams(question)
+        recalled: Set[int] = set()
+        for gram in question_grams:
+            if gram not in self._common:
+                recalled.update(self._postings.get(gram, ()))
+
+        best: Dict[Hashable, FuzzyCandidate] = {}
+
+        def offer(entry_id: int, score: float):
+            key = self._keys[entry_id]
+            if score >= min_score and (key not in best or score > best[key].score):
+                best[key] = FuzzyCandidate(key, round(score, 4), self._texts[entry_id])
+
+        # 每处编辑最多破坏2个bigram: 共有bigram过少的名称不可能在距离上限内,直接跳过
+        texts, grams = self._texts, self._grams
+        feasible = []
+        for entry_id in recalled:
+            shared = len(grams[entry_id] & question_grams)
+            if shared >= len(grams[entry_id]) - 2 * (len(texts[entry_id]) // 3):
+                feasible.append((entry_id, shared))
+        ranked = heapq.nsmallest(self.MAX_RERANK, feasible,
+                                 key=lambda x: (-x[1] / len(grams[x[0]]), x[0]))
+        for entry_id, shared in ranked:
+            text = texts[entry_id]
+            distance = substring_edit_distance(text, question, len(text) // 3)
+            if distance is None:
+                continue
+            offer(entry_id, 0.7 * (1 - distance / len(text)) + 0.3 * shared / len(grams[entry_id]))
+
+        if self._initials:
+            for word in _ascii_words(question):
+                for entry_id in self._initials.get(word, ()):
+                    offer(entry_id, PINYIN_INITIALS_SCORE)
+
+        # 同分时优先命中更长的名称
+        return sorted(best.values(), key=lambda c: (-c.score, -len(c.text)))[:top_k]
@@ -10,6 +10,7 @@
 
 from typing import Optional
 from modules.deepseek_client import DeepSeekClient
+from modules.company_catalog import get_company_catalog
 
 
 class IntentClassifier:
@@ -76,8 +77,8 @@ class IntentClassifier:
             "查询", "显示", "告诉我", "计算"
         ]
         
-        # 企业名称缓存(从数据库加载)
-        self._company_names_cache = None
+        # 企业名称和别名(进程内共享的企业目录,数据库变化时自动刷新)
+        self._company_catalog = get_company_catalog()
     
     @property
     def financial_data_keywords(self):
@@ -98,26 +99,8 @@ class IntentClassifier:
     
     def _load_company_names(self):
         """加载企业名称和别名"""
-        if self._company_names_cache is None:
-            try:
-                import sqlite3
-                conn = sqlite3.connect('database/financial.db')
-                cursor = conn.cursor()
-                
-                # 加载企业名称
-                cursor.execute('SELECT name FROM companies')
-                names = [row[0] for row in cursor.fetchall()]
-                
-                # 加载别名
-                cursor.execute('SELECT alias FROM company_aliases')
-                aliases = [row[0] for row in cursor.fetchall()]
-                
-                self._company_names_cache = names + aliases
-                conn.close()
-            except:
-                self._company_names_cache = []
-        
-        return self._company_names_cache
+        snapshot = self._company_catalog.snapshot()
+        return list(snapshot.companies.values()) + list(snapshot.aliases)
     
     def _should_route_to_knowledge_base(self, question: str) -> bool:
         """检查是否应该优先路由到知识库"""
@@ -226,11 +209,8 @@ class IntentClassifier:
         2. 包含财务数据关键词
         3. 包含数据请求关键词(可选,但增加置信度)
         """
-        # 加载企业名称
-        company_names = self._load_company_names()
-        
-        # 检查是否包含企业名称
-        has_company = any(name in question for name in company_names if name)
+        # 检查是否包含企业名称(或别名)
+        has_company = self._company_catalog.snapshot().mentions_company(question)
         
         if not has_company:
             return False
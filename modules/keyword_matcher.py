@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多模式关键词匹配(Aho-Corasick自动机)
+功能:
+1. 将多个类别的关键词列表编译为一个自动机,一次扫描找出所有类别的全部命中
+2. 命中结果保留关键词在原列表中的位置,便于按配置顺序决定优先级
+3. 支持最长匹配: 被同类别更长命中完全覆盖的短命中可被忽略(如"土地增值税"中的"增值税"),
+   或按最左最长规则选取互不重叠的命中
+
+自动机构建完成后只读,可在多线程间共享;配置变化时整体重建后替换引用
+"""
+
+from collections import deque, namedtuple
+from typing import Dict, Iterable, List, Optional
+
+
+# 一次命中: 关键词在类别列表中的位置、关键词、在文本中的起止位置(end不含)
+KeywordMatch = namedtuple('KeywordMatch', ['index', 'word', 'start', 'end'])
+
+
+class KeywordHits:
+    """一次扫描的命中结果(按类别分组)"""
+
+    def __init__(self, matches: Dict[str, List[KeywordMatch]]):
+        self._matches = matches
+
+    def matches(self, category: str, longest: bool = False) -> List[KeywordMatch]:
+        """
+        获取某类别的全部命中
+
+        Args:
+            category: 类别名
+            longest: 是否忽略被同类别更长命中覆盖的命中
+        """
+        hits = self._matches.get(category, [])
+        if not longest or len(hits) < 2:
+            return list(hits)
+        return [m for m in hits
+                if not any(o.start <= m.start and m.end <= o.end and (o.end - o.start) > (m.end - m.start)
+                           for o in hits)]
+
+    def non_overlapping(self, category: str) -> List[KeywordMatch]:
+        """
+        最左最长的不重叠命中(按文本位置排序)
+
+        从左到右选取: 起点最靠左的命中优先,同一起点取最长,与已选命中重叠的跳过
+        """
+        selected: List[KeywordMatch] = []
+        end = 0
+        for m in sorted(self._matches.get(category, []), key=lambda m: (m.start, m.start - m.end, m.index)):
+            if m.start >= end:
+                selected.append(m)
+                end = m.end
+        return selected
+
+    def found(self, category: str) -> List[str]:
+        """按类别列表顺序返回命中的关键词(同一位置的关键词只返回一次)"""
+        seen = {}
+        for m in self._matches.get(category, []):
+            seen.setdefault(m.index, m.word)
+        return [seen[i] for i in sorted(seen)]
+
+    def first(self, category: str, longest: bool = False) -> Optional[KeywordMatch]:
+        """返回类别列表中最靠前的命中(列表顺序即优先级)"""
+        hits = self.matches(category, longest=longest)
+        return min(hits, key=lambda m: (m.index, m.start)) if hits else None
+
+    def any(self, category: str) -> bool:
+        """类别是否有命中"""
+        return bool(self._matches.get(category))
+
+
+class KeywordAutomaton:
+    """Aho-Corasick多模式匹配自动机"""
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        """
+        编译自动机
+
+        Args:
+            categories: {类别名: 关键词列表},空关键词被忽略
+        """
+        self.categories = tuple(categories)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 节点 -> 以该节点结尾的 (类别, 列表位置, 关键词)
+        self._output: List[List[tuple]] = [[]]
+
+        for category, words in categories.items():
+            for index, word in enumerate(words):
+                if word:
+                    self._add(word, (category, index, word))
+        self._build()
+
+    def _add(self, word: str, payload: tuple):
+        """向字典树插入关键词"""
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append(payload)
+
+    def _build(self):
+        """广度优先计算失败指针,并合并后缀节点的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def scan(self, text: str) -> KeywordHits:
+        """
+        扫描文本,一次找出所有类别的全部命中(允许重叠)
+
+        Args:
+            text: 待扫描文本
+
+        Returns:
+            KeywordHits
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        matches: Dict[str, List[KeywordMatch]] = {}
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for category, index, word in output[node]:
+                matches.setdefault(category, []).append(
+                    KeywordMatch(index, word, pos + 1 - len(word), pos + 1))
+        return KeywordHits(matches)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+进程内LRU缓存
+功能:
+1. 有界LRU淘汰 + TTL过期
+2. 线程安全(FastAPI并发请求共享同一实例)
+3. 命中/未命中/淘汰统计,支持清空
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """线程安全的进程内LRU缓存"""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = None):
+        """
+        初始化
+
+        Args:
+            max_entries: 最大条目数,超出按LRU淘汰
+            ttl_seconds: 过期时间(秒),None表示不过期
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Returns:
+            (是否命中, 值)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl_seconds is not None and now - entry[0] > self.ttl_seconds:
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return True, entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        """写入缓存(超出容量时淘汰最久未访问的条目)"""
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > max(0, self.max_entries):
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> int:
+        """
+        清空缓存
+
+        Returns:
+            清除的条目数
+        """
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+            return count
+
+    def stats(self) -> Dict:
+        """统计信息"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0
+            }
@@ -9,12 +9,18 @@
 4. 提供未配置字段的提示
 """
 
-import json
+import copy
 import sqlite3
-import os
 from typing import Dict, List, Optional, Tuple, Set
 from pathlib import Path
 
+try:
+    from modules.config_registry import get_config_registry
+    from modules.keyword_matcher import KeywordAutomaton
+except ModuleNotFoundError:
+    from config_registry import get_config_registry
+    from keyword_matcher import KeywordAutomaton
+
 
 class MetricsLoader:
     """财务指标配置加载器（支持热更新）"""
@@ -38,39 +44,36 @@ class MetricsLoader:
         self._formulas = None
         self._db_schema = None
         self._unconfigured_fields = None
+        self._metric_matcher = None
         
-        # 热更新支持: 配置文件修改时间
-        self._config_mtime = 0
+        # 热更新支持: 已加载的配置快照版本
+        self._config_version = None
     
     def load_config(self) -> Dict:
         """
-        加载配置文件(支持热更新)
-        每次调用时检查文件修改时间，只有文件变化时才重新加载
+        获取当前配置(支持热更新)
+        配置文件由全局注册中心监视和解析,这里只比较快照版本号,版本变化时才复制配置并清除派生缓存
         """
-        try:
-            current_mtime = os.path.getmtime(self.config_path)
-            
-            # 如果文件已修改或尚未加载，重新加载
-            if current_mtime != self._config_mtime or self._config is None:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    self._config = json.load(f)
-                
-                # 如果是重新加载（不是首次加载），清除相关缓存
-                if self._config_mtime != 0:
-                    self._metrics_map = None
-                    self._keywords = None
-                    self._formulas = None
-                    print(f"📂 配置已热更新: {self.config_path}")
-                
-                self._config_mtime = current_mtime
-                
-        except FileNotFoundError:
-            print(f"⚠️  配置文件不存在: {self.config_path}")
-            self._config = {"tables": {}, "formulas": {}}
-        except json.JSONDecodeError as e:
-            print(f"⚠️  配置文件格式错误: {e}")
-            self._config = {"tables": {}, "formulas": {}}
+        snapshot = get_config_registry().get(self.config_path)
+        if snapshot.version == self._config_version and self._config is not None:
+            return self._config
         
+        if snapshot.data is None:
+            print(f"⚠️  配置文件不存在或格式错误: {self.config_path}")
+            self._config = {"tables": {}, "formulas": {}}
+        else:
+            # 使用副本: 调用方修改配置不会影响注册中心中其他使用方共享的快照
+            self._config = copy.deepcopy(snapshot.data)
+        
+        # 如果是重新加载（不是首次加载），清除相关缓存
+        if self._config_version is not None:
+            self._metrics_map = None
+            self._keywords = None
+            self._formulas = None
+            self._metric_matcher = None
+            print(f"📂 配置已热更新: {self.config_path}")
+        
+        self._config_version = snapshot.version
         return self._config
     
     def get_metrics_map(self) -> Dict[str, Tuple[str, str]]:
@@ -80,10 +83,10 @@ class MetricsLoader:
         Returns:
             {别名: (表名, 字段名), ...}
         """
+        config = self.load_config()
         if self._metrics_map is not None:
             return self._metrics_map
         
-        config = self.load_config()
         self._metrics_map = {}
         
         # 从配置文件加载常规字段映射
@@ -117,10 +120,10 @@ class MetricsLoader:
         Returns:
             关键词列表
         """
+        config = self.load_config()
         if self._keywords is not None:
             return self._keywords
         
-        config = self.load_config()
         keywords_set = set()
         
         # 从所有别名收集关键词
@@ -162,13 +165,23 @@ class MetricsLoader:
         Returns:
             {公式名: {expression, source_table, unit, ...}, ...}
         """
-        if self._formulas is not None:
-            return self._formulas
-        
         config = self.load_config()
-        self._formulas = config.get('formulas', {})
+        if self._formulas is None:
+            self._formulas = config.get('formulas', {})
         return self._formulas
     
+    def get_metric_matcher(self) -> KeywordAutomaton:
+        """
+        获取指标名称匹配自动机(指标别名 + 公式名,类别 'metric',列表按长度降序)
+        
+        配置热更新时随其他派生缓存一起重建
+        """
+        self.load_config()
+        if self._metric_matcher is None:
+            names = set(self.get_metrics_map()) | set(self.get_formulas())
+            self._metric_matcher = KeywordAutomaton({'metric': sorted(names, key=lambda n: (-len(n), n))})
+        return self._metric_matcher
+    
     def get_unit(self, alias_or_field: str) -> str:
         """
         获取指标单位
@@ -338,12 +351,15 @@ class MetricsLoader:
     
     def reload(self):
         """重新加载配置(清除缓存)"""
+        get_config_registry().refresh(self.config_path)
         self._config = None
+        self._config_version = None
         self._metrics_map = None
         self._keywords = None
         self._formulas = None
         self._db_schema = None
         self._unconfigured_fields = None
+        self._metric_matcher = None
 
 
 # 全局单例
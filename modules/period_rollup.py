@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+按月累计(年初至今)汇总表
+功能:
+1. 为带 period_month 的月度流量表(如 income_statements)维护 period_rollups 汇总表,
+   每个(企业, 年份, 字段, 月份)保存 1 月至该月的累计值
+2. 任意月份范围 m1-m2 的合计 = 累计(m2) - 累计(m1-1),季度 q1-q2 即 (q1-1)*3+1 至 q2*3 月,均为主键查找
+3. 在源表上安装触发器,导入/修改/删除数据时只记录受影响的(企业, 年份)分区,
+   导入后执行 refresh(见 tools/rebuild_period_rollups.py)只重算这些分区(增量刷新)
+4. 源表字段变化、触发器丢失(表被重建)时 refresh 整表重建
+
+查询(range_totals)只读: 汇总表未安装、已过期(字段变化/触发器丢失)或分区待刷新时返回None,
+由调用方回退为对源表求和;建表、触发器和重算只在导入/维护步骤中进行
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from modules.data_version import DataVersionWatcher
+from modules.sqlite_pool import get_connection_pool
+
+# 源表中不参与累计的字段
+KEY_COLUMNS = ('id', 'company_id', 'period_year', 'period_quarter', 'period_month')
+
+# 每个分区中"有数据的月份数"的累计值(用于判断月份范围内是否有数据)
+MONTHS_FIELD = '__months__'
+
+_NUMERIC_TYPES = ('INT', 'REAL', 'NUM', 'DEC', 'FLOA', 'DOUB')
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS period_rollups (
+        source_table TEXT NOT NULL,
+        company_id INTEGER NOT NULL,
+        period_year INTEGER NOT NULL,
+        field TEXT NOT NULL,
+        period_month INTEGER NOT NULL,
+        ytd REAL,
+        PRIMARY KEY (source_table, company_id, period_year, field, period_month)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS period_rollup_dirty (
+        source_table TEXT NOT NULL,
+        company_id INTEGER NOT NULL,
+        period_year INTEGER NOT NULL,
+        PRIMARY KEY (source_table, company_id, period_year)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS period_rollup_state (
+        source_table TEXT PRIMARY KEY,
+        fields TEXT NOT NULL
+    );
+"""
+
+
+class PeriodRollup:
+    """月度累计汇总表(线程安全;查询只读,导入后增量刷新)"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化
+
+        Args:
+            db_path: financial.db 路径
+        """
+        self.db_path = str(db_path)
+        self._watcher = DataVersionWatcher(self.db_path)
+        self._ready: Dict[str, tuple] = {}      # 表 -> (数据版本戳, 已累计字段集合或None)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # 手动控制事务(BEGIN IMMEDIATE ... COMMIT)
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    @staticmethod
+    def _rollup_fields(conn, table: str) -> Optional[List[str]]:
+        """源表中参与累计的数值字段;表不存在或没有 period_month 时返回None"""
+        columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        names = {col[1] for col in columns}
+        if not {'company_id', 'period_year', 'period_month'} <= names:
+            return None
+        return [col[1] for col in columns
+                if col[1] not in KEY_COLUMNS and any(t in (col[2] or '').upper() for t in _NUMERIC_TYPES)]
+
+    @staticmethod
+    def _trigger_names(table: str) -> List[str]:
+        return [f"period_rollup_{table}_{op}" for op in ('ai', 'au', 'ad')]
+
+    def _install(self, conn, table: str, fields: List[str]) -> bool:
+        """
+        确保触发器存在、字段未变化(在事务中调用)
+
+        Returns:
+            是否需要整表重建
+        """
+        existing = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,))}
+        row = conn.execute("SELECT fields FROM period_rollup_state WHERE source_table = ?", (table,)).fetchone()
+        if row is not None and row[0] == ','.join(fields) and set(self._trigger_names(table)) <= existing:
+            return False
+
+        mark = "INSERT OR IGNORE INTO period_rollup_dirty VALUES ('{table}', {row}.company_id, {row}.period_year);"
+        on_insert, on_update, on_delete = self._trigger_names(table)
+        for name in (on_insert, on_update, on_delete):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {on_insert} AFTER INSERT ON {table} BEGIN "
+                     f"{mark.format(table=table, row='NEW')} END")
+        conn.execute(f"CREATE TRIGGER {on_update} AFTER UPDATE ON {table} BEGIN "
+                     f"{mark.format(table=table, row='OLD')} {mark.format(table=table, row='NEW')} END")
+        conn.execute(f"CREATE TRIGGER {on_delete} AFTER DELETE ON {table} BEGIN "
+                     f"{mark.format(table=table, row='OLD')} END")
+        conn.execute("INSERT OR REPLACE INTO period_rollup_state VALUES (?, ?)", (table, ','.join(fields)))
+        return True
+
+    def refresh(self, table: str, full: bool = False) -> int:
+        """
+        安装并刷新某张源表的累计值(只重算有变化的分区;导入/维护步骤调用,会写数据库)
+
+        Args:
+            table: 源表名
+            full: 是否整表重建
+
+        Returns:
+            重算的(企业, 年份)分区数;表不支持时返回-1
+        """
+        if self._watcher.stamp() is None:
+            return -1
+        with self._lock:
+            conn = self._connect()
+            try:
+                fields = self._rollup_fields(conn, table)
+                if not fields:
+                    return -1
+                conn.executescript(_SCHEMA)
+                conn.execute("BEGIN IMMEDIATE")
+                if full:
+                    conn.execute("DELETE FROM period_rollup_state WHERE source_table = ?", (table,))
+                if self._install(conn, table, fields):
+                    conn.execute("DELETE FROM period_rollups WHERE source_table = ?", (table,))
+                    conn.execute(f"""
+                        INSERT OR IGNORE INTO period_rollup_dirty
+                        SELECT DISTINCT ?, company_id, period_year FROM {table}
+                        WHERE company_id IS NOT NULL AND period_year IS NOT NULL
+                    """, (table,))
+                partitions = conn.execute(
+                    "SELECT company_id, period_year FROM period_rollup_dirty WHERE source_table = ?",
+                    (table,)).fetchall()
+                for company_id, year in partitions:
+                    self._rebuild_partition(conn, table, fields, company_id, year)
+                conn.execute("DELETE FROM period_rollup_dirty WHERE source_table = ?", (table,))
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                print(f"⚠️  累计汇总刷新失败 ({table}): {e}")
+                return -1
+            finally:
+                conn.close()
+            if partitions:
+                print(f"📈 累计汇总已刷新: {table} {len(partitions)} 个分区")
+            self._ready.pop(table, None)
+            return len(partitions)
+
+    @staticmethod
+    def _rebuild_partition(conn, table: str, fields: List[str], company_id: int, year: int):
+        """重算一个(企业, 年份)分区的 1-12 月累计值"""
+        conn.execute("DELETE FROM period_rollups WHERE source_table = ? AND company_id = ? AND period_year = ?",
+                     (table, company_id, year))
+        select = ', '.join(f"SUM({field})" for field in fields)
+        rows = conn.execute(f"""
+            SELECT period_month, {select}
+            FROM {table}
+            WHERE company_id = ? AND period_year = ? AND period_month BETWEEN 1 AND 12
+            GROUP BY period_month
+        """, (company_id, year)).fetchall()
+        if not rows:
+            return
+        monthly = {row[0]: row[1:] for row in rows}
+
+        totals: List[Optional[float]] = [None] * len(fields)
+        months = 0
+        records = []
+        for month in range(1, 13):
+            values = monthly.get(month)
+            if values is not None:
+                months += 1
+                for i, value in enumerate(values):
+                    if value is not None:
+                        totals[i] = value if totals[i] is None else totals[i] + value
+            records.append((table, company_id, year, MONTHS_FIELD, month, months))
+            records.extend((table, company_id, year, field, month, totals[i]) for i, field in enumerate(fields))
+        conn.executemany("INSERT INTO period_rollups VALUES (?, ?, ?, ?, ?, ?)", records)
+
+    def _ready_fields(self, conn, table: str) -> Optional[Set[str]]:
+        """
+        汇总表可用时返回已累计的字段(只读检查,按数据版本缓存)
+
+        未安装、源表字段已变化或触发器丢失(表被重建)时返回None
+        """
+        stamp = self._watcher.stamp()
+        with self._lock:
+            cached = self._ready.get(table)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            fields = None
+            try:
+                row = conn.execute("SELECT fields FROM period_rollup_state WHERE source_table = ?",
+                                   (table,)).fetchone()
+                triggers = {r[0] for r in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,))}
+                current = self._rollup_fields(conn, table)
+                if row is not None and current and row[0] == ','.join(current) \
+                        and set(self._trigger_names(table)) <= triggers:
+                    fields = set(current)
+            except sqlite3.OperationalError:
+                pass                                # 汇总表尚未安装
+            self._ready[table] = (stamp, fields)
+            return fields
+
+    def range_totals(self, table: str, fields: Iterable[str], company_id: int, year: int,
+                     start_month: int, end_month: int) -> Optional[Dict[str, Optional[float]]]:
+        """
+        月份范围合计(累计值之差,只读)
+
+        Returns:
+            {字段: 合计};汇总表不可用、分区待刷新或该范围内没有月度数据时返回None
+        """
+        if not 1 <= start_month <= end_month <= 12 or self._watcher.stamp() is None:
+            return None
+        fields = list(fields)
+        names = fields + [MONTHS_FIELD]
+        conn = get_connection_pool(self.db_path).get()
+        ready = self._ready_fields(conn, table)
+        if ready is None or not ready.issuperset(fields):
+            return None
+        if conn.execute("SELECT 1 FROM period_rollup_dirty WHERE source_table = ? AND company_id = ? "
+                        "AND period_year = ?", (table, company_id, year)).fetchone():
+            return None
+        rows = conn.execute(f"""
+            SELECT field, period_month, ytd FROM period_rollups
+            WHERE source_table = ? AND company_id = ? AND period_year = ?
+            AND field IN ({','.join('?' * len(names))}) AND period_month IN (?, ?)
+        """, [table, company_id, year] + names + [start_month - 1, end_month]).fetchall()
+
+        ytd = {(field, month): value for field, month, value in rows}
+        if not (ytd.get((MONTHS_FIELD, end_month)) or 0) - (ytd.get((MONTHS_FIELD, start_month - 1)) or 0):
+            return None
+        totals = {}
+        for field in fields:
+            end = ytd.get((field, end_month))
+            totals[field] = None if end is None else end - (ytd.get((field, start_month - 1)) or 0)
+        return totals
+
+    def range_total(self, table: str, field: str, company_id: int, year: int,
+                    start_month: int, end_month: int) -> Optional[float]:
+        """单个字段的月份范围合计"""
+        totals = self.range_totals(table, [field], company_id, year, start_month, end_month)
+        return None if totals is None else totals[field]
+
+
+# 全局实例(按数据库路径共享)
+_rollup_instances: Dict[str, PeriodRollup] = {}
+_rollup_lock = threading.Lock()
+
+
+def get_period_rollup(db_path: str) -> PeriodRollup:
+    """获取指定数据库的全局累计汇总实例"""
+    key = str(Path(db_path).resolve())
+    with _rollup_lock:
+        if key not in _rollup_instances:
+            _rollup_instances[key] = PeriodRollup(key)
+        return _rollup_instances[key]
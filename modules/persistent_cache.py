@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基于SQLite的持久化缓存
+功能:
+1. 跨进程/重启保留的键值缓存(值以JSON存储)
+2. LRU淘汰(按最近访问时间) + TTL过期;可为条目设置保留优先级,优先级高的最后淘汰
+3. 按命名空间隔离,按标签(如配置指纹)批量失效
+4. 命中/未命中及读取耗时统计
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+# 默认缓存数据库路径(与 tax_incentives.db 同目录)
+DEFAULT_CACHE_DB = Path(__file__).parent.parent / "database" / "tax_llm_cache.db"
+
+
+class PersistentCache:
+    """SQLite持久化缓存(线程安全)"""
+
+    def __init__(self, db_path: Optional[str] = None, namespace: str = "default",
+                 max_entries: int = 5000, ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        """
+        初始化
+
+        Args:
+            db_path: 缓存数据库路径(默认 database/tax_llm_cache.db)
+            namespace: 命名空间(不同用途的缓存互不影响)
+            max_entries: 命名空间内最大条目数,超出按LRU淘汰
+            ttl_seconds: 过期时间(秒),None表示不过期
+        """
+        self.db_path = str(db_path or DEFAULT_CACHE_DB)
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._lookup_seconds = 0.0
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取数据库连接"""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        """创建缓存表"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key_hash TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    tag TEXT,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (namespace, key_hash)
+                )
+            """)
+            # 旧版本缓存库没有 priority 列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")}
+            if 'priority' not in columns:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed
+                ON cache_entries(namespace, accessed_at)
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """由多个组成部分生成缓存键(SHA-256)"""
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键(建议用 make_key 生成)
+
+        Returns:
+            (是否命中, 缓存值);值本身可以是None
+        """
+        now = time.time()
+        started = time.perf_counter()
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key_hash = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is None:
+                    self._misses += 1
+                    return False, None
+                if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key_hash = ?",
+                                 (self.namespace, key))
+                    conn.commit()
+                    self._misses += 1
+                    return False, None
+                conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key_hash = ?",
+                             (now, self.namespace, key))
+                conn.commit()
+                self._hits += 1
+                return True, json.loads(row[0])
+            finally:
+                conn.close()
+                self._lookup_seconds += time.perf_counter() - started
+
+    def set(self, key: str, value: Any, tag: Optional[str] = None, priority: int = 0):
+        """
+        写入缓存(超出容量时先淘汰优先级低的,同优先级按LRU淘汰)
+
+        Args:
+            key: 缓存键
+            value: 可JSON序列化的值
+            tag: 标签(用于 retain_tag 批量失效)
+            priority: 保留优先级(默认0)
+        """
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("""
+                    INSERT OR REPLACE INTO cache_entries
+                        (namespace, key_hash, value, tag, created_at, accessed_at, priority)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (self.namespace, key, payload, tag, now, now, priority))
+                conn.execute("""
+                    DELETE FROM cache_entries
+                    WHERE namespace = ? AND key_hash IN (
+                        SELECT key_hash FROM cache_entries WHERE namespace = ?
+                        ORDER BY priority DESC, accessed_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.namespace, self.namespace, self.max_entries))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def set_priority(self, key: str, priority: int) -> bool:
+        """
+        修改已有条目的保留优先级
+
+        Returns:
+            条目是否存在
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.execute(
+                    "UPDATE cache_entries SET priority = ? WHERE namespace = ? AND key_hash = ?",
+                    (priority, self.namespace, key)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+            finally:
+                conn.close()
+
+    def delete(self, key: str) -> bool:
+        """
+        删除条目
+
+        Returns:
+            条目是否存在
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key_hash = ?",
+                                      (self.namespace, key))
+                conn.commit()
+                return cursor.rowcount > 0
+            finally:
+                conn.close()
+
+    def retain_tag(self, tag: Optional[str]) -> int:
+        """
+        删除标签不等于 tag 的条目(如配置变更后清除旧配置下的缓存)
+
+        Returns:
+            删除的条目数
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND tag IS NOT ?",
+                    (self.namespace, tag)
+                )
+                conn.commit()
+                return cursor.rowcount
+            finally:
+                conn.close()
+
+    def clear(self):
+        """清空本命名空间的缓存并重置统计"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+                conn.commit()
+            finally:
+                conn.close()
+            self._hits = 0
+            self._misses = 0
+            self._lookup_seconds = 0.0
+
+    def stats(self) -> Dict:
+        """
+        获取缓存统计
+
+        Returns:
+            {namespace, entries, hits, misses, hit_rate, avg_lookup_ms}
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                entries = conn.execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?",
+                                       (self.namespace,)).fetchone()[0]
+            finally:
+                conn.close()
+            total = self._hits + self._misses
+            return {
+                "namespace": self.namespace,
+                "entries": entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+                "avg_lookup_ms": round(self._lookup_seconds * 1000 / total, 3) if total else 0.0
+            }
+
+
+# 全局实例(按 数据库路径+命名空间 共享)
+_cache_instances: Dict[tuple, PersistentCache] = {}
+_cache_lock = threading.Lock()
+
+
+def get_persistent_cache(namespace: str, db_path: Optional[str] = None, **kwargs) -> PersistentCache:
+    """
+    获取全局缓存实例
+
+    Args:
+        namespace: 命名空间
+        db_path: 缓存数据库路径(默认 database/tax_llm_cache.db)
+        **kwargs: 首次创建时传给 PersistentCache 的参数(max_entries, ttl_seconds)
+    """
+    key = (str(Path(db_path or DEFAULT_CACHE_DB).resolve()), namespace)
+    with _cache_lock:
+        if key not in _cache_instances:
+            _cache_instances[key] = PersistentCache(key[0], namespace, **kwargs)
+        return _cache_instances[key]
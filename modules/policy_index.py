@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+税收优惠政策 n-gram 倒排索引
+功能:
+1. 对 tax_incentives 文本字段建立字符级 unigram/bigram 倒排索引
+2. 以与 SQL `LIKE '%关键词%'` 完全一致的语义返回匹配的政策ID
+3. 数据库变更(data_version/文件变化)后自动重建
+
+LIKE语义说明:
+- 仅对ASCII字母大小写不敏感(与SQLite内置LIKE一致)
+- NULL字段不匹配
+- 关键词含 % 或 _ 通配符时无法用索引回答,由调用方回退到SQL
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from modules.data_version import DataVersionWatcher
+
+
+# 建立索引的字段(覆盖所有检索策略用到的字段)
+INDEXED_COLUMNS = (
+    'tax_type', 'incentive_items', 'qualification', 'incentive_method',
+    'detailed_rules', 'legal_basis', 'keywords', 'explanation'
+)
+
+# SQLite LIKE 只折叠ASCII大小写
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def fold_like(text: str) -> str:
+    """按SQLite LIKE规则折叠大小写(仅ASCII)"""
+    return text.translate(_ASCII_LOWER)
+
+
+def is_like_safe(term: str) -> bool:
+    """关键词是否不含LIKE通配符(可由索引精确回答)"""
+    return '%' not in term and '_' not in term
+
+
+class PolicyNgramIndex:
+    """政策文本 n-gram 倒排索引"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化
+
+        Args:
+            db_path: tax_incentives.db 路径
+        """
+        self.db_path = str(db_path)
+        self._watcher = DataVersionWatcher(self.db_path)
+        self._stamp = None
+        self._lock = threading.RLock()
+
+        # gram -> 包含该gram(任一索引字段)的政策ID集合
+        self._postings: Dict[str, Set[int]] = {}
+        # 字段 -> {政策ID: 折叠后的文本},用于候选验证
+        self._texts: Dict[str, Dict[int, str]] = {}
+        # 政策ID -> 税种(原值,用于等值过滤)
+        self._tax_types: Dict[int, str] = {}
+
+    # ------------------------------------------------------------------
+    # 构建与刷新
+    # ------------------------------------------------------------------
+
+    def ensure_fresh(self) -> bool:
+        """
+        检查数据库版本,变化时重建索引
+
+        Returns:
+            索引是否可用
+        """
+        stamp = self._watcher.stamp()
+        if stamp is None:
+            return False
+        with self._lock:
+            if stamp != self._stamp:
+                self.build()
+                self._stamp = stamp
+        return True
+
+    def build(self):
+        """从数据库全量构建索引"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, {', '.join(INDEXED_COLUMNS)} FROM tax_incentives")
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        self.build_from_rows(rows)
+        print(f"🗂️  政策n-gram索引已构建: {len(rows)} 条政策, {len(self._postings)} 个gram")
+
+    def build_from_rows(self, rows: Iterable[tuple]):
+        """
+        从 (id, *INDEXED_COLUMNS) 行构建索引
+
+        新结构构建完成后整体替换,查询方不会看到半成品
+        """
+        postings: Dict[str, Set[int]] = {}
+        texts: Dict[str, Dict[int, str]] = {col: {} for col in INDEXED_COLUMNS}
+        tax_types: Dict[int, str] = {}
+
+        for row in rows:
+            policy_id = row[0]
+            grams = set()
+            for col, value in zip(INDEXED_COLUMNS, row[1:]):
+                if value is None:
+                    continue
+                text = fold_like(str(value))
+                texts[col][policy_id] = text
+                grams.update(text)
+                grams.update(text[i:i + 2] for i in range(len(text) - 1))
+            tax_types[policy_id] = row[1]
+            for gram in grams:
+                postings.setdefault(gram, set()).add(policy_id)
+
+        with self._lock:
+            self._postings = postings
+            self._texts = texts
+            self._tax_types = tax_types
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def _candidates(self, term: str) -> Set[int]:
+        """由gram倒排表求候选集(可能包含假阳性,需验证)"""
+        if not term:
+            return set(self._tax_types)
+        if len(term) == 1:
+            return set(self._postings.get(term, ()))
+
+        grams = {term[i:i + 2] for i in range(len(term) - 1)}
+        posting_lists = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if not posting:
+                return set()
+            posting_lists.append(posting)
+        posting_lists.sort(key=len)
+
+        result = set(posting_lists[0])
+        for posting in posting_lists[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    def match_ids(self, terms: List[str], columns: Iterable[str],
+                  tax_type: Optional[str] = None) -> Optional[Set[int]]:
+        """
+        等价于 `[tax_type = ? AND] (col1 LIKE '%t%' OR col2 LIKE '%t%' ...) OR ...`
+
+        Args:
+            terms: 关键词列表(多个关键词之间为OR)
+            columns: 参与匹配的字段
+            tax_type: 税种精确过滤(可选)
+
+        Returns:
+            匹配的政策ID集合;关键词含通配符时返回None(需回退SQL)
+        """
+        if any(not is_like_safe(term) for term in terms):
+            return None
+
+        columns = tuple(columns)
+        matched: Set[int] = set()
+        with self._lock:
+            texts = [self._texts[col] for col in columns]
+            for term in terms:
+                folded = fold_like(term)
+                for policy_id in self._candidates(folded):
+                    if policy_id in matched:
+                        continue
+                    if tax_type is not None and self._tax_types.get(policy_id) != tax_type:
+                        continue
+                    for col_texts in texts:
+                        text = col_texts.get(policy_id)
+                        if text is not None and folded in text:
+                            matched.add(policy_id)
+                            break
+        return matched
+
+    def tax_type_of(self, policy_id: int) -> Optional[str]:
+        """获取政策税种"""
+        return self._tax_types.get(policy_id)
+
+
+# 全局实例(按数据库路径共享)
+_index_instances: Dict[str, PolicyNgramIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_policy_index(db_path: str) -> PolicyNgramIndex:
+    """获取指定数据库的全局索引实例"""
+    key = str(Path(db_path).resolve())
+    with _index_lock:
+        if key not in _index_instances:
+            _index_instances[key] = PolicyNgramIndex(key)
+        return _index_instances[key]
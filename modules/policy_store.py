@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+税收优惠政策常驻内存存储
+功能:
+1. 将 tax_incentives 全表一次性载入内存,按列存储(税种/优惠方式字符串驻留并编码,ID用紧凑数组)
+2. 按ID取回记录、按税种/优惠方式过滤、统计信息均直接由内存回答,不再建立SQLite连接
+3. 数据库变更(data_version/文件变化)后自动重新载入
+
+新快照构建完成后整体替换,并发查询只会看到完整的旧快照或新快照
+"""
+
+import sqlite3
+import sys
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from modules.data_version import DataVersionWatcher
+from modules.policy_index import fold_like
+
+
+class PolicySnapshot:
+    """tax_incentives 某一数据版本的列式快照(只读)"""
+
+    def __init__(self, columns: Iterable[str], rows: Iterable[tuple]):
+        """
+        按列构建快照
+
+        Args:
+            columns: 字段名(需包含 id、tax_type、incentive_method)
+            rows: 按 columns 顺序的行
+        """
+        self.columns = tuple(columns)
+        id_pos = self.columns.index('id')
+        tax_pos = self.columns.index('tax_type')
+        method_pos = self.columns.index('incentive_method')
+
+        self.ids = array('q')
+        self.values: Dict[str, list] = {col: [] for col in self.columns}
+        # 税种、优惠方式取值很少: 字典编码,行内只存编号
+        self.tax_type_names: List[Optional[str]] = []
+        self.tax_type_codes = array('H')
+        self.method_names: List[Optional[str]] = []
+        self.method_codes = array('H')
+        self._positions: Dict[int, int] = {}
+
+        tax_lookup: Dict[Optional[str], int] = {}
+        method_lookup: Dict[Optional[str], int] = {}
+        for row in sorted(rows, key=lambda r: r[id_pos]):
+            row = list(row)
+            for pos in (tax_pos, method_pos):
+                if isinstance(row[pos], str):
+                    row[pos] = sys.intern(row[pos])
+            self._positions[row[id_pos]] = len(self.ids)
+            self.ids.append(row[id_pos])
+            for col, value in zip(self.columns, row):
+                self.values[col].append(value)
+            self.tax_type_codes.append(self._encode(row[tax_pos], tax_lookup, self.tax_type_names))
+            self.method_codes.append(self._encode(row[method_pos], method_lookup, self.method_names))
+
+        self._tax_lookup = tax_lookup
+
+    @staticmethod
+    def _encode(value, lookup: Dict, names: List) -> int:
+        """字典编码"""
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(names)
+            names.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _row(self, pos: int) -> Dict:
+        """按位置物化一行(返回新字典,调用方可随意修改)"""
+        return {col: self.values[col][pos] for col in self.columns}
+
+    def get(self, policy_id: int) -> Optional[Dict]:
+        """按ID获取记录"""
+        pos = self._positions.get(policy_id)
+        return None if pos is None else self._row(pos)
+
+    def rows(self, ids: Iterable[int]) -> List[Dict]:
+        """按ID列表取回记录(保持顺序,忽略不存在的ID)"""
+        positions = self._positions
+        return [self._row(positions[i]) for i in ids if i in positions]
+
+    def tax_type_of(self, policy_id: int) -> Optional[str]:
+        """获取政策税种"""
+        pos = self._positions.get(policy_id)
+        return None if pos is None else self.tax_type_names[self.tax_type_codes[pos]]
+
+    def ids_by_tax_type(self, tax_type: str) -> List[int]:
+        """等价于 `WHERE tax_type = ? ORDER BY id`"""
+        code = self._tax_lookup.get(tax_type)
+        if code is None:
+            return []
+        return [self.ids[pos] for pos, c in enumerate(self.tax_type_codes) if c == code]
+
+    def ids_by_method_like(self, term: str) -> List[int]:
+        """
+        等价于 `WHERE incentive_method LIKE '%term%' ORDER BY id`(term不含通配符)
+
+        按不同取值判断一次,再展开到行
+        """
+        folded = fold_like(term)
+        matched = {code for code, name in enumerate(self.method_names)
+                   if name is not None and folded in fold_like(str(name))}
+        return [self.ids[pos] for pos, c in enumerate(self.method_codes) if c in matched]
+
+    def statistics(self) -> Dict:
+        """与 TaxIncentiveQuery.get_statistics 的SQL统计结果一致"""
+        by_tax = Counter(self.tax_type_codes)
+        by_method = Counter(c for c in self.method_codes if self.method_names[c] is not None)
+        return {
+            'total_count': len(self.ids),
+            'by_tax_type': {self.tax_type_names[c]: n for c, n in by_tax.most_common()},
+            'by_incentive_method': {self.method_names[c]: n for c, n in by_method.most_common(10)}
+        }
+
+
+class PolicyStore:
+    """tax_incentives 常驻内存存储(数据版本变化时自动重新载入)"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化
+
+        Args:
+            db_path: tax_incentives.db 路径
+        """
+        self.db_path = str(db_path)
+        self._watcher = DataVersionWatcher(self.db_path)
+        self._stamp = None
+        self._snapshot: Optional[PolicySnapshot] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Optional[PolicySnapshot]:
+        """
+        获取当前数据版本的快照,数据库变化时重新载入
+
+        Returns:
+            快照;数据库文件不存在时返回None
+        """
+        stamp = self._watcher.stamp()
+        if stamp is None:
+            return None
+        with self._lock:
+            if stamp != self._stamp or self._snapshot is None:
+                self._snapshot = self.load()
+                self._stamp = stamp
+            return self._snapshot
+
+    def load(self) -> PolicySnapshot:
+        """从数据库全量载入"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM tax_incentives")
+            columns = [d[0] for d in cursor.description]
+            snapshot = PolicySnapshot(columns, cursor.fetchall())
+        finally:
+            conn.close()
+        print(f"🗄️  政策常驻存储已载入: {len(snapshot)} 条政策")
+        return snapshot
+
+
+# 全局实例(按数据库路径共享)
+_store_instances: Dict[str, PolicyStore] = {}
+_store_lock = threading.Lock()
+
+
+def get_policy_store(db_path: str) -> PolicyStore:
+    """获取指定数据库的全局常驻存储实例"""
+    key = str(Path(db_path).resolve())
+    with _store_lock:
+        if key not in _store_instances:
+            _store_instances[key] = PolicyStore(key)
+        return _store_instances[key]
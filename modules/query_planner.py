@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+配置指标批量查询计划
+功能:
+1. 将一次问题中的多个配置指标按(数据表, 是否聚合)分组
+2. 每组生成一条 SELECT,一次取出该组全部字段/公式表达式在整个时间范围内的值
+3. 查询结果按指标拆回逐指标结果,与逐个指标单独查询的结果完全一致
+4. 公式指标先取 financial_metrics 预计算字段,预计算为空的再按公式所在表批量计算
+5. 企业/年份/季度/月份全部以参数绑定,语句文本只随表和字段组合变化
+
+item_query(键值表)和 income_statements 月份范围汇总仍按指标单独查询
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from modules.sqlite_pool import in_list
+
+
+def period_filter(company_id: int, time_range: Dict, with_month: bool = True,
+                  company_field: str = 'company_id', year_field: str = 'period_year',
+                  quarter_field: Optional[str] = 'period_quarter') -> Tuple[List[str], List]:
+    """
+    企业与时间段过滤条件(参数化)
+
+    条件只区分"有无年份/季度/月份",年份、季度列表整体作为一个参数传入(见 sqlite_pool.in_list),
+    因此不同问题只会产生少量固定的语句形态,可复用连接上已编译的语句
+
+    Args:
+        company_id: 企业ID
+        time_range: extract_time_range 的结果
+        with_month: 未指定季度时是否按 period_month 过滤(公式计算、item_query 不按月份过滤)
+        company_field/year_field/quarter_field: 字段名(item_query 使用配置中的字段名;
+            quarter_field 为None时不按季度过滤)
+
+    Returns:
+        (条件列表, 参数列表)
+    """
+    conditions = [f"{company_field} = ?"]
+    params: List = [int(company_id)]
+    if time_range.get('query_all_periods', False):
+        # 全期查询时不添加年份/季度条件
+        return conditions, params
+
+    years = time_range.get('years', [time_range.get('year')])
+    years = [y for y in years if y is not None]
+    if years:
+        condition, values = in_list(year_field, years)
+        conditions.append(condition)
+        params.extend(values)
+
+    if not quarter_field:
+        return conditions, params
+    quarters = time_range.get('quarters', [time_range.get('quarter')] if time_range.get('quarter') else None)
+    if quarters and quarters[0]:
+        condition, values = in_list(quarter_field, quarters)
+        conditions.append(condition)
+        params.extend(values)
+    elif with_month and 'month' in time_range:
+        conditions.append("period_month = ?")
+        params.append(int(time_range['month']))
+    return conditions, params
+
+
+def is_month_range(time_range: Dict) -> bool:
+    """是否为月份范围查询(未指定季度/单月时的 start_month-end_month)"""
+    if time_range.get('query_all_periods', False):
+        return False
+    quarters = time_range.get('quarters', [time_range.get('quarter')] if time_range.get('quarter') else None)
+    if quarters and quarters[0]:
+        return False
+    return 'month' not in time_range and 'start_month' in time_range and 'end_month' in time_range
+
+
+class BatchQuery:
+    """同一数据表、同一聚合方式的一次查询"""
+
+    def __init__(self, table: str, aggregate: bool):
+        self.table = table
+        self.aggregate = aggregate
+        self.columns: Dict[str, str] = {}              # 表达式 -> 列别名(相同表达式只查一次)
+        self.targets: List[Tuple[str, str, str]] = []  # (指标名, 列别名, 单位)
+
+    def add(self, metric_name: str, expression: str, unit: str):
+        """加入一个指标"""
+        alias = self.columns.get(expression)
+        if alias is None:
+            alias = f"c{len(self.columns)}"
+            self.columns[expression] = alias
+        self.targets.append((metric_name, alias, unit))
+
+    def split(self) -> List['BatchQuery']:
+        """拆成每个指标一条查询(批量查询出错时使用)"""
+        expressions = {alias: expr for expr, alias in self.columns.items()}
+        singles = []
+        for metric_name, alias, unit in self.targets:
+            single = BatchQuery(self.table, self.aggregate)
+            single.add(metric_name, expressions[alias], unit)
+            singles.append(single)
+        return singles
+
+    def sql(self, where_clause: str) -> str:
+        """生成查询语句"""
+        if self.aggregate:
+            select = ', '.join(f"SUM({expr}) AS {alias}" for expr, alias in self.columns.items())
+            return f"""
+                SELECT period_year, period_quarter, {select}
+                FROM {self.table}
+                WHERE {where_clause}
+                GROUP BY period_year, period_quarter
+                ORDER BY period_year, period_quarter
+            """
+        select = ', '.join(f"{expr} AS {alias}" for expr, alias in self.columns.items())
+        return f"""
+            SELECT period_year, period_quarter, {select}
+            FROM {self.table}
+            WHERE {where_clause}
+            ORDER BY period_year, period_quarter
+        """
+
+    def fan_out(self, rows) -> Dict[str, List[Dict]]:
+        """将查询结果拆回各指标的结果列表 {指标名: [...]}"""
+        results: Dict[str, List[Dict]] = {}
+        for metric_name, alias, unit in self.targets:
+            results[metric_name] = [{
+                'metric_name': metric_name,
+                'year': row['period_year'],
+                'quarter': row['period_quarter'],
+                'value': row[alias],
+                'unit': unit
+            } for row in rows]
+        return results
+
+
+class QueryPlan:
+    """一次问题的查询计划"""
+
+    def __init__(self):
+        self.batches: List[BatchQuery] = []       # 第一阶段: 原表字段及预计算字段
+        self.formulas: Dict[str, Dict] = {}       # 公式指标 -> 公式配置(预计算为空时第二阶段计算)
+        self.singles: List[str] = []              # 单独查询的指标(item_query、月份范围汇总)
+        self._index: Dict[Tuple[str, bool], BatchQuery] = {}
+
+    def batch(self, table: str, aggregate: bool) -> BatchQuery:
+        """获取(或新建)某表某聚合方式的批次"""
+        key = (table, aggregate)
+        if key not in self._index:
+            self._index[key] = BatchQuery(table, aggregate)
+            self.batches.append(self._index[key])
+        return self._index[key]
+
+
+class QueryPlanner:
+    """根据指标配置生成批量查询计划"""
+
+    def __init__(self, metrics_map: Dict[str, Tuple[str, str]], formulas: Dict,
+                 aggregation_tables: List[str], unit_of: Callable[[str], str]):
+        """
+        初始化
+
+        Args:
+            metrics_map: {指标名: (表名, 字段名)},item_query 的表名以 __item_query__ 开头
+            formulas: {指标名: 公式配置}
+            aggregation_tables: 需要按期间求和的流量型数据表
+            unit_of: 指标名 -> 默认单位
+        """
+        self.metrics_map = metrics_map
+        self.formulas = formulas
+        self.aggregation_tables = set(aggregation_tables)
+        self.unit_of = unit_of
+
+    def plan(self, metrics: List[str], time_range: Dict) -> QueryPlan:
+        """生成第一阶段计划(原表字段、预计算字段)"""
+        plan = QueryPlan()
+        month_range = is_month_range(time_range)
+        for metric_name in metrics:
+            if metric_name in self.metrics_map:
+                table, field = self.metrics_map[metric_name]
+                if table.startswith('__item_query__') or (month_range and table == 'income_statements'):
+                    plan.singles.append(metric_name)
+                else:
+                    plan.batch(table, table in self.aggregation_tables).add(
+                        metric_name, field, self.unit_of(metric_name))
+            elif metric_name in self.formulas:
+                formula_info = self.formulas[metric_name]
+                plan.formulas[metric_name] = formula_info
+                precomputed_field = formula_info.get('precomputed') or formula_info.get('result_field')
+                if precomputed_field:
+                    plan.batch('financial_metrics', 'financial_metrics' in self.aggregation_tables).add(
+                        metric_name, precomputed_field, self.unit_of(metric_name))
+        return plan
+
+    def formula_plan(self, formulas: Dict[str, Dict]) -> QueryPlan:
+        """生成第二阶段计划(按公式所在表批量计算,不聚合)"""
+        plan = QueryPlan()
+        for metric_name, formula_info in formulas.items():
+            expression = formula_info.get('expression') or formula_info.get('formula')
+            table = formula_info.get('source_table') or formula_info.get('table')
+            if not expression or not table:
+                continue
+            plan.batch(table, False).add(metric_name, expression,
+                                         formula_info.get('unit', self.unit_of(metric_name)))
+        return plan
+
+
+def has_value(rows: Optional[List[Dict]]) -> bool:
+    """结果中是否有非NULL值"""
+    return bool(rows) and any(r['value'] is not None for r in rows)
@@ -10,11 +10,14 @@
 """
 
 import sqlite3
-import json
-import os
 from typing import Dict, List, Optional, Set
 from pathlib import Path
 
+try:
+    from modules.config_registry import get_config_registry
+except ModuleNotFoundError:
+    from config_registry import get_config_registry
+
 
 class SchemaProvider:
     """数据库Schema提供者 - 为Text-to-SQL生成Schema描述"""
@@ -35,6 +38,7 @@ class SchemaProvider:
         # 缓存
         self._schema_cache = None
         self._glossary_cache = None
+        self._glossary_versions = None  # 术语缓存对应的配置快照版本
         self._value_distributions_cache = None
         
         # 需要发现值分布的字段(分类字段)
@@ -46,7 +50,8 @@ class SchemaProvider:
         
         # 排除的表
         self.excluded_tables = {
-            'sqlite_sequence', 'users', 'companies', 'company_aliases'
+            'sqlite_sequence', 'users', 'companies', 'company_aliases',
+            'period_rollups', 'period_rollup_dirty', 'period_rollup_state'
         }
         
         # 排除的字段
@@ -139,10 +144,13 @@ class SchemaProvider:
         
         return self._value_distributions_cache
     
-    def get_schema_description(self) -> str:
+    def get_schema_description(self, selection: Optional[Dict[str, Optional[Set[str]]]] = None) -> str:
         """
         生成LLM可读的Schema描述
         
+        Args:
+            selection: 只描述部分表/字段 {表名: 字段集合或None(整张表)}(见 SchemaRetriever),None为全部
+        
         Returns:
             Markdown格式的Schema描述
         """
@@ -152,14 +160,19 @@ class SchemaProvider:
         lines = []
         
         for table, columns in sorted(schema.items()):
+            if selection is not None and table not in selection:
+                continue
+            selected = selection.get(table) if selection is not None else None
+            
             # 获取表描述(从config)
             table_desc = self._get_table_description(table)
             lines.append(f"### {table}")
             if table_desc:
                 lines.append(f"> {table_desc}")
             
-            # 字段列表
-            data_columns = [c for c in columns if not c['is_excluded'] and not c['is_period']]
+            # 字段列表(时间字段总是保留)
+            data_columns = [c for c in columns if not c['is_excluded'] and not c['is_period']
+                            and (selected is None or c['name'] in selected)]
             period_columns = [c for c in columns if c['is_period']]
             
             if data_columns:
@@ -170,7 +183,8 @@ class SchemaProvider:
             # 值分布
             if table in value_distributions:
                 for col, values in value_distributions[table].items():
-                    lines.append(f"{col}可选值: {values}")
+                    if selected is None or col in selected:
+                        lines.append(f"{col}可选值: {values}")
             
             lines.append("")
         
@@ -179,8 +193,7 @@ class SchemaProvider:
     def _get_table_description(self, table_name: str) -> str:
         """获取表描述"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            config = get_config_registry().get(self.config_path).data or {}
             tables_config = config.get('tables', {})
             if table_name in tables_config:
                 return tables_config[table_name].get('description', '')
@@ -195,15 +208,19 @@ class SchemaProvider:
         Returns:
             {中文术语: SQL条件或表.字段, ...}
         """
-        if self._glossary_cache is not None:
+        registry = get_config_registry()
+        config_snapshot = registry.get(self.config_path)
+        glossary_snapshot = registry.get(self.glossary_path)
+        versions = (config_snapshot.version, glossary_snapshot.version)
+        if self._glossary_cache is not None and self._glossary_versions == versions:
             return self._glossary_cache
         
         self._glossary_cache = {}
+        self._glossary_versions = versions
         
         # 1. 从metrics_config加载别名映射
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            config = config_snapshot.data or {}
             
             for table_name, table_config in config.get('tables', {}).items():
                 for field_name, field_config in table_config.get('fields', {}).items():
@@ -244,10 +261,8 @@ class SchemaProvider:
         
         # 3. 加载手动补充
         try:
-            if os.path.exists(self.glossary_path):
-                with open(self.glossary_path, 'r', encoding='utf-8') as f:
-                    manual_glossary = json.load(f)
-                
+            manual_glossary = glossary_snapshot.data
+            if manual_glossary is not None:
                 # 语义映射
                 for term, sql in manual_glossary.get('semantic_mappings', {}).items():
                     self._glossary_cache[term] = sql
@@ -276,9 +291,8 @@ class SchemaProvider:
         
         # 先加载手动配置的语义映射
         try:
-            if os.path.exists(self.glossary_path):
-                with open(self.glossary_path, 'r', encoding='utf-8') as f:
-                    manual = json.load(f)
+            manual = get_config_registry().get(self.glossary_path).data
+            if manual is not None:
                 for term, sql in manual.get('semantic_mappings', {}).items():
                     lines.append(f"- {term}: {sql}")
         except:
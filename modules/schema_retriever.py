@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Text-to-SQL 相关Schema检索
+功能:
+1. 由业务术语(SchemaProvider.generate_glossary: 字段别名、item_query、语义映射)、公式指标、
+   schema_mappings.json 的表/枚举值同义词编译一个多模式自动机
+2. 一次扫描问题,选出相关的表及字段(命中表同义词时取整张表),只把这部分Schema放进Prompt
+3. 问题没有任何命中时返回None,调用方使用完整Schema
+
+术语/映射配置或Schema变化时整体重建自动机
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from modules.config_registry import get_config_registry
+    from modules.keyword_matcher import KeywordAutomaton
+except ModuleNotFoundError:
+    from config_registry import get_config_registry
+    from keyword_matcher import KeywordAutomaton
+
+# 表 -> 相关字段集合;字段集合为None表示整张表
+SchemaSelection = Dict[str, Optional[Set[str]]]
+
+_IDENTIFIER = re.compile(r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)?')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数(中文约0.6/字,其他字符约0.3/字),用于记录Prompt规模"""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3 + 0.5)
+
+
+class SchemaRetriever:
+    """按问题选择相关的表和字段"""
+
+    def __init__(self, provider, mapping_path: Optional[str] = None):
+        """
+        初始化
+
+        Args:
+            provider: SchemaProvider 实例(提供Schema、术语表和指标配置路径)
+            mapping_path: schema_mappings.json 路径
+        """
+        self.provider = provider
+        self.mapping_path = mapping_path or str(Path(__file__).parent.parent / 'config' / 'schema_mappings.json')
+        self._key = None
+        self._automaton: Optional[KeywordAutomaton] = None
+        self._terms: List[str] = []
+        self._targets: List[List[Tuple[str, Optional[str]]]] = []
+
+    def _targets_of(self, text: str, schema: Dict[str, Set[str]]) -> List[Tuple[str, Optional[str]]]:
+        """从术语对应的SQL片段中解析出 (表, 字段)(`表.字段` 或 仅字段名)"""
+        targets = []
+        for token in _IDENTIFIER.findall(text):
+            if '.' in token:
+                table, column = token.split('.', 1)
+                if column in schema.get(table, ()):
+                    targets.append((table, column))
+            else:
+                targets.extend((table, token) for table, columns in schema.items() if token in columns)
+        return targets
+
+    def _rebuild(self, glossary: Dict[str, str], schema: Dict[str, Set[str]], config: Dict, mappings: Dict):
+        """重建术语 -> (表, 字段) 索引和自动机"""
+        index: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+
+        def add(term, targets):
+            if term and targets:
+                index.setdefault(term, []).extend(targets)
+
+        for term, target in glossary.items():
+            if not term.endswith('可选值'):
+                add(term, self._targets_of(str(target), schema))
+
+        # 公式指标: 公式中引用的来源表字段及预计算字段
+        for name, formula in config.get('formulas', {}).items():
+            if name.startswith('_') or not isinstance(formula, dict):
+                continue
+            table = formula.get('source_table') or formula.get('table')
+            expression = formula.get('expression') or formula.get('formula') or ''
+            targets = [(table, token) for token in _IDENTIFIER.findall(expression)
+                       if token in schema.get(table, ())]
+            result_field = formula.get('result_field')
+            if result_field and result_field in schema.get('financial_metrics', ()):
+                targets.append(('financial_metrics', result_field))
+            for term in [name] + list(formula.get('aliases', [])):
+                add(term, targets)
+
+        for name, metric in config.get('financial_metrics', {}).items():
+            if name.startswith('_') or not isinstance(metric, dict):
+                continue
+            table, field = metric.get('table'), metric.get('value_field')
+            if field in schema.get(table, ()):
+                for term in [name] + list(metric.get('aliases', [])):
+                    add(term, [(table, field)])
+
+        # schema_mappings: 表同义词(整张表)与枚举值同义词
+        for table, synonyms in mappings.get('tables', {}).items():
+            if table in schema:
+                for term in [table] + list(synonyms):
+                    add(term, [(table, None)])
+        for key, synonyms in mappings.get('value_mappings', {}).items():
+            parts = key.split('.')
+            if len(parts) >= 2 and parts[1] in schema.get(parts[0], ()):
+                for term in synonyms:
+                    add(term, [(parts[0], parts[1])])
+
+        self._terms = list(index)
+        self._targets = [index[term] for term in self._terms]
+        self._automaton = KeywordAutomaton({'term': self._terms})
+
+    def select(self, question: str) -> Optional[SchemaSelection]:
+        """
+        选择与问题相关的表和字段
+
+        Returns:
+            {表名: 字段集合或None(整张表)};没有命中任何术语时返回None
+        """
+        registry = get_config_registry()
+        config_snapshot = registry.get(self.provider.config_path)
+        mapping_snapshot = registry.get(self.mapping_path)
+        glossary = self.provider.generate_glossary()
+        raw_schema = self.provider.get_schema()
+        key = (id(glossary), id(raw_schema), len(raw_schema), config_snapshot.version, mapping_snapshot.version)
+        if key != self._key or self._automaton is None:
+            schema = {table: {c['name'] for c in columns} for table, columns in raw_schema.items()}
+            self._rebuild(glossary, schema, config_snapshot.data or {}, mapping_snapshot.data or {})
+            self._key = key
+
+        selection: SchemaSelection = {}
+        # 被更长命中覆盖的短术语不计(如"营业外收入"中的"收入")
+        for match in self._automaton.scan(question).matches('term', longest=True):
+            for table, column in self._targets[match.index]:
+                if column is None:
+                    selection[table] = None
+                elif table not in selection:
+                    selection[table] = {column}
+                elif selection[table] is not None:
+                    selection[table].add(column)
+        return selection or None
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+生成SQL的只读沙箱执行
+功能:
+1. 只读连接(mode=ro + PRAGMA query_only),即使SQL绕过文本检查也无法写入
+2. set_authorizer 白名单: 只允许读取指定表的指定字段、调用非危险函数,其余操作(PRAGMA、ATTACH、写入等)一律拒绝
+3. set_progress_handler 时间/指令预算: 超出预算的查询(如失控的JOIN、递归CTE)被中断
+4. fetchmany 分批读取,达到行数上限即停止,不一次性取回全部结果
+
+由 SQLite 在编译/执行阶段检查,不依赖关键字黑名单
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 默认预算: 执行时间(秒)、虚拟机指令数、返回行数
+DEFAULT_TIME_BUDGET = 5.0
+DEFAULT_MAX_STEPS = 200_000_000
+DEFAULT_MAX_ROWS = 1000
+
+# 每执行多少条虚拟机指令检查一次预算
+PROGRESS_INTERVAL = 10_000
+
+# 每批读取行数
+FETCH_BATCH = 200
+
+# 禁止调用的函数(可读写文件或加载扩展)
+DENIED_FUNCTIONS = frozenset({'load_extension', 'readfile', 'writefile', 'edit', 'fts3_tokenizer'})
+
+
+class SandboxBudgetExceeded(sqlite3.OperationalError):
+    """查询超出时间或指令预算"""
+
+
+class SQLSandbox:
+    """只读、白名单、有预算的SQL执行器"""
+
+    def __init__(self, db_path: str, allowed: Dict[str, Iterable[str]],
+                 time_budget: float = DEFAULT_TIME_BUDGET, max_steps: int = DEFAULT_MAX_STEPS):
+        """
+        初始化
+
+        Args:
+            db_path: 数据库路径
+            allowed: 可读取的 {表名: 字段列表}
+            time_budget: 单次查询的执行时间上限(秒)
+            max_steps: 单次查询的虚拟机指令数上限
+        """
+        self.db_path = str(db_path)
+        self.allowed: Dict[str, Set[str]] = {table.lower(): {c.lower() for c in columns}
+                                             for table, columns in allowed.items()}
+        self.time_budget = time_budget
+        self.max_steps = max_steps
+
+    def _authorize(self, action, arg1, arg2, db_name, source):
+        """授权回调: 只放行白名单内的读取"""
+        if action in (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_RECURSIVE):
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_READ:
+            # arg1 表名, arg2 字段名;CTE(含递归CTE引用自身)和子查询的中间结果没有表名或不属于任何数据库,
+            # 其底层对真实表的读取会单独授权
+            if not arg1 or db_name is None:
+                return sqlite3.SQLITE_OK
+            columns = self.allowed.get(arg1.lower())
+            if columns is not None and (not arg2 or arg2.lower() in columns) and db_name == 'main':
+                return sqlite3.SQLITE_OK
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_FUNCTION:
+            return sqlite3.SQLITE_DENY if (arg2 or '').lower() in DENIED_FUNCTIONS else sqlite3.SQLITE_OK
+        return sqlite3.SQLITE_DENY
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开只读连接"""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=5)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def execute(self, sql: str, params=(), max_rows: int = DEFAULT_MAX_ROWS) -> Tuple[List[Dict], bool]:
+        """
+        在沙箱中执行查询
+
+        Args:
+            sql: SELECT 语句
+            params: 绑定参数
+            max_rows: 最多返回的行数
+
+        Returns:
+            (结果字典列表, 是否因行数上限被截断)
+
+        Raises:
+            sqlite3.DatabaseError: 授权被拒绝、语法错误等
+            SandboxBudgetExceeded: 超出时间/指令预算
+        """
+        conn = self._connect()
+        deadline = time.monotonic() + self.time_budget
+        steps = [0]
+        exceeded = [False]
+
+        def progress():
+            steps[0] += PROGRESS_INTERVAL
+            if steps[0] > self.max_steps or time.monotonic() > deadline:
+                exceeded[0] = True
+                return 1
+            return 0
+
+        try:
+            conn.set_authorizer(self._authorize)
+            conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+            cursor = conn.execute(sql, params)
+            results: List[Dict] = []
+            truncated = False
+            while len(results) < max_rows:
+                rows = cursor.fetchmany(min(FETCH_BATCH, max_rows - len(results)))
+                if not rows:
+                    break
+                results.extend(dict(row) for row in rows)
+            else:
+                truncated = cursor.fetchone() is not None
+            return results, truncated
+        except sqlite3.OperationalError as e:
+            if exceeded[0]:
+                raise SandboxBudgetExceeded(
+                    f"查询超出执行预算({self.time_budget}秒/{self.max_steps}条指令)") from e
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Text-to-SQL 参数化模板
+功能:
+1. 问题归一化: 企业名称、年份、季度替换为占位符,"A公司2023年收入"与"B公司2024年收入"得到同一模板问题
+2. 生成的SQL中与本次取值一致的企业ID/年份/季度条件替换为 :company_id / :years / :quarter 占位符
+3. 命中模板时代入新的取值得到可执行SQL
+
+只有能完整参数化的SQL才生成模板: 本次的企业/年份/季度条件都已替换为占位符,
+且没有残留的年份字面量或企业/季度条件字面量(如按年份透视的列、'2023年'别名),否则不缓存为模板
+"""
+
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+# 问题中的年份、季度写法
+_YEAR_TEXT = re.compile(r'(?<!\d)(?:19|20)\d{2}(?!\d)')
+_QUARTER_TEXT = re.compile(r'第?[一二三四1-4]季度|[Qq][1-4](?!\d)')
+
+# SQL 中的企业/年份/季度条件(可带表别名前缀)
+_COMPANY_EQ = re.compile(r'\b((?:\w+\.)?company_id)\s*=\s*(\d+)\b', re.IGNORECASE)
+_YEAR_EQ = re.compile(r'\b((?:\w+\.)?period_year)\s*=\s*(\d{4})\b', re.IGNORECASE)
+_YEAR_IN = re.compile(r'\b((?:\w+\.)?period_year)\s+IN\s*\(\s*(\d{4}(?:\s*,\s*\d{4})*)\s*\)', re.IGNORECASE)
+_YEAR_BETWEEN = re.compile(r'\b((?:\w+\.)?period_year)\s+BETWEEN\s+(\d{4})\s+AND\s+(\d{4})\b', re.IGNORECASE)
+_QUARTER_EQ = re.compile(r'\b((?:\w+\.)?period_quarter)\s*=\s*(\d)\b', re.IGNORECASE)
+
+# 模板化后不允许残留的字面量
+_RESIDUAL_YEAR = re.compile(r'(?<![\w.])(?:19|20)\d{2}(?!\d)')
+_RESIDUAL_CONDITION = re.compile(r'\b(?:company_id|period_year|period_quarter)\s*(?:=|<|>|IN\b|BETWEEN\b)\s*\(?\s*\d',
+                                 re.IGNORECASE)
+
+_PLACEHOLDER = re.compile(r':(company_id|years|quarter)\b')
+
+
+def normalize_question(question: str, mask_companies=None) -> str:
+    """
+    问题模板: 全半角统一,企业名称、年份、季度替换为占位符
+
+    Args:
+        question: 用户问题
+        mask_companies: 企业名称替换函数(如 CompanyCatalogSnapshot.mask),None时不替换
+    """
+    text = unicodedata.normalize('NFKC', question).strip()
+    if mask_companies is not None:
+        text = mask_companies(text)
+    text = _YEAR_TEXT.sub('<年>', text)
+    return _QUARTER_TEXT.sub('<季度>', text)
+
+
+def make_template(sql: str, company_id: int, years: Iterable[int], quarter: Optional[int]) -> Optional[str]:
+    """
+    将生成的SQL转为参数化模板
+
+    Returns:
+        模板SQL;无法完整参数化时返回None
+    """
+    years = sorted({int(y) for y in years})
+    company_id = int(company_id)
+
+    def company(m):
+        return f"{m.group(1)} = :company_id" if int(m.group(2)) == company_id else m.group(0)
+
+    def year_eq(m):
+        return f"{m.group(1)} IN (:years)" if [int(m.group(2))] == years else m.group(0)
+
+    def year_in(m):
+        values = sorted({int(v) for v in m.group(2).split(',')})
+        return f"{m.group(1)} IN (:years)" if values == years else m.group(0)
+
+    def year_between(m):
+        values = list(range(int(m.group(2)), int(m.group(3)) + 1))
+        return f"{m.group(1)} IN (:years)" if values == years else m.group(0)
+
+    def quarter_eq(m):
+        return f"{m.group(1)} = :quarter" if quarter and int(m.group(2)) == int(quarter) else m.group(0)
+
+    template = _COMPANY_EQ.sub(company, sql)
+    if years:
+        template = _YEAR_EQ.sub(year_eq, template)
+        template = _YEAR_IN.sub(year_in, template)
+        template = _YEAR_BETWEEN.sub(year_between, template)
+    template = _QUARTER_EQ.sub(quarter_eq, template)
+
+    if ':company_id' not in template:
+        return None
+    if years and ':years' not in template:
+        return None
+    if quarter and ':quarter' not in template:
+        return None
+    if _RESIDUAL_YEAR.search(template) or _RESIDUAL_CONDITION.search(template):
+        return None
+    return template
+
+
+def render_template(template: str, company_id: int, years: List[int], quarter: Optional[int]) -> Optional[str]:
+    """
+    代入取值得到可执行SQL(取值均为整数)
+
+    Returns:
+        SQL;模板需要的取值缺失时返回None
+    """
+    values = {
+        'company_id': str(int(company_id)),
+        'years': ', '.join(str(int(y)) for y in sorted(set(years))) if years else None,
+        'quarter': str(int(quarter)) if quarter else None,
+    }
+    needed = set(_PLACEHOLDER.findall(template))
+    if any(values[name] is None for name in needed):
+        return None
+    return _PLACEHOLDER.sub(lambda m: values[m.group(1)], template)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SQLite长连接池
+功能:
+1. 每个线程为每个数据库保持一个长连接,不再每次查询新建连接
+2. 放大预编译语句缓存(cached_statements),配合参数化SQL,同一语句形态只编译一次
+3. 数据库文件被替换(inode变化)或连接被关闭时自动重新打开
+
+只用于查询;写入仍使用各模块自己的短连接
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 每个连接缓存的预编译语句条数(sqlite3 默认 128)
+DEFAULT_CACHED_STATEMENTS = 512
+
+
+def _supports_json_each() -> bool:
+    try:
+        sqlite3.connect(':memory:').execute("SELECT value FROM json_each('[1]')").fetchall()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+# SQLite 是否内置 JSON1(列表参数用 json_each 传入时语句形态与列表长度无关)
+JSON_EACH_AVAILABLE = _supports_json_each()
+
+
+def in_list(column: str, values: List) -> tuple:
+    """
+    `column IN (...)` 条件及参数
+
+    支持 json_each 时整个列表作为一个JSON参数传入,列表长度不影响语句文本
+
+    Returns:
+        (条件SQL, 参数列表)
+    """
+    if JSON_EACH_AVAILABLE:
+        return f"{column} IN (SELECT value FROM json_each(?))", ['[' + ','.join(str(int(v)) for v in values) + ']']
+    return f"{column} IN ({','.join('?' * len(values))})", [int(v) for v in values]
+
+
+class ConnectionPool:
+    """单个数据库的线程级长连接池"""
+
+    def __init__(self, db_path: str, cached_statements: int = DEFAULT_CACHED_STATEMENTS):
+        """
+        初始化
+
+        Args:
+            db_path: 数据库路径
+            cached_statements: 每个连接的预编译语句缓存条数
+        """
+        self.db_path = str(db_path)
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _inode(self) -> Optional[int]:
+        try:
+            return os.stat(self.db_path).st_ino
+        except OSError:
+            return None
+
+    def get(self) -> sqlite3.Connection:
+        """获取当前线程的连接(row_factory 为 sqlite3.Row,调用方不要关闭)"""
+        conn = getattr(self._local, 'conn', None)
+        inode = self._inode()
+        if conn is not None:
+            try:
+                conn.in_transaction  # 已关闭的连接会抛出 ProgrammingError
+                if inode == self._local.inode:
+                    return conn
+            except sqlite3.ProgrammingError:
+                conn = None
+            if conn is not None:
+                self._discard(conn)
+
+        conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        self._local.conn = conn
+        self._local.inode = self._inode() if inode is None else inode
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """关闭所有线程的连接(各线程下次使用时重新打开)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+# 全局实例(按数据库路径共享)
+_pool_instances: Dict[str, ConnectionPool] = {}
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str) -> ConnectionPool:
+    """获取指定数据库的全局连接池"""
+    key = str(Path(db_path).resolve())
+    with _pool_lock:
+        if key not in _pool_instances:
+            _pool_instances[key] = ConnectionPool(key)
+        return _pool_instances[key]
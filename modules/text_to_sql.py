@@ -6,38 +6,134 @@ Text-to-SQL 引擎
 1. 使用DeepSeek动态生成SQL
 2. SQL安全验证
 3. 执行并返回结果
+4. 生成的SQL持久化缓存(跨重启/多worker共享),键含Schema与映射配置指纹,
+   指纹变化后旧SQL自动清除;执行成功的SQL优先保留,执行出错的SQL从缓存删除
+5. SQL同时按参数化模板缓存(企业/年份/季度为占位符),换企业或年份的同类问题直接代入取值,不再调用LLM
+6. Prompt只包含与问题相关的表/字段和映射(见 SchemaRetriever);固定的规则说明放在system消息中,
+   作为逐字节不变的前缀以利用服务端Prompt缓存,并记录每次Prompt的估算token数
+7. 生成的SQL在只读沙箱中执行(见 SQLSandbox): 表/字段白名单、时间与指令预算、分批读取并限制行数
+8. 执行结果进程内缓存: 键为归一化SQL + 数据版本戳(PRAGMA data_version/文件状态),
+   数据导入前的重复查询直接返回内存中的结果;有界LRU淘汰,行数过多的结果不缓存
 """
 
 import sqlite3
 import re
 import hashlib
 import json
+import time
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+try:
+    from modules.company_catalog import get_company_catalog
+    from modules.config_registry import get_config_registry
+    from modules.data_version import DataVersionWatcher
+    from modules.memory_cache import LRUCache
+    from modules.persistent_cache import PersistentCache, get_persistent_cache
+    from modules.schema_retriever import SchemaRetriever, estimate_tokens
+    from modules.sql_sandbox import SQLSandbox
+    from modules.sql_template import make_template, normalize_question, render_template
+except ModuleNotFoundError:
+    from company_catalog import get_company_catalog
+    from config_registry import get_config_registry
+    from data_version import DataVersionWatcher
+    from memory_cache import LRUCache
+    from persistent_cache import PersistentCache, get_persistent_cache
+    from schema_retriever import SchemaRetriever, estimate_tokens
+    from sql_sandbox import SQLSandbox
+    from sql_template import make_template, normalize_question, render_template
+
+# 提示词版本(修改 SQL_SYSTEM_PROMPT / _build_prompt 的生成规则时递增,使旧缓存失效)
+PROMPT_VERSION = "v2"
+
+# 固定的规则说明(system消息): 不含任何随问题变化的内容,保证各次请求的前缀逐字节相同
+SQL_SYSTEM_PROMPT = """你是SQL生成专家。根据用户消息中的数据库Schema、业务规则和查询条件生成SQLite查询语句。只返回SQL语句,不要有任何其他解释文字。
+
+## 表用途提示 (Table Usage Hints)
+- **financial_metrics**: 存放所有计算好的比率/率指标(如 net_profit_margin, tax_burden_rate, turnover_days). 不包含绝对金额.
+- **income_statements**: 存放利润表绝对金额(如 revenue, cost, total_profit, net_profit). 不包含比率.
+- **balance_sheets**: 存放资产负债表绝对金额.
+- **hr_salary_data**: 存放人员和薪酬数据.
+- **跨表查询**: 如果同时查询绝对金额(如利润)和比率(如利润率), **必须使用 JOIN** 连接相关表 (ON company_id, period_year, period_quarter).
+
+## 必须遵守的约束
+1. 只生成SELECT语句
+2. 必须包含"查询条件"中给出的 company_id 条件
+3. 必须包含"查询条件"中给出的年份条件及季度条件(如有)
+4. 聚合规则 (Aggregation Rules):
+   - 金额类 (Amounts): 使用 SUM(col).
+   - 比例/率类 (Ratios/Rates, e.g. tax_burden, profit_margin): 如果用户问题包含“平均”或“最大值”或”最小值“或“每季”，则按用户指示处理；如果不包含，则使用 AVG(col) 或按季度展示. 禁止在Group By时直接选择原始列.
+   - 快照/计数类 (Snapshots, e.g. employee_count): 使用 AVG(col) 或 MAX(col).
+   - 通用规则: 如果按年份分组(period_year), 所有被查出的列必须包裹在聚合函数(SUM, AVG, MAX, MIN)中.
+5. 分组规则：如果用户询问"每年"或未强调季度，按period_year分组；如果用户询问"季度"、"详细数据"或"趋势"，请按 period_year, period_quarter 分组。
+6. 如果涉及多个指标，请作为多个列查询，并为每列使用有意义的别名(AS '别名')
+7. 对于枚举值字段(如invoice_type, direction)，请严格参考'value_mappings'进行过滤
+8. 只返回SQL语句,不要有任何解释"""
+
+# 文本检查中禁止出现的语句关键字(去掉字符串字面量后按整词匹配,实际权限由沙箱授权回调控制)
+_FORBIDDEN_KEYWORDS = re.compile(
+    r'\b(INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|TRUNCATE|EXEC|EXECUTE|ATTACH|DETACH|PRAGMA|VACUUM|REINDEX)\b')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+# 生成SQL的执行预算(秒)
+SQL_TIME_BUDGET = 5.0
+
+# 执行结果缓存: 最大条目数;单条结果超过该行数时不缓存
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_MAX_ROWS = 500
+
+# 缓存条目保留优先级: 执行成功的SQL最后淘汰
+PRIORITY_GENERATED = 0
+PRIORITY_EXECUTED = 1
+
 
 class TextToSQLEngine:
     """Text-to-SQL引擎 - 使用LLM动态生成SQL查询"""
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, cache_db_path: str = None):
         """
         初始化
         
         Args:
             db_path: 数据库路径
+            cache_db_path: SQL缓存数据库路径(默认 database/tax_llm_cache.db)
         """
         base_dir = Path(__file__).parent.parent
         self.db_path = db_path or str(base_dir / 'database' / 'financial.db')
         
-        # 缓存最近的SQL查询
-        self._sql_cache = {}
-        self._max_cache_size = 100
+        # 生成SQL的持久化缓存(按Schema/映射指纹失效)
+        self._cache_db_path = cache_db_path
+        self._max_cache_size = 2000
+        self._cache_tag = None
+        self._schema_watcher = DataVersionWatcher(self.db_path)
+        self._schema_stamp = None
+        self._schema_fingerprint = None
+        
+        # LLM生成SQL的次数与耗时(缓存未命中的代价)
+        self._generate_count = 0
+        self._generate_seconds = 0.0
+        
+        # 只读沙箱(按Schema白名单构建,记录构建时的表结构指纹)
+        self._sandbox = None
+        self._sandbox_schema = None
+        
+        # 执行结果缓存(键含数据版本戳,数据变化后自然失效)
+        self._result_cache = LRUCache(max_entries=RESULT_CACHE_SIZE)
+        
+        # 相关Schema检索(延迟加载)与Prompt规模统计
+        self._schema_retriever = None
+        self._prompt_count = 0
+        self._prompt_tokens = 0
         
         # DeepSeek客户端(延迟加载)
         self._deepseek = None
         
         # Schema Provider(延迟加载)
         self._schema_provider = None
+        
+        # 业务规则映射的Prompt文本(按 schema_mappings.json 快照版本缓存)
+        self._mapping_str = None
+        self._mapping_version = None
     
     @property
     def deepseek(self):
@@ -61,6 +157,13 @@ class TextToSQLEngine:
             self._schema_provider = SchemaProvider(db_path=self.db_path)
         return self._schema_provider
     
+    @property
+    def schema_retriever(self) -> SchemaRetriever:
+        """延迟加载相关Schema检索器"""
+        if self._schema_retriever is None:
+            self._schema_retriever = SchemaRetriever(self.schema_provider)
+        return self._schema_retriever
+    
     def generate_sql(self, question: str, company_id: int, 
                      years: List[int], quarter: int = None) -> Optional[str]:
         """
@@ -75,35 +178,56 @@ class TextToSQLEngine:
         Returns:
             生成的SQL语句,如果失败返回None
         """
-        # 检查缓存
+        # 检查缓存(先按原问题,再按参数化模板)
+        cache = self._get_sql_cache()
         cache_key = self._get_cache_key(question, company_id, years, quarter)
-        if cache_key in self._sql_cache:
-            print(f"📦 使用缓存的SQL")
-            return self._sql_cache[cache_key]
-        
-        # 构建Prompt
+        template_key = self._get_template_key(question, years, quarter)
+        if cache is not None:
+            try:
+                hit, cached_sql = cache.get(cache_key)
+                if hit:
+                    print(f"📦 使用缓存的SQL")
+                    return cached_sql
+                hit, template = cache.get(template_key)
+                if hit:
+                    sql = render_template(template, company_id, years, quarter)
+                    if sql and self.validate_sql(sql):
+                        print(f"📦 使用缓存的SQL模板")
+                        return sql
+                    cache.delete(template_key)
+            except sqlite3.Error as e:
+                print(f"⚠️  SQL缓存读取失败: {e}")
+        
+        # 构建Prompt(固定前缀在system消息,随问题变化的内容在user消息)
         prompt = self._build_prompt(question, company_id, years, quarter)
+        self._log_prompt_size(prompt)
         
         # 调用DeepSeek
         messages = [
-            {"role": "system", "content": "你是SQL生成专家。只返回SQL语句,不要有任何其他解释文字。"},
+            {"role": "system", "content": SQL_SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ]
         
         try:
+            started = time.perf_counter()
             response = self.deepseek.chat_completion(
                 messages, 
                 stream=False, 
                 temperature=0.3,  # 低温度提高确定性
                 max_tokens=500
             )
+            self._generate_count += 1
+            self._generate_seconds += time.perf_counter() - started
             
             # 提取SQL
             sql = self._extract_sql(response)
             
             if sql and self.validate_sql(sql):
-                # 缓存
-                self._cache_sql(cache_key, sql)
+                # 缓存(能完整参数化时同时缓存为模板)
+                self._cache_sql(cache, cache_key, sql)
+                template = make_template(sql, company_id, years, quarter)
+                if template:
+                    self._cache_sql(cache, template_key, template)
                 print(f"✅ 生成SQL: {sql[:100]}...")
                 return sql
             else:
@@ -116,20 +240,13 @@ class TextToSQLEngine:
     
     def _build_prompt(self, question: str, company_id: int, 
                       years: List[int], quarter: int = None) -> str:
-        """构建LLM提示"""
-        # 获取Schema描述
-        schema_desc = self.schema_provider.get_schema_description()
+        """构建LLM提示(user消息: 相关Schema、映射、本次查询条件和问题)"""
+        # 只取与问题相关的表/字段;没有命中任何术语时使用完整Schema
+        selection = self.schema_retriever.select(question)
+        schema_desc = self.schema_provider.get_schema_description(selection)
         
         # 加载LLM生成的映射配置
-        try:
-            base_dir = Path(__file__).parent.parent
-            mapping_path = base_dir / 'config' / 'schema_mappings.json'
-            with open(mapping_path, 'r', encoding='utf-8') as f:
-                mappings = json.load(f)
-            mapping_str = json.dumps(mappings, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"⚠️  加载映射配置失败: {e}")
-            mapping_str = "无"
+        mapping_str = self._get_mapping_str(selection)
 
         # 构建年份条件
         if len(years) == 1:
@@ -142,34 +259,15 @@ class TextToSQLEngine:
         if quarter:
             quarter_condition = f" AND period_quarter = {quarter}"
         
-        prompt = f"""根据用户问题生成SQLite查询语句。
-
-## 数据库Schema
+        prompt = f"""## 数据库Schema
 {schema_desc}
 
 ## 业务规则与同义词映射 (Business Rules)
 {mapping_str}
 
-## 表用途提示 (Table Usage Hints)
-- **financial_metrics**: 存放所有计算好的比率/率指标(如 net_profit_margin, tax_burden_rate, turnover_days). 不包含绝对金额.
-- **income_statements**: 存放利润表绝对金额(如 revenue, cost, total_profit, net_profit). 不包含比率.
-- **balance_sheets**: 存放资产负债表绝对金额.
-- **hr_salary_data**: 存放人员和薪酬数据.
-- **跨表查询**: 如果同时查询绝对金额(如利润)和比率(如利润率), **必须使用 JOIN** 连接相关表 (ON company_id, period_year, period_quarter).
-
-## 必须遵守的约束
-1. 只生成SELECT语句
-2. 必须包含 company_id = {company_id} 条件
-3. 必须包含 {year_condition} 条件{quarter_condition}
-4. 聚合规则 (Aggregation Rules):
-   - 金额类 (Amounts): 使用 SUM(col).
-   - 比例/率类 (Ratios/Rates, e.g. tax_burden, profit_margin): 如果用户问题包含“平均”或“最大值”或”最小值“或“每季”，则按用户指示处理；如果不包含，则使用 AVG(col) 或按季度展示. 禁止在Group By时直接选择原始列.
-   - 快照/计数类 (Snapshots, e.g. employee_count): 使用 AVG(col) 或 MAX(col).
-   - 通用规则: 如果按年份分组(period_year), 所有被查出的列必须包裹在聚合函数(SUM, AVG, MAX, MIN)中.
-5. 分组规则：如果用户询问"每年"或未强调季度，按period_year分组；如果用户询问"季度"、"详细数据"或"趋势"，请按 period_year, period_quarter 分组。
-6. 如果涉及多个指标，请作为多个列查询，并为每列使用有意义的别名(AS '别名')
-7. 对于枚举值字段(如invoice_type, direction)，请严格参考'value_mappings'进行过滤
-8. 只返回SQL语句,不要有任何解释
+## 查询条件
+- company_id = {company_id}
+- {year_condition}{quarter_condition}
 
 ## 用户问题
 {question}
@@ -178,6 +276,59 @@ class TextToSQLEngine:
         
         return prompt
     
+    def _log_prompt_size(self, prompt: str):
+        """记录Prompt估算token数(固定前缀/随问题变化部分)"""
+        prefix_tokens = estimate_tokens(SQL_SYSTEM_PROMPT)
+        prompt_tokens = estimate_tokens(prompt)
+        self._prompt_count += 1
+        self._prompt_tokens += prefix_tokens + prompt_tokens
+        print(f"📏 Prompt约 {prefix_tokens + prompt_tokens} tokens (固定前缀 {prefix_tokens}, 问题相关 {prompt_tokens})")
+    
+    def get_prompt_stats(self) -> Dict:
+        """获取Prompt规模统计(LLM调用次数、平均估算token数、固定前缀token数)"""
+        count = self._prompt_count
+        return {
+            "prompts": count,
+            "avg_prompt_tokens": round(self._prompt_tokens / count, 1) if count else 0.0,
+            "prefix_tokens": estimate_tokens(SQL_SYSTEM_PROMPT)
+        }
+    
+    def _get_mapping_str(self, selection: Optional[Dict] = None) -> str:
+        """
+        获取业务规则映射的Prompt文本(紧凑JSON)
+        
+        Args:
+            selection: 相关表/字段(见 SchemaRetriever),只保留这些表的同义词和枚举值映射;None为全部
+        """
+        mapping_path = Path(__file__).parent.parent / 'config' / 'schema_mappings.json'
+        snapshot = get_config_registry().get(mapping_path)
+        if snapshot.data is None:
+            if snapshot.version != self._mapping_version:
+                print(f"⚠️  加载映射配置失败: {mapping_path}")
+                self._mapping_version = snapshot.version
+            return "无"
+        if selection is None:
+            # 完整映射只在配置变化时重新序列化
+            if snapshot.version != self._mapping_version:
+                self._mapping_str = json.dumps(snapshot.data, ensure_ascii=False, separators=(',', ':'))
+                self._mapping_version = snapshot.version
+            return self._mapping_str
+        
+        def relevant(key: str) -> bool:
+            parts = key.split('.')
+            if parts[0] not in selection:
+                return False
+            columns = selection[parts[0]]
+            return columns is None or len(parts) < 2 or parts[1] in columns
+        
+        pruned = {}
+        for section, entries in snapshot.data.items():
+            if isinstance(entries, dict):
+                kept = {key: value for key, value in entries.items() if relevant(key)}
+                if kept:
+                    pruned[section] = kept
+        return json.dumps(pruned, ensure_ascii=False, separators=(',', ':')) if pruned else "无"
+    
     def _extract_sql(self, response: str) -> Optional[str]:
         """从LLM响应中提取SQL"""
         if not response:
@@ -207,7 +358,9 @@ class TextToSQLEngine:
     
     def validate_sql(self, sql: str) -> bool:
         """
-        验证SQL安全性
+        验证SQL(文本层面的快速检查,真正的权限控制见 execute_sql 的沙箱)
+        
+        字符串字面量不参与检查,关键字按整词匹配(created_at 等字段名不会被误判)
         
         Args:
             sql: SQL语句
@@ -218,37 +371,49 @@ class TextToSQLEngine:
         if not sql:
             return False
         
-        sql_upper = sql.upper().strip()
+        sql_upper = _STRING_LITERAL.sub("''", sql).upper().strip()
         
-        # 只允许SELECT
-        if not sql_upper.startswith("SELECT"):
+        # 只允许SELECT(含 WITH ... SELECT)
+        if not (sql_upper.startswith("SELECT") or sql_upper.startswith("WITH")):
             print(f"⚠️  拒绝非SELECT语句")
             return False
         
+        # 禁止注释和多条语句
+        if '--' in sql_upper or '/*' in sql_upper or ';' in sql_upper.rstrip(';'):
+            print(f"⚠️  拒绝包含注释或多条语句的SQL")
+            return False
+        
         # 禁止危险关键字
-        dangerous_keywords = [
-            'INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER',
-            'TRUNCATE', 'EXEC', 'EXECUTE', '--', ';--', 'UNION SELECT'
-        ]
-        for keyword in dangerous_keywords:
-            if keyword in sql_upper:
-                print(f"⚠️  检测到危险关键字: {keyword}")
-                return False
+        match = _FORBIDDEN_KEYWORDS.search(sql_upper)
+        if match:
+            print(f"⚠️  检测到危险关键字: {match.group(1)}")
+            return False
         
         # 检查是否包含company_id条件
-        if 'COMPANY_ID' not in sql_upper:
+        if not re.search(r'\bCOMPANY_ID\b', sql_upper):
             print(f"⚠️  缺少company_id条件")
             return False
         
         return True
     
+    @property
+    def sandbox(self) -> SQLSandbox:
+        """只读沙箱(白名单为 SchemaProvider 发现的表及其字段,表结构指纹变化后重建)"""
+        self._get_fingerprint()
+        if self._sandbox is None or self._sandbox_schema != self._schema_fingerprint:
+            schema = self.schema_provider.get_schema()
+            allowed = {table: [c['name'] for c in columns] for table, columns in schema.items()}
+            self._sandbox = SQLSandbox(self.db_path, allowed, time_budget=SQL_TIME_BUDGET)
+            self._sandbox_schema = self._schema_fingerprint
+        return self._sandbox
+    
     def execute_sql(self, sql: str, limit: int = 1000) -> Tuple[List[Dict], Optional[str]]:
         """
-        安全执行SQL
+        在只读沙箱中执行SQL
         
         Args:
             sql: SQL语句
-            limit: 结果数量限制
+            limit: 结果数量限制(分批读取,达到上限即停止)
         
         Returns:
             (结果列表, 错误信息)
@@ -256,29 +421,22 @@ class TextToSQLEngine:
         if not self.validate_sql(sql):
             return [], "SQL验证失败"
         
-        # 添加LIMIT
-        if "LIMIT" not in sql.upper():
-            sql = f"{sql.rstrip(';')} LIMIT {limit}"
+        sql = sql.strip().rstrip(';')
+        stamp = self._schema_watcher.stamp()
+        cache_key = (self._normalize_sql(sql), limit, stamp) if stamp is not None else None
+        if cache_key is not None:
+            hit, cached = self._result_cache.get(cache_key)
+            if hit:
+                print(f"💾 SQL结果缓存命中,返回 {len(cached)} 条记录")
+                return [dict(row) for row in cached], None
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # 设置超时
-            cursor.execute("PRAGMA busy_timeout = 5000")
-            
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-            
-            # 转换为字典列表
-            results = []
-            for row in rows:
-                results.append(dict(row))
-            
-            conn.close()
-            
+            results, truncated = self.sandbox.execute(sql, max_rows=limit)
+            if truncated:
+                print(f"⚠️  结果超过 {limit} 条,已截断")
             print(f"📊 SQL执行成功,返回 {len(results)} 条记录")
+            if cache_key is not None and len(results) <= RESULT_CACHE_MAX_ROWS:
+                self._result_cache.set(cache_key, tuple(dict(row) for row in results))
             return results, None
             
         except Exception as e:
@@ -286,6 +444,31 @@ class TextToSQLEngine:
             print(f"⚠️  SQL执行错误: {error_msg}")
             return [], error_msg
     
+    @staticmethod
+    def _normalize_sql(sql: str) -> str:
+        """结果缓存键: 字符串字面量之外的空白压缩为单个空格、关键字等统一大写(字面量原样保留)"""
+        parts = []
+        last = 0
+        for m in _STRING_LITERAL.finditer(sql):
+            parts.append(re.sub(r'\s+', ' ', sql[last:m.start()]).upper())
+            parts.append(m.group(0))
+            last = m.end()
+        parts.append(re.sub(r'\s+', ' ', sql[last:]).upper())
+        return ''.join(parts).strip()
+    
+    def get_result_cache_stats(self) -> Dict:
+        """获取执行结果缓存统计(命中/未命中/淘汰/条目数)"""
+        return dict(self._result_cache.stats(), max_rows=RESULT_CACHE_MAX_ROWS)
+    
+    def clear_result_cache(self) -> int:
+        """
+        清空执行结果缓存
+        
+        Returns:
+            清除的条目数
+        """
+        return self._result_cache.clear()
+    
     def query(self, question: str, company_id: int, 
               years: List[int], quarter: int = None) -> Tuple[List[Dict], str]:
         """
@@ -309,6 +492,9 @@ class TextToSQLEngine:
         # 执行SQL
         results, error = self.execute_sql(sql)
         
+        # 执行成功的SQL提高保留优先级,执行出错的不再复用
+        self._update_cached_sql(question, company_id, years, quarter, executed=error is None)
+        
         if error:
             return [], f"SQL执行错误: {error}"
         
@@ -317,19 +503,112 @@ class TextToSQLEngine:
         
         return results, "success"
     
+    def _get_fingerprint(self) -> str:
+        """
+        Schema与映射配置指纹
+        
+        Schema部分为参与提示词的表/视图建表语句的哈希,仅在数据版本变化时重新计算;
+        映射部分为 schema_mappings.json 的内容指纹
+        """
+        stamp = self._schema_watcher.stamp()
+        if self._schema_fingerprint is None or stamp != self._schema_stamp:
+            excluded = self.schema_provider.excluded_tables
+            digest = hashlib.sha256()
+            if stamp is not None:
+                try:
+                    conn = sqlite3.connect(self.db_path)
+                    try:
+                        rows = conn.execute(
+                            "SELECT name, sql FROM sqlite_master "
+                            "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name"
+                        ).fetchall()
+                    finally:
+                        conn.close()
+                    for name, sql in rows:
+                        if name not in excluded:
+                            digest.update(f"{name}\n{sql}\n".encode('utf-8'))
+                except sqlite3.Error as e:
+                    print(f"⚠️  读取Schema失败: {e}")
+            fingerprint = digest.hexdigest()
+            if self._schema_fingerprint is not None and fingerprint != self._schema_fingerprint:
+                # 表结构变化(如迁移新增字段): SchemaProvider 重新发现表和字段
+                self.schema_provider.reload()
+            self._schema_fingerprint = fingerprint
+            self._schema_stamp = stamp
+        
+        mapping_path = Path(__file__).parent.parent / 'config' / 'schema_mappings.json'
+        mapping_fingerprint = get_config_registry().get(mapping_path).fingerprint
+        raw = f"{PROMPT_VERSION}|{self._schema_fingerprint}|{mapping_fingerprint}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+    
+    def _get_sql_cache(self) -> Optional[PersistentCache]:
+        """
+        获取SQL缓存(指纹变化时清除旧指纹下的缓存)
+        
+        Returns:
+            缓存实例;缓存不可用时返回None
+        """
+        try:
+            cache = get_persistent_cache("text_to_sql", self._cache_db_path,
+                                         max_entries=self._max_cache_size, ttl_seconds=None)
+            fingerprint = self._get_fingerprint()
+            if self._cache_tag != fingerprint:
+                removed = cache.retain_tag(fingerprint)
+                if removed:
+                    print(f"🧹 Schema或映射配置已变更,清除SQL缓存 {removed} 条")
+                self._cache_tag = fingerprint
+            return cache
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️  SQL缓存不可用: {e}")
+            return None
+    
     def _get_cache_key(self, question: str, company_id: int, 
                        years: List[int], quarter: int) -> str:
-        """生成缓存键"""
-        content = f"{question}|{company_id}|{sorted(years)}|{quarter}"
-        return hashlib.md5(content.encode()).hexdigest()
+        """生成缓存键(含Schema/映射指纹)"""
+        return PersistentCache.make_key(self._cache_tag, question, company_id, sorted(years), quarter)
+    
+    def _get_template_key(self, question: str, years: List[int], quarter: int) -> str:
+        """生成模板缓存键: 归一化问题 + 是否有年份/季度条件(含Schema/映射指纹)"""
+        catalog = get_company_catalog(self.db_path).snapshot()
+        template_question = normalize_question(question, catalog.mask)
+        return PersistentCache.make_key(self._cache_tag, 'template', template_question,
+                                        bool(years), bool(quarter))
+    
+    def _cache_sql(self, cache: Optional[PersistentCache], key: str, sql: str):
+        """缓存SQL(超出容量时先淘汰未执行成功过的,再按LRU淘汰)"""
+        if cache is None:
+            return
+        try:
+            cache.set(key, sql, tag=self._cache_tag, priority=PRIORITY_GENERATED)
+        except sqlite3.Error as e:
+            print(f"⚠️  SQL缓存写入失败: {e}")
+    
+    def _update_cached_sql(self, question: str, company_id: int,
+                           years: List[int], quarter: int, executed: bool):
+        """根据执行结果更新缓存(原问题及模板): 成功则优先保留,出错则删除"""
+        cache = self._get_sql_cache()
+        if cache is None:
+            return
+        keys = (self._get_cache_key(question, company_id, years, quarter),
+                self._get_template_key(question, years, quarter))
+        try:
+            for key in keys:
+                if executed:
+                    cache.set_priority(key, PRIORITY_EXECUTED)
+                elif cache.delete(key):
+                    print(f"🧹 删除执行出错的缓存SQL")
+        except sqlite3.Error as e:
+            print(f"⚠️  SQL缓存更新失败: {e}")
     
-    def _cache_sql(self, key: str, sql: str):
-        """缓存SQL"""
-        if len(self._sql_cache) >= self._max_cache_size:
-            # 移除最早的缓存
-            oldest_key = next(iter(self._sql_cache))
-            del self._sql_cache[oldest_key]
-        self._sql_cache[key] = sql
+    def get_cache_stats(self) -> Dict:
+        """获取SQL缓存统计(命中/未命中/条目数/读取耗时/LLM生成耗时)"""
+        cache = self._get_sql_cache()
+        if cache is None:
+            return {"enabled": False}
+        count = self._generate_count
+        return dict(cache.stats(), enabled=True, fingerprint=self._cache_tag,
+                    generated=count,
+                    avg_generate_ms=round(self._generate_seconds * 1000 / count, 1) if count else 0.0)
 
 
 # 全局单例
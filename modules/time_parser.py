@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+财务问题时间范围解析
+功能:
+1. 年份(4位/2位/范围/列表)、季度、月份、月份范围、全年、对比意图的解析规则预编译为模块级正则
+2. 全期/对比/全年关键词编译为一个多模式自动机,一次扫描得到全部关键词命中
+3. 按字符类别预判(无数字不跑年份规则、无"季/Q"不跑季度规则、无"月"不跑月份规则)
+4. 同一问题的解析结果按(问题, 当前年份)缓存,配置热更新时整体替换解析器
+5. 给出问题中时间表达式的位置(time_spans),供其他关键词匹配跳过(如"前三季度"中的"前三")
+
+规则顺序与原 FinancialQuery.extract_time_range 完全一致(先命中的规则优先),结果字典相同
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from modules.keyword_matcher import KeywordAutomaton
+from modules.memory_cache import LRUCache
+
+
+# 全期查询关键词(未配置时的默认值)
+DEFAULT_ALL_PERIODS_KEYWORDS = [
+    "多少", "是多少", "数据", "金额", "查询",
+    "增长", "增减", "增加", "减少",
+    "变动", "改变", "变化", "趋势", "情况"
+]
+
+# 对比分析关键词(未配置时的默认值)
+DEFAULT_COMPARISON_KEYWORDS = [
+    '增长', '对比', '比较', 'vs', '变化', '趋势', '同比', '环比', '差异', '变动'
+]
+
+# 年份规则(按优先级)
+_RE_RANGE_4_4 = re.compile(r'(\d{4})[—\-~至到](\d{4})年?')
+_RE_RANGE_2_2 = re.compile(r'(?<!\d)(\d{2})[—\-~至到](\d{2})(?!\d)')
+_RE_RANGE_4_2 = re.compile(r'(\d{4})[—\-~至到](\d{2})(?!\d)')
+_RE_YEAR_4 = re.compile(r'(\d{4})年?')
+_RE_LIST_2 = re.compile(r'((?:\d{2}[、，,])+\d{2})年')
+_RE_LIST_SPLIT = re.compile(r'[、，,]')
+_RE_YEAR_2 = re.compile(r'(?<!\d)(\d{2})年')
+_RE_STANDALONE_4 = re.compile(r'(?<!\d)(\d{4})(?!\d)')
+_RE_RANGE_SHORT_NIAN = re.compile(r'(?<!\d)(\d{2})[—\-](\d{2})年')
+_RE_RANGE_SHORT = re.compile(r'(?<!\d)(\d{2})[—\-](\d{2})(?!\d)')
+
+# 季度、月份规则
+_RE_QUARTER_Q = re.compile(r'[Qq]([1234])')
+_RE_QUARTER_CN = re.compile(r'第?([一二三四1234])季度?')
+_RE_MONTH_RANGE = re.compile(r'(\d{1,2})[—\-~至到](\d{1,2})月')
+_RE_MONTH = re.compile(r'(\d{1,2})月份?')
+_RE_DIGIT = re.compile(r'\d')
+
+# 时间表达式(年份、季度、上/下半年、月份及范围),用于 time_spans
+_RE_TIME_SPAN = re.compile(
+    r'\d{2,4}(?:[—\-~至到]\d{2,4})?年(?:度)?|前[一二三四1234]个?季度|第?[一二三四1234]季度|[Qq][1234]'
+    r'|[上下]半年|\d{1,2}(?:[—\-~至到]\d{1,2})?月份?')
+
+_CN_QUARTER = {'一': 1, '二': 2, '三': 3, '四': 4, '1': 1, '2': 2, '3': 3, '4': 4}
+_QUARTER_CHARS = frozenset('Qq季')
+
+
+def to_full_year(short_year: int) -> int:
+    """将2位数年份转换为4位数"""
+    return 2000 + short_year if short_year <= 60 else 1900 + short_year
+
+
+def _valid_year(year: int) -> bool:
+    return 1990 <= year <= 2060
+
+
+class TimeRangeParser:
+    """时间范围解析器(构建后只读,可在多线程间共享)"""
+
+    def __init__(self, all_periods_keywords: Optional[Iterable[str]] = None,
+                 comparison_keywords: Optional[Iterable[str]] = None,
+                 cache_size: int = 2048):
+        """
+        初始化
+
+        Args:
+            all_periods_keywords: 全期查询关键词(未指定年份时查询所有期间)
+            comparison_keywords: 对比分析关键词
+            cache_size: 解析结果缓存条数
+        """
+        if all_periods_keywords is None:
+            all_periods_keywords = DEFAULT_ALL_PERIODS_KEYWORDS
+        if comparison_keywords is None:
+            comparison_keywords = DEFAULT_COMPARISON_KEYWORDS
+        self._automaton = KeywordAutomaton({
+            'all_periods': list(all_periods_keywords),
+            'comparison': list(comparison_keywords),
+            'full_year': ['全年', '年度']
+        })
+        self._cache = LRUCache(max_entries=cache_size)
+
+    def parse(self, question: str, current_year: Optional[int] = None) -> Dict:
+        """
+        解析时间范围(结果缓存,返回副本)
+
+        Args:
+            question: 用户问题
+            current_year: 未指定年份时的默认年份,默认取当前年份
+
+        Returns:
+            与 FinancialQuery.extract_time_range 相同的字典
+        """
+        if current_year is None:
+            current_year = datetime.now().year
+        key = (question, current_year)
+        hit, result = self._cache.get(key)
+        if not hit:
+            result = self._parse(question, current_year)
+            self._cache.set(key, result)
+        return {k: list(v) if isinstance(v, list) else v for k, v in result.items()}
+
+    def time_spans(self, question: str) -> List[Tuple[int, int]]:
+        """
+        问题中时间表达式的位置
+
+        Returns:
+            [(start, end), ...](end不含)
+        """
+        spans = [m.span() for m in _RE_TIME_SPAN.finditer(question)]
+        spans.extend((m.start, m.end) for m in self._automaton.scan(question).matches('full_year'))
+        return spans
+
+    def _parse_years(self, question: str) -> tuple:
+        """
+        按优先级依次尝试年份规则,第一个得到非空年份的规则生效
+
+        Returns:
+            (年份列表, 是否有范围规则通过校验——即使范围为空也视为对比意图)
+        """
+        is_range = False
+
+        match = _RE_RANGE_4_4.search(question)
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            if _valid_year(start) and _valid_year(end):
+                is_range = True
+                if start <= end:
+                    return list(range(start, end + 1)), True
+
+        match = _RE_RANGE_2_2.search(question)
+        if match:
+            start, end = to_full_year(int(match.group(1))), to_full_year(int(match.group(2)))
+            if _valid_year(start) and _valid_year(end):
+                is_range = True
+                if start <= end:
+                    return list(range(start, end + 1)), True
+
+        match = _RE_RANGE_4_2.search(question)
+        if match:
+            start, end = int(match.group(1)), to_full_year(int(match.group(2)))
+            if _valid_year(start) and _valid_year(end):
+                is_range = True
+                if start <= end:
+                    return list(range(start, end + 1)), True
+
+        found = _RE_YEAR_4.findall(question)
+        years = sorted({int(y) for y in found if _valid_year(int(y))})
+        if years:
+            return years, is_range
+
+        match = _RE_LIST_2.search(question)
+        if match:
+            years = sorted({to_full_year(int(p)) for p in _RE_LIST_SPLIT.split(match.group(1))
+                            if p.isdigit() and _valid_year(to_full_year(int(p)))})
+            if years:
+                return years, is_range
+
+        found = _RE_YEAR_2.findall(question)
+        years = sorted({to_full_year(int(y)) for y in found if _valid_year(to_full_year(int(y)))})
+        if years:
+            return years, is_range
+
+        found = _RE_STANDALONE_4.findall(question)
+        years = [int(y) for y in found if _valid_year(int(y))]
+        if years:
+            return years, is_range
+
+        match = _RE_RANGE_SHORT_NIAN.search(question) or _RE_RANGE_SHORT.search(question)
+        if match:
+            start, end = to_full_year(int(match.group(1))), to_full_year(int(match.group(2)))
+            if _valid_year(start) and _valid_year(end) and start <= end:
+                return list(range(start, end + 1)), True
+
+        return [], is_range
+
+    def _parse(self, question: str, current_year: int) -> Dict:
+        result = {}
+        hits = self._automaton.scan(question)
+        result['is_comparison'] = hits.any('comparison')
+
+        # === 年份 ===
+        years: List[int] = []
+        if _RE_DIGIT.search(question):
+            years, from_range = self._parse_years(question)
+            if from_range:
+                result['is_comparison'] = True
+
+        if len(years) > 1:
+            result['years'] = years
+            result['year'] = years[0]
+            result['is_comparison'] = True
+        elif len(years) == 1:
+            result['year'] = years[0]
+            result['years'] = years
+        elif hits.any('all_periods'):
+            # 包含全期关键词时,查询所有期间的数据
+            result['query_all_periods'] = True
+            result['year'] = None
+            result['years'] = []
+            result['is_comparison'] = True
+            print(f"📅 检测到全期查询关键词,将查询所有期间数据")
+        else:
+            result['year'] = current_year
+            result['years'] = [current_year]
+
+        # === 季度 ===
+        quarters: List[int] = []
+        if not _QUARTER_CHARS.isdisjoint(question):
+            quarters = [int(q) for q in _RE_QUARTER_Q.findall(question)]
+            if not quarters:
+                quarters = [_CN_QUARTER[q] for q in _RE_QUARTER_CN.findall(question)]
+
+        if len(quarters) > 1:
+            result['quarters'] = sorted(set(quarters))
+            result['quarter'] = quarters[0]
+            result['is_comparison'] = True
+        elif len(quarters) == 1:
+            result['quarter'] = quarters[0]
+            result['quarters'] = quarters
+
+        # === 月份 ===
+        if '月' in question:
+            match = _RE_MONTH_RANGE.search(question)
+            if match:
+                start, end = int(match.group(1)), int(match.group(2))
+                if 1 <= start <= 12 and 1 <= end <= 12:
+                    result['start_month'] = start
+                    result['end_month'] = end
+            elif 'quarter' not in result:
+                match = _RE_MONTH.search(question)
+                if match and 1 <= int(match.group(1)) <= 12:
+                    result['month'] = int(match.group(1))
+
+        # === 是否全年 ===
+        if hits.any('full_year'):
+            result['is_full_year'] = True
+        elif 'quarter' not in result and 'month' not in result and 'start_month' not in result:
+            result['is_full_year'] = True
+
+        return result
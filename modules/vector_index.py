@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+税收优惠政策稠密向量索引(离线构建,本地检索,无需网络)
+功能:
+1. 对政策文本做字符 unigram/bigram TF-IDF(scipy.sparse 稀疏矩阵),再经截断SVD(LSA)降维为稠密向量
+2. 索引保存为 tax_incentives.db 旁的 .npz 文件(文档向量矩阵 + 词表 + idf + 投影矩阵)
+3. 查询时将问题投影到同一空间,NumPy向量化计算余弦相似度取top-k
+4. 索引文件更新(mtime变化)后自动重新载入
+
+构建: python tools/rebuild_vector_index.py(构建需要 scipy,检索只需要 NumPy)
+"""
+
+import math
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from modules.policy_index import fold_like
+
+
+# 参与向量化的字段及权重(优惠项目、关键词最能代表政策主题)
+VECTOR_FIELD_WEIGHTS = {
+    "incentive_items": 3.0,
+    "keywords": 2.0,
+    "tax_type": 1.0,
+    "incentive_method": 1.0,
+    "qualification": 1.0,
+    "detailed_rules": 1.0,
+    "explanation": 1.0,
+}
+
+# 默认索引文件(与 tax_incentives.db 同目录)
+DEFAULT_INDEX_NAME = "tax_incentives_vectors.npz"
+
+# 索引格式版本(分词或文件结构变化时递增)
+INDEX_FORMAT_VERSION = 1
+
+
+def default_index_path(db_path: str) -> str:
+    """数据库对应的默认向量索引路径"""
+    return str(Path(db_path).with_name(DEFAULT_INDEX_NAME))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分为字符 unigram + bigram(中文无需分词词典)
+
+    先做NFKC归一化和ASCII小写,去掉空白和标点;bigram不跨越被去掉的字符
+    """
+    tokens: List[str] = []
+    run: List[str] = []
+    for ch in fold_like(unicodedata.normalize('NFKC', text or "")):
+        if ch.isspace() or unicodedata.category(ch)[0] in ('P', 'S', 'Z', 'C'):
+            run = []
+            continue
+        tokens.append(ch)
+        if run:
+            tokens.append(run[-1] + ch)
+        run.append(ch)
+    return tokens
+
+
+def _document_terms(row: Dict) -> Counter:
+    """按字段权重统计一条政策的词频"""
+    tf: Counter = Counter()
+    for field, weight in VECTOR_FIELD_WEIGHTS.items():
+        value = row.get(field)
+        if value is None:
+            continue
+        for token in tokenize(str(value)):
+            tf[token] += weight
+    return tf
+
+
+def _tfidf(tf: Dict[str, float], vocab: Dict[str, int], idf: np.ndarray) -> Dict[int, float]:
+    """次线性TF × IDF(只保留词表内的词)"""
+    return {vocab[t]: (1.0 + math.log(n)) * float(idf[vocab[t]])
+            for t, n in tf.items() if t in vocab and n > 0}
+
+
+def build_vector_index(db_path: str, out_path: Optional[str] = None, dims: int = 128,
+                       min_df: int = 2, max_df_ratio: float = 0.5) -> Dict:
+    """
+    从数据库离线构建向量索引并写入 .npz
+
+    TF-IDF 矩阵以稀疏格式构建,截断SVD只求前 dims 个奇异值(scipy.sparse.linalg.svds),
+    内存与非零元素数成正比,不随 文档数×词表 增长
+
+    Args:
+        db_path: tax_incentives.db 路径
+        out_path: 输出路径(默认与数据库同目录)
+        dims: 向量维数上限
+        min_df: 词最少出现的文档数
+        max_df_ratio: 词出现文档比例上限(过于常见的词区分度低)
+
+    Returns:
+        构建统计 {documents, vocabulary, dims, path}
+    """
+    out_path = out_path or default_index_path(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = [dict(r) for r in conn.execute(
+            f"SELECT id, {', '.join(VECTOR_FIELD_WEIGHTS)} FROM tax_incentives ORDER BY id")]
+    finally:
+        conn.close()
+
+    ids = np.array([r["id"] for r in rows], dtype=np.int64)
+    doc_tfs = [_document_terms(r) for r in rows]
+    n_docs = len(doc_tfs)
+
+    df: Counter = Counter()
+    for tf in doc_tfs:
+        df.update(tf.keys())
+    max_df = max(1, int(max_df_ratio * n_docs)) if n_docs > 1 else 1
+    terms = sorted(t for t, n in df.items() if min_df <= n <= max_df) if n_docs > 1 else sorted(df)
+    vocab = {t: i for i, t in enumerate(terms)}
+    idf = np.array([math.log((1 + n_docs) / (1 + df[t])) + 1.0 for t in terms], dtype=np.float64)
+
+    from scipy import sparse
+    from scipy.sparse.linalg import svds
+
+    # 文档-词 TF-IDF 稀疏矩阵(行L2归一化)
+    row_idx, col_idx, values = [], [], []
+    for i, tf in enumerate(doc_tfs):
+        weights = _tfidf(tf, vocab, idf)
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        for col, weight in weights.items():
+            row_idx.append(i)
+            col_idx.append(col)
+            values.append(weight / norm)
+    matrix = sparse.csr_matrix((np.array(values, dtype=np.float64), (row_idx, col_idx)),
+                               shape=(n_docs, len(terms)))
+
+    # 截断SVD: X ≈ U Σ Vᵀ,投影矩阵 P = V,文档向量 = X P = U Σ
+    rank = min(n_docs, len(terms))
+    if rank:
+        if rank <= dims + 1:
+            # 文档或词很少时(svds 要求 k < rank)直接对小矩阵做完整SVD
+            u, sigma, vt = np.linalg.svd(matrix.toarray(), full_matrices=False)
+        else:
+            # 固定初始向量,同一数据重复构建得到相同结果
+            v0 = np.full(rank, 1.0 / math.sqrt(rank))
+            u, sigma, vt = svds(matrix, k=dims, v0=v0)
+        order = np.argsort(sigma)[::-1][:dims]
+        keep = order[sigma[order] > 1e-5]
+        sigma = sigma[keep]
+        projection = vt[keep].T.astype(np.float32)
+        vectors = (u[:, keep] * sigma).astype(np.float32)
+    else:
+        projection = np.zeros((len(terms), 0), dtype=np.float32)
+        vectors = np.zeros((n_docs, 0), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms > 0, norms, 1.0)
+
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = str(out_path) + ".tmp.npz"
+    np.savez(tmp_path, version=np.array(INDEX_FORMAT_VERSION), ids=ids, vectors=vectors,
+             projection=projection, idf=idf.astype(np.float32), vocab=np.array(terms, dtype=str),
+             built_at=np.array(datetime.now().isoformat()))
+    Path(tmp_path).replace(out_path)  # 原子替换,检索方不会读到写了一半的文件
+    return {"documents": n_docs, "vocabulary": len(terms), "dims": int(vectors.shape[1]),
+            "path": str(out_path)}
+
+
+class PolicyVectorIndex:
+    """政策稠密向量索引(只读,文件更新后自动重新载入)"""
+
+    def __init__(self, index_path: str):
+        """
+        初始化
+
+        Args:
+            index_path: .npz 索引文件路径
+        """
+        self.index_path = str(index_path)
+        self._mtime = None
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Optional[tuple]:
+        """按需(首次或文件变化时)载入索引;文件不存在或格式不符时返回None"""
+        try:
+            mtime = Path(self.index_path).stat().st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                self._data = None
+                self._mtime = mtime
+                try:
+                    with np.load(self.index_path, allow_pickle=False) as npz:
+                        if int(npz["version"]) != INDEX_FORMAT_VERSION:
+                            print(f"⚠️ 向量索引格式过旧,请运行 tools/rebuild_vector_index.py")
+                            return None
+                        vocab = {t: i for i, t in enumerate(npz["vocab"].tolist())}
+                        self._data = (npz["ids"], npz["vectors"], npz["projection"], npz["idf"], vocab)
+                    print(f"🧭 向量索引已载入: {len(self._data[0])} 条政策, {len(vocab)} 个词")
+                except (OSError, KeyError, ValueError) as e:
+                    print(f"⚠️ 向量索引载入失败: {e}")
+            return self._data
+
+    def available(self) -> bool:
+        """索引是否可用"""
+        data = self._load()
+        return data is not None and data[1].shape[1] > 0
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """将文本投影为单位向量;没有任何词在词表内时返回None"""
+        return self._embed(text, self._load())
+
+    @staticmethod
+    def _embed(text: str, data: Optional[tuple]) -> Optional[np.ndarray]:
+        """用已载入的索引数据投影文本(同一次检索始终使用同一份数据)"""
+        if data is None:
+            return None
+        _, _, projection, idf, vocab = data
+        weights = _tfidf(Counter(tokenize(text)), vocab, idf)
+        if not weights:
+            return None
+        cols = np.fromiter(weights.keys(), dtype=np.int64)
+        values = np.fromiter(weights.values(), dtype=np.float32)
+        vector = values @ projection[cols]
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def query(self, text: str, top_k: int = 50, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """
+        余弦相似度top-k检索
+
+        Args:
+            text: 查询文本
+            top_k: 返回数量
+            min_score: 相似度下限
+
+        Returns:
+            [(政策ID, 相似度)],按相似度降序
+        """
+        # 只取一次索引数据: 其他线程重新载入时替换的是 self._data,不影响本次检索
+        data = self._load()
+        vector = self._embed(text, data)
+        if vector is None or top_k <= 0:
+            return []
+        ids, vectors = data[0], data[1]
+        scores = vectors @ vector
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((ids[top], -scores[top]))]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Tuple[List[int], float]], k: float = 60.0) -> List[int]:
+    """
+    加权RRF融合多个排序列表
+
+    Args:
+        rankings: [(ID列表, 权重)]
+        k: RRF平滑常数
+
+    Returns:
+        融合后的ID列表(分数降序,同分按ID)
+    """
+    scores: Dict[int, float] = {}
+    for ids, weight in rankings:
+        for rank, policy_id in enumerate(ids):
+            scores[policy_id] = scores.get(policy_id, 0.0) + weight / (k + rank + 1)
+    return sorted(scores, key=lambda i: (-scores[i], i))
+
+
+# 全局实例(按索引路径共享)
+_vector_instances: Dict[str, PolicyVectorIndex] = {}
+_vector_lock = threading.Lock()
+
+
+def get_vector_index(index_path: str) -> PolicyVectorIndex:
+    """获取指定路径的全局向量索引实例"""
+    key = str(Path(index_path).resolve())
+    with _vector_lock:
+        if key not in _vector_instances:
+            _vector_instances[key] = PolicyVectorIndex(key)
+        return _vector_instances[key]
@@ -26,6 +26,9 @@ from modules.intent_classifier import IntentClassifier
 from modules.db_query import TaxIncentiveQuery
 from modules.deepseek_client import DeepSeekClient
 from modules.financial_query import FinancialQuery
+from modules.financial_analytics import FinancialAnalytics
+from modules.financial_results import FinancialResultSet
+from modules.company_catalog import get_company_catalog
 
 # 认证依赖项
 from server.routers.auth import get_current_user
@@ -250,14 +253,7 @@ async def generate_sse_response(
         # 获取公司信息
         company = None
         if company_id:
-            import sqlite3
-            conn = sqlite3.connect(FINANCIAL_DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM companies WHERE id = ?", (company_id,))
-            row = cursor.fetchone()
-            conn.close()
-            if row:
-                company = {"id": row[0], "name": row[1]}
+            company = get_company_catalog(FINANCIAL_DB_PATH).snapshot().get(company_id)
         # 4. 保存完整的 AI 回答
         # (此时 stream_financial_response 等已执行完毕，我们需要一种机制捕获产生的内容)
         # 由于是流式返回，上面的生成器已经在 yield 内容。
@@ -382,8 +378,14 @@ async def stream_tax_response(
     def send_content(content: str) -> str:
         return f"event: message\ndata: {json.dumps({'content': content}, ensure_ascii=False)}\n\n"
     
-    # 查询数据库
-    results, total_count, query_intent = db_query.search(question, limit=20)
+    def send_event(event_type: str, data: dict) -> str:
+        return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    # 查询数据库(在线程中执行,LLM辅助推理受截止时间约束,不阻塞事件循环)
+    results, total_count, query_intent, search_meta = await asyncio.to_thread(
+        db_query.search_with_meta, question, 20
+    )
+    yield send_event("search_meta", search_meta)
     
     if not results:
         yield send_content("📊 **本地知识库查询结果**\n\n")
@@ -512,7 +514,10 @@ async def stream_financial_response(
             # 使用前端选中的公司
             time_range = financial_query.extract_time_range(question)
             metrics = financial_query.extract_metrics(question)
-            results = financial_query.execute_query(company['id'], time_range, metrics, question)
+            results, query_meta = await asyncio.to_thread(
+                financial_query.execute_query_with_meta, company['id'], time_range, metrics, question
+            )
+            yield send_event("query_meta", query_meta)
             
             if not results:
                 yield send_content("📊 **企业财务数据查询**\n\n")
@@ -521,8 +526,11 @@ async def stream_financial_response(
             
             status = "success"
         else:
-            # 从问题中匹配公司
-            results, company, status = financial_query.search(question)
+            # 从问题中匹配公司(在线程中执行,Text-to-SQL回退不阻塞事件循环)
+            results, company, status, query_meta = await asyncio.to_thread(
+                financial_query.search_with_meta, question
+            )
+            yield send_event("query_meta", query_meta)
         
         if status == "company_not_found":
             yield send_content("📊 **企业财务数据查询**\n\n")
@@ -540,6 +548,10 @@ async def stream_financial_response(
         # 显示标题
         yield send_content("📊 **企业财务数据查询**\n\n")
         
+        # 结果转换为列式容器(期间 × 指标矩阵只构建一次,表格/对比/图表/总结共用)
+        result_set = FinancialResultSet.of(results)
+        analytics = FinancialAnalytics(result_set)
+        
         # === 检查是否需要提示默认平均值 ===
         # 条件: 1.数据是按年分组(结果中没有quarter) 2.指标是比率类 3.问题中没有明确指明"平均"等词
         try:
@@ -547,16 +559,14 @@ async def stream_financial_response(
             is_annual = True
             
             # 检查是否包含比率指标
-            for r in results:
-                m_name = r.get('metric_name', '')
+            for m_name in result_set.metrics:
                 # 简单判断: 包含"率", "比", "burden", "margin"等
-                if any(x in m_name for x in ["率", "比", "burden", "margin"]):
+                if any(x in (m_name or '') for x in ["率", "比", "burden", "margin"]):
                     has_ratio = True
-                
-                # 检查是否包含季度信息 (如果任一行有季度且不为None/0，则不是纯年度)
-                q = r.get('quarter') or r.get('period_quarter')
-                if q:
-                    is_annual = False
+            
+            # 检查是否包含季度信息 (如果任一行有季度且不为None/0，则不是纯年度)
+            if any(result_set.quarters):
+                is_annual = False
             
             # 检查问题关键词
             explicit_keywords = ["平均", "最大", "最小", "每季", "季度", "明细", "趋势", "detail", "avg", "max", "min"]
@@ -571,7 +581,7 @@ async def stream_financial_response(
 
         # === 1. 生成表格 (详细/标准模式) ===
         if response_mode in ["detailed", "standard"]:
-            formatted = financial_query.format_results(results, company)
+            formatted = financial_query.format_results(result_set, company)
             yield send_content(formatted)
         
         # === 2. 生成图表 (仅详细模式) ===
@@ -580,58 +590,24 @@ async def stream_financial_response(
             # 对比分析计算
             time_range = financial_query.extract_time_range(question)
             if time_range.get('is_comparison'):
-                comparison_result = financial_query.calculate_comparison(results, time_range)
+                comparison_result = financial_query.calculate_comparison(result_set, time_range)
                 if comparison_result.get('has_comparison'):
                     formatted_comparison = financial_query.format_comparison(comparison_result, company)
                     yield send_content(formatted_comparison)
             
             # 发送图表数据 (仅当开启显示且数据足够时)
-            if len(results) >= 2:
+            if len(result_set) >= 2:
                 try:
-                    # 1. 整理数据：按 metric 分组
-                    metrics_map = {} # metric -> { (year, q) -> value }
-                    all_periods = set()
-                    
-                    for r in results:
-                        m = r['metric_name']
-                        p = (r['year'], r.get('quarter'))
-                        all_periods.add(p)
-                        if m not in metrics_map:
-                            metrics_map[m] = {}
-                        metrics_map[m][p] = r['value']
-                    
-                    # 排序 periods
-                    sorted_periods = sorted(list(all_periods), key=lambda x: (x[0], x[1] or 0))
-                    labels = []
-                    for year, quarter in sorted_periods:
-                        labels.append(f"{year}年" + (f"Q{quarter}" if quarter else ""))
-                    
-                    unique_metrics = list(metrics_map.keys())
+                    # 1. 期间 × 指标矩阵(期间已排序,指标按首次出现顺序)及环比增长(向量化计算)
+                    labels = analytics.labels
+                    unique_metrics = result_set.metrics
                     
                     # 2. 决策：单指标 vs 多指标
                     if len(unique_metrics) == 1:
                         # === 单指标：使用详细对比图表 (Combo Chart) ===
                         metric = unique_metrics[0]
-                        values = []
-                        growth_amounts = []
-                        growth_rates = []
-                        
-                        prev_val = None
-                        for p in sorted_periods:
-                            val = metrics_map[metric].get(p)
-                            values.append(val or 0)
-                            
-                            if prev_val is not None and prev_val != 0 and val is not None:
-                                growth = val - prev_val
-                                growth_pct = (growth / abs(prev_val)) * 100
-                                growth_wan = growth / 10000 if abs(growth) >= 10000 else growth
-                                growth_amounts.append(round(growth_wan, 2))
-                                growth_rates.append(round(growth_pct, 2))
-                            else:
-                                growth_amounts.append(None)
-                                growth_rates.append(None)
-                            
-                            prev_val = val
+                        values = [val or 0 for val in result_set.column(0)]
+                        growth_amounts, growth_rates = analytics.chart_growth(0)
                         
                         # 如果有对比信息(growth_rates不全为None)，使用Combo图，否则普通Bar图
                         if any(g is not None for g in growth_rates):
@@ -693,10 +669,7 @@ async def stream_financial_response(
                         # === 图表1: 绝对值对比 (柱状图) ===
                         value_datasets = []
                         for idx, metric in enumerate(top_metrics):
-                            data_points = []
-                            for p in sorted_periods:
-                                val = metrics_map[metric].get(p, 0)
-                                data_points.append(val or 0)
+                            data_points = [val or 0 for val in result_set.column(idx)]
                             
                             value_datasets.append({
                                 "type": "bar",
@@ -718,19 +691,7 @@ async def stream_financial_response(
                         # === 图表2: 增长率对比 (柱状图) ===
                         growth_datasets = []
                         for idx, metric in enumerate(top_metrics):
-                            growth_rates = []
-                            prev_val = None
-                            
-                            for p in sorted_periods:
-                                val = metrics_map[metric].get(p)
-                                
-                                if prev_val is not None and prev_val != 0 and val is not None:
-                                    growth_pct = ((val - prev_val) / abs(prev_val)) * 100
-                                    growth_rates.append(round(growth_pct, 2))
-                                else:
-                                    growth_rates.append(None)
-                                
-                                prev_val = val
+                            _, growth_rates = analytics.chart_growth(idx)
                             
                             growth_datasets.append({
                                 "type": "bar",
@@ -761,15 +722,20 @@ async def stream_financial_response(
                 except Exception as e:
                     print(f"⚠️ 图表数据发送失败: {e}")
 
+        # 预计算的增长率/CAGR/背离等结论(LLM直接引用,不再自行从表格推算)
+        analytics_text = analytics.summary_text()
+        analytics_prompt = f"预计算分析(系统已计算,请直接引用,不要重新推算):\n{analytics_text}\n" if analytics_text else ""
+        
         # === 3. 分析总结 (详细/标准模式) ===
         if response_mode in ["detailed", "standard"]:
-            if len(results) > 2:
+            if len(result_set) > 2:
                 yield send_event("summary", {"content": "\n**分析总结**:\n"})
-                results_text = financial_query.format_results(results, company) # 重新获取格式化文本
+                results_text = financial_query.format_results(result_set, company)
                 prompt = f"""请根据以下企业财务数据,简要分析总结。用户问题: {question}
 数据:
 {results_text}
-要求: 根据返回的数据量大小,用5-20句话总结数据特点和趋势，分析可能存在的风险; 如有明显趋势变化,简要分析可能原因；如有两个或两个以上指标且相互可以对比分析，则需分析是否存在背离。不要重复原始数据。"""
+{analytics_prompt}
+要求: 根据返回的数据量大小,用5-20句话总结数据特点和趋势，分析可能存在的风险; 如有明显趋势变化,简要分析可能原因；如有两个或两个以上指标且相互可以对比分析，则需结合预计算的背离结果分析是否存在背离。不要重复原始数据。"""
                 
                 messages = [{"role": "user", "content": prompt}]
                 for chunk in deepseek.chat_completion(messages, stream=True):
@@ -783,7 +749,7 @@ async def stream_financial_response(
             
             # 将 results 转换为简化文本供 LLM 阅读
             raw_data_text = f"企业: {company['name']}\n数据:\n"
-            for r in results:
+            for r in result_set:
                 metric = r.get('metric_name')
                 year = r.get('year')
                 qtr = r.get('quarter')
@@ -813,9 +779,10 @@ async def stream_financial_response(
 
 查询到的原始数据:
 {raw_data_text}
+{analytics_prompt}
 
 要求:
-根据返回的数据量大小,用5-20句话总结数据特点和趋势，分析可能存在的风险; 如有明显趋势变化,简要分析可能原因；如有两个或两个以上指标且相互可以对比分析，则需分析是否存在背离。
+根据返回的数据量大小,用5-20句话总结数据特点和趋势，分析可能存在的风险; 如有明显趋势变化,简要分析可能原因；如有两个或两个以上指标且相互可以对比分析，则需结合预计算的背离结果分析是否存在背离。
 **不要使用表格** ；控制篇幅，便于移动端查看。
 
 请直接回答。"""
@@ -974,6 +941,49 @@ async def chat_sync(request: ChatRequest) -> ChatResponse:
         return ChatResponse(content=content, source="coze")
 
 
+@router.get("/chat/tax-policies")
+async def get_tax_policies_page(
+    tax_type: str,
+    entities: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None
+):
+    """
+    税收优惠政策分页查询（结构化查询翻页）
+
+    - entities: 实体关键词，逗号分隔
+    - cursor: 上一页返回的 next_cursor，为空表示第一页
+    """
+    _, db_query, _, _ = get_modules()
+    entity_keywords = [e.strip() for e in entities.split(",") if e.strip()] if entities else None
+    try:
+        results, total, next_cursor = db_query.structured_search_page(
+            tax_type, entity_keywords, limit=max(1, min(limit, 100)), cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results, "total": total, "next_cursor": next_cursor}
+
+
+@router.get("/admin/tax-search-cache")
+async def get_tax_search_cache_stats():
+    """
+    查看税收优惠问题级结果缓存状态（条目数、命中率、淘汰数等）
+    """
+    _, db_query, _, _ = get_modules()
+    return db_query.get_search_cache_stats()
+
+
+@router.post("/admin/tax-search-cache/flush")
+async def flush_tax_search_cache():
+    """
+    清空税收优惠问题级结果缓存
+    """
+    _, db_query, _, _ = get_modules()
+    removed = db_query.clear_search_cache()
+    return {"status": "success", "removed": removed}
+
+
 @router.get("/chat/history")
 async def get_history_api(limit: int = 50, current_user: dict = Depends(get_current_user)):
     """获取聊天历史 (主窗口消息)"""
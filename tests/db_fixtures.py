@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试用SQLite库构建工具(各测试文件共用,不含测试用例)
+功能:
+1. create_db: 按 {表名: 字段定义} 建表并写入 {表名: 行列表}
+2. create_financial_db: 财务查询相关测试共用的最小财务库,financial_metrics 行由调用方指定
+
+测试文件已把项目根目录加入 sys.path,统一用 from tests.db_fixtures import ... 引用
+"""
+
+import sqlite3
+from typing import Dict, Iterable, Optional
+
+# 财务表共用的期间字段
+PERIOD_COLUMNS = "company_id INTEGER, period_year INTEGER, period_quarter INTEGER"
+
+# 最小财务库: 利润表按月、资产负债表按季度
+FINANCIAL_SCHEMA = {
+    "companies": "id INTEGER PRIMARY KEY, name TEXT",
+    "company_aliases": "company_id INTEGER, alias TEXT",
+    "income_statements": f"{PERIOD_COLUMNS}, period_month INTEGER, "
+                         "total_revenue REAL, cost_of_sales REAL, net_profit REAL",
+    "balance_sheets": f"{PERIOD_COLUMNS}, total_assets REAL, total_liabilities REAL",
+    "financial_metrics": f"{PERIOD_COLUMNS}, period_month INTEGER, "
+                         "net_profit_margin REAL, asset_liability_ratio REAL",
+}
+
+
+def create_db(path: str, schema: Dict[str, str], rows: Optional[Dict[str, Iterable[tuple]]] = None):
+    """
+    构建测试库
+
+    Args:
+        path: 数据库文件路径
+        schema: {表名: 字段定义},按顺序建表
+        rows: {表名: 行列表},每行按字段顺序给出全部取值
+    """
+    conn = sqlite3.connect(path)
+    try:
+        for table, columns in schema.items():
+            conn.execute(f"CREATE TABLE {table} ({columns})")
+        for table, values in (rows or {}).items():
+            values = list(values)
+            if values:
+                placeholders = ", ".join("?" * len(values[0]))
+                conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", values)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def create_financial_db(path: str, metric_rows: Iterable[tuple] = ()):
+    """
+    构建最小的财务测试库: 企业1(华兴科技有限公司)2022-2023年的月度利润表和季度资产负债表
+
+    营业收入 = (年份-2000+月份)*100,营业成本为其60%,净利润为其10%;
+    总资产 = 1000*季度,总负债 = 400*季度
+
+    Args:
+        path: 数据库文件路径
+        metric_rows: financial_metrics 表的行
+                     (company_id, period_year, period_quarter, period_month, net_profit_margin, asset_liability_ratio)
+    """
+    income_rows = []
+    balance_rows = []
+    for year in (2022, 2023):
+        for quarter in (1, 2, 3, 4):
+            for month in range(quarter * 3 - 2, quarter * 3 + 1):
+                revenue = year - 2000 + month
+                income_rows.append((1, year, quarter, month, revenue * 100.0, revenue * 60.0, revenue * 10.0))
+            balance_rows.append((1, year, quarter, 1000.0 * quarter, 400.0 * quarter))
+    create_db(path, FINANCIAL_SCHEMA, {
+        "companies": [(1, '华兴科技有限公司')],
+        "income_statements": income_rows,
+        "balance_sheets": balance_rows,
+        "financial_metrics": metric_rows,
+    })
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试企业实体目录: 与逐个`in`匹配结果一致、别名/全名/简称优先级、数据变更刷新、数据库不存在、
+本地模糊匹配及仅在候选不明确时调用LLM
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.company_catalog import CompanyCatalog, CompanyCatalogSnapshot, short_company_name
+from modules.financial_query import FinancialQuery
+from modules.fuzzy_index import FuzzyNameIndex, substring_edit_distance
+
+
+def reference_match(companies, aliases, question):
+    """原有的逐个子串匹配实现(策略1-3)"""
+    for alias in sorted(aliases, key=len, reverse=True):
+        if alias in question:
+            return {'id': aliases[alias], 'name': companies.get(aliases[alias])}
+    sorted_companies = sorted(companies.items(), key=lambda x: len(x[1]), reverse=True)
+    for company_id, name in sorted_companies:
+        if name in question:
+            return {'id': company_id, 'name': name}
+    for company_id, name in sorted_companies:
+        short = short_company_name(name)
+        if short and len(short) >= 2 and short in question:
+            return {'id': company_id, 'name': name}
+    return None
+
+
+class TestCompanyCatalogSnapshot(unittest.TestCase):
+    COMPANIES = {1: "华兴科技有限公司", 2: "华兴科技发展有限公司", 3: "东方机械厂", 4: "蓝天公司"}
+    ALIASES = {"华兴": 1, "华兴发展": 2, "东机": 3}
+
+    def setUp(self):
+        self.catalog = CompanyCatalogSnapshot(dict(self.COMPANIES), dict(self.ALIASES))
+
+    def test_priority(self):
+        self.assertEqual(self.catalog.match("华兴发展的营业收入")["id"], 2)
+        self.assertEqual(self.catalog.match("东方机械厂2023年利润")["id"], 3)
+        self.assertEqual(self.catalog.match("蓝天的资产负债率"), {'id': 4, 'name': "蓝天公司"})
+        self.assertIsNone(self.catalog.match("增值税税率是多少"))
+
+    def test_mask(self):
+        self.assertEqual(self.catalog.mask("华兴科技发展有限公司和蓝天2023年收入"), "<企业>和<企业>2023年收入")
+        self.assertEqual(self.catalog.mask("东机与华兴发展", "X"), "X与X")
+        self.assertEqual(self.catalog.mask("增值税税率"), "增值税税率")
+
+    def test_matches_reference(self):
+        rng = random.Random(7)
+        chars = "华兴科技发展有限公司东方机械厂蓝天的利润收入"
+        for _ in range(2000):
+            question = "".join(rng.choice(chars) for _ in range(rng.randint(1, 12)))
+            self.assertEqual(self.catalog.match(question),
+                             reference_match(self.COMPANIES, self.ALIASES, question), question)
+
+    def test_mentions_company_excludes_short_names(self):
+        self.assertTrue(self.catalog.mentions_company("东机今年营收"))
+        self.assertFalse(self.catalog.mentions_company("东方机械今年营收"))
+        self.assertEqual(self.catalog.get(4), {'id': 4, 'name': "蓝天公司"})
+        self.assertIsNone(self.catalog.get(99))
+
+
+class TestFuzzyIndex(unittest.TestCase):
+    def test_substring_edit_distance(self):
+        self.assertEqual(substring_edit_distance("东方机械", "查询东方机械的利润", 1), 0)
+        self.assertEqual(substring_edit_distance("东方机械", "查询东方机戒的利润", 1), 1)
+        self.assertEqual(substring_edit_distance("东方机械", "查询东机的利润", 2), 2)
+        self.assertIsNone(substring_edit_distance("东方机械", "查询利润", 1))
+
+    def test_ranked_candidates(self):
+        index = FuzzyNameIndex([("华兴科技", 1), ("华兴科技发展", 2), ("远航物流股份", 3)], use_pinyin=False)
+        candidates = index.query("华星科技发展的营收")
+        self.assertEqual([c.key for c in candidates], [2, 1])
+        self.assertGreater(candidates[0].score, candidates[1].score)
+        self.assertEqual(index.query("增值税税率是多少"), [])
+
+
+class TestFinancialQueryCompanyResolution(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmpdir, "financial.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE companies (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE company_aliases (company_id INTEGER, alias TEXT)")
+        conn.executemany("INSERT INTO companies VALUES (?, ?)",
+                         [(1, "远航物流股份有限公司"), (2, "华兴科技有限公司"), (3, "华兴科创有限公司")])
+        conn.commit()
+        conn.close()
+        self.query = FinancialQuery(db_path=db_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_clear_fuzzy_match_skips_llm(self):
+        with mock.patch.object(self.query, "_extract_company_with_llm") as llm:
+            company = self.query.match_company("远航物留股份2023年营业收入")
+        llm.assert_not_called()
+        self.assertEqual(company, {'id': 1, 'name': "远航物流股份有限公司"})
+
+    def test_no_candidates_skips_llm(self):
+        with mock.patch.object(self.query, "_extract_company_with_llm") as llm:
+            self.assertIsNone(self.query.match_company("增值税税率是多少"))
+        llm.assert_not_called()
+
+    def test_ambiguous_sends_only_candidates(self):
+        with mock.patch.object(self.query, "_extract_company_with_llm", return_value=None) as llm:
+            self.query.match_company("华兴科x的利润")
+        llm.assert_called_once()
+        candidates = llm.call_args[0][1]
+        self.assertEqual(sorted(c['id'] for c in candidates), [2, 3])
+
+
+class TestCompanyCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE companies (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE company_aliases (company_id INTEGER, alias TEXT)")
+        conn.execute("INSERT INTO companies VALUES (1, '华兴科技有限公司')")
+        conn.execute("INSERT INTO company_aliases VALUES (1, '华兴')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_reloads_on_change(self):
+        catalog = CompanyCatalog(self.db_path)
+        first = catalog.snapshot()
+        self.assertIs(catalog.snapshot(), first)
+        self.assertIsNone(first.match("远航物流的收入"))
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO companies VALUES (2, '远航物流有限公司')")
+        conn.commit()
+        conn.close()
+        self.assertEqual(catalog.snapshot().match("远航物流的收入")["id"], 2)
+
+    def test_missing_database(self):
+        path = os.path.join(self.tmpdir, "missing.db")
+        snapshot = CompanyCatalog(path).snapshot()
+        self.assertEqual(len(snapshot), 0)
+        self.assertIsNone(snapshot.match("华兴的收入"))
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
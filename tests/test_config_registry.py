@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试JSON配置注册中心: 只解析一次、版本号、去抖动轮询、订阅通知、格式错误保留上一版本、使用方拿到的配置为副本
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config_registry import ConfigRegistry
+from modules.metrics_loader import MetricsLoader
+
+
+class TestConfigRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "config.json")
+        self._write({"a": 1})
+        # 关闭后台线程,由测试手动驱动轮询
+        self.registry = ConfigRegistry(poll_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _write(self, data, offset=10):
+        with open(self.path, "w", encoding="utf-8") as f:
+            if isinstance(data, str):
+                f.write(data)
+            else:
+                json.dump(data, f)
+        os.utime(self.path, (time.time() + offset, time.time() + offset))
+
+    def test_parsed_once(self):
+        with mock.patch("modules.config_registry.json.loads", wraps=json.loads) as loads:
+            first = self.registry.get(self.path)
+            second = self.registry.get(self.path)
+        self.assertIs(first, second)
+        self.assertEqual(first.data, {"a": 1})
+        self.assertEqual(loads.call_count, 1)
+        with self.assertRaises(AttributeError):
+            first.version = 99
+
+    def test_poll_is_debounced(self):
+        v1 = self.registry.get(self.path).version
+        self._write({"a": 2})
+        self.registry.poll()
+        self.assertEqual(self.registry.get(self.path).version, v1)
+        self.registry.poll()
+        snapshot = self.registry.get(self.path)
+        self.assertGreater(snapshot.version, v1)
+        self.assertEqual(snapshot.data, {"a": 2})
+
+    def test_refresh_and_subscribe(self):
+        received = []
+        self.registry.subscribe(self.path, received.append)
+        self._write({"a": 3})
+        self.registry.refresh(self.path)
+        self.assertEqual([s.data for s in received], [{"a": 3}])
+        # 未变化时不重复通知
+        self.registry.refresh()
+        self.assertEqual(len(received), 1)
+
+    def test_touch_without_change_keeps_version(self):
+        v1 = self.registry.get(self.path).version
+        os.utime(self.path, (time.time() + 20, time.time() + 20))
+        self.registry.refresh(self.path)
+        self.assertEqual(self.registry.get(self.path).version, v1)
+
+    def test_invalid_json_keeps_last_good(self):
+        v1 = self.registry.get(self.path).version
+        self._write("{broken")
+        self.registry.refresh(self.path)
+        snapshot = self.registry.get(self.path)
+        self.assertEqual(snapshot.version, v1)
+        self.assertEqual(snapshot.data, {"a": 1})
+
+    def test_missing_file(self):
+        snapshot = self.registry.get(os.path.join(self.tmpdir, "missing.json"))
+        self.assertIsNone(snapshot.data)
+        self.assertEqual(snapshot.fingerprint, "missing")
+
+    def test_metrics_loader_returns_private_copy(self):
+        with mock.patch("modules.metrics_loader.get_config_registry", return_value=self.registry):
+            loader = MetricsLoader(config_path=self.path)
+            config = loader.load_config()
+            config["a"] = 2
+            self.assertIs(loader.load_config(), config)       # 同一版本内返回同一对象
+            self.assertEqual(self.registry.get(self.path).data, {"a": 1})
+            self.assertEqual(MetricsLoader(config_path=self.path).load_config(), {"a": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
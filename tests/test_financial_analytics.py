@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试向量化财务分析: 环比口径与原逐期循环一致、同比、CAGR、滚动平均、背离识别、LLM预计算结论
+"""
+
+import math
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.financial_analytics import FinancialAnalytics, rolling_mean, sequential_change, to_array, to_list
+from modules.financial_query import FinancialQuery
+from modules.financial_results import FinancialResultSet
+
+
+def legacy_chart_growth(values):
+    """原图表代码中的逐期环比循环"""
+    growth_amounts, growth_rates = [], []
+    prev_val = None
+    for val in values:
+        if prev_val is not None and prev_val != 0 and val is not None:
+            growth = val - prev_val
+            growth_pct = (growth / abs(prev_val)) * 100
+            growth_wan = growth / 10000 if abs(growth) >= 10000 else growth
+            growth_amounts.append(round(growth_wan, 2))
+            growth_rates.append(round(growth_pct, 2))
+        else:
+            growth_amounts.append(None)
+            growth_rates.append(None)
+        prev_val = val
+    return growth_amounts, growth_rates
+
+
+def quarterly(metric, values, unit='元', start_year=2022):
+    return [{'metric_name': metric, 'year': start_year + i // 4, 'quarter': i % 4 + 1, 'value': v, 'unit': unit}
+            for i, v in enumerate(values)]
+
+
+class TestVectorizedGrowth(unittest.TestCase):
+    def test_chart_growth_matches_legacy_loop(self):
+        rng = random.Random(19)
+        for _ in range(500):
+            values = [rng.choice([None, 0.0, round(rng.uniform(-1e7, 1e7), 2), float(rng.randint(-5, 5))])
+                      for _ in range(rng.randint(1, 12))]
+            analytics = FinancialAnalytics(quarterly("营业收入", values))
+            self.assertEqual(analytics.chart_growth(0), legacy_chart_growth(values), values)
+
+    def test_sequential_change_matrix(self):
+        change, pct = sequential_change(to_array([[1.0, None], [2.0, 4.0], [None, 2.0], [3.0, 0.0]]))
+        self.assertEqual(to_list(change), [[None, None], [1.0, None], [None, -2.0], [None, -2.0]])
+        self.assertEqual(to_list(pct), [[None, None], [100.0, None], [None, -50.0], [None, -100.0]])
+
+    def test_rolling_mean(self):
+        values = to_array([1.0, 2.0, None, 4.0, 5.0, 6.0])
+        self.assertEqual(to_list(rolling_mean(values, 2)), [None, 1.5, None, None, 4.5, 5.5])
+        self.assertEqual(to_list(rolling_mean(values, 7)), [None] * 6)
+
+
+class TestFinancialAnalytics(unittest.TestCase):
+    def setUp(self):
+        revenue = [100.0, 110.0, 120.0, 130.0, 150.0, 160.0, 170.0, 180.0]
+        profit = [10.0, 12.0, 9.0, 14.0, 15.0, 13.0, 12.0, 11.0]
+        self.analytics = FinancialAnalytics(quarterly("营业收入", revenue) + quarterly("净利润", profit))
+
+    def test_yoy_and_cagr(self):
+        yoy = self.analytics.yoy_pct()
+        self.assertTrue(np.isnan(yoy[:4]).all())
+        self.assertAlmostEqual(yoy[4, 0], 50.0)
+        self.assertAlmostEqual(yoy[7, 1], (11.0 - 14.0) / 14.0 * 100)
+        # 2022Q1 -> 2023Q4 共 1.75 年
+        self.assertAlmostEqual(self.analytics.cagr()[0], ((180.0 / 100.0) ** (1 / 1.75) - 1) * 100)
+
+        annual = FinancialAnalytics([{'metric_name': "营收", 'year': y, 'quarter': None, 'value': v, 'unit': '元'}
+                                     for y, v in ((2020, 100.0), (2021, None), (2023, 200.0))])
+        self.assertAlmostEqual(annual.cagr()[0], (2 ** (1 / 3) - 1) * 100)
+        self.assertAlmostEqual(annual.overall_change_pct()[0], 100.0)
+        self.assertTrue(math.isnan(FinancialAnalytics(quarterly("亏损", [-5.0, 10.0])).cagr()[0]))
+
+    def test_divergences(self):
+        divergences = self.analytics.divergences()
+        self.assertEqual(len(divergences), 1)
+        self.assertEqual(divergences[0]['metrics'], ("营业收入", "净利润"))
+        self.assertEqual(divergences[0]['periods'], ["2022年Q3", "2023年Q2", "2023年Q3", "2023年Q4"])
+        self.assertFalse(divergences[0]['overall'])
+        self.assertEqual(FinancialAnalytics(quarterly("营业收入", [1.0, 2.0])).divergences(), [])
+
+    def test_summary_text(self):
+        summary = self.analytics.summary()
+        self.assertEqual(summary['metrics'][0]['last_growth_pct'], round((180 - 170) / 170 * 100, 2))
+        self.assertEqual(summary['metrics'][0]['rolling_mean'], 165.0)
+        text = self.analytics.summary_text()
+        self.assertIn("营业收入: 2022年Q1至2023年Q4, 累计变化 +80.00%", text)
+        self.assertIn("背离: 营业收入 与 净利润", text)
+        self.assertEqual(FinancialAnalytics([]).summary(), {'metrics': [], 'divergences': []})
+
+    def test_format_comparison_detail(self):
+        query = FinancialQuery(db_path=":memory:")
+        results = FinancialResultSet(quarterly("营业收入", [100.0, None, 0.0, 50.0, 60.0]))
+        comparison = query.calculate_comparison(results, {'is_comparison': True})
+        text = query.format_comparison(comparison, {'name': "测试企业"})
+        self.assertIn("| 2022年Q1 | 100.00 | n/a | n/a |", text)
+        self.assertIn("| 2022年Q3 | 0.00 | -100.00 | -100.00% |", text)
+        self.assertIn("| 2022年Q4 | 50.00 | n/a | n/a |", text)
+        self.assertIn("| 2023年Q1 | 60.00 | +10.00 | +20.00% |", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试列式查询结果容器: 期间 × 指标矩阵、兼容字典访问、对比分析与表格/列表格式化结果与原实现一致
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.financial_query import FinancialQuery
+from modules.financial_results import FinancialResultSet
+
+
+def legacy_comparisons(results):
+    """原 calculate_comparison 的分组与首末期对比"""
+    metrics_data = {}
+    for r in results:
+        metrics_data.setdefault(r['metric_name'], []).append(r)
+    comparisons = []
+    for metric, data in metrics_data.items():
+        if len(data) < 2:
+            continue
+        data.sort(key=lambda x: (x['year'], x.get('quarter', 0)))
+        valid_data = [d for d in data if d['value'] is not None]
+        if len(valid_data) < 2:
+            continue
+        first, last = valid_data[0], valid_data[-1]
+        change = last['value'] - first['value']
+        change_pct = (change / first['value'] * 100) if first['value'] else None
+        comparisons.append((metric, [(d['year'], d.get('quarter'), d['value'], d['unit']) for d in valid_data],
+                            change, change_pct, first['unit']))
+    return comparisons
+
+
+def legacy_table(query, results):
+    """原 _format_as_table 的矩阵构建"""
+    metrics = set(r['metric_name'] for r in results)
+    periods = sorted(set((r['year'], r.get('quarter')) for r in results), key=lambda x: (x[0], x[1] or 0))
+    data_matrix, units = {}, {}
+    for r in results:
+        data_matrix[((r['year'], r.get('quarter')), r['metric_name'])] = r['value']
+        units[r['metric_name']] = r['unit']
+    lines = []
+    for period in periods:
+        lines.append([query._format_value(data_matrix.get((period, m)), units.get(m, '元')) for m in sorted(metrics)])
+    return lines
+
+
+def random_results(rng, quarterly):
+    results = []
+    metrics = rng.sample(["营业收入", "净利润", "毛利率", "资产总计", "成本"], rng.randint(1, 4))
+    for metric in metrics:
+        unit = '%' if '率' in metric else '元'
+        for year in rng.sample([2021, 2022, 2023, 2024], rng.randint(1, 4)):
+            for quarter in (rng.sample([1, 2, 3, 4], rng.randint(1, 4)) if quarterly else [None]):
+                for _ in range(rng.choice([1, 1, 1, 2])):
+                    value = None if rng.random() < 0.15 else round(rng.uniform(-1e6, 1e9), 2)
+                    results.append({'metric_name': metric, 'year': year, 'quarter': quarter,
+                                    'value': value, 'unit': unit})
+    rng.shuffle(results)
+    return results
+
+
+class TestFinancialResultSet(unittest.TestCase):
+    def setUp(self):
+        self.query = FinancialQuery(db_path=":memory:")
+
+    def test_matrix_and_records(self):
+        results = [
+            {'metric_name': "营业收入", 'year': 2023, 'quarter': 2, 'value': 20.0, 'unit': '元'},
+            {'metric_name': "净利润", 'year': 2023, 'quarter': 1, 'value': 1.0, 'unit': '元'},
+            {'metric_name': "营业收入", 'year': 2023, 'quarter': 1, 'value': 10.0, 'unit': '元'},
+        ]
+        result_set = FinancialResultSet(results)
+        self.assertEqual(result_set.metrics, ["营业收入", "净利润"])
+        self.assertEqual(result_set.periods, [(2023, 1), (2023, 2)])
+        self.assertEqual(result_set.matrix, [[10.0, 1.0], [20.0, None]])
+        self.assertEqual(result_set.column(1), [1.0, None])
+        self.assertEqual(list(result_set), results)
+        self.assertEqual(result_set[2], results[2])
+        self.assertIs(FinancialResultSet.of(result_set), result_set)
+        self.assertFalse(FinancialResultSet([]))
+
+    def test_matches_legacy(self):
+        rng = random.Random(18)
+        company = {'id': 1, 'name': "测试企业"}
+        for trial in range(300):
+            results = random_results(rng, quarterly=trial % 2 == 0)
+            result_set = FinancialResultSet(results)
+
+            comparison = self.query.calculate_comparison(result_set, {'is_comparison': True})
+            self.assertEqual([(c['metric'], c['periods'], c['change'], c['change_pct'], c['unit'])
+                              for c in comparison['comparisons']], legacy_comparisons(results))
+            self.assertEqual(self.query.calculate_comparison(results, {'is_comparison': True}), comparison)
+
+            text = self.query.format_results(result_set, company)
+            self.assertEqual(self.query.format_results(results, company), text)
+            if "| 期间 |" in text:
+                rows = [line.split(" | ")[1:] for line in text.strip().split("\n")[4:]]
+                expected = legacy_table(self.query, results)
+                self.assertEqual([[cell.rstrip(" |") for cell in row] for row in rows], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
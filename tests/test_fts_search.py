@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试FTS5(trigram)检索后端: 匹配集合与LIKE一致 + bm25排序 + 触发器同步 + 降级
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tools.rebuild_fts_index as rebuild_tool
+from modules.db_query import TaxIncentiveQuery
+
+
+SRC_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "database", "tax_incentives.db")
+
+
+class TestFtsSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.db_path = os.path.join(cls.tmpdir, "tax_incentives.db")
+        shutil.copy(SRC_DB, cls.db_path)
+        rebuild_tool.LOG_PATH = os.path.join(cls.tmpdir, "fts_rebuild.log")
+
+        conn = sqlite3.connect(cls.db_path)
+        assert rebuild_tool.rebuild_fts_index(conn)
+        conn.close()
+
+        cls.fts = TaxIncentiveQuery(db_path=cls.db_path, search_backend="fts")
+        cls.like = TaxIncentiveQuery(db_path=cls.db_path, search_backend="like")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def _ids(self, results):
+        return [r['id'] for r in results]
+
+    def test_schema_upgraded(self):
+        conn = sqlite3.connect(self.db_path)
+        self.assertTrue(rebuild_tool.check_fts_schema(conn))
+        conn.close()
+
+    def test_entity_search_same_matches(self):
+        for entities in (["小微企业"], ["集成电路", "软件"], ["创业投资"], ["残疾人"]):
+            fts_ids = self._ids(self.fts.entity_search(entities, limit=1000))
+            like_ids = self._ids(self.like.entity_search(entities, limit=1000))
+            self.assertEqual(sorted(fts_ids), sorted(like_ids), entities)
+
+    def test_structured_search_same_matches(self):
+        for tax_type, entities in (("企业所得税", ["小微企业"]), ("增值税", ["软件", "集成电路"]),
+                                   ("契税", ["住房"]), ("增值税", None)):
+            fts_ids = self._ids(self.fts.structured_search(tax_type, entities, limit=1000))
+            like_ids = self._ids(self.like.structured_search(tax_type, entities, limit=1000))
+            self.assertEqual(sorted(fts_ids), sorted(like_ids), (tax_type, entities))
+            self.assertEqual(self.fts.count_structured_results(tax_type, entities),
+                             self.like.count_structured_results(tax_type, entities))
+
+    def test_keyword_search_same_matches(self):
+        for keywords in ("研发 加计扣除", "增值税 免征", "高新技术", "农业"):
+            fts_ids = self._ids(self.fts.keyword_search(keywords, limit=1000))
+            like_ids = self._ids(self.like.keyword_search(keywords, limit=1000))
+            self.assertEqual(sorted(fts_ids), sorted(like_ids), keywords)
+
+    def test_bm25_ranks_title_hits_first(self):
+        results = self.fts.entity_search(["创业投资"], limit=3)
+        self.assertTrue(results)
+        self.assertIn("创业投资", results[0]['incentive_items'])
+
+    def test_limit_returns_top_ranked(self):
+        full = self._ids(self.fts.keyword_search("研发 加计扣除", limit=1000))
+        top = self._ids(self.fts.keyword_search("研发 加计扣除", limit=5))
+        self.assertEqual(top, full[:5])
+
+    def test_triggers_keep_index_in_sync(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO tax_incentives (tax_type, incentive_items, incentive_method) VALUES (?, ?, ?)",
+            ("增值税", "量子隧穿设备", "即征即退"))
+        new_id = cursor.lastrowid
+        conn.commit()
+        self.assertEqual(self._ids(self.fts.entity_search(["量子隧穿"])), [new_id])
+
+        cursor.execute("UPDATE tax_incentives SET incentive_items = ? WHERE id = ?", ("光子晶体设备", new_id))
+        conn.commit()
+        self.assertEqual(self.fts.entity_search(["量子隧穿"]), [])
+        self.assertEqual(self._ids(self.fts.entity_search(["光子晶体"])), [new_id])
+
+        cursor.execute("DELETE FROM tax_incentives WHERE id = ?", (new_id,))
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.fts.entity_search(["光子晶体"]), [])
+
+    def test_fallback_without_trigram_table(self):
+        # FTS表为旧的unicode61分词时,fts后端应降级且匹配集合与LIKE一致
+        db_path = os.path.join(self.tmpdir, "legacy.db")
+        shutil.copy(SRC_DB, db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("DROP TABLE tax_incentives_fts")
+        conn.execute("CREATE VIRTUAL TABLE tax_incentives_fts USING fts5(tax_type, incentive_items)")
+        conn.commit()
+        conn.close()
+
+        query = TaxIncentiveQuery(db_path=db_path, search_backend="fts")
+        like = TaxIncentiveQuery(db_path=db_path, search_backend="like")
+        self.assertIsNone(query._fts_match(["小微企业"], query.ENTITY_SEARCH_COLUMNS))
+        self.assertEqual(sorted(self._ids(query.entity_search(["小微企业"], limit=1000))),
+                         sorted(self._ids(like.entity_search(["小微企业"], limit=1000))))
+
+
+if __name__ == "__main__":
+    unittest.main()
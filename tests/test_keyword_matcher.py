@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试多模式关键词自动机: 与逐个`in`判断结果一致、最长匹配、配置热更新重建
+"""
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config_registry import get_config_registry
+from modules.db_query import TaxIncentiveQuery
+from modules.keyword_matcher import KeywordAutomaton
+
+
+class TestKeywordAutomaton(unittest.TestCase):
+    def test_matches_naive_substring_search(self):
+        rng = random.Random(7)
+        alphabet = "增值税企业所得免征减即退"
+        words = {"a": ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(40)],
+                 "b": ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 3))) for _ in range(20)]}
+        automaton = KeywordAutomaton(words)
+        for _ in range(200):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+            hits = automaton.scan(text)
+            for category, keywords in words.items():
+                expected = [w for w in keywords if w in text]
+                self.assertEqual(hits.found(category), expected)
+                first = hits.first(category)
+                self.assertEqual(first.word if first else None, next((w for w in keywords if w in text), None))
+
+    def test_overlapping_and_positions(self):
+        hits = KeywordAutomaton({"k": ["即征即退", "退税", "征即"]}).scan("即征即退税")
+        self.assertEqual(hits.found("k"), ["即征即退", "退税", "征即"])
+        self.assertEqual({(m.word, m.start, m.end) for m in hits.matches("k")},
+                         {("即征即退", 0, 4), ("退税", 3, 5), ("征即", 1, 3)})
+
+    def test_longest_match(self):
+        automaton = KeywordAutomaton({"tax": ["增值税", "土地增值税"]})
+        self.assertEqual(automaton.scan("土地增值税优惠").first("tax", longest=True).word, "土地增值税")
+        self.assertEqual(automaton.scan("土地增值税优惠").first("tax").word, "增值税")
+        self.assertEqual(automaton.scan("增值税和土地增值税").first("tax", longest=True).word, "增值税")
+
+    def test_empty_keywords_ignored(self):
+        hits = KeywordAutomaton({"k": ["", "优惠"]}).scan("优惠")
+        self.assertEqual(hits.found("k"), ["优惠"])
+        self.assertFalse(KeywordAutomaton({"k": [""]}).scan("abc").any("k"))
+
+
+class TestTaxQueryKeywordMatching(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmpdir, "tax_query_config.json")
+        shutil.copy(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "config", "tax_query_config.json"), self.config_path)
+        self.query = TaxIncentiveQuery(config_path=self.config_path,
+                                       llm_cache_path=os.path.join(self.tmpdir, "llm_cache.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _extract(self, question):
+        with mock.patch.object(self.query, "_infer_tax_type_with_llm", return_value=None), \
+                mock.patch.object(self.query, "_extract_project_keywords_with_llm", return_value=None):
+            return self.query._extract_tax_and_incentive(question)
+
+    def test_priority_rules(self):
+        result = self._extract("土地增值税有哪些免征和减征的条件")
+        self.assertEqual((result[0], result[4]), ("土地增值税", "explicit"))
+        self.assertEqual(result[1], ["免征", "减征"])
+        self.assertEqual(result[3], "condition")
+
+        result = self._extract("企业所得方面高新技术企业有什么优惠")
+        self.assertEqual((result[0], result[4]), ("企业所得税", "explicit"))
+        self.assertEqual(result[2], ["高新技术"])
+        self.assertEqual(result[3], "general")
+
+    def test_rebuilt_on_config_reload(self):
+        self.assertEqual(self._extract("养老托育服务优惠")[2], [])
+        with open(self.config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        config["core_entity_keywords"].append("养老托育")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False)
+        os.utime(self.config_path, (time.time() + 10, time.time() + 10))
+        get_config_registry().refresh(self.config_path)
+        self.assertEqual(self._extract("养老托育服务优惠")[2], ["养老托育"])
+
+    def test_extract_keywords(self):
+        self.assertEqual(self.query._extract_keywords("软件企业增值税即征即退"), "增值税 即征即退 软件")
+        self.assertEqual(self.query._extract_keywords("无关问题"), "无关问题")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试LLM辅助推理的持久化缓存: 命中/未命中、TTL、LRU淘汰、配置变更失效、异常不缓存
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config_registry import get_config_registry
+from modules.db_query import TaxIncentiveQuery
+from modules.persistent_cache import PersistentCache
+
+
+class TestPersistentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "cache.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_hit_and_miss(self):
+        cache = PersistentCache(self.db_path, "t")
+        key = cache.make_key("a", 1)
+        self.assertEqual(cache.get(key), (False, None))
+        cache.set(key, None)
+        self.assertEqual(cache.get(key), (True, None))
+        cache.set(key, ["粮食"])
+        self.assertEqual(cache.get(key), (True, ["粮食"]))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 1))
+
+    def test_persists_across_instances(self):
+        PersistentCache(self.db_path, "t").set("k", "增值税")
+        self.assertEqual(PersistentCache(self.db_path, "t").get("k"), (True, "增值税"))
+        self.assertEqual(PersistentCache(self.db_path, "other").get("k"), (False, None))
+
+    def test_ttl_expiry(self):
+        cache = PersistentCache(self.db_path, "t", ttl_seconds=60)
+        cache.set("k", 1)
+        with mock.patch("modules.persistent_cache.time.time", return_value=time.time() + 120):
+            self.assertEqual(cache.get("k"), (False, None))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_lru_eviction(self):
+        cache = PersistentCache(self.db_path, "t", max_entries=2)
+        now = time.time()
+        with mock.patch("modules.persistent_cache.time.time", side_effect=[now, now + 1, now + 2, now + 3]):
+            cache.set("a", 1)
+            cache.set("b", 2)
+            cache.get("a")       # a 最近被访问
+            cache.set("c", 3)    # 淘汰 b
+        self.assertTrue(cache.get("a")[0])
+        self.assertFalse(cache.get("b")[0])
+        self.assertTrue(cache.get("c")[0])
+
+    def test_priority_evicted_last(self):
+        cache = PersistentCache(self.db_path, "t", max_entries=2)
+        now = time.time()
+        with mock.patch("modules.persistent_cache.time.time", side_effect=[now, now + 1, now + 2]):
+            cache.set("a", 1)
+            cache.set("b", 2)
+            self.assertTrue(cache.set_priority("a", 1))
+            cache.set("c", 3)    # a 虽然最久未访问,但优先级高,淘汰 b
+        self.assertTrue(cache.get("a")[0])
+        self.assertFalse(cache.get("b")[0])
+        self.assertTrue(cache.delete("c"))
+        self.assertFalse(cache.delete("c"))
+        self.assertFalse(cache.set_priority("c", 1))
+
+    def test_retain_tag(self):
+        cache = PersistentCache(self.db_path, "t")
+        cache.set("a", 1, tag="v1")
+        cache.set("b", 2, tag="v2")
+        self.assertEqual(cache.retain_tag("v2"), 1)
+        self.assertFalse(cache.get("a")[0])
+        self.assertTrue(cache.get("b")[0])
+
+
+class TestTaxQueryLlmCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmpdir, "tax_query_config.json")
+        shutil.copy(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "config", "tax_query_config.json"), self.config_path)
+        self.query = TaxIncentiveQuery(config_path=self.config_path,
+                                       llm_cache_path=os.path.join(self.tmpdir, "llm_cache.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _patch_llm(self, **kwargs):
+        client = mock.MagicMock()
+        client.chat_completion.configure_mock(**kwargs)
+        return mock.patch("modules.deepseek_client.DeepSeekClient", return_value=client), client
+
+    def test_repeat_and_near_repeat_questions_skip_llm(self):
+        patcher, client = self._patch_llm(return_value="企业所得税")
+        with patcher:
+            self.assertEqual(self.query._infer_tax_type_with_llm("研发费用怎么扣除?"), "企业所得税")
+            self.assertEqual(self.query._infer_tax_type_with_llm("研发费用 怎么扣除？"), "企业所得税")
+        self.assertEqual(client.chat_completion.call_count, 1)
+
+        patcher, client = self._patch_llm(return_value="粮食, 油页岩")
+        with patcher:
+            self.assertEqual(self.query._extract_project_keywords_with_llm("粮食企业优惠"), ["粮食", "油页岩"])
+            self.assertEqual(self.query._extract_project_keywords_with_llm("粮食企业优惠"), ["粮食", "油页岩"])
+        self.assertEqual(client.chat_completion.call_count, 1)
+        self.assertEqual(self.query.get_llm_cache_stats()["hits"], 2)
+
+    def test_failures_are_not_cached(self):
+        patcher, client = self._patch_llm(side_effect=Exception("API请求超时"))
+        with patcher, self.assertRaises(Exception):
+            self.query._infer_tax_type_with_llm("研发费用怎么扣除")
+        patcher, client = self._patch_llm(return_value="企业所得税")
+        with patcher:
+            self.assertEqual(self.query._infer_tax_type_with_llm("研发费用怎么扣除"), "企业所得税")
+        self.assertEqual(client.chat_completion.call_count, 1)
+
+    def test_config_change_invalidates(self):
+        patcher, client = self._patch_llm(return_value="增值税")
+        with patcher:
+            self.query._infer_tax_type_with_llm("进项税怎么抵扣")
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            config["core_entity_keywords"].append("测试实体")
+            with open(self.config_path, "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False)
+            os.utime(self.config_path, (time.time() + 10, time.time() + 10))
+            get_config_registry().refresh(self.config_path)
+            self.query._infer_tax_type_with_llm("进项税怎么抵扣")
+        self.assertEqual(client.chat_completion.call_count, 2)
+        self.assertEqual(self.query.get_llm_cache_stats()["entries"], 1)
+
+    def test_disabled_by_config(self):
+        self.query._load_config()["llm_cache"]["enabled"] = False
+        patcher, client = self._patch_llm(return_value="增值税")
+        with patcher:
+            self.query._infer_tax_type_with_llm("进项税怎么抵扣")
+            self.query._infer_tax_type_with_llm("进项税怎么抵扣")
+        self.assertEqual(client.chat_completion.call_count, 2)
+        self.assertEqual(self.query.get_llm_cache_stats(), {"enabled": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
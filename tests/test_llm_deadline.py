@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试LLM辅助推理并发执行与截止时间: 两个调用并发、超时或调用失败降级为关键词检索且不缓存、
+工作线程不读取配置、元数据上报
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.db_query import TaxIncentiveQuery
+
+
+class TestLlmDeadline(unittest.TestCase):
+    QUESTION = "会议展览服务有哪些优惠政策"
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmpdir, "tax_query_config.json")
+        shutil.copy(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "config", "tax_query_config.json"), self.config_path)
+        self.query = TaxIncentiveQuery(config_path=self.config_path,
+                                       llm_cache_path=os.path.join(self.tmpdir, "llm_cache.db"))
+        # 向量索引存在时未命中关键词的问题不会调用LLM,这里只测LLM路径
+        self.query._load_config()["hybrid_search"] = {"enabled": False}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _set_deadline(self, seconds):
+        self.query._load_config()["llm_inference"] = {"deadline_seconds": seconds}
+
+    def _slow(self, delay, value):
+        def func(question, llm_cache=None):
+            time.sleep(delay)
+            return value
+        return func
+
+    def test_calls_run_concurrently(self):
+        self._set_deadline(5)
+        with mock.patch.object(self.query, "_infer_tax_type_with_llm", self._slow(0.3, None)), \
+                mock.patch.object(self.query, "_extract_project_keywords_with_llm",
+                                  self._slow(0.3, ["会议展览"])):
+            start = time.perf_counter()
+            result = self.query._extract_tax_and_incentive(self.QUESTION)
+            elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(result[2], ["会议展览"])
+        meta = result[5]
+        self.assertEqual(meta["tasks"], ["project_keywords", "tax_type"])
+        self.assertEqual(meta["timed_out"], [])
+        self.assertEqual(meta["failed"], [])
+        self.assertFalse(meta["degraded"])
+
+    def test_deadline_degrades_to_keyword_search(self):
+        self._set_deadline(0.2)
+        with mock.patch.object(self.query, "_infer_tax_type_with_llm", self._slow(1.0, "增值税")), \
+                mock.patch.object(self.query, "_extract_project_keywords_with_llm",
+                                  self._slow(1.0, ["会议展览"])):
+            start = time.perf_counter()
+            results, total, intent, meta = self.query.search_with_meta(self.QUESTION, limit=5)
+            elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.9)
+        self.assertIn(meta["strategy"], ("keyword", "question"))
+        self.assertEqual(meta["llm"]["timed_out"], ["project_keywords", "tax_type"])
+        self.assertTrue(meta["llm"]["degraded"])
+        self.assertEqual(meta["llm"]["deadline_seconds"], 0.2)
+
+    def test_failed_task_degrades_and_is_not_cached(self):
+        self._set_deadline(5)
+        client = mock.MagicMock()
+        client.chat_completion.side_effect = ConnectionError("网络不可达")
+        with mock.patch("modules.deepseek_client.DeepSeekClient", return_value=client):
+            _, _, _, meta = self.query.search_with_meta(self.QUESTION, limit=5)
+            self.assertEqual(meta["llm"]["failed"], ["project_keywords", "tax_type"])
+            self.assertEqual(meta["llm"]["timed_out"], [])
+            self.assertTrue(meta["llm"]["degraded"])
+            self.assertEqual(self.query.get_search_cache_stats()["entries"], 0)
+            self.assertEqual(self.query.get_llm_cache_stats()["entries"], 0)
+            _, _, _, meta = self.query.search_with_meta(self.QUESTION, limit=5)
+        self.assertEqual(meta["cache"], "miss")
+        self.assertEqual(client.chat_completion.call_count, 4)
+
+    def test_workers_do_not_load_config(self):
+        self._set_deadline(5)
+        main_thread = threading.current_thread()
+        load_threads = []
+        load_config = self.query._load_config
+
+        def tracking_load_config():
+            load_threads.append(threading.current_thread())
+            return load_config()
+
+        client = mock.MagicMock()
+        client.chat_completion.return_value = "无"
+        with mock.patch.object(self.query, "_load_config", tracking_load_config), \
+                mock.patch("modules.deepseek_client.DeepSeekClient", return_value=client):
+            result = self.query._extract_tax_and_incentive(self.QUESTION)
+        self.assertEqual(client.chat_completion.call_count, 2)
+        self.assertEqual(result[5]["tasks"], ["project_keywords", "tax_type"])
+        self.assertTrue(load_threads)
+        self.assertTrue(all(thread is main_thread for thread in load_threads))
+        self.assertEqual(self.query.get_llm_cache_stats()["entries"], 2)
+
+    def test_no_llm_calls_when_keywords_match(self):
+        with mock.patch.object(self.query, "_infer_tax_type_with_llm") as infer, \
+                mock.patch.object(self.query, "_extract_project_keywords_with_llm") as extract:
+            result = self.query._extract_tax_and_incentive("集成电路企业所得税优惠")
+        infer.assert_not_called()
+        extract.assert_not_called()
+        self.assertEqual(result[0], "企业所得税")
+        self.assertEqual(result[5]["tasks"], [])
+
+    def test_search_keeps_three_tuple(self):
+        with mock.patch.object(self.query, "_infer_tax_type_with_llm", return_value=None), \
+                mock.patch.object(self.query, "_extract_project_keywords_with_llm", return_value=None):
+            self.assertEqual(len(self.query.search(self.QUESTION, limit=3)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
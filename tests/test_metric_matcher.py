@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试指标名称匹配: 最左最长不重叠命中及位置、子串去重、与原实现一致(无重叠时)、配置热更新重建
+"""
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config_registry import get_config_registry
+from modules.financial_query import FinancialQuery
+from modules.keyword_matcher import KeywordAutomaton
+from modules.metrics_loader import MetricsLoader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_extract_metrics(names, question):
+    """原实现: 按长度降序逐个`in`判断,跳过已找到指标的子串"""
+    found = []
+    for name in sorted(set(names), key=len, reverse=True):
+        if name in question and not any(name in existing for existing in found):
+            found.append(name)
+    return found
+
+
+class TestNonOverlapping(unittest.TestCase):
+    def test_leftmost_longest(self):
+        automaton = KeywordAutomaton({'metric': ["营业收入", "收入", "收入总额", "总额", "净利润"]})
+        hits = automaton.scan("营业收入总额和净利润")
+        self.assertEqual([(m.word, m.start, m.end) for m in hits.non_overlapping('metric')],
+                         [("营业收入", 0, 4), ("总额", 4, 6), ("净利润", 7, 10)])
+
+
+class TestExtractMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmpdir, "metrics_config.json")
+        shutil.copy(os.path.join(ROOT, "config", "metrics_config.json"), self.config_path)
+        self.query = FinancialQuery(db_path=os.path.join(self.tmpdir, "financial.db"))
+        self.query._metrics_loader = MetricsLoader(config_path=self.config_path,
+                                                   db_path=os.path.join(self.tmpdir, "financial.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_spans_and_dedup(self):
+        question = "2023年营业收入、净利润和资产负债率是多少"
+        matches = self.query.match_metrics(question)
+        self.assertEqual([m.word for m in matches], ["营业收入", "净利润", "资产负债率"])
+        for m in matches:
+            self.assertEqual(question[m.start:m.end], m.word)
+        self.assertEqual(self.query.extract_metrics(question), ["资产负债率", "营业收入", "净利润"])
+        self.assertEqual(self.query.extract_metrics("公司地址在哪"), [])
+
+    def test_matches_legacy_with_separators(self):
+        names = list(set(self.query.metrics_map) | set(self.query.formulas))
+        rng = random.Random(14)
+        for _ in range(1000):
+            question = "、".join(rng.choice(names) for _ in range(rng.randint(1, 3)))
+            legacy = legacy_extract_metrics(names, question)
+            found = self.query.extract_metrics(question)
+            # 同长度指标在原实现中顺序不确定,只比较集合
+            if len({len(m) for m in legacy}) == len(legacy) and self._no_overlap(names, question):
+                self.assertEqual(found, legacy, question)
+            self.assertTrue(set(found) <= set(legacy), question)
+
+    @staticmethod
+    def _no_overlap(names, question):
+        """问题中的指标命中两两不重叠(或互相包含)"""
+        spans = [(i, i + len(n)) for n in set(names) for i in range(len(question)) if question.startswith(n, i)]
+        return all(a[1] <= b[0] or b[1] <= a[0] or (a[0] <= b[0] and b[1] <= a[1]) or (b[0] <= a[0] and a[1] <= b[1])
+                   for a in spans for b in spans)
+
+    def test_rebuilt_on_config_reload(self):
+        matcher = self.query.metrics_loader.get_metric_matcher()
+        self.assertIs(self.query.metrics_loader.get_metric_matcher(), matcher)
+        self.assertEqual(self.query.extract_metrics("测试指标甲是多少"), [])
+
+        with open(self.config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        table = next(iter(config["tables"].values()))
+        field = next(iter(table["fields"].values()))
+        field["aliases"].append("测试指标甲")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False)
+        os.utime(self.config_path, (time.time() + 10, time.time() + 10))
+        get_config_registry().refresh(self.config_path)
+
+        self.assertEqual(self.query.extract_metrics("测试指标甲是多少"), ["测试指标甲"])
+        self.assertIsNot(self.query.metrics_loader.get_metric_matcher(), matcher)
+
+
+if __name__ == "__main__":
+    unittest.main()
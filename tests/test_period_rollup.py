@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试按月累计汇总: 任意月份范围与逐月求和一致、导入/修改/删除后增量刷新、字段变化和表重建时整表重建、
+查询只读(未刷新的分区返回None)、无月度数据时回退季度近似、FinancialQuery 月份/季度范围查询
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.financial_query import FinancialQuery
+from modules.period_rollup import PeriodRollup
+
+CREATE_INCOME = """
+    CREATE TABLE income_statements (
+        id INTEGER PRIMARY KEY, company_id INTEGER, period_year INTEGER, period_quarter INTEGER,
+        period_month INTEGER, total_revenue REAL, net_profit REAL, remark TEXT
+    )
+"""
+
+
+def monthly_rows(company_id, year, rng):
+    return [(company_id, year, (month - 1) // 3 + 1, month, float(rng.randint(1, 1000)),
+             float(rng.randint(-50, 200)), 'x') for month in range(1, 13)]
+
+
+class TestPeriodRollup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        rng = random.Random(17)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE companies (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE company_aliases (company_id INTEGER, alias TEXT)")
+        conn.execute(CREATE_INCOME)
+        for company_id in (1, 2):
+            for year in (2022, 2023):
+                conn.executemany("INSERT INTO income_statements (company_id, period_year, period_quarter, "
+                                 "period_month, total_revenue, net_profit, remark) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 monthly_rows(company_id, year, rng))
+        conn.commit()
+        conn.close()
+        self.rollup = PeriodRollup(self.db_path)
+
+    def tearDown(self):
+        self.rollup._watcher.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def execute(self, *statements):
+        conn = sqlite3.connect(self.db_path)
+        for sql in statements:
+            conn.execute(sql)
+        conn.commit()
+        conn.close()
+
+    def brute_force(self, field, company_id, year, start, end):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(f"SELECT SUM({field}) FROM income_statements WHERE company_id = ? "
+                                "AND period_year = ? AND period_month BETWEEN ? AND ?",
+                                (company_id, year, start, end)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def assert_all_ranges(self):
+        for company_id in (1, 2):
+            for year in (2022, 2023):
+                for start in range(1, 13):
+                    for end in range(start, 13):
+                        totals = self.rollup.range_totals('income_statements', ['total_revenue', 'net_profit'],
+                                                          company_id, year, start, end)
+                        if self.brute_force('total_revenue', company_id, year, start, end) is None:
+                            self.assertIsNone(totals)
+                            continue
+                        for field in ('total_revenue', 'net_profit'):
+                            self.assertAlmostEqual(totals[field],
+                                                   self.brute_force(field, company_id, year, start, end))
+
+    def tables(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        finally:
+            conn.close()
+
+    def test_read_path_does_not_write(self):
+        before = self.tables()
+        self.assertIsNone(self.rollup.range_total('income_statements', 'total_revenue', 1, 2023, 3, 8))
+        self.assertEqual(self.tables(), before)
+        self.assertNotIn('period_rollups', before)
+
+    def test_ranges_match_brute_force(self):
+        self.assertEqual(self.rollup.refresh('income_statements'), 4)
+        self.assert_all_ranges()
+        self.assertEqual(self.rollup.refresh('income_statements'), 0)
+        self.assertIsNone(self.rollup.range_total('income_statements', 'total_revenue', 1, 2021, 1, 12))
+        self.assertIsNone(self.rollup.range_total('income_statements', 'total_revenue', 1, 2023, 8, 3))
+
+    def test_incremental_refresh(self):
+        self.rollup.refresh('income_statements')
+        self.execute("UPDATE income_statements SET total_revenue = total_revenue + 5 "
+                     "WHERE company_id = 1 AND period_year = 2023 AND period_month = 4",
+                     "DELETE FROM income_statements WHERE company_id = 2 AND period_year = 2022 AND period_month = 7")
+        # 导入后未刷新的分区不使用汇总表,其余分区不受影响
+        self.assertIsNone(self.rollup.range_total('income_statements', 'total_revenue', 1, 2023, 1, 12))
+        self.assertAlmostEqual(self.rollup.range_total('income_statements', 'total_revenue', 1, 2022, 1, 12),
+                               self.brute_force('total_revenue', 1, 2022, 1, 12))
+        self.assertEqual(self.rollup.refresh('income_statements'), 2)
+        self.assert_all_ranges()
+
+        self.execute("INSERT INTO income_statements (company_id, period_year, period_quarter, period_month, "
+                     "total_revenue, net_profit) VALUES (3, 2024, 1, 2, 100, 10)")
+        self.assertEqual(self.rollup.refresh('income_statements'), 1)
+        self.assertEqual(self.rollup.range_total('income_statements', 'total_revenue', 3, 2024, 1, 6), 100)
+        self.assertIsNone(self.rollup.range_total('income_statements', 'total_revenue', 3, 2024, 3, 6))
+
+    def test_rebuild_on_schema_change(self):
+        self.rollup.refresh('income_statements')
+        self.execute("ALTER TABLE income_statements ADD COLUMN other_income REAL DEFAULT 1")
+        self.assertIsNone(self.rollup.range_total('income_statements', 'total_revenue', 1, 2023, 3, 8))
+        self.assertEqual(self.rollup.refresh('income_statements'), 4)
+        self.assertEqual(self.rollup.range_total('income_statements', 'other_income', 1, 2023, 3, 8), 6)
+
+        # 表被删除重建后触发器丢失,整表重建
+        self.execute("DROP TABLE income_statements", CREATE_INCOME,
+                     "INSERT INTO income_statements (company_id, period_year, period_quarter, period_month, "
+                     "total_revenue, net_profit) VALUES (1, 2023, 1, 1, 42, 1)")
+        self.assertIsNone(self.rollup.range_total('income_statements', 'total_revenue', 1, 2023, 1, 12))
+        self.assertEqual(self.rollup.refresh('income_statements'), 1)
+        self.assertEqual(self.rollup.range_total('income_statements', 'total_revenue', 1, 2023, 1, 12), 42)
+        self.assertIsNone(self.rollup.range_total('income_statements', 'total_revenue', 2, 2023, 1, 12))
+
+    def test_unsupported_table(self):
+        self.execute("CREATE TABLE balance_sheets (company_id INTEGER, period_year INTEGER, total_assets REAL)")
+        self.assertEqual(self.rollup.refresh('balance_sheets'), -1)
+        self.assertIsNone(self.rollup.range_total('balance_sheets', 'total_assets', 1, 2023, 1, 3))
+
+
+class TestFinancialQueryMonthRange(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE companies (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE company_aliases (company_id INTEGER, alias TEXT)")
+        conn.execute(CREATE_INCOME)
+        for month in range(1, 13):
+            conn.execute("INSERT INTO income_statements (company_id, period_year, period_quarter, period_month, "
+                         "total_revenue) VALUES (1, 2023, ?, ?, ?)", ((month - 1) // 3 + 1, month, month * 100.0))
+        # 2022年只有季度数据(period_month = 0)
+        for quarter in range(1, 5):
+            conn.execute("INSERT INTO income_statements (company_id, period_year, period_quarter, period_month, "
+                         "total_revenue) VALUES (1, 2022, ?, 0, ?)", (quarter, quarter * 1000.0))
+        conn.commit()
+        conn.close()
+        self.query = FinancialQuery(db_path=self.db_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_exact_month_range(self):
+        time_range = self.query.extract_time_range("2023年3-8月营业收入")
+        expected = sum(m * 100.0 for m in range(3, 9))
+        # 汇总表尚未建立: 按月求和,不写数据库
+        results = self.query._query_configured(1, time_range, ["营业收入"])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['quarter'], "3-8月")
+        self.assertEqual(results[0]['value'], expected)
+
+        PeriodRollup(self.db_path).refresh('income_statements')
+        self.assertEqual(self.query._query_configured(1, time_range, ["营业收入"])[0]['value'], expected)
+
+    def test_quarters_use_rollup(self):
+        time_range = self.query.extract_time_range("2023年一季度和三季度营业收入")
+        expected = [(2023, 1, 600.0), (2023, 3, 2400.0)]
+        results = self.query._query_configured(1, time_range, ["营业收入"])
+        self.assertEqual([(r['year'], r['quarter'], r['value']) for r in results], expected)
+
+        PeriodRollup(self.db_path).refresh('income_statements')
+        with mock.patch.object(FinancialQuery, '_run_batch', side_effect=AssertionError("SUM scan")):
+            results = self.query._query_configured(1, time_range, ["营业收入"])
+        self.assertEqual([(r['year'], r['quarter'], r['value']) for r in results], expected)
+
+    def test_quarterly_data_uses_quarter_approximation(self):
+        time_range = self.query.extract_time_range("2022年3-8月营业收入")
+        results = self.query._query_configured(1, time_range, ["营业收入"])
+        self.assertEqual(results[0]['value'], 1000.0 + 2000.0 + 3000.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
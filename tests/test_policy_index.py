@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试n-gram倒排索引: 与SQL LIKE检索结果一致性 + 数据变更后自动重建
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.db_query import TaxIncentiveQuery
+from modules.policy_index import PolicyNgramIndex
+
+
+ENTITY_CASES = [
+    ["小微企业"], ["高新技术"], ["集成电路", "软件"], ["残疾人"],
+    ["粮食"], ["海南"], ["会议展览"], ["创业投资", "天使投资"], ["不存在的关键词xyz"],
+]
+
+STRUCTURED_CASES = [
+    ("企业所得税", None), ("增值税", None), ("个人所得税", None), ("契税", None),
+    ("企业所得税", ["小微企业"]), ("增值税", ["软件", "集成电路"]), ("增值税", ["粮食"]),
+    ("印花税", ["小微企业"]), ("房产税", ["不存在的关键词xyz"]),
+]
+
+KEYWORD_CASES = [
+    "增值税 免征", "高新技术", "研发 加计扣除", "农业", "科技 环保", "节能",
+    "小微企业所得税减免政策", "ABC", "a", "税",
+]
+
+
+class TestPolicyIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.like = TaxIncentiveQuery(search_backend="like")
+        cls.ngram = TaxIncentiveQuery(search_backend="ngram")
+
+    def _ids(self, results):
+        return [r['id'] for r in results]
+
+    def test_entity_search_matches_like(self):
+        for entities in ENTITY_CASES:
+            self.assertEqual(
+                self._ids(self.ngram.entity_search(entities, limit=1000)),
+                self._ids(self.like.entity_search(entities, limit=1000)),
+                entities)
+            self.assertEqual(
+                self._ids(self.ngram.entity_search(entities, limit=5)),
+                self._ids(self.like.entity_search(entities, limit=5)),
+                entities)
+
+    def test_structured_search_matches_like(self):
+        for tax_type, entities in STRUCTURED_CASES:
+            self.assertEqual(
+                self._ids(self.ngram.structured_search(tax_type, entities, limit=1000)),
+                self._ids(self.like.structured_search(tax_type, entities, limit=1000)),
+                (tax_type, entities))
+            self.assertEqual(
+                self.ngram.count_structured_results(tax_type, entities),
+                self.like.count_structured_results(tax_type, entities),
+                (tax_type, entities))
+
+    def test_keyword_search_matches_like(self):
+        for keywords in KEYWORD_CASES:
+            self.assertEqual(
+                self._ids(self.ngram.keyword_search(keywords, limit=1000)),
+                self._ids(self.like.keyword_search(keywords, limit=1000)),
+                keywords)
+
+    def test_wildcard_terms_fall_back_to_sql(self):
+        index = PolicyNgramIndex(self.like.db_path)
+        index.ensure_fresh()
+        self.assertIsNone(index.match_ids(["100%"], ("detailed_rules",)))
+        self.assertEqual(
+            self._ids(self.ngram.keyword_search("免_", limit=1000)),
+            self._ids(self.like.keyword_search("免_", limit=1000)))
+
+
+class TestPolicyIndexRefresh(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        src = TaxIncentiveQuery(search_backend="like").db_path
+        self.db_path = os.path.join(self.tmpdir, "tax_incentives.db")
+        shutil.copy(src, self.db_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_rebuild_after_insert(self):
+        query = TaxIncentiveQuery(db_path=self.db_path, search_backend="ngram")
+        self.assertEqual(query.entity_search(["量子隧穿"]), [])
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "INSERT INTO tax_incentives (tax_type, incentive_items, incentive_method) VALUES (?, ?, ?)",
+            ("增值税", "量子隧穿设备", "免征"))
+        conn.commit()
+        conn.close()
+
+        results = query.entity_search(["量子隧穿"])
+        self.assertEqual([r['incentive_items'] for r in results], ["量子隧穿设备"])
+        self.assertEqual(query.count_structured_results("增值税", ["量子隧穿"]), 1)
+
+
+if __name__ == "__main__":
+    # 简单性能对比
+    like = TaxIncentiveQuery(search_backend="like")
+    ngram = TaxIncentiveQuery(search_backend="ngram")
+    ngram.entity_search(["小微企业"])  # 预热索引
+    for name, q in (("like", like), ("ngram", ngram)):
+        start = time.perf_counter()
+        for _ in range(50):
+            q.count_structured_results("企业所得税", ["小微企业"])
+        print(f"{name}: {(time.perf_counter() - start) / 50 * 1000:.3f} ms/次")
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试政策常驻内存存储: 与SQL查询结果一致、数据变更后重新载入
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.db_query import TaxIncentiveQuery
+from modules.policy_store import get_policy_store
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestPolicyStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "tax_incentives.db")
+        shutil.copy(os.path.join(ROOT, "database", "tax_incentives.db"), self.db_path)
+        self.resident = TaxIncentiveQuery(db_path=self.db_path, resident=True)
+        self.sql = TaxIncentiveQuery(db_path=self.db_path, resident=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_statistics_match_sql(self):
+        resident, sql = self.resident.get_statistics(), self.sql.get_statistics()
+        self.assertEqual(resident['total_count'], sql['total_count'])
+        self.assertEqual(resident['by_tax_type'], sql['by_tax_type'])
+        self.assertEqual(sorted(resident['by_incentive_method'].values(), reverse=True),
+                         sorted(sql['by_incentive_method'].values(), reverse=True))
+
+    def test_lookups_match_sql(self):
+        for policy_id in (1, 100, 10 ** 9):
+            self.assertEqual(self.resident.get_by_id(policy_id), self.sql.get_by_id(policy_id))
+        for tax_type in ("增值税", "契税", "不存在的税"):
+            self.assertEqual(self.resident.search_by_tax_type(tax_type, limit=20),
+                             self.sql.search_by_tax_type(tax_type, limit=20))
+        for method in ("免征", "即征即退", "EXEMPT"):
+            self.assertEqual(self.resident.search_by_incentive_method(method, limit=20),
+                             self.sql.search_by_incentive_method(method, limit=20))
+        ids = [5, 3, 10 ** 9, 1]
+        self.assertEqual(self.resident._fetch_by_ids(ids), self.sql._fetch_by_ids(ids))
+
+    def test_search_results_match_sql(self):
+        for tax_type, entities in (("增值税", ["软件"]), ("企业所得税", None)):
+            self.assertEqual(self.resident.structured_search_page(tax_type, entities, limit=10),
+                             self.sql.structured_search_page(tax_type, entities, limit=10))
+
+    def test_reload_on_data_change(self):
+        before = self.resident.get_statistics()['total_count']
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO tax_incentives (tax_type, incentive_items) VALUES ('契税', '常驻测试')")
+        new_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.resident.get_statistics()['total_count'], before + 1)
+        self.assertEqual(self.resident.get_by_id(new_id)['incentive_items'], "常驻测试")
+
+    def test_snapshot_is_shared(self):
+        self.resident.get_statistics()
+        store = get_policy_store(self.db_path)
+        self.assertIs(store.snapshot(), store.snapshot())
+
+
+if __name__ == "__main__":
+    unittest.main()
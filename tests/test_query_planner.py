@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试配置指标批量查询: 每张表一条SQL、结果与逐指标查询一致、预计算为空时按公式批量计算、批量出错时逐个回退
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.financial_query import FinancialQuery
+from modules.query_planner import QueryPlanner, period_filter
+from tests.db_fixtures import create_financial_db
+
+
+# 2023年净利率预计算值为空
+METRIC_ROWS = [(1, year, quarter, None, 10.0 if year == 2022 else None, 40.0)
+               for year in (2022, 2023) for quarter in (1, 2, 3, 4)]
+
+
+FORMULAS = {
+    '测试净利率': {'expression': 'net_profit * 100.0 / NULLIF(total_revenue, 0)',
+                 'source_table': 'income_statements', 'result_field': 'net_profit_margin', 'unit': '%'},
+    '成本利润率': {'expression': 'net_profit * 100.0 / NULLIF(cost_of_sales, 0)',
+                 'source_table': 'income_statements', 'unit': '%'},
+}
+
+
+class TestQueryPlanner(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        create_financial_db(self.db_path, METRIC_ROWS)
+        self.query = FinancialQuery(db_path=self.db_path)
+        formulas = dict(self.query.formulas, **FORMULAS)
+        patcher = mock.patch.object(FinancialQuery, "formulas", new_callable=mock.PropertyMock,
+                                    return_value=formulas)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # 统计每次查询执行的SQL
+        self.statements = []
+        connect = self.query._get_connection
+
+        def traced_connection():
+            conn = connect()
+            conn.set_trace_callback(self.statements.append)
+            return conn
+        self.query._get_connection = traced_connection
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def legacy_query(self, time_range, metrics):
+        """原实现: 每个指标单独查询"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        results = []
+        for metric_name in metrics:
+            if metric_name in self.query.metrics_map:
+                table, field = self.query.metrics_map[metric_name]
+                results.extend(self.query._query_direct(cursor, 1, time_range, table, field, metric_name))
+                continue
+            formula_info = self.query.formulas[metric_name]
+            precomputed = self.query._query_direct(cursor, 1, time_range, 'financial_metrics',
+                                                   formula_info['result_field'], metric_name) \
+                if formula_info.get('result_field') else []
+            if any(r['value'] is not None for r in precomputed):
+                results.extend(precomputed)
+            else:
+                results.extend(self.legacy_formula(cursor, time_range, metric_name, formula_info))
+        conn.close()
+        return results
+
+    def legacy_formula(self, cursor, time_range, metric_name, formula_info):
+        """原实现: 按公式逐个指标计算(不聚合,不按月份过滤)"""
+        conditions, params = period_filter(1, time_range, with_month=False)
+        cursor.execute(f"""
+            SELECT period_year, period_quarter, {formula_info['expression']} as value
+            FROM {formula_info['source_table']}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY period_year, period_quarter
+        """, params)
+        unit = formula_info.get('unit', self.query._get_unit(metric_name))
+        return [{'metric_name': metric_name, 'year': row['period_year'], 'quarter': row['period_quarter'],
+                 'value': row['value'], 'unit': unit} for row in cursor.fetchall()]
+
+    def selects(self):
+        return [s for s in self.statements if s.lstrip().upper().startswith('SELECT')]
+
+    def test_one_select_per_table(self):
+        metrics = ["营业收入", "营业成本", "净利润", "资产总计", "负债合计", "资产负债率"]
+        time_range = {'year': 2023, 'years': [2023], 'is_full_year': True}
+        results = self.query._query_configured(1, time_range, metrics)
+        self.assertEqual(len(self.selects()), 3)
+        self.assertEqual(results, self.legacy_query(time_range, metrics))
+        self.assertEqual([r['metric_name'] for r in results[:4]], ["营业收入"] * 4)
+
+    def test_matches_legacy_across_time_ranges(self):
+        metrics = ["净利润", "测试净利率", "资产负债率", "成本利润率", "营收", "总资产"]
+        for time_range in ({'year': 2022, 'years': [2022]},
+                           {'year': 2022, 'years': [2022, 2023], 'is_comparison': True},
+                           {'year': 2023, 'years': [2023], 'quarter': 2, 'quarters': [2]},
+                           {'year': 2023, 'years': [2023], 'quarters': [1, 3], 'quarter': 1},
+                           {'year': None, 'years': [], 'query_all_periods': True}):
+            self.assertEqual(self.query._query_configured(1, time_range, metrics),
+                             self.legacy_query(time_range, metrics), time_range)
+
+    def test_empty_precomputed_uses_formula_batch(self):
+        time_range = {'year': 2023, 'years': [2023]}
+        results = self.query._query_configured(1, time_range, ["测试净利率", "成本利润率"])
+        # 第一阶段: financial_metrics 预计算;第二阶段: 两个公式合并为一条 income_statements 查询
+        self.assertEqual(len(self.selects()), 2)
+        self.assertTrue(all(r['value'] is not None and r['unit'] == '%' for r in results))
+        self.assertAlmostEqual(results[0]['value'], 10.0)
+
+    def test_batch_error_falls_back_per_metric(self):
+        planner = QueryPlanner({"营业收入": ("income_statements", "total_revenue"),
+                                "不存在": ("income_statements", "missing_column")},
+                               {}, ["income_statements"], lambda name: '元')
+        plan = planner.plan(["营业收入", "不存在"], {'year': 2023, 'years': [2023]})
+        self.assertEqual(len(plan.batches), 1)
+
+        conn = self.query._get_connection()
+        try:
+            results = self.query._run_batch(conn.cursor(), plan.batches[0], "company_id = 1 AND period_year = 2023")
+        finally:
+            conn.close()
+        self.assertEqual(len(results["营业收入"]), 4)
+        self.assertEqual(results["不存在"], [])
+
+    def test_item_queries_and_month_ranges_stay_single(self):
+        planner = QueryPlanner({"营业收入": ("income_statements", "total_revenue"),
+                                "进项": ("__item_query__input_tax", "")},
+                               {}, ["income_statements"], lambda name: '元')
+        plan = planner.plan(["营业收入", "进项"], {'year': 2023, 'start_month': 3, 'end_month': 8})
+        self.assertEqual(plan.singles, ["营业收入", "进项"])
+        self.assertEqual(plan.batches, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
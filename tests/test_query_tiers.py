@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试财务查询分层执行: 配置指标直查不调用LLM、未配置指标/复杂条件/直查无数据时回退Text-to-SQL、层级上报
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.financial_query import FinancialQuery
+from tests.db_fixtures import create_financial_db
+
+
+class TestQueryTiers(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        create_financial_db(self.db_path)
+        self.query = FinancialQuery(db_path=self.db_path)
+        patcher = mock.patch.object(self.query, "_query_text_to_sql", return_value=[
+            {'metric_name': 'value', 'year': 2023, 'quarter': None, 'value': 1.0, 'unit': '元'}])
+        self.text_to_sql = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, question):
+        time_range = self.query.extract_time_range(question)
+        metrics = self.query.extract_metrics(question)
+        return self.query.execute_query_with_meta(1, time_range, metrics, question)
+
+    def test_configured_metric_skips_llm(self):
+        results, meta = self._run("2023年营业收入")
+        self.text_to_sql.assert_not_called()
+        self.assertEqual(meta["tier"], "configured")
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0]["quarter"], 1)
+        self.assertAlmostEqual(results[0]["value"], (24 + 25 + 26) * 100.0)
+
+    def test_formula_without_precomputed_value(self):
+        results, meta = self._run("2023年成本利润率")
+        self.assertEqual(meta["tier"], "configured")
+        self.assertAlmostEqual(results[0]["value"], 10 * 100.0 / 60)
+        self.assertEqual(results[0]["unit"], "%")
+
+    def test_unresolved_metric_falls_back(self):
+        results, meta = self._run("2023年的研发投入强度")
+        self.text_to_sql.assert_called_once()
+        self.assertEqual(meta["tier"], "text_to_sql")
+        self.assertEqual(meta["fallback_reason"], "no_metric")
+
+    def test_complex_condition_falls_back(self):
+        _, meta = self._run("2023年营业收入最高的季度")
+        self.text_to_sql.assert_called_once()
+        self.assertEqual(meta["fallback_reason"], "complex_condition")
+        self.assertIn("最高", meta["complex"])
+
+    def test_time_expressions_are_not_complex(self):
+        for question in ("2023年前三季度营业收入", "前三季度利润总额", "2023年上半年营业收入", "2023年度营业收入"):
+            self.assertEqual(self.query._complex_query_markers(question), [], question)
+        _, meta = self._run("2023年前三季度营业收入")
+        self.text_to_sql.assert_not_called()
+        self.assertEqual(meta["tier"], "configured")
+
+        self.assertEqual(self.query._complex_query_markers("2023年营业收入前三名的客户"), ["前三", "客户"])
+        self.assertEqual(self.query._complex_query_markers("2023年第一季度最大客户的收入"), ["最大", "客户"])
+
+    def test_no_configured_data_falls_back(self):
+        _, meta = self._run("2021年营业收入")
+        self.text_to_sql.assert_called_once()
+        self.assertEqual(meta["fallback_reason"], "configured_no_data")
+
+    def test_search_reports_tier(self):
+        results, company, status, meta = self.query.search_with_meta("华兴科技2023年营业收入")
+        self.assertEqual(status, "success")
+        self.assertEqual(company["id"], 1)
+        self.assertEqual(meta["tier"], "configured")
+        self.assertEqual(self.query.search("华兴科技2023年营业收入")[2], "success")
+
+
+if __name__ == "__main__":
+    unittest.main()
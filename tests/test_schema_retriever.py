@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试Text-to-SQL相关Schema检索: 按术语选表选字段、表同义词取整表、无命中回退完整Schema、
+Prompt固定前缀不随问题变化且问题相关部分更短
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.schema_provider import SchemaProvider
+from modules.schema_retriever import SchemaRetriever, estimate_tokens
+from modules.text_to_sql import SQL_SYSTEM_PROMPT, TextToSQLEngine
+from tests.db_fixtures import PERIOD_COLUMNS, create_db
+
+
+SCHEMA = {
+    "income_statements": f"{PERIOD_COLUMNS}, total_revenue REAL, cost_of_sales REAL, "
+                         "net_profit REAL, non_operating_income REAL",
+    "balance_sheets": f"{PERIOD_COLUMNS}, total_assets REAL, total_liabilities REAL",
+    "financial_metrics": f"{PERIOD_COLUMNS}, net_profit_margin REAL, debt_ratio REAL",
+    "invoices": f"{PERIOD_COLUMNS}, invoice_type TEXT, amount_excluding_tax REAL, "
+                "total_amount REAL, tax_amount REAL, item_name TEXT",
+}
+ROWS = {"invoices": [(1, 2023, 1, 'INPUT', 100.0, 113.0, 13.0, '钢材')]}
+
+
+class TestSchemaRetriever(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        create_db(self.db_path, SCHEMA, ROWS)
+        self.provider = SchemaProvider(db_path=self.db_path)
+        self.retriever = SchemaRetriever(self.provider)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_selects_metric_columns(self):
+        self.assertEqual(self.retriever.select("2023年营业收入和营业成本"),
+                         {'income_statements': {'total_revenue', 'cost_of_sales'}})
+        selection = self.retriever.select("资产总计和利润率")
+        self.assertEqual(selection['balance_sheets'], {'total_assets'})
+        self.assertEqual(selection['income_statements'], {'net_profit', 'total_revenue'})
+        self.assertEqual(selection['financial_metrics'], {'net_profit_margin'})
+
+    def test_table_synonym_and_value_mapping(self):
+        selection = self.retriever.select("2023年进项发票金额")
+        self.assertIn('invoice_type', selection['invoices'])
+        self.assertIn('total_amount', selection['invoices'])      # item_query 进项发票金额
+        self.assertEqual(self.retriever.select("利润表"), {'income_statements': None})
+        self.assertIsNone(self.retriever.select("测试问题"))
+
+    def test_pruned_description(self):
+        selection = self.retriever.select("进项发票税额")
+        description = self.provider.get_schema_description(selection)
+        self.assertIn("### invoices", description)
+        self.assertNotIn("### income_statements", description)
+        self.assertIn("tax_amount", description)
+        self.assertNotIn("item_name", description)
+        self.assertIn("invoice_type可选值: ['INPUT']", description)
+        self.assertIn("时间字段: period_year, period_quarter", description)
+        self.assertIn("### income_statements", self.provider.get_schema_description())
+
+
+class TestPromptLayout(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        create_db(self.db_path, SCHEMA, ROWS)
+        self.engine = TextToSQLEngine(db_path=self.db_path, cache_db_path=os.path.join(self.tmpdir, "cache.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_static_prefix_and_dynamic_part(self):
+        prompt = self.engine._build_prompt("2023年营业收入", 5, [2023, 2024], 2)
+        self.assertIn("- company_id = 5\n- period_year IN (2023,2024) AND period_quarter = 2", prompt)
+        self.assertIn("total_revenue", prompt)
+        self.assertNotIn("balance_sheets", prompt)
+        self.assertNotIn("{", SQL_SYSTEM_PROMPT)
+        self.assertNotIn("5", SQL_SYSTEM_PROMPT.replace("5.", ""))
+
+        full = self.engine._build_prompt("测试问题", 5, [2023])
+        self.assertIn("### balance_sheets", full)
+        self.assertIn("value_mappings", full)
+        self.assertLess(estimate_tokens(prompt), estimate_tokens(full))
+
+        self.engine._log_prompt_size(prompt)
+        stats = self.engine.get_prompt_stats()
+        self.assertEqual(stats["prompts"], 1)
+        self.assertEqual(stats["avg_prompt_tokens"], stats["prefix_tokens"] + estimate_tokens(prompt))
+
+
+if __name__ == "__main__":
+    unittest.main()
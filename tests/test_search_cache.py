@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试问题级结果缓存: LRU/TTL淘汰、并发安全、重复问题命中、数据变更失效、降级结果不缓存
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.db_query import TaxIncentiveQuery
+from modules.memory_cache import LRUCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        cache = LRUCache(ttl_seconds=60)
+        cache.set("a", 1)
+        with mock.patch("modules.memory_cache.time.time", return_value=time.time() + 120):
+            self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_concurrent_access(self):
+        cache = LRUCache(max_entries=50)
+
+        def worker(n):
+            for i in range(500):
+                cache.set((n, i % 80), i)
+                cache.get((n, (i * 7) % 80))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 50)
+        self.assertEqual(stats["hits"] + stats["misses"], 8 * 500)
+
+
+class TestTaxSearchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "tax_incentives.db")
+        shutil.copy(os.path.join(ROOT, "database", "tax_incentives.db"), self.db_path)
+        self.query = TaxIncentiveQuery(db_path=self.db_path,
+                                       llm_cache_path=os.path.join(self.tmpdir, "llm_cache.db"))
+        for name in ("_infer_tax_type_with_llm", "_extract_project_keywords_with_llm"):
+            patcher = mock.patch.object(self.query, name, return_value=None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_repeat_question_hits_cache(self):
+        with mock.patch.object(self.query, "_extract_tax_and_incentive",
+                               wraps=self.query._extract_tax_and_incentive) as extract:
+            first = self.query.search_with_meta("小微企业所得税优惠", limit=5)
+            second = self.query.search_with_meta("小微企业所得税优惠？", limit=5)
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual(first[3]["cache"], "miss")
+        self.assertEqual(second[3]["cache"], "hit")
+        self.assertEqual(first[:3], second[:3])
+        self.assertEqual(self.query.get_search_cache_stats()["hits"], 1)
+
+        # 调用方修改返回结果不影响缓存
+        second[0][0]["tax_type"] = "已修改"
+        self.assertNotEqual(self.query.search("小微企业所得税优惠", limit=5)[0][0]["tax_type"], "已修改")
+
+    def test_limit_is_part_of_key(self):
+        self.query.search("小微企业所得税优惠", limit=5)
+        _, _, _, meta = self.query.search_with_meta("小微企业所得税优惠", limit=3)
+        self.assertEqual(meta["cache"], "miss")
+
+    def test_data_change_invalidates(self):
+        self.query.search("小微企业所得税优惠", limit=5)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE tax_incentives SET keywords = keywords WHERE id = 1")
+        conn.commit()
+        conn.close()
+        _, _, _, meta = self.query.search_with_meta("小微企业所得税优惠", limit=5)
+        self.assertEqual(meta["cache"], "miss")
+
+    def test_degraded_results_not_cached(self):
+        self.query._load_config()["hybrid_search"] = {"enabled": False}
+        self.query._load_config()["llm_inference"] = {"deadline_seconds": 0.05}
+
+        def slow(question, llm_cache=None):
+            time.sleep(0.3)
+            return None
+
+        with mock.patch.object(self.query, "_infer_tax_type_with_llm", slow), \
+                mock.patch.object(self.query, "_extract_project_keywords_with_llm", slow):
+            self.query.search("会议展览服务有哪些优惠政策", limit=5)
+        self.assertEqual(self.query.get_search_cache_stats()["entries"], 0)
+
+    def test_flush_and_disable(self):
+        self.query.search("高新技术企业优惠", limit=5)
+        self.assertEqual(self.query.clear_search_cache(), 1)
+        self.query._load_config()["search_cache"] = {"enabled": False}
+        _, _, _, meta = self.query.search_with_meta("高新技术企业优惠", limit=5)
+        self.assertNotIn("cache", meta)
+        self.assertEqual(self.query.get_search_cache_stats(), {"enabled": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试生成SQL的只读沙箱: 表/字段白名单(迁移后更新)、递归CTE、禁止写入和PRAGMA、时间预算中断失控查询、
+分批读取行数上限、文本检查不再误判 created_at 等字段
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.sql_sandbox import SandboxBudgetExceeded, SQLSandbox
+from modules.text_to_sql import TextToSQLEngine
+from tests.db_fixtures import create_db
+
+
+SCHEMA = {
+    "invoices": "company_id INTEGER, period_year INTEGER, amount REAL, created_at TEXT",
+    "users": "id INTEGER, password TEXT",
+}
+ROWS = {
+    "invoices": [(1, 2023, float(i), '2023-01-01') for i in range(3000)],
+    "users": [(1, 'secret')],
+}
+
+
+class TestSQLSandbox(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        create_db(self.db_path, SCHEMA, ROWS)
+        self.sandbox = SQLSandbox(self.db_path, {'invoices': ['company_id', 'period_year', 'amount', 'created_at']})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_whitelist(self):
+        rows, truncated = self.sandbox.execute(
+            "SELECT period_year, SUM(amount) AS total FROM invoices WHERE company_id = ? GROUP BY period_year", (1,))
+        self.assertEqual(rows, [{'period_year': 2023, 'total': sum(range(3000))}])
+        self.assertFalse(truncated)
+        for sql in ("SELECT password FROM users",
+                    "SELECT name FROM sqlite_master",
+                    "SELECT load_extension('x') FROM invoices",
+                    "PRAGMA table_info(invoices)",
+                    "DELETE FROM invoices"):
+            with self.assertRaises(sqlite3.DatabaseError, msg=sql):
+                self.sandbox.execute(sql)
+        with self.assertRaises(sqlite3.DatabaseError):
+            SQLSandbox(self.db_path, {'invoices': ['company_id']}).execute("SELECT amount FROM invoices")
+
+    def test_row_cap(self):
+        rows, truncated = self.sandbox.execute("SELECT amount FROM invoices ORDER BY amount", max_rows=250)
+        self.assertEqual(len(rows), 250)
+        self.assertTrue(truncated)
+        self.assertEqual(rows[-1], {'amount': 249.0})
+        rows, truncated = self.sandbox.execute("SELECT amount FROM invoices", max_rows=3000)
+        self.assertEqual((len(rows), truncated), (3000, False))
+
+    def test_recursive_cte(self):
+        rows, _ = self.sandbox.execute(
+            "WITH RECURSIVE n(x) AS (SELECT MIN(period_year) FROM invoices UNION ALL "
+            "SELECT x + 1 FROM n WHERE x < 2025) SELECT x FROM n")
+        self.assertEqual([r['x'] for r in rows], [2023, 2024, 2025])
+        # 部分SQLite版本对CTE自身的读取也会调用授权(表名为CTE名,不属于任何数据库)
+        self.assertEqual(self.sandbox._authorize(sqlite3.SQLITE_READ, 'n', 'x', None, None), sqlite3.SQLITE_OK)
+        self.assertEqual(self.sandbox._authorize(sqlite3.SQLITE_READ, 'users', 'password', 'main', None),
+                         sqlite3.SQLITE_DENY)
+        self.assertEqual(self.sandbox._authorize(sqlite3.SQLITE_READ, 'invoices', 'amount', 'temp', None),
+                         sqlite3.SQLITE_DENY)
+
+    def test_budget_interrupts_runaway_query(self):
+        sandbox = SQLSandbox(self.db_path, {'invoices': ['amount']}, time_budget=0.2)
+        started = time.monotonic()
+        with self.assertRaises(SandboxBudgetExceeded):
+            sandbox.execute("SELECT COUNT(*) FROM invoices a, invoices b, invoices c")
+        self.assertLess(time.monotonic() - started, 2.0)
+        with self.assertRaises(SandboxBudgetExceeded):
+            SQLSandbox(self.db_path, {}, max_steps=50_000).execute(
+                "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT MAX(x) FROM n")
+
+
+class TestEngineExecution(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        create_db(self.db_path, SCHEMA, ROWS)
+        self.engine = TextToSQLEngine(db_path=self.db_path, cache_db_path=os.path.join(self.tmpdir, "cache.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_validate_sql(self):
+        self.assertTrue(self.engine.validate_sql(
+            "SELECT created_at, amount AS '删除--前' FROM invoices WHERE company_id = 1;"))
+        for sql in ("DELETE FROM invoices WHERE company_id = 1",
+                    "SELECT 1 FROM invoices WHERE company_id = 1; DROP TABLE invoices",
+                    "SELECT 1 FROM invoices WHERE company_id = 1 -- x",
+                    "SELECT amount FROM invoices",
+                    "SELECT 1 FROM invoices WHERE company_id = 1 AND x IN (SELECT 1 FROM t) ATTACH"):
+            self.assertFalse(self.engine.validate_sql(sql), sql)
+
+    def test_execute_sql(self):
+        results, error = self.engine.execute_sql(
+            "SELECT created_at, COUNT(*) AS n FROM invoices WHERE company_id = 1 GROUP BY created_at")
+        self.assertIsNone(error)
+        self.assertEqual(results, [{'created_at': '2023-01-01', 'n': 3000}])
+
+        results, error = self.engine.execute_sql("SELECT amount FROM invoices WHERE company_id = 1", limit=10)
+        self.assertEqual((len(results), error), (10, None))
+
+        # users 不在 SchemaProvider 发现的表中
+        results, error = self.engine.execute_sql(
+            "SELECT password FROM users WHERE id IN (SELECT company_id FROM invoices)")
+        self.assertEqual(results, [])
+        self.assertIn("prohibited", error)
+
+    def test_whitelist_follows_migrations(self):
+        self.assertIsNone(self.engine.execute_sql("SELECT amount FROM invoices WHERE company_id = 1", limit=1)[1])
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("ALTER TABLE invoices ADD COLUMN tax_amount REAL DEFAULT 2")
+        conn.commit()
+        conn.close()
+        results, error = self.engine.execute_sql(
+            "SELECT SUM(tax_amount) AS tax FROM invoices WHERE company_id = 1")
+        self.assertIsNone(error)
+        self.assertEqual(results, [{'tax': 6000.0}])
+
+    def test_result_cache(self):
+        sql = "SELECT COUNT(*) AS n FROM invoices WHERE company_id = 1 AND created_at = '2023-01-01'"
+        self.assertEqual(self.engine.execute_sql(sql), ([{'n': 3000}], None))
+        results, _ = self.engine.execute_sql(sql.lower().replace(" = 1", "  =\n 1") + ";")
+        results[0]['n'] = -1
+        self.assertEqual(self.engine.execute_sql(sql), ([{'n': 3000}], None))
+        stats = self.engine.get_result_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 1))
+
+        # 字符串字面量内的大小写/空白不同是不同的查询
+        self.assertEqual(self.engine.execute_sql(sql.replace("'2023-01-01'", "'2023-01-01 '")),
+                         ([{'n': 0}], None))
+
+        # 数据变化后重新执行
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO invoices VALUES (1, 2024, 1.0, '2023-01-01')")
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.engine.execute_sql(sql), ([{'n': 3001}], None))
+
+        # 行数超过上限的结果不缓存
+        self.engine.clear_result_cache()
+        self.engine.execute_sql("SELECT amount FROM invoices WHERE company_id = 1")
+        self.assertEqual(self.engine.get_result_cache_stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试SQLite长连接池与参数化查询条件: 线程内复用连接、关闭/替换数据库后重连、语句形态与取值无关
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.query_planner import period_filter
+from modules.sqlite_pool import ConnectionPool, get_connection_pool, in_list
+from tests.db_fixtures import PERIOD_COLUMNS, create_db
+
+
+def create_pool_db(path, value):
+    """构建单表测试库,所有行的 v 取同一个值(用于区分替换前后的数据库)"""
+    create_db(path, {"t": f"{PERIOD_COLUMNS}, v REAL"},
+              {"t": [(1, y, q, value) for y in (2022, 2023, 2024) for q in (1, 2, 3, 4)]})
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "test.db")
+        create_pool_db(self.db_path, 1.0)
+        self.pool = ConnectionPool(self.db_path)
+
+    def tearDown(self):
+        self.pool.close_all()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_reuses_connection_per_thread(self):
+        conn = self.pool.get()
+        self.assertIs(self.pool.get(), conn)
+        self.assertIsInstance(conn.execute("SELECT v FROM t").fetchone(), sqlite3.Row)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.pool.get()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+        self.assertIs(get_connection_pool(self.db_path), get_connection_pool(self.db_path))
+
+    def test_reopens_after_close_or_replace(self):
+        conn = self.pool.get()
+        conn.close()
+        conn = self.pool.get()
+        self.assertEqual(conn.execute("SELECT SUM(v) FROM t").fetchone()[0], 12.0)
+
+        replacement = os.path.join(self.tmpdir, "new.db")
+        create_pool_db(replacement, 2.0)
+        os.replace(replacement, self.db_path)
+        reopened = self.pool.get()
+        self.assertIsNot(reopened, conn)
+        self.assertEqual(reopened.execute("SELECT SUM(v) FROM t").fetchone()[0], 24.0)
+
+        self.pool.close_all()
+        self.assertEqual(self.pool.get().execute("SELECT COUNT(*) FROM t").fetchone()[0], 12)
+
+
+class TestPeriodFilter(unittest.TestCase):
+    def test_statement_shape_independent_of_values(self):
+        shapes = set()
+        for years in ([2022], [2022, 2023], [2021, 2022, 2023, 2024]):
+            for quarters in ([1], [2, 4], [1, 2, 3]):
+                conditions, params = period_filter(7, {'year': years[0], 'years': years, 'quarters': quarters})
+                shapes.add(' AND '.join(conditions))
+                self.assertEqual(params[0], 7)
+        self.assertEqual(len(shapes), 1)
+        self.assertFalse(any(ch.isdigit() for ch in shapes.pop()))
+
+    def test_filters_match_values(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (company_id INTEGER, period_year INTEGER, period_quarter INTEGER, "
+                     "period_month INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?)",
+                         [(c, y, (m - 1) // 3 + 1, m) for c in (1, 2) for y in (2022, 2023) for m in range(1, 13)])
+        cases = [
+            ({'year': 2023, 'years': [2023]}, 12),
+            ({'year': 2022, 'years': [2022, 2023], 'quarters': [1, 4]}, 12),
+            ({'year': 2023, 'years': [2023], 'month': 5}, 1),
+            ({'year': None, 'years': [], 'query_all_periods': True, 'quarters': [1]}, 24),
+        ]
+        for time_range, expected in cases:
+            conditions, params = period_filter(1, time_range)
+            count = conn.execute(f"SELECT COUNT(*) FROM t WHERE {' AND '.join(conditions)}", params).fetchone()[0]
+            self.assertEqual(count, expected, time_range)
+
+        conditions, params = period_filter(1, {'year': 2023, 'years': [2023], 'quarters': [2]},
+                                           quarter_field=None)
+        self.assertEqual(len(conditions), 2)
+        condition, values = in_list('period_year', [2022, 2023])
+        self.assertEqual(conn.execute(f"SELECT COUNT(*) FROM t WHERE {condition}", values).fetchone()[0], 48)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试结构化查询分页: 一次执行返回结果页+总数, 游标翻页覆盖全部结果
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.db_query import TaxIncentiveQuery
+
+
+CASES = [("增值税", None), ("企业所得税", ["小微企业"]), ("个人所得税", None), ("房产税", ["不存在的关键词xyz"])]
+
+
+class TestStructuredPage(unittest.TestCase):
+    def _walk(self, query, tax_type, entities, page_size):
+        ids, cursor, totals = [], None, set()
+        while True:
+            results, total, cursor = query.structured_search_page(tax_type, entities, limit=page_size, cursor=cursor)
+            ids.extend(r['id'] for r in results)
+            totals.add(total)
+            if cursor is None:
+                return ids, totals
+
+    def test_pages_cover_full_result(self):
+        for backend in ("like", "ngram"):
+            query = TaxIncentiveQuery(search_backend=backend)
+            for tax_type, entities in CASES:
+                full = [r['id'] for r in query.structured_search(tax_type, entities, limit=10000)]
+                total = query.count_structured_results(tax_type, entities)
+                self.assertEqual(len(full), total)
+                for page_size in (1, 7, 50):
+                    ids, totals = self._walk(query, tax_type, entities, page_size)
+                    self.assertEqual(ids, full, (backend, tax_type, page_size))
+                    self.assertEqual(totals, {total})
+
+    def test_like_and_ngram_agree(self):
+        like = TaxIncentiveQuery(search_backend="like")
+        ngram = TaxIncentiveQuery(search_backend="ngram")
+        for tax_type, entities in CASES:
+            a = like.structured_search_page(tax_type, entities, limit=5)
+            b = ngram.structured_search_page(tax_type, entities, limit=5)
+            self.assertEqual([r['id'] for r in a[0]], [r['id'] for r in b[0]])
+            self.assertEqual(a[1], b[1])
+
+    def test_page_past_end(self):
+        query = TaxIncentiveQuery(search_backend="like")
+        total = query.count_structured_results("增值税")
+        results, count, cursor = query.structured_search_page("增值税", limit=10, cursor=f"o{total}")
+        self.assertEqual((results, count, cursor), ([], total, None))
+
+    def test_invalid_cursor(self):
+        query = TaxIncentiveQuery(search_backend="like")
+        with self.assertRaises(ValueError):
+            query.structured_search_page("增值税", cursor="bogus")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试Text-to-SQL的持久化SQL缓存: 重启后命中、Schema变更失效、执行成功优先保留、执行出错删除、
+换企业/年份的同类问题命中参数化模板
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.sql_template import make_template, normalize_question, render_template
+from modules.text_to_sql import TextToSQLEngine
+
+
+class TestTextToSQLCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "financial.db")
+        self.cache_path = os.path.join(self.tmpdir, "sql_cache.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE income_statements (company_id INTEGER, period_year INTEGER, "
+                     "period_quarter INTEGER, total_revenue REAL)")
+        conn.execute("INSERT INTO income_statements VALUES (1, 2023, 1, 100.0)")
+        conn.execute("CREATE TABLE companies (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE company_aliases (company_id INTEGER, alias TEXT)")
+        conn.executemany("INSERT INTO companies VALUES (?, ?)", [(1, "华兴科技有限公司"), (2, "蓝天公司")])
+        conn.commit()
+        conn.close()
+        self.llm = mock.MagicMock()
+        self.llm.chat_completion.return_value = (
+            "SELECT period_year, SUM(total_revenue) AS revenue FROM income_statements "
+            "WHERE company_id = 1 AND period_year = 2023 GROUP BY period_year")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def engine(self, max_entries=2000):
+        engine = TextToSQLEngine(db_path=self.db_path, cache_db_path=self.cache_path)
+        engine._max_cache_size = max_entries
+        engine._deepseek = self.llm
+        return engine
+
+    def test_survives_restart(self):
+        sql = self.engine().generate_sql("2023年营业收入", 1, [2023])
+        engine = self.engine()
+        self.assertEqual(engine.generate_sql("2023年营业收入", 1, [2023]), sql)
+        self.assertEqual(self.llm.chat_completion.call_count, 1)
+        # 同一进程内同一缓存库共享缓存实例,统计包含首次的原问题和模板两次未命中
+        stats = engine.get_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 2, 2))
+        self.assertTrue(stats["enabled"])
+
+    def test_schema_change_invalidates(self):
+        engine = self.engine()
+        engine.generate_sql("2023年营业收入", 1, [2023])
+        old_fingerprint = engine.get_cache_stats()["fingerprint"]
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("ALTER TABLE income_statements ADD COLUMN net_profit REAL")
+        conn.commit()
+        conn.close()
+
+        engine.generate_sql("2023年营业收入", 1, [2023])
+        self.assertEqual(self.llm.chat_completion.call_count, 2)
+        stats = engine.get_cache_stats()
+        self.assertNotEqual(stats["fingerprint"], old_fingerprint)
+        self.assertEqual(stats["entries"], 2)
+
+        # 数据变更(非Schema变更)不影响指纹
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO income_statements VALUES (1, 2023, 2, 50.0, 5.0)")
+        conn.commit()
+        conn.close()
+        engine.generate_sql("2023年营业收入", 1, [2023])
+        self.assertEqual(self.llm.chat_completion.call_count, 2)
+
+    def test_executed_sql_retained(self):
+        engine = self.engine(max_entries=2)
+        results, status = engine.query("2023年营业收入", 1, [2023])
+        self.assertEqual(status, "success")
+        engine.generate_sql("问题二", 1, [2023])
+        engine.generate_sql("问题三", 1, [2023])   # 淘汰未执行过的"问题二"
+        self.llm.chat_completion.reset_mock()
+
+        engine.generate_sql("2023年营业收入", 1, [2023])
+        self.assertEqual(self.llm.chat_completion.call_count, 0)
+        engine.generate_sql("问题二", 1, [2023])
+        self.assertEqual(self.llm.chat_completion.call_count, 1)
+
+    def test_failed_sql_not_reused(self):
+        self.llm.chat_completion.return_value = "SELECT missing FROM income_statements WHERE company_id = 1"
+        engine = self.engine()
+        results, status = engine.query("错误字段", 1, [2023])
+        self.assertTrue(status.startswith("SQL执行错误"))
+        self.assertEqual(engine.get_cache_stats()["entries"], 0)
+
+    def test_template_reused_across_companies_and_years(self):
+        engine = self.engine()
+        self.llm.chat_completion.return_value = (
+            "SELECT period_year, SUM(total_revenue) AS revenue FROM income_statements "
+            "WHERE company_id = 1 AND period_year = 2023 AND period_quarter = 1 GROUP BY period_year")
+        engine.generate_sql("华兴科技2023年第一季度营业收入", 1, [2023], 1)
+
+        sql = engine.generate_sql("蓝天公司2024年Q2营业收入", 2, [2024], 2)
+        self.assertEqual(self.llm.chat_completion.call_count, 1)
+        self.assertIn("company_id = 2 AND period_year IN (2024) AND period_quarter = 2", sql)
+
+        # 多个年份时代入年份列表;无季度条件的问题不复用有季度的模板
+        sql = engine.generate_sql("蓝天公司2022年和2024年第三季度营业收入", 2, [2022, 2024], 3)
+        self.assertEqual(self.llm.chat_completion.call_count, 2)
+        engine.generate_sql("蓝天公司2024年营业收入", 2, [2024])
+        self.assertEqual(self.llm.chat_completion.call_count, 3)
+
+    def test_failed_template_dropped(self):
+        engine = self.engine()
+        self.llm.chat_completion.return_value = (
+            "SELECT missing FROM income_statements WHERE company_id = 1 AND period_year = 2023")
+        engine.query("华兴科技2023年营业收入", 1, [2023])
+        engine.generate_sql("蓝天公司2024年营业收入", 2, [2024])
+        self.assertEqual(self.llm.chat_completion.call_count, 2)
+
+
+class TestSQLTemplate(unittest.TestCase):
+    def test_normalize_question(self):
+        mask = lambda text: text.replace("蓝天公司", "<企业>")
+        self.assertEqual(normalize_question("蓝天公司２０２３年第二季度和Q4收入", mask),
+                         "<企业><年>年<季度>和<季度>收入")
+
+    def test_make_and_render(self):
+        sql = ("SELECT i.period_year, SUM(i.total_revenue) FROM income_statements i "
+               "WHERE i.company_id = 5 AND i.period_year BETWEEN 2022 AND 2024 GROUP BY i.period_year LIMIT 5")
+        template = make_template(sql, 5, [2022, 2023, 2024], None)
+        self.assertEqual(template, sql.replace("= 5", "= :company_id")
+                         .replace("BETWEEN 2022 AND 2024", "IN (:years)"))
+        self.assertEqual(render_template(template, 7, [2021, 2020], None),
+                         sql.replace("= 5", "= 7").replace("BETWEEN 2022 AND 2024", "IN (2020, 2021)"))
+        self.assertIsNone(render_template(template, 7, [], None))
+
+        in_list = "SELECT 1 FROM t WHERE company_id = 5 AND period_year IN (2023, 2022)"
+        self.assertEqual(make_template(in_list, 5, [2022, 2023], None),
+                         "SELECT 1 FROM t WHERE company_id = :company_id AND period_year IN (:years)")
+
+    def test_rejects_incomplete_templates(self):
+        # 年份出现在别名中
+        self.assertIsNone(make_template(
+            "SELECT SUM(total_revenue) AS '2023年收入' FROM t WHERE company_id = 5 AND period_year = 2023",
+            5, [2023], None))
+        # 问题指定了季度但SQL未按季度过滤
+        self.assertIsNone(make_template("SELECT 1 FROM t WHERE company_id = 5 AND period_year = 2023",
+                                        5, [2023], 2))
+        # 季度条件与本次取值不一致
+        self.assertIsNone(make_template("SELECT 1 FROM t WHERE company_id = 5 AND period_quarter IN (1, 2)",
+                                        5, [], 1))
+        self.assertIsNone(make_template("SELECT 1 FROM t WHERE company_id = 6", 5, [], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试时间范围解析器: 黄金语料及随机问题上与原逐条正则实现结果一致、结果缓存、配置关键词、时间表达式位置
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.time_parser import TimeRangeParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 黄金语料: tests/test_date_parsing.py 及线上常见的时间表达
+GOLDEN_QUESTIONS = [
+    "查询22、23年收入", "22-25利润", "22-25年税负", "22,23年税负",
+    "华兴科技2023年营业收入", "2022-2024年净利润变化", "2022至2024年利润总额", "2022到2024年的资产负债率",
+    "2021-24年销售收入", "2021~2023营业成本", "2023、2024年利润对比", "2023和2024年毛利率",
+    "23年营收", "23年和24年的净利润", "21，22年营业收入", "2023利润率", "2023年一季度收入",
+    "2023年Q1、Q2营业收入", "2024年q3净利润", "2023年第二季度利润", "一季度和二季度收入对比",
+    "2023年3月增值税", "2023年3月份销项税额", "2023年1-6月收入", "2023年1至3月营业成本",
+    "2023年全年利润", "2023年度营业收入", "净利润是多少", "营业收入的趋势", "资产总额",
+    "2025年9月的收入", "2019年营收", "1989年营收", "2061年营收", "99年利润", "61-65年", "25-22利润",
+    "2024-2022年利润", "2023年12月进项税额", "2023年13月收入", "Q5收入", "三季度利润同比",
+    "2022vs2023利润", "2023年上半年收入", "近三年利润情况", "24年Q4和25年Q1收入", "2023年1月到3月收入",
+    "20230101的数据", "销售额12345-2023", "2022—2024年收入", "第四季度增值税", "4季度收入",
+]
+
+QUERY_SETTINGS = json.load(open(os.path.join(ROOT, "config", "metrics_config.json"),
+                                encoding="utf-8")).get("query_settings", {})
+
+
+def legacy_extract_time_range(question, query_settings, current_year):
+    """原 FinancialQuery.extract_time_range 实现(逐条正则,作为对照)"""
+    result = {}
+    # 全期查询关键词
+    all_periods_keywords = query_settings.get('all_periods_keywords', [
+        "多少", "是多少", "数据", "金额", "查询",
+        "增长", "增减", "增加", "减少",
+        "变动", "改变", "变化", "趋势", "情况"
+    ])
+    has_all_periods_keyword = any(kw in question for kw in all_periods_keywords)
+
+    # === 检测对比分析意图 ===
+    comparison_keywords = query_settings.get('comparison_keywords', [
+        '增长', '对比', '比较', 'vs', '变化', '趋势', '同比', '环比', '差异', '变动'
+    ])
+    result['is_comparison'] = any(kw in question for kw in comparison_keywords)
+
+    # === 提取年份(支持多个) ===
+    years = []
+    has_explicit_time = False  # 标记是否有明确指定时间
+
+    # 辅助函数: 将2位数年份转换为4位数
+    def to_full_year(short_year: int) -> int:
+        return 2000 + short_year if short_year <= 60 else 1900 + short_year
+
+    # 模式1: 4位数-4位数年份范围 (如 2022-2024, 2022至2024)
+    range_match = re.search(r'(\d{4})[—\-~至到](\d{4})年?', question)
+    if range_match:
+        start_year = int(range_match.group(1))
+        end_year = int(range_match.group(2))
+        if 1990 <= start_year <= 2060 and 1990 <= end_year <= 2060:
+            years = list(range(start_year, end_year + 1))
+            result['is_comparison'] = True
+            has_explicit_time = True
+
+    # 模式2: 2位数-2位数年份范围 (如 21-23 → 2021-2023)
+    if not years:
+        range_match_2_2 = re.search(r'(?<!\d)(\d{2})[—\-~至到](\d{2})(?!\d)', question)
+        if range_match_2_2:
+            start_short = int(range_match_2_2.group(1))
+            end_short = int(range_match_2_2.group(2))
+            start_year = to_full_year(start_short)
+            end_year = to_full_year(end_short)
+            if 1990 <= start_year <= 2060 and 1990 <= end_year <= 2060:
+                years = list(range(start_year, end_year + 1))
+                result['is_comparison'] = True
+                has_explicit_time = True
+
+    # 模式3: 4位数-2位数年份范围 (如 2021-24 → 2021-2024)
+    if not years:
+        range_match_4_2 = re.search(r'(\d{4})[—\-~至到](\d{2})(?!\d)', question)
+        if range_match_4_2:
+            start_year = int(range_match_4_2.group(1))
+            end_short = int(range_match_4_2.group(2))
+            end_year = to_full_year(end_short)
+            if 1990 <= start_year <= 2060 and 1990 <= end_year <= 2060:
+                years = list(range(start_year, end_year + 1))
+                result['is_comparison'] = True
+                has_explicit_time = True
+
+    # 模式4: 多个四位数年份 (如 2023、2024, 2023和2024)
+    if not years:
+        multi_match = re.findall(r'(\d{4})年?', question)
+        if multi_match:
+            years = [int(y) for y in multi_match if 1990 <= int(y) <= 2060]
+            years = sorted(set(years))  # 去重并排序
+            has_explicit_time = bool(years)
+
+    # 模式X: 两位数列表 (如 "22、23年", "21,22年")
+    if not years:
+        # 匹配类似 "22、23" 或 "21,22" 后面跟着 "年" 的情况
+        # 先找包含分隔符的两位数串
+        list_match = re.search(r'((?:\d{2}[、，,])+\d{2})年', question)
+        if list_match:
+            year_str = list_match.group(1)
+            # 分割并提取
+            parts = re.split(r'[、，,]', year_str)
+            for p in parts:
+                if p.isdigit():
+                    y = to_full_year(int(p))
+                    if 1990 <= y <= 2060:
+                        years.append(y)
+            years = sorted(set(years))
+            has_explicit_time = bool(years)
+
+    # 模式5: 两位数年份+年字 (如 23年、24年 → 2023、2024)
+    if not years:
+        short_match = re.findall(r'(?<!\d)(\d{2})年', question)
+        if short_match:
+            for y in short_match:
+                yi = int(y)
+                full_year = to_full_year(yi)
+                if 1990 <= full_year <= 2060:
+                    years.append(full_year)
+            years = sorted(set(years))
+            has_explicit_time = bool(years)
+
+    # 模式6: 独立四位数字 (如 2023利润率)
+    if not years:
+        standalone = re.findall(r'(?<!\d)(\d{4})(?!\d)', question)
+        if standalone:
+            years = [int(y) for y in standalone if 1990 <= int(y) <= 2060]
+            has_explicit_time = bool(years)
+
+    # 模式7: 两位数范围 (如 "22-25" -> 2022-2025, "22-25年")
+    # 必须确保不与上面的 "2022-25" 冲突
+    if not years:
+        # 优先匹配带'年'的: "22-25年"
+        range_short_year = re.search(r'(?<!\d)(\d{2})[—\-](\d{2})年', question)
+        # 或者是无单位的: "22-25"
+        if not range_short_year:
+            range_short_year = re.search(r'(?<!\d)(\d{2})[—\-](\d{2})(?!\d)', question)
+
+        if range_short_year:
+            s = int(range_short_year.group(1))
+            e = int(range_short_year.group(2))
+            # 简单的合法性检查: start < end, 且都在合理年份区间
+            sy = to_full_year(s)
+            ey = to_full_year(e)
+            if 1990 <= sy <= 2060 and 1990 <= ey <= 2060 and sy <= ey:
+                years = list(range(sy, ey + 1))
+                result['is_comparison'] = True
+                has_explicit_time = True
+
+    # 设置结果
+    if len(years) > 1:
+        result['years'] = years
+        result['year'] = years[0]  # 兼容旧逻辑
+        result['is_comparison'] = True
+    elif len(years) == 1:
+        result['year'] = years[0]
+        result['years'] = years
+    else:
+        # 没有指定年份时的处理
+        if has_all_periods_keyword:
+            # 包含优先关键词时,查询所有期间的数据
+            result['query_all_periods'] = True
+            result['year'] = None
+            result['years'] = []
+            result['is_comparison'] = True  # 全期查询默认视为对比分析
+            print(f"📅 检测到全期查询关键词,将查询所有期间数据")
+        else:
+            # 默认当前年份
+            result['year'] = current_year
+            result['years'] = [current_year]
+
+    # === 提取季度(支持多个) ===
+    cn_num = {'一': 1, '二': 2, '三': 3, '四': 4, '1': 1, '2': 2, '3': 3, '4': 4}
+    quarters = []
+
+    # 模式1: Q1、Q2 或 Q1和Q2
+    q_matches = re.findall(r'[Qq]([1234])', question)
+    if q_matches:
+        quarters = [int(q) for q in q_matches]
+
+    # 模式2: 一季度、二季度 等
+    if not quarters:
+        cn_matches = re.findall(r'第?([一二三四1234])季度?', question)
+        if cn_matches:
+            quarters = [cn_num.get(q, int(q) if q.isdigit() else None) for q in cn_matches]
+            quarters = [q for q in quarters if q is not None]
+
+    # 设置结果
+    if len(quarters) > 1:
+        result['quarters'] = sorted(set(quarters))
+        result['quarter'] = quarters[0]  # 兼容旧逻辑
+        result['is_comparison'] = True
+    elif len(quarters) == 1:
+        result['quarter'] = quarters[0]
+        result['quarters'] = quarters
+
+    # === 提取月份 ===
+    cn_month = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6,
+                '七': 7, '八': 8, '九': 9, '十': 10, '十一': 11, '十二': 12}
+
+    # 月份范围
+    range_match = re.search(r'(\d{1,2})[—\-~至到](\d{1,2})月', question)
+    if range_match:
+        start = int(range_match.group(1))
+        end = int(range_match.group(2))
+        if 1 <= start <= 12 and 1 <= end <= 12:
+            result['start_month'] = start
+            result['end_month'] = end
+    elif 'quarters' not in result and 'quarter' not in result:
+        # 单月份
+        month_match = re.search(r'(\d{1,2})月份?', question)
+        if month_match:
+            month = int(month_match.group(1))
+            if 1 <= month <= 12:
+                result['month'] = month
+
+    # === 判断是否全年 ===
+    if '全年' in question or '年度' in question:
+        result['is_full_year'] = True
+    elif 'quarter' not in result and 'quarters' not in result and 'month' not in result and 'start_month' not in result:
+        result['is_full_year'] = True
+
+    return result
+
+
+
+def random_question(rng):
+    """由时间表达片段随机拼接问题"""
+    pieces = ["2023", "2022", "23", "22", "25", "年", "-", "至", "、", ",", "Q1", "q2", "一季度", "第三季度",
+              "3月", "1-6月", "12月份", "全年", "年度", "利润", "收入", "增长", "对比", "是多少", "vs",
+              "1999", "2060", "60", "61", "9", "10", "到", "~", "—"]
+    return "".join(rng.choice(pieces) for _ in range(rng.randint(1, 8)))
+
+
+class TestTimeRangeParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = TimeRangeParser(QUERY_SETTINGS.get("all_periods_keywords"),
+                                      QUERY_SETTINGS.get("comparison_keywords"))
+
+    def assert_equivalent(self, question):
+        self.assertEqual(self.parser.parse(question, current_year=2026),
+                         legacy_extract_time_range(question, QUERY_SETTINGS, 2026), question)
+
+    def test_golden_corpus(self):
+        for question in GOLDEN_QUESTIONS:
+            self.assert_equivalent(question)
+
+    def test_random_questions(self):
+        rng = random.Random(13)
+        for _ in range(3000):
+            self.assert_equivalent(random_question(rng))
+
+    def test_default_keywords(self):
+        parser = TimeRangeParser()
+        for question in GOLDEN_QUESTIONS:
+            self.assertEqual(parser.parse(question, current_year=2026),
+                             legacy_extract_time_range(question, {}, 2026), question)
+
+    def test_cached_result_is_copy(self):
+        first = self.parser.parse("2022-2024年净利润")
+        first["years"].append(1999)
+        first["year"] = None
+        self.assertEqual(self.parser.parse("2022-2024年净利润")["years"], [2022, 2023, 2024])
+
+    def test_time_spans(self):
+        question = "2023年前三季度和上半年Q1营业收入前三名"
+        spans = [question[start:end] for start, end in sorted(self.parser.time_spans(question))]
+        self.assertEqual(spans, ["2023年", "前三季度", "上半年", "Q1"])
+
+
+if __name__ == "__main__":
+    # 简单性能对比(关闭结果缓存,只比较解析本身)
+    questions = GOLDEN_QUESTIONS * 20
+    uncached = TimeRangeParser(QUERY_SETTINGS.get("all_periods_keywords"),
+                               QUERY_SETTINGS.get("comparison_keywords"), cache_size=0)
+    for name, parse in (("原实现", lambda q: legacy_extract_time_range(q, QUERY_SETTINGS, 2026)),
+                        ("新解析器", lambda q: uncached.parse(q, current_year=2026))):
+        start = time.perf_counter()
+        for question in questions:
+            parse(question)
+        print(f"{name}: {(time.perf_counter() - start) / len(questions) * 1000:.4f} ms/次")
+    unittest.main()
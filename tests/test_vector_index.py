@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试政策向量索引: 离线构建、余弦top-k检索、RRF融合、关键词未命中时的混合检索(不调用LLM)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.db_query import TaxIncentiveQuery
+from modules.vector_index import (PolicyVectorIndex, build_vector_index, reciprocal_rank_fusion,
+                                  tokenize)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(ROOT, "database", "tax_incentives.db")
+
+
+class TestVectorIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.index_path = os.path.join(cls.tmpdir, "vectors.npz")
+        cls.stats = build_vector_index(DB_PATH, cls.index_path, dims=64)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("残疾人, AB"), ["残", "疾", "残疾", "人", "疾人", "a", "b", "ab"])
+
+    def test_build_stats(self):
+        self.assertGreater(self.stats["documents"], 0)
+        self.assertEqual(self.stats["dims"], 64)
+
+    def test_query_ranks_relevant_policy_first(self):
+        index = PolicyVectorIndex(self.index_path)
+        self.assertTrue(index.available())
+        results = index.query("给残疾人发工资有什么好处", top_k=5)
+        self.assertEqual(len(results), 5)
+        self.assertEqual([s for _, s in results], sorted((s for _, s in results), reverse=True))
+        query = TaxIncentiveQuery(db_path=DB_PATH)
+        self.assertIn("残疾", query.get_by_id(results[0][0])["incentive_items"])
+
+    def test_out_of_vocabulary_query(self):
+        self.assertEqual(PolicyVectorIndex(self.index_path).query("@@@ ###"), [])
+
+    def test_missing_index(self):
+        index = PolicyVectorIndex(os.path.join(self.tmpdir, "missing.npz"))
+        self.assertFalse(index.available())
+        self.assertEqual(index.query("残疾人"), [])
+
+    def test_rrf(self):
+        self.assertEqual(reciprocal_rank_fusion([([1, 2, 3], 1.0), ([2, 3], 1.0)]), [2, 3, 1])
+        self.assertEqual(reciprocal_rank_fusion([([1], 1.0), ([2], 2.0)]), [2, 1])
+
+    def test_unmatched_question_uses_hybrid_without_llm(self):
+        query = TaxIncentiveQuery(db_path=DB_PATH)
+        config = query._load_config()
+        config["hybrid_search"] = dict(config["hybrid_search"], index_path=self.index_path, replace_llm=True)
+        with mock.patch.object(query, "_infer_tax_type_with_llm") as infer, \
+                mock.patch.object(query, "_extract_project_keywords_with_llm") as extract:
+            results, total, _, meta = query.search_with_meta("农民合作社卖自己种的菜", limit=5)
+        infer.assert_not_called()
+        extract.assert_not_called()
+        self.assertEqual(meta["strategy"], "hybrid")
+        self.assertEqual(meta["llm"]["tasks"], [])
+        self.assertEqual(len(results), 5)
+        self.assertTrue(any("农" in (r["incentive_items"] or "") for r in results))
+
+    def test_llm_inference_kept_by_default(self):
+        query = TaxIncentiveQuery(db_path=DB_PATH)
+        config = query._load_config()
+        self.assertFalse(config["hybrid_search"]["replace_llm"])
+        config["hybrid_search"] = dict(config["hybrid_search"], index_path=self.index_path)
+        with mock.patch.object(query, "_infer_tax_type_with_llm", return_value=None) as infer, \
+                mock.patch.object(query, "_extract_project_keywords_with_llm", return_value=[]) as extract:
+            results, _, _, meta = query.search_with_meta("农民合作社卖自己种的菜", limit=5)
+        infer.assert_called_once()
+        extract.assert_called_once()
+        self.assertEqual(meta["strategy"], "hybrid")
+        self.assertEqual(len(results), 5)
+
+    def test_truncated_svd(self):
+        with np.load(self.index_path) as npz:
+            projection, vectors = npz["projection"], npz["vectors"]
+        self.assertEqual(projection.shape[1], 64)
+        np.testing.assert_allclose(projection.T @ projection, np.eye(64), atol=1e-4)
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-4)
+
+        # 文档数不超过维数时改用完整SVD
+        tiny = os.path.join(self.tmpdir, "tiny.npz")
+        stats = build_vector_index(DB_PATH, tiny, dims=self.stats["documents"] + 10)
+        self.assertLessEqual(stats["dims"], self.stats["documents"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,7 @@
 FTS索引重建脚本
 功能:
 1. 检测主表 tax_incentives 与 FTS 索引表的数据差异
-2. 自动重建 tax_incentives_fts 及其关联表
+2. 自动重建 tax_incentives_fts 及其关联表(trigram分词,支持中文子串检索)
 3. 对新增记录，调用大模型生成/优化 keywords 字段
 4. 容错处理：事务回滚、异常日志
 
@@ -32,6 +32,21 @@ LOG_PATH = PROJECT_ROOT / "tools" / "fts_rebuild.log"
 # 记录文件，用于配置更新脚本检测执行顺序
 LAST_REBUILD_FILE = PROJECT_ROOT / "tools" / ".fts_last_rebuild"
 
+# FTS索引字段(与 TaxIncentiveQuery 的检索字段一致)
+FTS_COLUMNS = [
+    "tax_type",
+    "incentive_items",
+    "qualification",
+    "detailed_rules",
+    "legal_basis",
+    "explanation",
+    "keywords",
+    "incentive_method",
+]
+
+# FTS分词器: trigram 按3字符切分,可对中文做子串匹配(unicode61 会把整句中文当成一个词)
+FTS_TOKENIZER = "trigram"
+
 
 def log(message: str, level: str = "INFO"):
     """记录日志"""
@@ -69,10 +84,54 @@ def check_fts_sync(conn) -> dict:
         "main_count": main_count,
         "fts_count": fts_count,
         "is_synced": main_count == fts_count,
-        "fts_exists": fts_count >= 0
+        "fts_exists": fts_count >= 0,
+        "schema_ok": check_fts_schema(conn)
     }
 
 
+def check_fts_schema(conn) -> bool:
+    """检查FTS表分词器和字段是否为最新结构"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'tax_incentives_fts'")
+    row = cursor.fetchone()
+    if not row or FTS_TOKENIZER not in (row[0] or "").lower():
+        return False
+    cursor.execute("PRAGMA table_info(tax_incentives_fts)")
+    return [r[1] for r in cursor.fetchall()] == FTS_COLUMNS
+
+
+def create_fts_triggers(cursor):
+    """创建主表到FTS表的同步触发器"""
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{col}" for col in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{col}" for col in FTS_COLUMNS)
+
+    for name in ("tax_incentives_ai", "tax_incentives_ad", "tax_incentives_au"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    cursor.execute(f"""
+        CREATE TRIGGER tax_incentives_ai AFTER INSERT ON tax_incentives BEGIN
+            INSERT INTO tax_incentives_fts(rowid, {columns})
+            VALUES (new.id, {new_values});
+        END
+    """)
+    # external content表删除时需提供旧值,才能正确清除倒排项
+    cursor.execute(f"""
+        CREATE TRIGGER tax_incentives_ad AFTER DELETE ON tax_incentives BEGIN
+            INSERT INTO tax_incentives_fts(tax_incentives_fts, rowid, {columns})
+            VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER tax_incentives_au AFTER UPDATE ON tax_incentives BEGIN
+            INSERT INTO tax_incentives_fts(tax_incentives_fts, rowid, {columns})
+            VALUES ('delete', old.id, {old_values});
+            INSERT INTO tax_incentives_fts(rowid, {columns})
+            VALUES (new.id, {new_values});
+        END
+    """)
+
+
 def rebuild_fts_index(conn) -> bool:
     """重建FTS索引"""
     cursor = conn.cursor()
@@ -85,34 +144,27 @@ def rebuild_fts_index(conn) -> bool:
         cursor.execute("DROP TABLE IF EXISTS tax_incentives_fts")
         
         # 2. 创建新的FTS5虚拟表
-        log("  → 创建FTS5虚拟表...")
-        cursor.execute("""
+        log(f"  → 创建FTS5虚拟表(tokenize={FTS_TOKENIZER})...")
+        cursor.execute(f"""
             CREATE VIRTUAL TABLE tax_incentives_fts USING fts5(
-                tax_type,
-                incentive_items,
-                qualification,
-                detailed_rules,
-                legal_basis,
-                explanation,
-                keywords,
+                {", ".join(FTS_COLUMNS)},
                 content='tax_incentives',
-                content_rowid='id'
+                content_rowid='id',
+                tokenize='{FTS_TOKENIZER}'
             )
         """)
         
         # 3. 填充FTS索引
         log("  → 填充FTS索引数据...")
-        cursor.execute("""
-            INSERT INTO tax_incentives_fts(rowid, tax_type, incentive_items, 
-                qualification, detailed_rules, legal_basis, explanation, keywords)
-            SELECT id, tax_type, incentive_items, qualification, 
-                   detailed_rules, legal_basis, explanation, keywords
-            FROM tax_incentives
-        """)
+        cursor.execute("INSERT INTO tax_incentives_fts(tax_incentives_fts) VALUES('rebuild')")
+        
+        # 4. 重建同步触发器
+        log("  → 重建同步触发器...")
+        create_fts_triggers(cursor)
         
         conn.commit()
         
-        # 4. 验证
+        # 5. 验证
         new_count = get_fts_table_count(cursor)
         main_count = get_main_table_count(cursor)
         
@@ -233,9 +285,10 @@ def main():
         log(f"  主表记录数: {status['main_count']}")
         log(f"  FTS记录数: {status['fts_count']}")
         log(f"  是否同步: {'是' if status['is_synced'] else '否'}")
+        log(f"  结构最新: {'是' if status['schema_ok'] else '否'}")
         
-        # 2. 如果不同步或FTS不存在，重建索引
-        if not status['is_synced'] or not status['fts_exists']:
+        # 2. 如果不同步、FTS不存在或结构过旧(非trigram/缺字段)，重建索引
+        if not status['is_synced'] or not status['fts_exists'] or not status['schema_ok']:
             log("需要重建FTS索引...")
             if not rebuild_fts_index(conn):
                 return 1
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+按月累计汇总表维护脚本
+功能:
+1. 首次运行时在 financial.db 中创建 period_rollups 等汇总表,并在源表上安装变更触发器
+2. 之后每次导入数据后运行: 只重算触发器记录的有变化的(企业, 年份)分区
+3. 源表字段变化或表被重建(触发器丢失)时自动整表重建;--full 强制整表重建
+
+查询层只读取汇总表,汇总表未建立或分区待刷新时回退为对源表求和,因此该脚本不运行也不影响正确性
+
+使用方法:
+    python tools/rebuild_period_rollups.py                 # 刷新 income_statements
+    python tools/rebuild_period_rollups.py --full           # 整表重建
+    python tools/rebuild_period_rollups.py 表名1 表名2       # 刷新指定的月度表
+
+执行顺序:
+    在导入/更新财务数据的脚本之后运行
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from modules.period_rollup import PeriodRollup
+
+# 数据库路径
+DB_PATH = PROJECT_ROOT / "database" / "financial.db"
+
+# 默认维护的月度表
+DEFAULT_TABLES = ["income_statements"]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="按月累计汇总表维护")
+    parser.add_argument("tables", nargs="*", default=DEFAULT_TABLES, help="带 period_month 的月度表")
+    parser.add_argument("--full", action="store_true", help="整表重建")
+    parser.add_argument("--db", default=str(DB_PATH), help="financial.db 路径")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("按月累计汇总表维护")
+    print("=" * 60)
+
+    if not Path(args.db).exists():
+        print(f"❌ 数据库文件不存在: {args.db}")
+        return 1
+
+    rollup = PeriodRollup(args.db)
+    failed = False
+    for table in args.tables:
+        count = rollup.refresh(table, full=args.full)
+        if count < 0:
+            print(f"⚠️  {table}: 表不存在、没有 period_month 字段或刷新失败")
+            failed = True
+        else:
+            print(f"✅ {table}: 重算 {count} 个(企业, 年份)分区")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+政策向量索引重建脚本
+功能:
+1. 从 tax_incentives 表构建 TF-IDF + SVD 稠密向量索引(纯本地计算,无需网络)
+2. 写入 database/tax_incentives_vectors.npz(原子替换,服务无需重启,自动载入新索引)
+
+使用方法:
+    python tools/rebuild_vector_index.py [--dims 128]
+
+执行顺序:
+    政策数据变更后,与 rebuild_fts_index.py 一起运行
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from modules.vector_index import build_vector_index, default_index_path
+
+# 数据库路径
+DB_PATH = PROJECT_ROOT / "database" / "tax_incentives.db"
+LOG_PATH = PROJECT_ROOT / "tools" / "vector_rebuild.log"
+
+
+def log(message: str, level: str = "INFO"):
+    """记录日志"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    log_line = f"[{timestamp}] [{level}] {message}"
+    print(log_line)
+
+    with open(LOG_PATH, 'a', encoding='utf-8') as f:
+        f.write(log_line + "\n")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="政策向量索引重建工具")
+    parser.add_argument("--dims", type=int, default=128, help="向量维数上限")
+    parser.add_argument("--min-df", type=int, default=2, help="词最少出现的政策条数")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("政策向量索引重建工具")
+    print("=" * 60)
+
+    if not DB_PATH.exists():
+        log(f"❌ 数据库文件不存在: {DB_PATH}", "ERROR")
+        return 1
+
+    try:
+        log(f"开始构建向量索引(dims={args.dims}, min_df={args.min_df})...")
+        stats = build_vector_index(str(DB_PATH), default_index_path(str(DB_PATH)),
+                                   dims=args.dims, min_df=args.min_df)
+        log(f"✅ 向量索引构建完成: {stats['documents']} 条政策, "
+            f"{stats['vocabulary']} 个词, {stats['dims']} 维 → {stats['path']}")
+        return 0
+    except Exception as e:
+        log(f"❌ 向量索引构建失败: {e}", "ERROR")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())